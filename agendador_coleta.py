@@ -0,0 +1,286 @@
+"""
+Agendador adaptativo de coleta por símbolo
+
+Em vez de uma frequência fixa para todos, cada símbolo tem o próprio intervalo
+de consulta, escolhido em tempo de execução:
+
+- Volatilidade: média exponencial de r²/Δt (variância por segundo dos retornos
+  log entre consultas, meia-vida configurável). O intervalo é o tempo esperado
+  para o preço andar `alvo_movimento_bps`: Δt = (alvo / σ)². Símbolo agitado
+  é consultado mais vezes; símbolo parado se afasta até `intervalo_max`.
+- Ordens abertas: símbolos com ordem ativa (fonte_ordens, por exemplo os
+  símbolos de GestorOrdensDinamico.ordens_ativas) têm o intervalo dividido
+  por `fator_ordens`.
+- Falhas: cada falha seguida dobra o intervalo do símbolo (até backoff_max).
+- Orçamento: a soma das taxas (1/intervalo) fica abaixo do orçamento efetivo
+  de requisições por segundo. Símbolos sem ordem cedem primeiro. Respostas 429
+  cortam o orçamento efetivo pela metade e pausam as consultas pelo tempo
+  pedido pelo servidor; cada sucesso devolve um pouco (AIMD).
+
+intervalos() expõe o intervalo escolhido de cada símbolo (métrica).
+"""
+
+import math
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+from loguru import logger
+
+
+def espera_sugerida(cabecalhos: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Segundos de espera pedidos pelo servidor (Retry-After ou reset do limite da Bybit)"""
+    if not cabecalhos:
+        return None
+    try:
+        if 'retry-after' in cabecalhos:
+            return max(0.0, float(cabecalhos['retry-after']))
+        if 'x-bapi-limit-reset-timestamp' in cabecalhos:
+            return max(0.0, float(cabecalhos['x-bapi-limit-reset-timestamp']) / 1000 - time.time())
+    except ValueError:
+        pass
+    return None
+
+
+class AgendadorAdaptativo:
+    """Escolhe quando consultar cada símbolo dentro de um orçamento de requisições"""
+
+    def __init__(self, simbolos: Optional[Iterable[str]] = None, orcamento_req_segundo: Optional[float] = None,
+                 intervalo_min: Optional[float] = None, intervalo_max: Optional[float] = None,
+                 intervalo_inicial: Optional[float] = None, alvo_movimento_bps: Optional[float] = None,
+                 fator_ordens: Optional[float] = None, meia_vida_segundos: Optional[float] = None,
+                 backoff_max: Optional[float] = None, fonte_ordens: Optional[Callable[[], Iterable[str]]] = None):
+        """
+        Inicializa o agendador (todos os símbolos vencem na primeira chamada)
+
+        Args:
+            simbolos: Símbolos agendados
+            orcamento_req_segundo: Teto de consultas por segundo somando todos os símbolos
+            intervalo_min: Menor intervalo por símbolo (segundos)
+            intervalo_max: Maior intervalo por símbolo sem falhas (segundos)
+            intervalo_inicial: Intervalo enquanto não há volatilidade medida
+            alvo_movimento_bps: Movimento esperado entre duas consultas
+            fator_ordens: Divisor do intervalo de símbolos com ordem aberta
+            meia_vida_segundos: Meia-vida da média de volatilidade
+            backoff_max: Maior intervalo após falhas seguidas
+            fonte_ordens: Função que devolve os símbolos com ordem aberta
+        """
+        try:
+            import config
+            cfg = (config.load_config() or {}).get('coleta', {}).get('agendador', {}) or {}
+        except Exception:
+            cfg = {}
+        self.orcamento = orcamento_req_segundo or cfg.get('orcamento_req_segundo', 4)
+        self.intervalo_min = intervalo_min or cfg.get('intervalo_min_segundos', 1)
+        self.intervalo_max = intervalo_max or cfg.get('intervalo_max_segundos', 60)
+        self.intervalo_inicial = intervalo_inicial or cfg.get('intervalo_inicial_segundos', 10)
+        self.alvo = (alvo_movimento_bps or cfg.get('alvo_movimento_bps', 5)) / 10_000
+        self.fator_ordens = fator_ordens or cfg.get('fator_ordens', 4)
+        self.meia_vida = meia_vida_segundos or cfg.get('meia_vida_segundos', 300)
+        self.backoff_max = backoff_max or cfg.get('backoff_max_segundos', 300)
+        self.fonte_ordens = fonte_ordens
+
+        self.orcamento_efetivo = float(self.orcamento)
+        self._pausa_ate = 0.0
+        self._estado: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {
+            'consultas': 0,
+            'precos': 0,
+            'falhas': 0,
+            'respostas': 0,
+            'erros_429': 0,
+            'pausas_429': 0,
+        }
+        for simbolo in simbolos or []:
+            self.adicionar(simbolo)
+
+    # ------------------------------------------------------------------
+    # Símbolos
+    # ------------------------------------------------------------------
+    def adicionar(self, simbolo: str):
+        with self._lock:
+            if simbolo not in self._estado:
+                self._estado[simbolo] = {'intervalo': float(self.intervalo_inicial), 'proximo_em': 0.0,
+                                         'variancia': None, 'ultimo_preco': None, 'ultimo_em': None,
+                                         'falhas': 0, 'com_ordem': False, 'consultas': 0}
+                self._recalcular()
+
+    def remover(self, simbolo: str):
+        with self._lock:
+            self._estado.pop(simbolo, None)
+            self._recalcular()
+
+    # ------------------------------------------------------------------
+    # Agenda
+    # ------------------------------------------------------------------
+    def vencidos(self, agora: Optional[float] = None) -> List[str]:
+        """Símbolos que devem ser consultados agora (já reagendados para a próxima vez)"""
+        agora = time.monotonic() if agora is None else agora
+        self._atualizar_ordens()
+        with self._lock:
+            if agora < self._pausa_ate:
+                return []
+            vencidos = sorted((e['proximo_em'], s) for s, e in self._estado.items() if e['proximo_em'] <= agora)
+            for _, simbolo in vencidos:
+                estado = self._estado[simbolo]
+                estado['proximo_em'] = agora + estado['intervalo']
+                estado['consultas'] += 1
+            self.estatisticas['consultas'] += len(vencidos)
+            return [s for _, s in vencidos]
+
+    def tempo_ate_proximo(self, agora: Optional[float] = None) -> float:
+        """Segundos até o próximo símbolo vencer (respeitando pausa por 429)"""
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            if not self._estado:
+                return self.intervalo_max
+            proximo = max(min(e['proximo_em'] for e in self._estado.values()), self._pausa_ate)
+            return max(0.0, proximo - agora)
+
+    def intervalos(self) -> Dict[str, float]:
+        """Intervalo atual de cada símbolo (segundos)"""
+        with self._lock:
+            return {s: round(e['intervalo'], 3) for s, e in self._estado.items()}
+
+    # ------------------------------------------------------------------
+    # Realimentação
+    # ------------------------------------------------------------------
+    def registrar_preco(self, simbolo: str, preco: float, agora: Optional[float] = None):
+        """Preço consultado com sucesso: atualiza a volatilidade e zera as falhas"""
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if estado is None or not preco or preco <= 0:
+                return
+            self.estatisticas['precos'] += 1
+            anterior, anterior_em = estado['ultimo_preco'], estado['ultimo_em']
+            if anterior and anterior_em is not None and agora > anterior_em:
+                dt = agora - anterior_em
+                observacao = math.log(preco / anterior) ** 2 / dt
+                if estado['variancia'] is None:
+                    estado['variancia'] = observacao
+                else:
+                    peso = 1 - math.exp(-dt * math.log(2) / self.meia_vida)
+                    estado['variancia'] += peso * (observacao - estado['variancia'])
+            estado['ultimo_preco'], estado['ultimo_em'] = preco, agora
+            estado['falhas'] = 0
+            self._recalcular()
+
+    def registrar_falha(self, simbolo: str):
+        """Consulta sem dados: o intervalo do símbolo dobra a cada falha seguida"""
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if estado is None:
+                return
+            estado['falhas'] += 1
+            self.estatisticas['falhas'] += 1
+            self._recalcular()
+
+    def registrar_resposta(self, status: Optional[int], espera: Optional[float] = None):
+        """
+        Resultado de uma requisição HTTP (de qualquer símbolo)
+
+        Args:
+            status: Status HTTP (None = falha de rede)
+            espera: Segundos pedidos pelo servidor antes de tentar de novo
+        """
+        with self._lock:
+            self.estatisticas['respostas'] += 1
+            if status == 429:
+                self.estatisticas['erros_429'] += 1
+                piso = min(self.orcamento, 1.0 / self.intervalo_max)
+                self.orcamento_efetivo = max(piso, self.orcamento_efetivo / 2)
+                pausa = espera if espera is not None else 1.0
+                if time.monotonic() + pausa > self._pausa_ate:
+                    self._pausa_ate = time.monotonic() + pausa
+                    self.estatisticas['pausas_429'] += 1
+                logger.warning(f"⚠️ 429 recebido: orçamento de coleta reduzido para "
+                               f"{self.orcamento_efetivo:.2f} req/s, pausa de {pausa:.1f}s")
+                self._recalcular()
+            elif status is not None and status < 400 and self.orcamento_efetivo < self.orcamento:
+                self.orcamento_efetivo = min(self.orcamento, self.orcamento_efetivo + 0.05 * self.orcamento)
+                self._recalcular()
+
+    def observar(self, cliente, hosts: Optional[Iterable[str]] = None):
+        """Recebe os status de um ClienteHTTP (cliente_http.py), opcionalmente só de alguns hosts"""
+        hosts = set(hosts) if hosts else None
+
+        def _ouvinte(host, status, latencia_ms, cabecalhos):
+            if hosts is None or host in hosts:
+                self.registrar_resposta(status, espera_sugerida(cabecalhos))
+
+        cliente.ao_responder(_ouvinte)
+        return _ouvinte
+
+    # ------------------------------------------------------------------
+    # Cálculo dos intervalos
+    # ------------------------------------------------------------------
+    def _atualizar_ordens(self):
+        if not self.fonte_ordens:
+            return
+        try:
+            com_ordem = set(self.fonte_ordens())
+        except Exception as e:
+            logger.debug(f"Fonte de ordens indisponível: {e}")
+            return
+        with self._lock:
+            mudou = False
+            for simbolo, estado in self._estado.items():
+                if estado['com_ordem'] != (simbolo in com_ordem):
+                    estado['com_ordem'] = simbolo in com_ordem
+                    mudou = True
+            if mudou:
+                self._recalcular()
+
+    def _desejado(self, estado: Dict[str, Any]) -> float:
+        if estado['variancia'] is None:
+            intervalo = self.intervalo_inicial
+        elif estado['variancia'] <= 0:
+            intervalo = self.intervalo_max
+        else:
+            intervalo = self.alvo ** 2 / estado['variancia']
+        intervalo = min(max(intervalo, self.intervalo_min), self.intervalo_max)
+        if estado['com_ordem']:
+            intervalo = max(self.intervalo_min, intervalo / self.fator_ordens)
+        if estado['falhas']:
+            intervalo = min(self.backoff_max, intervalo * 2 ** estado['falhas'])
+        return intervalo
+
+    def _recalcular(self):
+        """Intervalos desejados, depois encaixados no orçamento (chamar com o lock)"""
+        if not self._estado:
+            return
+        desejados = {s: self._desejado(e) for s, e in self._estado.items()}
+        prioritarios = {s for s, e in self._estado.items() if e['com_ordem']}
+        taxa_prioritaria = sum(1 / desejados[s] for s in prioritarios)
+        taxa_resto = sum(1 / d for s, d in desejados.items() if s not in prioritarios)
+        orcamento = self.orcamento_efetivo
+
+        if taxa_prioritaria + taxa_resto > orcamento:
+            sobra = orcamento - taxa_prioritaria
+            if taxa_resto and sobra >= 0.2 * orcamento:
+                # Símbolos sem ordem cedem a diferença
+                fator = taxa_resto / sobra
+                for s in desejados:
+                    if s not in prioritarios:
+                        desejados[s] *= fator
+            else:
+                fator = (taxa_prioritaria + taxa_resto) / orcamento
+                for s in desejados:
+                    desejados[s] *= fator
+
+        for simbolo, intervalo in desejados.items():
+            estado = self._estado[simbolo]
+            if estado['ultimo_em'] is not None and intervalo < estado['intervalo']:
+                # Encurtou: antecipa a próxima consulta em vez de esperar o intervalo antigo
+                estado['proximo_em'] = min(estado['proximo_em'], estado['ultimo_em'] + intervalo)
+            estado['intervalo'] = intervalo
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.estatisticas)
+            stats['orcamento_efetivo'] = round(self.orcamento_efetivo, 3)
+            stats['taxa_planejada'] = round(sum(1 / e['intervalo'] for e in self._estado.values()), 3)
+            stats['pausado'] = time.monotonic() < self._pausa_ate
+        stats['intervalos'] = self.intervalos()
+        return stats
@@ -1,160 +1,151 @@
-import sqlite3
 import os
 from datetime import datetime
 from loguru import logger
 from typing import Optional
+from banco_dados import obter_banco, agora_ms, para_epoch_ms
+from buffer_precos import obter_buffer_precos
+from payloads import obter_armazem_payloads, extrair_campos
+from estatisticas import contar_linhas, obter_estatisticas_decisoes
 
 class Armazenamento:
     def __init__(self, db_path=None):
         self.db_path = db_path or self.get_db_path()
-        self.criar_tabelas()
+        self.banco = obter_banco(self.db_path)
+        # Gravações de alta frequência (preços, análises, decisões) vão pelo buffer write-behind
+        self.buffer = self.banco.obter_buffer()
+        # Payloads grandes (dados de entrada, respostas da API) gravados uma vez, referenciados por id
+        self.payloads = obter_armazem_payloads(self.banco)
 
     def get_db_path(self):
         os.makedirs('dados', exist_ok=True)
         return os.path.join('dados', 'trading.db')
 
-    def criar_tabelas(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS precos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            preco_atual DECIMAL(10,2),
-            bid DECIMAL(10,2),
-            ask DECIMAL(10,2),
-            volume INTEGER,
-            open_price DECIMAL(10,2),
-            high_price DECIMAL(10,2),
-            low_price DECIMAL(10,2),
-            close_price DECIMAL(10,2),
-            simbolo TEXT
-        );
-        ''')
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS analises (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            dados_entrada TEXT,
-            resultado TEXT,
-            confianca DECIMAL(5,2)
-        );
-        ''')
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS ordens (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            tipo TEXT,
-            quantidade INTEGER,
-            preco DECIMAL(10,2),
-            status TEXT,
-            resposta_api TEXT
-        );
-        ''')
-        conn.commit()
-        conn.close()
-
-    def salvar_precos(self, timestamp, preco_atual, preco_abertura=None, preco_minimo=None, preco_maximo=None, preco_medio=None, variacao=None, volume=None, simbolo=None):
+    def salvar_precos(self, timestamp, preco_atual, preco_abertura=None, preco_minimo=None, preco_maximo=None, preco_medio=None, variacao=None, volume=None, simbolo=None, bid=None, ask=None):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
-            INSERT INTO precos (timestamp, preco_atual, open_price, high_price, low_price, close_price, volume, simbolo)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ts_ms = para_epoch_ms(timestamp)
+            aceito = self.buffer.adicionar('''
+            INSERT INTO precos (timestamp, ts_ms, preco_atual, open_price, high_price, low_price, close_price, volume, bid, ask, simbolo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 timestamp,
+                ts_ms,
                 preco_atual,
                 preco_abertura,
                 preco_maximo,
                 preco_minimo,
                 preco_medio,
                 volume,
+                bid,
+                ask,
                 simbolo
             ))
-            conn.commit()
-            conn.close()
-            logger.info(f"Preço salvo no banco: {preco_atual} ({simbolo})")
-            return True
+            self._anexar_buffer_precos(simbolo, ts_ms, preco_atual, volume, bid, ask)
+            if aceito:
+                logger.info(f"Preço salvo no banco: {preco_atual} ({simbolo})")
+            else:
+                logger.warning(f"⚠️ Preço descartado pelo buffer de escrita (cheio): {preco_atual} ({simbolo})")
+            return aceito
         except Exception as e:
             logger.error(f"Erro ao salvar preço: {e}")
             return False
 
+    def _anexar_buffer_precos(self, simbolo, ts_ms, preco, volume=None, bid=None, ask=None):
+        """Anexa o tick ao buffer circular do símbolo (histórico quente sem SQLite)"""
+        if not simbolo or preco is None:
+            return
+        try:
+            obter_buffer_precos(simbolo).adicionar(ts_ms, float(preco), float(volume or 0), bid, ask)
+        except Exception as e:
+            logger.error(f"Erro ao anexar tick ao buffer de preços: {e}")
+
     def salvar_analise(self, dados_entrada, resultado, confianca):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
-            INSERT INTO analises (timestamp, dados_entrada, resultado, confianca)
-            VALUES (?, ?, ?, ?)
+            payload_id = self.payloads.gravar(dados_entrada, self.buffer)
+            campos = extrair_campos(dados_entrada)
+            aceito = self.buffer.adicionar('''
+            INSERT INTO analises (timestamp, ts_ms, payload_id, rsi, volatilidade, preco_atual, resultado, confianca)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 datetime.now(),
-                str(dados_entrada),
+                agora_ms(),
+                payload_id,
+                campos['rsi'],
+                campos['volatilidade'],
+                campos['preco_atual'],
                 resultado,
                 confianca
             ))
-            conn.commit()
-            conn.close()
-            logger.info(f"Análise salva: {resultado} (confiança: {confianca})")
-            return True
+            if aceito:
+                logger.info(f"Análise salva: {resultado} (confiança: {confianca})")
+            else:
+                logger.warning(f"⚠️ Análise descartada pelo buffer de escrita (cheio): {resultado}")
+            return aceito
         except Exception as e:
             logger.error(f"Erro ao salvar análise: {e}")
             return False
 
     def salvar_ordem(self, tipo, quantidade, preco, status, resposta_api):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
-            INSERT INTO ordens (timestamp, tipo, quantidade, preco, status, resposta_api)
-            VALUES (?, ?, ?, ?, ?, ?)
+            payload_id = self.payloads.gravar(resposta_api)
+            self.banco.executar('''
+            INSERT INTO ordens (timestamp, ts_ms, tipo, quantidade, preco, status, payload_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 datetime.now(),
+                agora_ms(),
                 tipo,
                 quantidade,
                 preco,
                 status,
-                str(resposta_api)
+                payload_id
             ))
-            conn.commit()
-            conn.close()
             logger.info(f"Ordem salva: {tipo} {quantidade} @ {preco}")
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar ordem: {e}")
             return False
 
+    def obter_payload(self, payload_id):
+        """Retorna o dicionário original de uma linha a partir do payload_id"""
+        try:
+            payload = self.payloads.ler(payload_id)
+            if payload is None and payload_id:
+                # Pode estar ainda no buffer write-behind
+                self.buffer.descarregar()
+                payload = self.payloads.ler(payload_id)
+            return payload
+        except Exception as e:
+            logger.error(f"Erro ao ler payload {payload_id}: {e}")
+            return None
+
     def obter_ultimos_precos(self, limite=100):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            self.buffer.descarregar()
+            return self.banco.consultar('''
             SELECT timestamp, preco_atual, volume, close_price, simbolo
             FROM precos
             WHERE preco_atual IS NOT NULL
-            ORDER BY timestamp DESC
+            ORDER BY ts_ms DESC
             LIMIT ?
             ''', (limite,))
-            resultados = c.fetchall()
-            conn.close()
-            return resultados
         except Exception as e:
             logger.error(f"Erro ao obter preços: {e}")
             return []
 
     def obter_estatisticas(self):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('SELECT COUNT(*) FROM precos')
-            total_precos = c.fetchone()[0]
-            c.execute('SELECT preco_atual FROM precos WHERE preco_atual IS NOT NULL ORDER BY timestamp DESC LIMIT 1')
-            ultimo_preco = c.fetchone()
-            ultimo_preco = ultimo_preco[0] if ultimo_preco else None
-            c.execute('SELECT COUNT(*) FROM analises')
-            total_analises = c.fetchone()[0]
-            c.execute('SELECT COUNT(*) FROM ordens')
-            total_ordens = c.fetchone()[0]
-            conn.close()
+            self.buffer.descarregar()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
+                c.execute('SELECT COUNT(*) FROM precos')
+                total_precos = c.fetchone()[0]
+                c.execute('SELECT preco_atual FROM precos WHERE preco_atual IS NOT NULL ORDER BY ts_ms DESC LIMIT 1')
+                ultimo_preco = c.fetchone()
+                ultimo_preco = ultimo_preco[0] if ultimo_preco else None
+                c.execute('SELECT COUNT(*) FROM analises')
+                total_analises = c.fetchone()[0]
+                c.execute('SELECT COUNT(*) FROM ordens')
+                total_ordens = c.fetchone()[0]
             return {
                 'total_precos': total_precos,
                 'ultimo_preco': ultimo_preco,
@@ -163,90 +154,24 @@ class Armazenamento:
             }
         except Exception as e:
             logger.error(f"Erro ao obter estatísticas: {e}")
-            return {} 
+            return {}
 
 class ArmazenamentoCrypto(Armazenamento):
     """Armazenamento específico para dados de crypto"""
-    
-    def __init__(self, db_path=None):
-        super().__init__(db_path)
-        self.criar_tabelas_crypto()
-    
-    def criar_tabelas_crypto(self):
-        """Cria tabelas específicas para crypto"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Tabela de dados crypto
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS crypto_dados (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            symbol TEXT NOT NULL,
-            preco_atual DECIMAL(15,8),
-            preco_abertura DECIMAL(15,8),
-            preco_minimo DECIMAL(15,8),
-            preco_maximo DECIMAL(15,8),
-            volume DECIMAL(20,8),
-            variacao_percentual DECIMAL(10,4),
-            rsi DECIMAL(5,2),
-            volatilidade DECIMAL(10,6),
-            tendencia TEXT,
-            fonte TEXT
-        );
-        ''')
-        
-        # Tabela de decisões da IA
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS decisoes_ia (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            symbol TEXT NOT NULL,
-            decisao TEXT NOT NULL,
-            confianca DECIMAL(5,2),
-            razao TEXT,
-            dados_entrada TEXT,
-            resultado TEXT,
-            acerto BOOLEAN
-        );
-        ''')
-        
-        # Tabela de ordens crypto
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS ordens_crypto (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            order_id TEXT UNIQUE,
-            symbol TEXT NOT NULL,
-            tipo TEXT NOT NULL,
-            quantidade DECIMAL(15,8),
-            preco_entrada DECIMAL(15,8),
-            preco_atual DECIMAL(15,8),
-            status TEXT NOT NULL,
-            lucro_prejuizo DECIMAL(15,8),
-            pnl_percentual DECIMAL(10,4),
-            confianca_ia DECIMAL(5,2),
-            dados_mercado TEXT
-        );
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logger.info("Tabelas crypto criadas")
-    
+
     def salvar_dados_crypto(self, dados: dict):
         """Salva dados de crypto no banco"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            ts_ms = agora_ms()
+            aceito = self.buffer.adicionar('''
             INSERT INTO crypto_dados (
-                timestamp, symbol, preco_atual, preco_abertura, preco_minimo, 
-                preco_maximo, volume, variacao_percentual, rsi, volatilidade, 
+                timestamp, ts_ms, symbol, preco_atual, preco_abertura, preco_minimo,
+                preco_maximo, volume, variacao_percentual, rsi, volatilidade,
                 tendencia, fonte
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 datetime.now(),
+                ts_ms,
                 dados.get('symbol', ''),
                 dados.get('preco_atual', 0),
                 dados.get('preco_abertura', 0),
@@ -259,49 +184,58 @@ class ArmazenamentoCrypto(Armazenamento):
                 dados.get('tendencia', 'lateral'),
                 dados.get('fonte', 'Bybit')
             ))
-            conn.commit()
-            conn.close()
-            return True
+            self._anexar_buffer_precos(dados.get('symbol'), ts_ms, dados.get('preco_atual'),
+                                       dados.get('volume'), dados.get('bid'), dados.get('ask'))
+            if not aceito:
+                logger.warning(f"⚠️ Dados de {dados.get('symbol', '')} descartados pelo buffer de escrita (cheio)")
+            return aceito
         except Exception as e:
             logger.error(f"Erro ao salvar dados crypto: {e}")
             return False
-    
+
     def salvar_decisao_ia(self, symbol: str, decisao: dict, dados_entrada: Optional[dict] = None):
         """Salva decisão da IA"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            payload_id = self.payloads.gravar(dados_entrada, self.buffer)
+            campos = extrair_campos(dados_entrada)
+            aceito = self.buffer.adicionar('''
             INSERT INTO decisoes_ia (
-                timestamp, symbol, decisao, confianca, razao, dados_entrada
-            ) VALUES (?, ?, ?, ?, ?, ?)
+                timestamp, ts_ms, symbol, decisao, confianca, razao,
+                payload_id, rsi, volatilidade, preco_atual
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 datetime.now(),
+                agora_ms(),
                 symbol,
                 decisao.get('decisao', 'aguardar'),
                 decisao.get('confianca', 0.5),
                 decisao.get('razao', ''),
-                str(dados_entrada) if dados_entrada else ''
+                payload_id,
+                campos['rsi'],
+                campos['volatilidade'],
+                campos['preco_atual']
             ))
-            conn.commit()
-            conn.close()
-            return True
+            if not aceito:
+                logger.warning(f"⚠️ Decisão IA de {symbol} descartada pelo buffer de escrita (cheio)")
+            return aceito
         except Exception as e:
             logger.error(f"Erro ao salvar decisão IA: {e}")
             return False
-    
+
     def salvar_ordem_crypto(self, ordem: dict):
         """Salva ordem de crypto"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            payload_id = self.payloads.gravar(ordem.get('dados_mercado'))
+            campos = extrair_campos(ordem)
+            self.banco.executar('''
             INSERT INTO ordens_crypto (
-                timestamp, order_id, symbol, tipo, quantidade, preco_entrada,
-                preco_atual, status, lucro_prejuizo, pnl_percentual, confianca_ia, dados_mercado
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                timestamp, ts_ms, order_id, symbol, tipo, quantidade, preco_entrada,
+                preco_atual, status, lucro_prejuizo, pnl_percentual, confianca_ia,
+                payload_id, rsi, volatilidade
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 datetime.now(),
+                agora_ms(),
                 ordem.get('order_id', ''),
                 ordem.get('symbol', ''),
                 ordem.get('tipo', ''),
@@ -312,53 +246,39 @@ class ArmazenamentoCrypto(Armazenamento):
                 ordem.get('lucro_prejuizo', 0),
                 ordem.get('pnl_percentual', 0),
                 ordem.get('confianca_ia', 0.5),
-                str(ordem.get('dados_mercado', {}))
+                payload_id,
+                campos['rsi'],
+                campos['volatilidade']
             ))
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar ordem crypto: {e}")
             return False
-    
+
     def obter_estatisticas_crypto(self):
         """Obtém estatísticas dos dados crypto"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Total de dados
-            c.execute('SELECT COUNT(*) FROM crypto_dados')
-            total_dados = c.fetchone()[0]
-            
-            # Total de decisões
-            c.execute('SELECT COUNT(*) FROM decisoes_ia')
-            total_decisoes = c.fetchone()[0]
-            
-            # Total de ordens
-            c.execute('SELECT COUNT(*) FROM ordens_crypto')
-            total_ordens = c.fetchone()[0]
-            
-            # Último preço
-            c.execute('''
-            SELECT symbol, preco_atual, timestamp 
-            FROM crypto_dados 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-            ''')
-            ultimo_dado = c.fetchone()
-            
-            # Taxa de acerto das decisões
-            c.execute('''
-            SELECT COUNT(*) FROM decisoes_ia 
-            WHERE acerto = 1
-            ''')
-            acertos = c.fetchone()[0]
-            
-            taxa_acerto = (acertos / total_decisoes * 100) if total_decisoes > 0 else 0
-            
-            conn.close()
-            
+            self.buffer.descarregar()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
+
+                # Contagens e acertos vêm dos agregados mantidos por trigger
+                total_dados = contar_linhas(conn, 'crypto_dados')
+                total_ordens = contar_linhas(conn, 'ordens_crypto')
+                decisoes = obter_estatisticas_decisoes(conn)
+                total_decisoes = decisoes['total']
+
+                # Último preço
+                c.execute('''
+                SELECT symbol, preco_atual, timestamp
+                FROM crypto_dados
+                ORDER BY ts_ms DESC
+                LIMIT 1
+                ''')
+                ultimo_dado = c.fetchone()
+
+            taxa_acerto = decisoes['taxa_acerto']
+
             return {
                 'total_dados': total_dados,
                 'total_decisoes': total_decisoes,
@@ -372,4 +292,4 @@ class ArmazenamentoCrypto(Armazenamento):
             }
         except Exception as e:
             logger.error(f"Erro ao obter estatísticas crypto: {e}")
-            return {} 
\ No newline at end of file
+            return {}
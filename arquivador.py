@@ -0,0 +1,334 @@
+"""
+Arquivador de histórico: move linhas antigas do SQLite para Parquet (camada fria)
+
+Linhas de crypto_dados, precos, decisoes_ia e analises mais antigas que
+banco_dados.max_dias_historico são gravadas em arquivos Parquet particionados
+por data e símbolo (dados/historico/<tabela>/data=AAAA-MM-DD/par=<símbolo>/)
+e depois removidas do banco em lotes pequenos, para nunca segurar o escritor.
+
+ler_historico() une o banco (quente) com o Parquet (frio) para backtests e relatórios.
+"""
+
+import os
+import sqlite3
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from loguru import logger
+
+from banco_dados import obter_banco, carregar_config_banco, para_epoch_ms, GerenciadorBanco
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional: sem ele o arquivamento fica desativado
+    pa = ds = pq = None
+
+# Tabela -> coluna de símbolo usada na partição (None = só data)
+TABELAS_ARQUIVO: Dict[str, Optional[str]] = {
+    'crypto_dados': 'symbol',
+    'precos': 'simbolo',
+    'decisoes_ia': 'symbol',
+    'analises': None,
+}
+
+DIRETORIO_PADRAO = os.path.join('dados', 'historico')
+
+
+def _tipo_arrow(coluna: str, tipo_declarado: str):
+    """Tipo Parquet estável por coluna (lotes diferentes precisam do mesmo esquema)"""
+    tipo = (tipo_declarado or '').upper()
+    if 'INT' in tipo and (coluna == 'id' or coluna.endswith('_ms')):
+        return pa.int64()
+    if any(t in tipo for t in ('CHAR', 'TEXT', 'CLOB', 'DATE', 'TIME')) or not tipo:
+        return pa.string()
+    # REAL, DECIMAL e INTEGER de mercado (volume pode vir fracionado)
+    return pa.float64()
+
+
+class ArquivadorHistorico:
+    """Move linhas fora da janela de retenção para Parquet e lê as duas camadas juntas"""
+
+    def __init__(self, banco: Optional[GerenciadorBanco] = None, diretorio: Optional[str] = None,
+                 max_dias: Optional[int] = None, tamanho_lote: Optional[int] = None,
+                 pausa_lote_ms: Optional[int] = None, intervalo_minutos: Optional[float] = None,
+                 conexao_leitura: Optional[sqlite3.Connection] = None):
+        """
+        Inicializa o arquivador
+
+        Args:
+            banco: Gerenciador do banco (padrão: dados/trading.db)
+            diretorio: Raiz dos arquivos Parquet
+            max_dias: Dias mantidos no SQLite (padrão: banco_dados.max_dias_historico)
+            tamanho_lote: Linhas lidas/removidas por lote
+            pausa_lote_ms: Pausa entre lotes para o escritor atender outras tarefas
+            intervalo_minutos: Intervalo entre execuções da thread de fundo
+            conexao_leitura: Conexão somente leitura para ler_historico em processos que
+                só leem (sem banco, o GerenciadorBanco não é aberto e não há arquivamento)
+        """
+        cfg_banco = carregar_config_banco()
+        cfg = cfg_banco.get('arquivamento', {}) or {}
+        self.conexao_leitura = conexao_leitura
+        self.banco = banco or (obter_banco() if conexao_leitura is None else None)
+        self.diretorio = diretorio or cfg.get('diretorio', DIRETORIO_PADRAO)
+        self.max_dias = max_dias if max_dias is not None else cfg_banco.get('max_dias_historico', 30)
+        self.tamanho_lote = max(1, tamanho_lote or cfg.get('tamanho_lote', 5000))
+        self.pausa_lote = (pausa_lote_ms if pausa_lote_ms is not None else cfg.get('pausa_lote_ms', 50)) / 1000
+        self.intervalo = (intervalo_minutos or cfg.get('intervalo_minutos', 60)) * 60
+
+        self._esquemas: Dict[str, Tuple[List[str], Any]] = {}
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_execucao = threading.Lock()
+
+        self.estatisticas = {
+            'execucoes': 0,
+            'linhas_arquivadas': 0,
+            'arquivos_gravados': 0,
+            'lotes': 0,
+            'erros': 0,
+            'tempo_total_ms': 0.0,
+            'ultima_execucao': None,
+        }
+
+    @property
+    def disponivel(self) -> bool:
+        return pa is not None and bool(self.max_dias) and self.banco is not None
+
+    def limite_ms(self) -> int:
+        """Epoch ms a partir do qual as linhas continuam no banco"""
+        return para_epoch_ms(datetime.now() - timedelta(days=self.max_dias))
+
+    def iniciar(self):
+        """Inicia a thread de arquivamento periódico"""
+        if not self.disponivel:
+            logger.warning("⚠️ Arquivador de histórico desativado (pyarrow ausente ou max_dias_historico vazio)")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="arquivador-historico", daemon=True)
+        self._thread.start()
+        logger.info(f"🗃️ Arquivador iniciado: retenção {self.max_dias} dias, destino {self.diretorio}")
+
+    def parar(self, timeout: float = 10.0):
+        """Interrompe a thread (o lote em andamento termina antes)"""
+        self._parar.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._parar.is_set():
+            self.arquivar()
+            self._parar.wait(self.intervalo)
+
+    def arquivar(self) -> Dict[str, int]:
+        """
+        Executa uma passada completa em todas as tabelas
+
+        Returns:
+            Linhas arquivadas por tabela
+        """
+        if not self.disponivel:
+            return {}
+        resultado = {}
+        with self._lock_execucao:
+            inicio = time.perf_counter()
+            limite = self.limite_ms()
+            for tabela in TABELAS_ARQUIVO:
+                if self._parar.is_set():
+                    break
+                try:
+                    resultado[tabela] = self.arquivar_tabela(tabela, limite)
+                except Exception as e:
+                    self.estatisticas['erros'] += 1
+                    logger.error(f"❌ Erro ao arquivar {tabela}: {e}")
+            self.estatisticas['execucoes'] += 1
+            self.estatisticas['tempo_total_ms'] += (time.perf_counter() - inicio) * 1000
+            self.estatisticas['ultima_execucao'] = datetime.now().isoformat()
+        total = sum(resultado.values())
+        if total:
+            logger.info(f"🗃️ Arquivamento concluído: {total} linhas movidas para Parquet {resultado}")
+        return resultado
+
+    def arquivar_tabela(self, tabela: str, limite_ms: Optional[int] = None) -> int:
+        """
+        Move para Parquet as linhas da tabela com ts_ms anterior ao limite
+
+        Cada lote é gravado antes de ser removido. Se o processo cair entre a
+        gravação e o DELETE, a próxima execução lê essas linhas de novo e pode
+        gravá-las em outro arquivo (o nome vem do intervalo de ids do lote, que
+        muda se entraram linhas novas no limite); as cópias repetidas ficam no
+        Parquet e são descartadas na leitura, por id, em ler_historico.
+
+        Returns:
+            Número de linhas arquivadas
+        """
+        limite_ms = limite_ms if limite_ms is not None else self.limite_ms()
+        colunas, esquema = self._esquema(tabela)
+        total = 0
+        while not self._parar.is_set():
+            linhas = self.banco.consultar(
+                f"SELECT {', '.join(colunas)} FROM {tabela} WHERE ts_ms < ? ORDER BY id LIMIT ?",
+                (limite_ms, self.tamanho_lote)
+            )
+            if not linhas:
+                break
+            id_min, id_max = linhas[0][0], linhas[-1][0]
+            self._gravar_lote(tabela, colunas, esquema, linhas, id_min, id_max)
+
+            # Ids crescem com a inserção: o intervalo contém exatamente as linhas lidas
+            self.banco.executar(
+                f"DELETE FROM {tabela} WHERE id BETWEEN ? AND ? AND ts_ms < ?",
+                (id_min, id_max, limite_ms)
+            )
+            total += len(linhas)
+            self.estatisticas['linhas_arquivadas'] += len(linhas)
+            self.estatisticas['lotes'] += 1
+            if len(linhas) < self.tamanho_lote:
+                break
+            self._parar.wait(self.pausa_lote)
+        return total
+
+    def _esquema(self, tabela: str) -> Tuple[List[str], Any]:
+        if tabela not in self._esquemas:
+            info = self.banco.consultar(f"PRAGMA table_info({tabela})")
+            # 'id' primeiro: os lotes usam linhas[0][0] / linhas[-1][0] como limites
+            info = sorted(info, key=lambda linha: linha[1] != 'id')
+            colunas = [linha[1] for linha in info]
+            esquema = pa.schema([(linha[1], _tipo_arrow(linha[1], linha[2])) for linha in info])
+            self._esquemas[tabela] = (colunas, esquema)
+        return self._esquemas[tabela]
+
+    def _gravar_lote(self, tabela: str, colunas: List[str], esquema, linhas: List[tuple],
+                     id_min: int, id_max: int):
+        """Agrupa o lote por (data, símbolo) e grava um arquivo por partição"""
+        coluna_simbolo = TABELAS_ARQUIVO[tabela]
+        idx_ts = colunas.index('ts_ms')
+        idx_simbolo = colunas.index(coluna_simbolo) if coluna_simbolo else None
+
+        particoes: Dict[Tuple[str, Optional[str]], List[tuple]] = {}
+        for linha in linhas:
+            data = datetime.fromtimestamp(linha[idx_ts] / 1000).strftime('%Y-%m-%d')
+            simbolo = (linha[idx_simbolo] or 'desconhecido') if idx_simbolo is not None else None
+            particoes.setdefault((data, simbolo), []).append(linha)
+
+        for (data, simbolo), grupo in particoes.items():
+            destino = os.path.join(self.diretorio, tabela, f"data={data}")
+            if simbolo is not None:
+                destino = os.path.join(destino, f"par={simbolo}")
+            os.makedirs(destino, exist_ok=True)
+
+            arrays = []
+            for i, campo in enumerate(esquema):
+                valores = [linha[i] for linha in grupo]
+                if pa.types.is_string(campo.type):
+                    valores = [None if v is None else str(v) for v in valores]
+                arrays.append(pa.array(valores, type=campo.type, from_pandas=True))
+            tabela_arrow = pa.Table.from_arrays(arrays, schema=esquema)
+
+            arquivo = os.path.join(destino, f"lote-{id_min}-{id_max}.parquet")
+            temporario = arquivo + '.tmp'
+            pq.write_table(tabela_arrow, temporario, compression='zstd')
+            os.replace(temporario, arquivo)
+            self.estatisticas['arquivos_gravados'] += 1
+
+    def ler_historico(self, tabela: str, simbolo: Optional[str] = None, inicio: Any = None,
+                      fim: Any = None, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Lê a tabela unindo o banco (quente) com o Parquet arquivado (frio)
+
+        Args:
+            tabela: Uma das TABELAS_ARQUIVO
+            simbolo: Filtra pelo símbolo (coluna da partição)
+            inicio: Início do intervalo (datetime, ISO, epoch s/ms) - inclusivo
+            fim: Fim do intervalo - exclusivo
+            colunas: Colunas desejadas (padrão: todas)
+
+        Returns:
+            DataFrame ordenado por ts_ms
+        """
+        if tabela not in TABELAS_ARQUIVO:
+            raise ValueError(f"Tabela sem arquivamento: {tabela}")
+        coluna_simbolo = TABELAS_ARQUIVO[tabela]
+        if simbolo is not None and coluna_simbolo is None:
+            raise ValueError(f"Tabela {tabela} não tem coluna de símbolo")
+        inicio_ms = para_epoch_ms(inicio) if inicio is not None else None
+        fim_ms = para_epoch_ms(fim) if fim is not None else None
+        # O id é lido mesmo sem ser pedido: é a chave que remove as cópias de um lote regravado
+        sem_id = colunas is not None and 'id' not in colunas
+        if sem_id:
+            colunas = ['id'] + list(colunas)
+
+        quente = self._ler_quente(tabela, coluna_simbolo, simbolo, inicio_ms, fim_ms, colunas)
+        frio = self._ler_frio(tabela, simbolo, inicio_ms, fim_ms, colunas)
+        if frio is None or frio.empty:
+            df = quente
+        elif quente.empty:
+            df = frio
+        else:
+            df = pd.concat([frio, quente], ignore_index=True)
+        if 'id' in df.columns:
+            # Lote regravado após queda pode existir nas duas camadas ou em dois arquivos
+            df = df.drop_duplicates(subset='id', keep='last')
+        if 'ts_ms' in df.columns:
+            df = df.sort_values('ts_ms', kind='stable')
+        if sem_id:
+            df = df.drop(columns='id')
+        return df.reset_index(drop=True)
+
+    def _ler_quente(self, tabela, coluna_simbolo, simbolo, inicio_ms, fim_ms, colunas) -> pd.DataFrame:
+        filtros, params = [], []
+        if simbolo is not None:
+            filtros.append(f"{coluna_simbolo} = ?")
+            params.append(simbolo)
+        if inicio_ms is not None:
+            filtros.append("ts_ms >= ?")
+            params.append(inicio_ms)
+        if fim_ms is not None:
+            filtros.append("ts_ms < ?")
+            params.append(fim_ms)
+        selecao = ', '.join(colunas) if colunas else '*'
+        where = f" WHERE {' AND '.join(filtros)}" if filtros else ''
+        sql = f"SELECT {selecao} FROM {tabela}{where}"
+        if self.conexao_leitura is not None:
+            return pd.read_sql_query(sql, self.conexao_leitura, params=params)
+        with self.banco.conexao_leitura() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _ler_frio(self, tabela, simbolo, inicio_ms, fim_ms, colunas) -> Optional[pd.DataFrame]:
+        raiz = os.path.join(self.diretorio, tabela)
+        if pa is None or not os.path.isdir(raiz):
+            return None
+        campos_particao = [('data', pa.string())]
+        if TABELAS_ARQUIVO[tabela]:
+            campos_particao.append(('par', pa.string()))
+        dataset = ds.dataset(raiz, format='parquet',
+                             partitioning=ds.partitioning(pa.schema(campos_particao), flavor='hive'),
+                             exclude_invalid_files=True)
+
+        filtro = None
+        def _e(expr):
+            return expr if filtro is None else filtro & expr
+        if simbolo is not None:
+            filtro = _e(ds.field('par') == simbolo)
+        if inicio_ms is not None:
+            # Poda por partição (um dia de folga por causa do fuso) + filtro exato em ts_ms
+            dia = (datetime.fromtimestamp(inicio_ms / 1000) - timedelta(days=1)).strftime('%Y-%m-%d')
+            filtro = _e((ds.field('data') >= dia) & (ds.field('ts_ms') >= inicio_ms))
+        if fim_ms is not None:
+            dia = (datetime.fromtimestamp(fim_ms / 1000) + timedelta(days=1)).strftime('%Y-%m-%d')
+            filtro = _e((ds.field('data') <= dia) & (ds.field('ts_ms') < fim_ms))
+
+        nomes = [n for n in dataset.schema.names if n not in ('data', 'par')]
+        if colunas:
+            nomes = [n for n in colunas if n in nomes]
+        return dataset.to_table(columns=nomes, filter=filtro).to_pandas()
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Retorna contadores do arquivador"""
+        return dict(self.estatisticas, max_dias=self.max_dias, diretorio=self.diretorio)
@@ -0,0 +1,604 @@
+"""
+Gerenciador central do banco de dados SQLite (dados/trading.db)
+
+Um único serviço por processo:
+- uma conexão de escrita, dona de uma thread alimentada por fila (WAL + pragmas ajustados)
+- um pool de conexões somente leitura (mode=ro) para consultas concorrentes
+- contadores de profundidade de fila e tempo de espera por lock
+- buffer write-behind opcional que agrupa INSERTs por tabela (executemany + group commit)
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from queue import Queue, Empty
+from collections import deque
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from loguru import logger
+
+DB_PADRAO = os.path.join('dados', 'trading.db')
+
+# Pragmas aplicados na conexão de escrita
+PRAGMAS_ESCRITA = {
+    'auto_vacuum': 'INCREMENTAL',  # só vale para bancos novos (antes da primeira tabela)
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',      # seguro com WAL, evita fsync por commit
+    'temp_store': 'MEMORY',
+    'cache_size': -16000,         # ~16MB
+    'mmap_size': 268435456,       # 256MB
+    'wal_autocheckpoint': 1000,
+}
+
+# Pragmas aplicados nas conexões de leitura
+PRAGMAS_LEITURA = {
+    'query_only': 1,
+    'temp_store': 'MEMORY',
+    'cache_size': -8000,
+    'mmap_size': 268435456,
+}
+
+# Políticas de overflow do buffer write-behind
+POLITICAS_OVERFLOW = ('descartar_antigos', 'descartar_novos', 'bloquear')
+
+
+def agora_ms() -> int:
+    """Epoch atual em milissegundos (formato das colunas *_ms)"""
+    return int(time.time() * 1000)
+
+
+def para_epoch_ms(valor: Any = None) -> int:
+    """
+    Converte datetime, texto ISO ou número para epoch em milissegundos
+
+    Args:
+        valor: datetime (hora local se ingênuo), string ISO, segundos/milissegundos ou None (agora)
+    """
+    if valor is None:
+        return agora_ms()
+    if isinstance(valor, datetime):
+        return int(valor.timestamp() * 1000)
+    if isinstance(valor, (int, float)):
+        # Valores abaixo de ~2001-09 em ms são tratados como segundos
+        return int(valor if valor >= 1e12 else valor * 1000)
+    try:
+        return int(datetime.fromisoformat(str(valor)).timestamp() * 1000)
+    except ValueError:
+        return agora_ms()
+
+
+def dividir_comandos(script: str) -> List[str]:
+    """Divide um script SQL em comandos completos (respeita ';' dentro de triggers)"""
+    comandos, atual = [], ''
+    for parte in script.split(';'):
+        atual += parte + ';'
+        if sqlite3.complete_statement(atual):
+            if atual.strip(' \t\n;'):
+                comandos.append(atual)
+            atual = ''
+    return comandos
+
+
+def executar_comandos(conn: sqlite3.Connection, script: str):
+    """Executa um script comando a comando (executescript faria COMMIT da transação aberta)"""
+    for comando in dividir_comandos(script):
+        conn.execute(comando)
+
+
+class _TarefaEscrita:
+    """Unidade de trabalho enviada para a thread de escrita"""
+    __slots__ = ('funcao', 'evento', 'resultado', 'erro', 'enfileirada_em')
+
+    def __init__(self, funcao: Callable[[sqlite3.Connection], Any], aguardar: bool):
+        self.funcao = funcao
+        self.evento = threading.Event() if aguardar else None
+        self.resultado = None
+        self.erro: Optional[BaseException] = None
+        self.enfileirada_em = time.perf_counter()
+
+
+class GerenciadorBanco:
+    """Serviço de armazenamento com escritor único e pool de leitura"""
+
+    def __init__(self, db_path: str = DB_PADRAO, tamanho_pool_leitura: int = 4,
+                 busy_timeout_ms: int = 5000, tamanho_fila: int = 10000):
+        """
+        Inicializa o gerenciador
+
+        Args:
+            db_path: Caminho do arquivo SQLite
+            tamanho_pool_leitura: Número de conexões somente leitura
+            busy_timeout_ms: Tempo máximo de espera por lock de outros processos
+            tamanho_fila: Capacidade da fila de escrita
+        """
+        self.db_path = db_path
+        self.tamanho_pool_leitura = max(1, tamanho_pool_leitura)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._fila: Queue = Queue(maxsize=tamanho_fila)
+        self._pool_leitura: Queue = Queue()
+        self._conexoes_leitura: List[sqlite3.Connection] = []
+        self._lock_pool = threading.Lock()
+        self._lock_metricas = threading.Lock()
+        self._pronto = threading.Event()
+        self._fechado = False
+        self.buffer: Optional['BufferEscrita'] = None
+
+        self.metricas = {
+            'escritas': 0,
+            'leituras': 0,
+            'erros_escrita': 0,
+            'erros_leitura': 0,
+            'profundidade_fila_max': 0,
+            'espera_fila_total_ms': 0.0,
+            'espera_fila_max_ms': 0.0,
+            'espera_lock_total_ms': 0.0,
+            'espera_lock_max_ms': 0.0,
+            'espera_pool_leitura_total_ms': 0.0,
+            'espera_pool_leitura_max_ms': 0.0,
+        }
+
+        diretorio = os.path.dirname(db_path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self._thread_escrita = threading.Thread(target=self._loop_escrita, name="banco-escritor", daemon=True)
+        self._thread_escrita.start()
+        self._pronto.wait()
+        logger.info(f"🗄️ Gerenciador de banco inicializado: {db_path} (pool leitura: {self.tamanho_pool_leitura})")
+
+    # ------------------------------------------------------------------
+    # Conexões
+    # ------------------------------------------------------------------
+    def _abrir_conexao_escrita(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for pragma, valor in PRAGMAS_ESCRITA.items():
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+        return conn
+
+    def _abrir_conexao_leitura(self) -> sqlite3.Connection:
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for pragma, valor in PRAGMAS_LEITURA.items():
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+        return conn
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def _loop_escrita(self):
+        """Thread dona da única conexão de escrita"""
+        conn = self._abrir_conexao_escrita()
+        self._pronto.set()
+        while True:
+            try:
+                tarefa = self._fila.get(timeout=1)
+            except Empty:
+                if self._fechado:
+                    break
+                continue
+            if tarefa is None:
+                break
+            self._executar_tarefa(conn, tarefa)
+        try:
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        except Exception as e:
+            logger.error(f"❌ Erro ao fechar conexão de escrita: {e}")
+
+    def _executar_tarefa(self, conn: sqlite3.Connection, tarefa: _TarefaEscrita):
+        inicio = time.perf_counter()
+        espera_fila_ms = (inicio - tarefa.enfileirada_em) * 1000
+        espera_lock_ms = 0.0
+        try:
+            # BEGIN IMMEDIATE adquire o lock de escrita; o tempo gasto aqui é espera por lock
+            conn.execute("BEGIN IMMEDIATE")
+            espera_lock_ms = (time.perf_counter() - inicio) * 1000
+            try:
+                tarefa.resultado = tarefa.funcao(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            tarefa.erro = e
+            with self._lock_metricas:
+                self.metricas['erros_escrita'] += 1
+            if tarefa.evento is None:
+                logger.error(f"❌ Erro em escrita assíncrona no banco: {e}")
+        finally:
+            with self._lock_metricas:
+                m = self.metricas
+                m['escritas'] += 1
+                m['espera_fila_total_ms'] += espera_fila_ms
+                m['espera_fila_max_ms'] = max(m['espera_fila_max_ms'], espera_fila_ms)
+                m['espera_lock_total_ms'] += espera_lock_ms
+                m['espera_lock_max_ms'] = max(m['espera_lock_max_ms'], espera_lock_ms)
+            if tarefa.evento is not None:
+                tarefa.evento.set()
+
+    def transacao(self, funcao: Callable[[sqlite3.Connection], Any], aguardar: bool = True) -> Any:
+        """
+        Executa uma função na thread de escrita, dentro de uma única transação
+
+        Args:
+            funcao: Recebe a conexão de escrita e retorna um valor qualquer
+            aguardar: Se True, bloqueia até o commit e propaga exceções
+
+        Returns:
+            Valor retornado pela função (None se aguardar=False)
+        """
+        if self._fechado:
+            raise RuntimeError("Gerenciador de banco já foi fechado")
+        if threading.current_thread() is self._thread_escrita:
+            raise RuntimeError("transacao() chamada de dentro da thread de escrita; use a conexão recebida")
+        tarefa = _TarefaEscrita(funcao, aguardar)
+        self._fila.put(tarefa)
+        profundidade = self._fila.qsize()
+        with self._lock_metricas:
+            if profundidade > self.metricas['profundidade_fila_max']:
+                self.metricas['profundidade_fila_max'] = profundidade
+        if not aguardar:
+            return None
+        tarefa.evento.wait()
+        if tarefa.erro is not None:
+            raise tarefa.erro
+        return tarefa.resultado
+
+    def executar(self, sql: str, params: Sequence[Any] = (), aguardar: bool = True) -> Optional[int]:
+        """Executa um comando de escrita; retorna o lastrowid"""
+        return self.transacao(lambda conn: conn.execute(sql, params).lastrowid, aguardar)
+
+    def executar_muitos(self, sql: str, lista_params: Iterable[Sequence[Any]], aguardar: bool = True) -> Optional[int]:
+        """Executa o mesmo comando para vários conjuntos de parâmetros; retorna rowcount"""
+        lista_params = list(lista_params)
+        return self.transacao(lambda conn: conn.executemany(sql, lista_params).rowcount, aguardar)
+
+    def executar_script(self, script: str, aguardar: bool = True):
+        """Executa vários comandos DDL separados por ';' numa única transação"""
+        def _executar(conn: sqlite3.Connection):
+            executar_comandos(conn, script)
+        return self.transacao(_executar, aguardar)
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    @contextmanager
+    def conexao_leitura(self):
+        """Empresta uma conexão somente leitura do pool"""
+        inicio = time.perf_counter()
+        conn = None
+        try:
+            conn = self._pool_leitura.get_nowait()
+        except Empty:
+            with self._lock_pool:
+                if len(self._conexoes_leitura) < self.tamanho_pool_leitura:
+                    conn = self._abrir_conexao_leitura()
+                    self._conexoes_leitura.append(conn)
+            if conn is None:
+                conn = self._pool_leitura.get()
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock_metricas:
+            self.metricas['espera_pool_leitura_total_ms'] += espera_ms
+            self.metricas['espera_pool_leitura_max_ms'] = max(self.metricas['espera_pool_leitura_max_ms'], espera_ms)
+            self.metricas['leituras'] += 1
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool_leitura.put(conn)
+
+    def consultar(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        """Executa uma consulta numa conexão de leitura e retorna todas as linhas"""
+        try:
+            with self.conexao_leitura() as conn:
+                return conn.execute(sql, params).fetchall()
+        except Exception:
+            with self._lock_metricas:
+                self.metricas['erros_leitura'] += 1
+            raise
+
+    def consultar_um(self, sql: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        """Executa uma consulta e retorna apenas a primeira linha"""
+        linhas = self.consultar(sql, params)
+        return linhas[0] if linhas else None
+
+    # ------------------------------------------------------------------
+    # Métricas e ciclo de vida
+    # ------------------------------------------------------------------
+    def obter_metricas(self) -> Dict[str, Any]:
+        """Retorna contadores de fila, lock e pool de leitura"""
+        with self._lock_metricas:
+            m = dict(self.metricas)
+        escritas = max(1, m['escritas'])
+        m['profundidade_fila'] = self._fila.qsize()
+        m['espera_fila_media_ms'] = m['espera_fila_total_ms'] / escritas
+        m['espera_lock_media_ms'] = m['espera_lock_total_ms'] / escritas
+        m['conexoes_leitura'] = len(self._conexoes_leitura)
+        return m
+
+    def obter_buffer(self) -> 'BufferEscrita':
+        """Retorna o buffer write-behind deste banco (cria na primeira chamada)"""
+        if self.buffer is None:
+            with self._lock_pool:
+                if self.buffer is None:
+                    cfg = carregar_config_banco().get('buffer_escrita', {}) or {}
+                    self.buffer = BufferEscrita(
+                        self,
+                        tamanho_lote=cfg.get('tamanho_lote', 200),
+                        intervalo_ms=cfg.get('intervalo_ms', 500),
+                        capacidade=cfg.get('capacidade', 20000),
+                        politica_overflow=cfg.get('politica_overflow', 'descartar_antigos'),
+                    )
+        return self.buffer
+
+    def fechar(self, timeout: float = 10.0):
+        """Drena a fila de escrita e fecha todas as conexões"""
+        if self._fechado:
+            return
+        if self.buffer is not None:
+            self.buffer.fechar()
+        self._fechado = True
+        self._fila.put(None)
+        self._thread_escrita.join(timeout=timeout)
+        with self._lock_pool:
+            for conn in self._conexoes_leitura:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._conexoes_leitura.clear()
+        logger.info(f"🗄️ Gerenciador de banco fechado: {self.db_path}")
+
+
+class BufferEscrita:
+    """
+    Buffer write-behind: acumula linhas por comando INSERT e grava em lote
+
+    Um descarregamento grava todas as tabelas pendentes com executemany numa
+    única transação do escritor (group commit). Dispara a cada tamanho_lote
+    linhas numa tabela ou a cada intervalo_ms, o que vier primeiro.
+    """
+
+    def __init__(self, banco: GerenciadorBanco, tamanho_lote: int = 200, intervalo_ms: int = 500,
+                 capacidade: int = 20000, politica_overflow: str = 'descartar_antigos',
+                 timeout_bloqueio: float = 1.0):
+        """
+        Inicializa o buffer
+
+        Args:
+            banco: Gerenciador que executa as gravações
+            tamanho_lote: Linhas pendentes numa tabela que disparam o descarregamento
+            intervalo_ms: Intervalo máximo entre descarregamentos
+            capacidade: Total de linhas pendentes permitido (todas as tabelas)
+            politica_overflow: 'descartar_antigos', 'descartar_novos' ou 'bloquear'
+            timeout_bloqueio: Espera máxima por espaço na política 'bloquear' (depois descarta a nova linha)
+        """
+        if politica_overflow not in POLITICAS_OVERFLOW:
+            raise ValueError(f"Política de overflow inválida: {politica_overflow}")
+        self.banco = banco
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.intervalo = max(1, intervalo_ms) / 1000
+        self.capacidade = max(1, capacidade)
+        self.politica_overflow = politica_overflow
+        self.timeout_bloqueio = timeout_bloqueio
+
+        self._pendentes: Dict[str, deque] = {}
+        self._total_pendente = 0
+        self._cond = threading.Condition()
+        self._lote_cheio = False
+        self._fechado = False
+        # Chamados com as linhas de um comando depois que o lote foi confirmado no banco
+        self._ao_gravar: Dict[str, List[Callable[[List[tuple]], None]]] = {}
+
+        self.metricas = {
+            'linhas_recebidas': 0,
+            'linhas_gravadas': 0,
+            'linhas_descartadas': 0,
+            'lotes_gravados': 0,
+            'erros_gravacao': 0,
+            'pendentes_max': 0,
+            'tempo_gravacao_total_ms': 0.0,
+        }
+
+        self._thread = threading.Thread(target=self._loop, name="banco-write-behind", daemon=True)
+        self._thread.start()
+
+    def adicionar(self, sql: str, params: Sequence[Any]) -> bool:
+        """
+        Enfileira uma linha para gravação assíncrona
+
+        Args:
+            sql: Comando INSERT parametrizado (identifica a tabela)
+            params: Parâmetros da linha
+
+        Returns:
+            True se a linha foi aceita, False se descartada pelo overflow
+        """
+        with self._cond:
+            if self._fechado:
+                raise RuntimeError("Buffer de escrita já foi fechado")
+            self.metricas['linhas_recebidas'] += 1
+
+            if self._total_pendente >= self.capacidade:
+                if not self._tratar_overflow(sql):
+                    self.metricas['linhas_descartadas'] += 1
+                    return False
+
+            fila = self._pendentes.get(sql)
+            if fila is None:
+                fila = self._pendentes[sql] = deque()
+            fila.append(tuple(params))
+            self._total_pendente += 1
+            if self._total_pendente > self.metricas['pendentes_max']:
+                self.metricas['pendentes_max'] = self._total_pendente
+            if len(fila) >= self.tamanho_lote:
+                self._lote_cheio = True
+                self._cond.notify_all()
+            return True
+
+    def ao_gravar(self, sql: str, callback: Callable[[List[tuple]], None]):
+        """
+        Registra um callback para as linhas do comando que chegaram ao banco
+
+        Args:
+            sql: Comando INSERT (mesmo texto passado a adicionar)
+            callback: Recebe as linhas gravadas, na thread do buffer, após o commit do lote;
+                      linhas descartadas ou de lotes com erro nunca são passadas
+        """
+        with self._cond:
+            self._ao_gravar.setdefault(sql, []).append(callback)
+
+    def _tratar_overflow(self, sql: str) -> bool:
+        """Aplica a política de overflow (chamado com o lock); retorna se há espaço para a nova linha"""
+        if self.politica_overflow == 'descartar_antigos':
+            # Descarta a linha mais antiga da mesma tabela (ou da maior, se esta estiver vazia)
+            fila = self._pendentes.get(sql) or max(self._pendentes.values(), key=len, default=None)
+            if fila:
+                fila.popleft()
+                self._total_pendente -= 1
+                self.metricas['linhas_descartadas'] += 1
+                return True
+            return False
+        if self.politica_overflow == 'bloquear':
+            self._lote_cheio = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._total_pendente < self.capacidade or self._fechado,
+                                timeout=self.timeout_bloqueio)
+            return self._total_pendente < self.capacidade
+        return False
+
+    def _loop(self):
+        """Thread que descarrega o buffer periodicamente"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._lote_cheio or self._fechado, timeout=self.intervalo)
+                fechado = self._fechado
+            self._descarregar()
+            if fechado:
+                break
+
+    def _retirar_pendentes(self) -> Dict[str, List[tuple]]:
+        with self._cond:
+            lotes = {sql: list(fila) for sql, fila in self._pendentes.items() if fila}
+            self._pendentes.clear()
+            self._total_pendente = 0
+            self._lote_cheio = False
+            self._cond.notify_all()
+        return lotes
+
+    def _descarregar(self) -> int:
+        lotes = self._retirar_pendentes()
+        if not lotes:
+            return 0
+
+        def _gravar(conn: sqlite3.Connection):
+            for sql, linhas in lotes.items():
+                conn.executemany(sql, linhas)
+
+        total = sum(len(linhas) for linhas in lotes.values())
+        inicio = time.perf_counter()
+        try:
+            self.banco.transacao(_gravar)
+            with self._cond:
+                self.metricas['linhas_gravadas'] += total
+                self.metricas['lotes_gravados'] += 1
+                self.metricas['tempo_gravacao_total_ms'] += (time.perf_counter() - inicio) * 1000
+                callbacks = [(callback, linhas) for sql, linhas in lotes.items()
+                             for callback in self._ao_gravar.get(sql, ())]
+        except Exception as e:
+            with self._cond:
+                self.metricas['erros_gravacao'] += 1
+                self.metricas['linhas_descartadas'] += total
+            logger.error(f"❌ Erro ao gravar lote write-behind ({total} linhas): {e}")
+            return total
+        for callback, linhas in callbacks:
+            try:
+                callback(linhas)
+            except Exception as e:
+                logger.error(f"❌ Erro no callback de gravação do buffer: {e}")
+        return total
+
+    def descarregar(self) -> int:
+        """Grava imediatamente tudo o que está pendente; retorna o número de linhas"""
+        return self._descarregar()
+
+    def obter_metricas(self) -> Dict[str, Any]:
+        """Retorna contadores do buffer"""
+        with self._cond:
+            m = dict(self.metricas)
+            m['pendentes'] = self._total_pendente
+        m['tempo_gravacao_medio_ms'] = m['tempo_gravacao_total_ms'] / max(1, m['lotes_gravados'])
+        return m
+
+    def fechar(self, timeout: float = 10.0):
+        """Para a thread após um último descarregamento"""
+        with self._cond:
+            if self._fechado:
+                return
+            self._fechado = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        # Linhas que chegaram durante o join
+        self._descarregar()
+        m = self.obter_metricas()
+        logger.info(f"🗄️ Buffer write-behind fechado: {m['linhas_gravadas']} linhas em {m['lotes_gravados']} lotes, "
+                    f"{m['linhas_descartadas']} descartadas")
+
+
+_gerenciadores: Dict[str, GerenciadorBanco] = {}
+_lock_gerenciadores = threading.Lock()
+
+
+def carregar_config_banco() -> Dict[str, Any]:
+    """Retorna a seção banco_dados do config.yaml (vazia se indisponível)"""
+    try:
+        import config
+        return (config.load_config() or {}).get('banco_dados', {}) or {}
+    except Exception:
+        return {}
+
+
+def obter_banco(db_path: Optional[str] = None) -> GerenciadorBanco:
+    """
+    Retorna o gerenciador do processo para o arquivo informado (cria na primeira chamada)
+
+    Args:
+        db_path: Caminho do banco (padrão: dados/trading.db)
+    """
+    caminho = os.path.abspath(db_path or DB_PADRAO)
+    gerenciador = _gerenciadores.get(caminho)
+    if gerenciador is not None and not gerenciador._fechado:
+        return gerenciador
+    with _lock_gerenciadores:
+        gerenciador = _gerenciadores.get(caminho)
+        if gerenciador is None or gerenciador._fechado:
+            cfg = carregar_config_banco()
+            gerenciador = GerenciadorBanco(
+                db_path or DB_PADRAO,
+                tamanho_pool_leitura=cfg.get('pool_leitura', 4),
+                busy_timeout_ms=cfg.get('busy_timeout_ms', 5000),
+                tamanho_fila=cfg.get('tamanho_fila_escrita', 10000),
+            )
+            # Esquema versionado: só executa DDL quando a versão muda
+            from migracoes import aplicar_migracoes
+            aplicar_migracoes(gerenciador)
+            _gerenciadores[caminho] = gerenciador
+        return gerenciador
+
+
+def fechar_bancos():
+    """Fecha todos os gerenciadores abertos no processo"""
+    with _lock_gerenciadores:
+        gerenciadores = list(_gerenciadores.values())
+        _gerenciadores.clear()
+    for gerenciador in gerenciadores:
+        gerenciador.fechar()
+
+
+atexit.register(fechar_bancos)
@@ -0,0 +1,338 @@
+"""
+Barras OHLCV em vários timeframes montadas a partir dos ticks do stream
+
+Cada tick entra só na barra aberta do menor timeframe (1s por padrão). Quando
+uma barra fecha, ela é incorporada à barra aberta do timeframe seguinte
+(1s -> 1m -> 5m -> 15m -> 1h), então os timeframes maiores são derivados
+incrementalmente dos menores, sem recalcular a partir dos ticks.
+
+As barras fecham pelo relógio: uma thread chama fechar_ate() a cada
+intervalo_relogio_ms e fecha toda barra cujo período já terminou (com uma
+tolerância para ticks atrasados), mesmo sem tick novo. Um tick com horário
+além do período da barra aberta também fecha as barras daquele símbolo.
+Cada barra fechada é publicada aos ouvintes de ao_fechar() e guardada num
+CacheKlines por (símbolo, timeframe), com a mesma janela NumPy dos klines da
+API — indicadores e prompts pedem contexto multi-timeframe sem I/O.
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from loguru import logger
+
+from cache_klines import COLUNAS, CacheKlines, determinar_tendencia
+
+TIMEFRAMES_PADRAO = ('1s', '1m', '5m', '15m', '1h')
+_UNIDADES_MS = {'s': 1000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000}
+
+
+def duracao_timeframe_ms(timeframe: str) -> int:
+    """Duração de um timeframe ('1s', '5m', '1h', '1d') em ms"""
+    quantidade, unidade = timeframe[:-1], timeframe[-1:]
+    if unidade not in _UNIDADES_MS or not quantidade.isdigit() or int(quantidade) <= 0:
+        raise ValueError(f"Timeframe inválido: {timeframe}")
+    return int(quantidade) * _UNIDADES_MS[unidade]
+
+
+class _Barra:
+    """Barra em formação"""
+    __slots__ = ('inicio', 'open', 'high', 'low', 'close', 'volume', 'turnover', 'ticks')
+
+    def __init__(self, inicio: int, open_: float, high: float, low: float, close: float,
+                 volume: float, turnover: float, ticks: int):
+        self.inicio = inicio
+        self.open, self.high, self.low, self.close = open_, high, low, close
+        self.volume, self.turnover, self.ticks = volume, turnover, ticks
+
+    def incluir_tick(self, preco: float, volume: float):
+        if preco > self.high:
+            self.high = preco
+        if preco < self.low:
+            self.low = preco
+        self.close = preco
+        self.volume += volume
+        self.turnover += preco * volume
+        self.ticks += 1
+
+    def incorporar(self, barra: '_Barra'):
+        """Junta uma barra mais recente do timeframe menor"""
+        self.high = max(self.high, barra.high)
+        self.low = min(self.low, barra.low)
+        self.close = barra.close
+        self.volume += barra.volume
+        self.turnover += barra.turnover
+        self.ticks += barra.ticks
+
+    def copia(self, inicio: int) -> '_Barra':
+        return _Barra(inicio, self.open, self.high, self.low, self.close, self.volume, self.turnover, self.ticks)
+
+    def candle(self) -> tuple:
+        return (self.inicio, self.open, self.high, self.low, self.close, self.volume, self.turnover)
+
+
+class AgregadorBarras:
+    """Barras OHLCV por símbolo em vários timeframes, fechadas pelo relógio e publicadas como eventos"""
+
+    def __init__(self, timeframes: Optional[List[str]] = None, capacidade: Optional[int] = None,
+                 tolerancia_ms: Optional[int] = None, intervalo_relogio_ms: Optional[int] = None,
+                 relogio: Optional[Callable[[], int]] = None):
+        """
+        Inicializa o agregador (a thread do relógio só roda após iniciar())
+
+        Args:
+            timeframes: Timeframes montados; cada um deve ser múltiplo do anterior (padrão: coleta.barras)
+            capacidade: Barras fechadas mantidas por (símbolo, timeframe)
+            tolerancia_ms: Espera após o fim do período antes de fechar pelo relógio (ticks atrasados)
+            intervalo_relogio_ms: Intervalo da thread que fecha as barras
+            relogio: Função que devolve o instante atual em ms (padrão: time.time; na reprodução, o relógio da gravação)
+        """
+        try:
+            import config
+            cfg = config.load_config() or {}
+        except Exception:
+            cfg = {}
+        cfg_barras = (cfg.get('coleta', {}) or {}).get('barras', {}) or {}
+        timeframes = list(timeframes or cfg_barras.get('timeframes') or TIMEFRAMES_PADRAO)
+        self.timeframes = sorted(timeframes, key=duracao_timeframe_ms)
+        self.duracoes = [duracao_timeframe_ms(tf) for tf in self.timeframes]
+        for menor, maior, tf in zip(self.duracoes, self.duracoes[1:], self.timeframes[1:]):
+            if maior % menor:
+                raise ValueError(f"Timeframe {tf} não é múltiplo do anterior")
+        self.capacidade = capacidade or cfg_barras.get('capacidade', 500)
+        self.tolerancia_ms = tolerancia_ms if tolerancia_ms is not None else cfg_barras.get('tolerancia_ms', 250)
+        self.intervalo_relogio = (intervalo_relogio_ms or cfg_barras.get('intervalo_relogio_ms', 200)) / 1000
+        self.relogio = relogio or (lambda: int(time.time() * 1000))
+
+        # Por símbolo, a barra aberta de cada timeframe (None = nenhuma)
+        self._abertas: Dict[str, List[Optional[_Barra]]] = {}
+        self._fechadas: Dict[str, List[CacheKlines]] = {}
+        self._ouvintes: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.RLock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.estatisticas = {
+            'ticks': 0,
+            'ticks_atrasados': 0,
+            'barras_fechadas': 0,
+            'fechadas_pelo_relogio': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+    def anexar_stream(self, stream):
+        """Monta as barras com os ticks do StreamBybit"""
+        stream.ao_receber('tick', self._tick_do_stream)
+
+    def _tick_do_stream(self, tick: Dict[str, Any]):
+        self.adicionar_tick(tick['symbol'], tick['ts_ms'], tick['preco'], tick.get('volume') or 0.0)
+
+    def adicionar_tick(self, simbolo: str, ts_ms: int, preco: float, volume: float = 0.0):
+        """Inclui um tick na barra do menor timeframe (fecha antes as barras que o horário do tick encerra)"""
+        eventos: List[Dict[str, Any]] = []
+        with self._lock:
+            abertas = self._abertas.get(simbolo)
+            if abertas is None:
+                abertas = self._abertas[simbolo] = [None] * len(self.timeframes)
+                self._fechadas[simbolo] = [CacheKlines(simbolo, tf, self.capacidade) for tf in self.timeframes]
+            self._fechar_simbolo(simbolo, abertas, ts_ms, eventos)
+            inicio = ts_ms - ts_ms % self.duracoes[0]
+            base = abertas[0]
+            ultima_fechada = self._fechadas[simbolo][0].ultimo_inicio
+            if (base is not None and inicio < base.inicio) or (ultima_fechada is not None and inicio <= ultima_fechada):
+                # Período já fechado pelo relógio: o tick fica só no buffer do stream
+                self.estatisticas['ticks_atrasados'] += 1
+            elif base is None:
+                abertas[0] = _Barra(inicio, preco, preco, preco, preco, volume, preco * volume, 1)
+                self.estatisticas['ticks'] += 1
+            else:
+                base.incluir_tick(preco, volume)
+                self.estatisticas['ticks'] += 1
+        self._publicar(eventos)
+
+    # ------------------------------------------------------------------
+    # Fechamento
+    # ------------------------------------------------------------------
+    def _fechar_simbolo(self, simbolo: str, abertas: List[Optional[_Barra]], agora_ms: int,
+                        eventos: List[Dict[str, Any]]):
+        """Fecha, do menor para o maior timeframe, as barras cujo período terminou até agora_ms"""
+        for k, duracao in enumerate(self.duracoes):
+            barra = abertas[k]
+            if barra is None or agora_ms < barra.inicio + duracao:
+                continue
+            abertas[k] = None
+            self._fechadas[simbolo][k].mesclar([barra.candle()])
+            self.estatisticas['barras_fechadas'] += 1
+            eventos.append(self._evento(simbolo, k, barra))
+            if k + 1 < len(self.duracoes):
+                superior = abertas[k + 1]
+                inicio = barra.inicio - barra.inicio % self.duracoes[k + 1]
+                if superior is None:
+                    abertas[k + 1] = barra.copia(inicio)
+                else:
+                    superior.incorporar(barra)
+
+    def fechar_ate(self, agora_ms: Optional[int] = None) -> int:
+        """
+        Fecha as barras de todos os símbolos cujo período terminou
+
+        Args:
+            agora_ms: Instante do fechamento (padrão: relógio menos a tolerância)
+
+        Returns:
+            Barras fechadas
+        """
+        agora_ms = agora_ms if agora_ms is not None else self.relogio() - self.tolerancia_ms
+        eventos: List[Dict[str, Any]] = []
+        with self._lock:
+            for simbolo, abertas in self._abertas.items():
+                self._fechar_simbolo(simbolo, abertas, agora_ms, eventos)
+            self.estatisticas['fechadas_pelo_relogio'] += len(eventos)
+        self._publicar(eventos)
+        return len(eventos)
+
+    def _evento(self, simbolo: str, k: int, barra: _Barra) -> Dict[str, Any]:
+        return {
+            'symbol': simbolo,
+            'timeframe': self.timeframes[k],
+            'inicio_ms': barra.inicio,
+            'fim_ms': barra.inicio + self.duracoes[k],
+            'open': barra.open,
+            'high': barra.high,
+            'low': barra.low,
+            'close': barra.close,
+            'volume': barra.volume,
+            'turnover': barra.turnover,
+            'ticks': barra.ticks,
+            'fechado': True,
+        }
+
+    def ao_fechar(self, funcao: Callable[[Dict[str, Any]], None]):
+        """Registra um ouvinte chamado com cada barra fechada (na thread do relógio ou do stream)"""
+        self._ouvintes.append(funcao)
+
+    def _publicar(self, eventos: List[Dict[str, Any]]):
+        for evento in eventos:
+            for funcao in self._ouvintes:
+                try:
+                    funcao(evento)
+                except Exception as e:
+                    logger.error(f"❌ Erro em ouvinte de barras: {e}")
+
+    # ------------------------------------------------------------------
+    # Relógio
+    # ------------------------------------------------------------------
+    def iniciar(self) -> 'AgregadorBarras':
+        """Inicia a thread que fecha as barras pelo relógio"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop_relogio, daemon=True, name="AgregadorBarras")
+        self._thread.start()
+        logger.info(f"🕰️ Barras {'/'.join(self.timeframes)} montadas a partir dos ticks")
+        return self
+
+    def _loop_relogio(self):
+        while not self._parar.wait(self.intervalo_relogio):
+            try:
+                self.fechar_ate()
+            except Exception as e:
+                logger.error(f"❌ Erro ao fechar barras: {e}")
+
+    def parar(self, timeout: float = 2.0):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def _indice(self, timeframe: str) -> int:
+        try:
+            return self.timeframes.index(timeframe)
+        except ValueError:
+            raise ValueError(f"Timeframe {timeframe} não montado ({', '.join(self.timeframes)})")
+
+    def cache(self, simbolo: str, timeframe: str) -> Optional[CacheKlines]:
+        """Barras fechadas do (símbolo, timeframe) num CacheKlines (None se o símbolo não tem ticks)"""
+        k = self._indice(timeframe)
+        with self._lock:
+            fechadas = self._fechadas.get(simbolo)
+            return fechadas[k] if fechadas else None
+
+    def barra_atual(self, simbolo: str, timeframe: str) -> Optional[Dict[str, Any]]:
+        """Barra em formação do timeframe, já com o que está aberto nos timeframes menores"""
+        k = self._indice(timeframe)
+        with self._lock:
+            abertas = self._abertas.get(simbolo)
+            if not abertas:
+                return None
+            atual: Optional[_Barra] = None
+            for j in range(k + 1):
+                barra = abertas[j]
+                if barra is None:
+                    continue
+                if atual is None:
+                    atual = barra.copia(barra.inicio)
+                else:
+                    mais_recente = atual
+                    atual = barra.copia(barra.inicio)
+                    atual.incorporar(mais_recente)
+            if atual is None:
+                return None
+            evento = self._evento(simbolo, k, atual.copia(atual.inicio - atual.inicio % self.duracoes[k]))
+        evento['fechado'] = False
+        return evento
+
+    def barras(self, simbolo: str, timeframe: str, n: Optional[int] = None,
+               incluir_aberta: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Colunas NumPy (ts_ms, open, high, low, close, volume, turnover) das últimas n barras
+
+        Args:
+            incluir_aberta: Acrescenta a barra em formação como última linha
+        """
+        cache = self.cache(simbolo, timeframe)
+        janela = cache.janela(n) if cache is not None else {nome: np.zeros(0) for nome in COLUNAS}
+        atual = self.barra_atual(simbolo, timeframe) if incluir_aberta else None
+        if atual is None:
+            return janela
+        valores = (atual['inicio_ms'], atual['open'], atual['high'], atual['low'], atual['close'],
+                   atual['volume'], atual['turnover'])
+        inicio = 1 if n is not None and len(janela['ts_ms']) >= n else 0
+        return {nome: np.append(janela[nome][inicio:], valor) for nome, valor in zip(COLUNAS, valores)}
+
+    def contexto(self, simbolo: str, timeframes: Optional[List[str]] = None, n: int = 20) -> Dict[str, Dict[str, Any]]:
+        """
+        Resumo multi-timeframe do símbolo para prompts, filtros e o gestor de ordens
+
+        Returns:
+            {timeframe: {open, high, low, close, volume, variacao (% da barra atual),
+             amplitude (% máxima-mínima), tendencia (últimas n barras), barras (fechadas)}}
+        """
+        resultado = {}
+        for timeframe in timeframes or self.timeframes[1:] or self.timeframes:
+            cache = self.cache(simbolo, timeframe)
+            atual = self.barra_atual(simbolo, timeframe)
+            if cache is None or atual is None:
+                continue
+            fechamentos = np.append(cache.fechamentos(n - 1), atual['close'])
+            resultado[timeframe] = {
+                'open': atual['open'],
+                'high': atual['high'],
+                'low': atual['low'],
+                'close': atual['close'],
+                'volume': atual['volume'],
+                'variacao': (atual['close'] / atual['open'] - 1) * 100 if atual['open'] else 0.0,
+                'amplitude': (atual['high'] - atual['low']) / atual['close'] * 100 if atual['close'] else 0.0,
+                'tendencia': determinar_tendencia(fechamentos, longa=min(n, 20)),
+                'barras': len(cache),
+            }
+        return resultado
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        stats = dict(self.estatisticas)
+        stats['simbolos'] = len(self._abertas)
+        return stats
@@ -0,0 +1,207 @@
+"""
+Buffers circulares de preços por símbolo (NumPy, persistidos em memória mapeada)
+
+Cada símbolo tem um anel de capacidade fixa com (ts_ms, preço, volume, bid, ask).
+Os arrays ficam num arquivo mapeado em memória (dados/buffers/<símbolo>.anel):
+o coletor anexa ticks no processo dele e outros processos (monitores, preparador)
+abrem o mesmo arquivo somente leitura, sem cópia e sem consultar o SQLite.
+
+Layout do arquivo: cabeçalho int64[8] + 5 colunas de 2*capacidade posições.
+Cada tick é gravado em i e em i+capacidade, então os últimos N ticks são sempre
+uma fatia contígua de cada coluna (views NumPy, sem concatenar pedaços do anel).
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+import numpy as np
+from loguru import logger
+
+MAGICO = 0x414E454C50524543  # 'ANELPREC'
+VERSAO = 1
+CAPACIDADE_PADRAO = 4096
+DIRETORIO_PADRAO = os.path.join('dados', 'buffers')
+
+# Posições do cabeçalho
+_H_MAGICO, _H_VERSAO, _H_CAPACIDADE, _H_TOTAL, _H_SEQUENCIA = range(5)
+_TAMANHO_CABECALHO = 8
+
+COLUNAS = ('ts_ms', 'preco', 'volume', 'bid', 'ask')
+_TIPOS = {'ts_ms': np.int64, 'preco': np.float64, 'volume': np.float64, 'bid': np.float64, 'ask': np.float64}
+
+
+def _carregar_config_buffer() -> Dict:
+    try:
+        import config
+        return (config.load_config() or {}).get('buffer_precos', {}) or {}
+    except Exception:
+        return {}
+
+
+class BufferCircularPrecos:
+    """Anel de ticks de um símbolo com colunas NumPy contíguas"""
+
+    def __init__(self, simbolo: str, capacidade: int = CAPACIDADE_PADRAO,
+                 caminho: Optional[str] = None, somente_leitura: bool = False):
+        """
+        Inicializa o buffer
+
+        Args:
+            simbolo: Símbolo do ativo
+            capacidade: Número máximo de ticks mantidos
+            caminho: Arquivo para mapear em memória (None = só em memória)
+            somente_leitura: Abre um arquivo existente sem permitir escrita
+        """
+        self.simbolo = simbolo
+        self.caminho = caminho
+        self.somente_leitura = somente_leitura
+        self._lock = threading.Lock()
+
+        if caminho:
+            self._mapa = self._mapear(caminho, capacidade, somente_leitura)
+        else:
+            self._mapa = np.zeros(self._tamanho_bytes(capacidade), dtype=np.uint8)
+            self._iniciar_cabecalho(self._mapa, capacidade)
+
+        self._cabecalho = self._mapa[:_TAMANHO_CABECALHO * 8].view(np.int64)
+        self.capacidade = int(self._cabecalho[_H_CAPACIDADE])
+        self._colunas: Dict[str, np.ndarray] = {}
+        deslocamento = _TAMANHO_CABECALHO * 8
+        for nome in COLUNAS:
+            tamanho = 2 * self.capacidade * 8
+            self._colunas[nome] = self._mapa[deslocamento:deslocamento + tamanho].view(_TIPOS[nome])
+            deslocamento += tamanho
+
+    @staticmethod
+    def _tamanho_bytes(capacidade: int) -> int:
+        return (_TAMANHO_CABECALHO + 2 * capacidade * len(COLUNAS)) * 8
+
+    @staticmethod
+    def _iniciar_cabecalho(mapa: np.ndarray, capacidade: int):
+        cabecalho = mapa[:_TAMANHO_CABECALHO * 8].view(np.int64)
+        cabecalho[:] = 0
+        cabecalho[_H_MAGICO] = MAGICO
+        cabecalho[_H_VERSAO] = VERSAO
+        cabecalho[_H_CAPACIDADE] = capacidade
+
+    def _mapear(self, caminho: str, capacidade: int, somente_leitura: bool) -> np.ndarray:
+        if somente_leitura:
+            return np.memmap(caminho, dtype=np.uint8, mode='r')
+
+        if os.path.exists(caminho):
+            mapa = np.memmap(caminho, dtype=np.uint8, mode='r+')
+            cabecalho = mapa[:_TAMANHO_CABECALHO * 8].view(np.int64)
+            if (len(mapa) >= _TAMANHO_CABECALHO * 8 and cabecalho[_H_MAGICO] == MAGICO
+                    and cabecalho[_H_VERSAO] == VERSAO and cabecalho[_H_CAPACIDADE] == capacidade
+                    and len(mapa) == self._tamanho_bytes(capacidade)):
+                return mapa
+            logger.warning(f"⚠️ Buffer de preços {caminho} incompatível, recriando com capacidade {capacidade}")
+            del mapa
+
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        mapa = np.memmap(caminho, dtype=np.uint8, mode='w+', shape=(self._tamanho_bytes(capacidade),))
+        self._iniciar_cabecalho(mapa, capacidade)
+        mapa.flush()
+        return mapa
+
+    @property
+    def total(self) -> int:
+        """Ticks anexados desde a criação do arquivo"""
+        return int(self._cabecalho[_H_TOTAL])
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacidade)
+
+    def adicionar(self, ts_ms: int, preco: float, volume: float = 0.0,
+                  bid: Optional[float] = None, ask: Optional[float] = None):
+        """Anexa um tick (sobrescreve o mais antigo quando cheio)"""
+        if self.somente_leitura:
+            raise RuntimeError(f"Buffer de {self.simbolo} aberto somente leitura")
+        valores = (ts_ms, preco, volume or 0.0,
+                   np.nan if bid is None else bid, np.nan if ask is None else ask)
+        with self._lock:
+            total = int(self._cabecalho[_H_TOTAL])
+            i = total % self.capacidade
+            # Sequência ímpar = escrita em andamento (leitores de outro processo refazem a leitura)
+            self._cabecalho[_H_SEQUENCIA] += 1
+            for nome, valor in zip(COLUNAS, valores):
+                coluna = self._colunas[nome]
+                coluna[i] = valor
+                coluna[i + self.capacidade] = valor
+            self._cabecalho[_H_TOTAL] = total + 1
+            self._cabecalho[_H_SEQUENCIA] += 1
+
+    def ultimos(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Views dos últimos n ticks, do mais antigo para o mais recente
+
+        As views apontam para o anel: leia-as logo ou use copia() se o
+        escritor puder sobrescrever a janela enquanto ela é usada.
+
+        Args:
+            n: Quantidade de ticks (padrão: todos os disponíveis)
+        """
+        disponiveis = len(self)
+        n = disponiveis if n is None else max(0, min(n, disponiveis))
+        fim = self.total % self.capacidade + self.capacidade
+        return {nome: self._colunas[nome][fim - n:fim] for nome in COLUNAS}
+
+    def copia(self, n: Optional[int] = None, tentativas: int = 5) -> Dict[str, np.ndarray]:
+        """Cópia consistente dos últimos n ticks (refaz se o escritor mexeu durante a leitura)"""
+        for _ in range(tentativas):
+            sequencia = int(self._cabecalho[_H_SEQUENCIA])
+            if sequencia % 2:
+                continue
+            janela = {nome: valores.copy() for nome, valores in self.ultimos(n).items()}
+            if int(self._cabecalho[_H_SEQUENCIA]) == sequencia:
+                return janela
+        return {nome: valores.copy() for nome, valores in self.ultimos(n).items()}
+
+    def flush(self):
+        """Força a gravação das páginas sujas no arquivo"""
+        if isinstance(self._mapa, np.memmap) and not self.somente_leitura:
+            self._mapa.flush()
+
+
+_buffers: Dict[str, BufferCircularPrecos] = {}
+_lock_buffers = threading.Lock()
+
+
+def caminho_buffer(simbolo: str, diretorio: Optional[str] = None) -> str:
+    diretorio = diretorio or _carregar_config_buffer().get('diretorio', DIRETORIO_PADRAO)
+    nome = ''.join(c if c.isalnum() or c in '-_' else '_' for c in simbolo)
+    return os.path.join(diretorio, f"{nome}.anel")
+
+
+def obter_buffer_precos(simbolo: str, diretorio: Optional[str] = None) -> BufferCircularPrecos:
+    """
+    Retorna o buffer gravável do símbolo no processo (cria na primeira chamada)
+
+    Args:
+        simbolo: Símbolo do ativo
+        diretorio: Pasta do arquivo mapeado, usada só na criação (padrão: buffer_precos.diretorio do config)
+    """
+    buffer = _buffers.get(simbolo)
+    if buffer is not None:
+        return buffer
+    with _lock_buffers:
+        buffer = _buffers.get(simbolo)
+        if buffer is None:
+            cfg = _carregar_config_buffer()
+            caminho = caminho_buffer(simbolo, diretorio) if cfg.get('persistir', True) else None
+            buffer = BufferCircularPrecos(simbolo, cfg.get('capacidade', CAPACIDADE_PADRAO), caminho)
+            _buffers[simbolo] = buffer
+        return buffer
+
+
+def abrir_buffer_precos(simbolo: str, diretorio: Optional[str] = None) -> Optional[BufferCircularPrecos]:
+    """
+    Abre somente leitura o buffer gravado por outro processo
+
+    Returns:
+        Buffer mapeado ou None se o arquivo ainda não existe
+    """
+    caminho = caminho_buffer(simbolo, diretorio)
+    if not os.path.exists(caminho):
+        return None
+    return BufferCircularPrecos(simbolo, caminho=caminho, somente_leitura=True)
@@ -0,0 +1,163 @@
+"""
+Cache compartilhado de features (indicadores) por símbolo
+
+Coletor, preparador de dados e gestores de ordens pedem os mesmos indicadores
+várias vezes por ciclo. Cada entrada guarda o último vetor calculado junto com
+o marcador da fonte de onde saiu:
+  - buffer de ticks: (buffer, total de ticks anexados)
+  - cache de klines: (cache, início do último candle, revisão do cache)
+mais o gerenciador e a geração das features declaradas pelos consumidores.
+Enquanto não chega tick ou candle novo o marcador não muda e todos recebem o
+mesmo vetor, sem recalcular. O vetor é somente leitura (VetorFeatures) e traz
+a versão, que sobe a cada recálculo da chave.
+"""
+
+import threading
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+from loguru import logger
+
+from indicadores_streaming import GerenciadorIndicadores, obter_gerenciador_indicadores
+
+
+class VetorFeatures(Mapping):
+    """Features de uma chave numa versão; imutável (listas viram tuplas)"""
+
+    __slots__ = ('chave', 'versao', 'marcador', 'calculado_em', '_valores')
+
+    def __init__(self, chave: str, versao: int, marcador: Hashable, valores: Dict[str, Any]):
+        congelados = {nome: tuple(valor) if isinstance(valor, list) else valor for nome, valor in valores.items()}
+        object.__setattr__(self, 'chave', chave)
+        object.__setattr__(self, 'versao', versao)
+        object.__setattr__(self, 'marcador', marcador)
+        object.__setattr__(self, 'calculado_em', time.time())
+        object.__setattr__(self, '_valores', MappingProxyType(congelados))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("VetorFeatures é somente leitura")
+
+    def __getitem__(self, nome: str) -> Any:
+        return self._valores[nome]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._valores)
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+    def como_dict(self) -> Dict[str, Any]:
+        """Cópia mutável (e serializável em JSON) dos valores"""
+        return {nome: list(valor) if isinstance(valor, tuple) else valor for nome, valor in self._valores.items()}
+
+    def __repr__(self) -> str:
+        return f"VetorFeatures({self.chave!r}, versao={self.versao}, {len(self)} features)"
+
+
+class _Entrada:
+    __slots__ = ('marcador', 'vetor', 'custo', 'lock')
+
+    def __init__(self):
+        self.marcador = None
+        self.vetor: Optional[VetorFeatures] = None
+        self.custo = 0.0
+        self.lock = threading.Lock()
+
+
+class CacheFeatures:
+    """Último vetor de features por chave, recalculado só quando a fonte muda"""
+
+    def __init__(self):
+        self._entradas: Dict[str, _Entrada] = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {
+            'acertos': 0,
+            'falhas': 0,
+            'invalidacoes': 0,
+            'tempo_calculo_ms': 0.0,
+            'tempo_economizado_ms': 0.0,
+        }
+
+    def obter(self, chave: str, marcador: Hashable, calcular: Callable[[], Dict[str, Any]]) -> VetorFeatures:
+        """
+        Vetor da chave para o marcador da fonte
+
+        Args:
+            chave: Símbolo (ou símbolo/intervalo)
+            marcador: Identifica o estado da fonte; igual ao guardado = acerto
+            calcular: Calcula os valores quando o marcador mudou
+
+        Returns:
+            VetorFeatures (o mesmo objeto para todos enquanto o marcador não muda)
+        """
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            with self._lock:
+                entrada = self._entradas.setdefault(chave, _Entrada())
+        with entrada.lock:
+            vetor = entrada.vetor
+            if vetor is not None and entrada.marcador == marcador:
+                with self._lock:
+                    self.estatisticas['acertos'] += 1
+                    self.estatisticas['tempo_economizado_ms'] += entrada.custo * 1000
+                return vetor
+            inicio = time.perf_counter()
+            valores = calcular()
+            entrada.custo = time.perf_counter() - inicio
+            entrada.vetor = VetorFeatures(chave, (vetor.versao if vetor else 0) + 1, marcador, valores)
+            entrada.marcador = marcador
+            with self._lock:
+                self.estatisticas['falhas'] += 1
+                self.estatisticas['tempo_calculo_ms'] += entrada.custo * 1000
+            return entrada.vetor
+
+    def de_buffer(self, simbolo: str, buffer, gerenciador: Optional[GerenciadorIndicadores] = None) -> VetorFeatures:
+        """Features do buffer de ticks do símbolo; recalcula só quando entra tick novo"""
+        gerenciador = gerenciador or obter_gerenciador_indicadores()
+        marcador = (id(buffer), buffer.total, id(gerenciador), gerenciador.geracao)
+        return self.obter(simbolo, marcador, lambda: gerenciador.de_buffer(simbolo, buffer))
+
+    def de_klines(self, cache, gerenciador: Optional[GerenciadorIndicadores] = None) -> VetorFeatures:
+        """Features do cache de klines; recalcula só com candle novo ou o último reescrito"""
+        gerenciador = gerenciador or obter_gerenciador_indicadores()
+        marcador = (id(cache), cache.ultimo_inicio, cache.revisao, id(gerenciador), gerenciador.geracao)
+        return self.obter(f"{cache.simbolo}/{cache.intervalo}", marcador, lambda: gerenciador.de_klines(cache))
+
+    def atual(self, chave: str) -> Optional[VetorFeatures]:
+        """Último vetor calculado da chave, sem consultar a fonte (None se nunca calculado)"""
+        entrada = self._entradas.get(chave)
+        return entrada.vetor if entrada else None
+
+    def invalidar(self, chave: Optional[str] = None):
+        """Força o recálculo da chave (ou de todas) na próxima leitura"""
+        with self._lock:
+            entradas = [self._entradas[chave]] if chave in self._entradas else (
+                list(self._entradas.values()) if chave is None else [])
+            self.estatisticas['invalidacoes'] += len(entradas)
+        for entrada in entradas:
+            with entrada.lock:
+                entrada.marcador = None
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Acertos, falhas e tempo de cálculo evitado"""
+        with self._lock:
+            stats = dict(self.estatisticas)
+            stats['chaves'] = len(self._entradas)
+        consultas = stats['acertos'] + stats['falhas']
+        stats['taxa_acerto'] = stats['acertos'] / consultas if consultas else 0.0
+        return stats
+
+
+_cache: Optional[CacheFeatures] = None
+_lock_cache = threading.Lock()
+
+
+def obter_cache_features() -> CacheFeatures:
+    """Cache compartilhado do processo"""
+    global _cache
+    with _lock_cache:
+        if _cache is None:
+            _cache = CacheFeatures()
+            logger.debug("🗂️ Cache de features criado")
+        return _cache
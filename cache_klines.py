@@ -0,0 +1,383 @@
+"""
+Cache incremental de candles (klines) da Bybit por (símbolo, intervalo)
+
+A primeira leitura baixa o histórico de /v5/market/kline uma vez. Depois,
+cada ciclo pede só os candles a partir do último guardado (o último ainda em
+formação é reescrito, os novos são anexados). Os candles ficam em colunas
+NumPy com o mesmo truque de buffer_precos.py: cada posição é gravada em i e
+em i+capacidade, então a janela dos últimos N é sempre uma fatia contígua.
+
+Com um StreamBybit anexado, os candles do tópico kline entram direto no cache
+e não há requisição por ciclo; uma lacuna (queda da conexão ou candle pulado)
+marca o cache e a próxima leitura completa o intervalo pela API (backfill).
+
+Os indicadores (RSI, volatilidade, tendência) são calculados sobre a janela do
+cache, sem montar DataFrame a cada chamada.
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import requests
+from loguru import logger
+
+from stream_bybit import intervalo_kline_ms
+
+BASE_URL_PADRAO = "https://api.bybit.com"
+CAPACIDADE_PADRAO = 500
+MAX_POR_REQUISICAO = 1000
+
+COLUNAS = ('ts_ms', 'open', 'high', 'low', 'close', 'volume', 'turnover')
+
+
+class CacheKlines:
+    """Janela de candles de um (símbolo, intervalo) em colunas NumPy"""
+
+    def __init__(self, simbolo: str, intervalo: str, capacidade: int = CAPACIDADE_PADRAO):
+        """
+        Inicializa o cache vazio
+
+        Args:
+            simbolo: Símbolo do ativo
+            intervalo: Intervalo da Bybit ('1', '5', '60', 'D'...)
+            capacidade: Candles mantidos (os mais antigos saem)
+        """
+        self.simbolo = simbolo
+        self.intervalo = str(intervalo)
+        self.duracao_ms = intervalo_kline_ms(self.intervalo)
+        self.capacidade = capacidade
+        self._colunas = {nome: np.zeros(2 * capacidade, dtype=np.int64 if nome == 'ts_ms' else np.float64)
+                         for nome in COLUNAS}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.precisa_backfill = False
+        self.atualizado_em: Optional[float] = None  # time.monotonic() da última atualização
+        self.revisao = 0  # sobe a cada candle anexado ou reescrito com valores diferentes
+
+    def __len__(self) -> int:
+        return min(self._total, self.capacidade)
+
+    @property
+    def ultimo_inicio(self) -> Optional[int]:
+        """Início (ms) do candle mais recente"""
+        if not self._total:
+            return None
+        return int(self._colunas['ts_ms'][(self._total - 1) % self.capacidade])
+
+    def _gravar(self, i: int, candle: Tuple):
+        for nome, valor in zip(COLUNAS, candle):
+            coluna = self._colunas[nome]
+            coluna[i] = valor
+            coluna[i + self.capacidade] = valor
+
+    def mesclar(self, candles: List[Tuple]) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """
+        Junta candles (ts_ms, open, high, low, close, volume, turnover) em ordem crescente
+
+        O candle com o mesmo início do último é reescrito; anteriores são ignorados.
+
+        Returns:
+            (candles novos anexados, intervalo (inicio_ms, fim_ms) faltando antes deles ou None)
+        """
+        novos, faltando = 0, None
+        with self._lock:
+            for candle in candles:
+                inicio = int(candle[0])
+                ultimo = self.ultimo_inicio
+                if ultimo is not None and inicio < ultimo:
+                    continue
+                if ultimo is not None and inicio == ultimo:
+                    i = (self._total - 1) % self.capacidade
+                    if any(self._colunas[nome][i] != valor for nome, valor in zip(COLUNAS, candle)):
+                        self._gravar(i, candle)
+                        self.revisao += 1
+                    continue
+                if (ultimo is not None and self.duracao_ms and inicio > ultimo + self.duracao_ms
+                        and faltando is None):
+                    faltando = (ultimo + self.duracao_ms, inicio)
+                self._gravar(self._total % self.capacidade, candle)
+                self._total += 1
+                self.revisao += 1
+                novos += 1
+            self.atualizado_em = time.monotonic()
+        return novos, faltando
+
+    def janela(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Cópia dos últimos n candles, do mais antigo para o mais recente"""
+        with self._lock:
+            disponiveis = len(self)
+            n = disponiveis if n is None else max(0, min(n, disponiveis))
+            fim = self._total % self.capacidade + self.capacidade
+            return {nome: self._colunas[nome][fim - n:fim].copy() for nome in COLUNAS}
+
+    def fechamentos(self, n: Optional[int] = None) -> np.ndarray:
+        return self.janela(n)['close']
+
+
+# ----------------------------------------------------------------------
+# Indicadores sobre a janela (mesma definição que os cálculos em pandas do robô)
+# ----------------------------------------------------------------------
+def calcular_rsi(fechamentos: np.ndarray, periodo: int = 14) -> float:
+    """RSI com médias simples dos ganhos/perdas dos últimos `periodo` candles"""
+    if len(fechamentos) <= periodo:
+        return 50.0
+    delta = np.diff(fechamentos[-(periodo + 1):])
+    ganho = delta[delta > 0].sum() / periodo
+    perda = -delta[delta < 0].sum() / periodo
+    if perda == 0:
+        return 100.0 if ganho > 0 else 50.0
+    return float(100 - 100 / (1 + ganho / perda))
+
+
+def calcular_volatilidade(fechamentos: np.ndarray, periodo: int = 20) -> float:
+    """Desvio padrão amostral dos retornos simples dos últimos `periodo` candles"""
+    if len(fechamentos) <= periodo:
+        return 0.0
+    janela = fechamentos[-(periodo + 1):]
+    retornos = janela[1:] / janela[:-1] - 1
+    return float(retornos.std(ddof=1))
+
+
+def determinar_tendencia(fechamentos: np.ndarray, curta: int = 5, longa: int = 20, limiar: float = 0.005) -> str:
+    """'alta'/'baixa' quando a média curta se afasta mais que `limiar` da longa"""
+    if len(fechamentos) < longa:
+        return 'lateral'
+    media_curta = fechamentos[-curta:].mean()
+    media_longa = fechamentos[-longa:].mean()
+    if media_curta > media_longa * (1 + limiar):
+        return 'alta'
+    if media_curta < media_longa * (1 - limiar):
+        return 'baixa'
+    return 'lateral'
+
+
+class GerenciadorKlines:
+    """Mantém os caches de klines e busca na API só o que falta"""
+
+    def __init__(self, session: Optional[requests.Session] = None, base_url: Optional[str] = None,
+                 categoria: Optional[str] = None, capacidade: Optional[int] = None,
+                 intervalo_minimo_segundos: Optional[float] = None):
+        """
+        Inicializa o gerenciador
+
+        Args:
+            session: Sessão HTTP reaproveitada
+            base_url: URL da API REST (padrão: exchange.base_url)
+            categoria: Categoria da Bybit ('linear', 'spot')
+            capacidade: Candles mantidos por (símbolo, intervalo)
+            intervalo_minimo_segundos: Intervalo mínimo entre buscas incrementais do mesmo cache
+        """
+        try:
+            import config
+            cfg = config.load_config() or {}
+        except Exception:
+            cfg = {}
+        cfg_coleta = cfg.get('coleta', {}) or {}
+        cfg_klines = cfg_coleta.get('klines', {}) or {}
+        self.session = session or requests.Session()
+        self.base_url = base_url or (cfg.get('exchange', {}) or {}).get('base_url') or BASE_URL_PADRAO
+        self.categoria = categoria or cfg_klines.get('categoria', 'linear')
+        self.capacidade = capacidade or cfg_klines.get('capacidade', CAPACIDADE_PADRAO)
+        self.intervalo_minimo = (intervalo_minimo_segundos if intervalo_minimo_segundos is not None
+                                 else cfg_klines.get('intervalo_minimo_segundos', 1))
+        self.timeout = cfg_klines.get('timeout_segundos', 10)
+        self.stream = None
+        self._caches: Dict[Tuple[str, str], CacheKlines] = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {
+            'requisicoes': 0,
+            'candles_baixados': 0,
+            'candles_stream': 0,
+            'bootstraps': 0,
+            'backfills': 0,
+            'leituras_sem_requisicao': 0,
+            'erros': 0,
+        }
+
+    def anexar_stream(self, stream):
+        """Alimenta os caches com o tópico kline do stream e marca backfill nas lacunas"""
+        self.stream = stream
+        stream.ao_receber('kline', self._candle_do_stream)
+        stream.ao_receber('lacuna', self._lacuna_do_stream)
+
+    def _candle_do_stream(self, candle: Dict[str, Any]):
+        cache = self._caches.get((candle['symbol'], candle['intervalo']))
+        if cache is None or not len(cache):
+            return  # sem bootstrap ainda: a primeira leitura baixa o histórico
+        if cache.precisa_backfill:
+            return  # a busca pendente cobre este candle
+        if cache.duracao_ms and candle['inicio_ms'] > cache.ultimo_inicio + cache.duracao_ms:
+            # Não anexa por cima do buraco: o backfill parte do último candle contíguo
+            cache.precisa_backfill = True
+            return
+        cache.mesclar([(candle['inicio_ms'], candle['open'], candle['high'], candle['low'],
+                        candle['close'], candle['volume'], 0.0)])
+        self.estatisticas['candles_stream'] += 1
+
+    def _lacuna_do_stream(self, lacuna: Dict[str, Any]):
+        for (simbolo, _), cache in self._caches.items():
+            if simbolo == lacuna['symbol']:
+                cache.precisa_backfill = True
+
+    def cache(self, simbolo: str, intervalo: str = '1') -> CacheKlines:
+        """Cache do par (criado vazio na primeira vez)"""
+        chave = (simbolo, str(intervalo))
+        with self._lock:
+            if chave not in self._caches:
+                self._caches[chave] = CacheKlines(simbolo, str(intervalo), self.capacidade)
+            return self._caches[chave]
+
+    def _stream_cobre(self, cache: CacheKlines) -> bool:
+        return bool(self.stream and self.stream.conectado and cache.simbolo in self.stream.simbolos
+                    and getattr(self.stream, 'intervalo_kline', None) == cache.intervalo
+                    and 'kline' in self.stream.topicos)
+
+    def _dispensa_busca(self, cache: CacheKlines, agora: float) -> bool:
+        """Cache atualizado há menos de intervalo_minimo ou mantido pelo stream (e sem backfill pendente)"""
+        if not len(cache) or cache.precisa_backfill:
+            return False
+        recente = cache.atualizado_em is not None and agora - cache.atualizado_em < self.intervalo_minimo
+        return recente or self._stream_cobre(cache)
+
+    def obter(self, simbolo: str, intervalo: str = '1') -> Optional[CacheKlines]:
+        """
+        Cache atualizado do par: bootstrap na primeira vez, depois só os candles novos
+
+        Returns:
+            Cache (possivelmente com dados do ciclo anterior se a API falhar) ou None se vazio
+        """
+        cache = self.cache(simbolo, intervalo)
+        if self._dispensa_busca(cache, time.monotonic()):
+            self.estatisticas['leituras_sem_requisicao'] += 1
+            return cache
+        try:
+            self._atualizar(cache)
+        except Exception as e:
+            self.estatisticas['erros'] += 1
+            logger.error(f"❌ Erro ao atualizar klines {simbolo}/{intervalo}: {e}")
+        return cache if len(cache) else None
+
+    def _atualizar(self, cache: CacheKlines):
+        if not len(cache):
+            candles = self._baixar(cache, inicio=None, limite=cache.capacidade)
+            self.estatisticas['bootstraps'] += 1
+            cache.mesclar(candles)
+            logger.info(f"🕯️ Klines {cache.simbolo}/{cache.intervalo}: {len(candles)} candles iniciais")
+            return
+
+        backfill = cache.precisa_backfill
+        # A partir do último guardado: reescreve o candle em formação e anexa os novos
+        candles = self._baixar(cache, inicio=cache.ultimo_inicio, limite=cache.capacidade)
+        cache.mesclar(candles)
+        cache.precisa_backfill = False
+        if backfill:
+            self.estatisticas['backfills'] += 1
+            logger.info(f"🕯️ Backfill de klines {cache.simbolo}/{cache.intervalo}: {len(candles)} candles")
+
+    def _baixar(self, cache: CacheKlines, inicio: Optional[int], limite: int) -> List[Tuple]:
+        """GET /v5/market/kline; devolve os candles em ordem crescente"""
+        candles: List[Tuple] = []
+        fim = None
+        restante = limite
+        while restante > 0:
+            params = {'category': self.categoria, 'symbol': cache.simbolo, 'interval': cache.intervalo,
+                      'limit': min(restante, MAX_POR_REQUISICAO)}
+            if inicio is not None:
+                params['start'] = inicio
+            if fim is not None:
+                params['end'] = fim
+            self.estatisticas['requisicoes'] += 1
+            response = self.session.get(f"{self.base_url}/v5/market/kline", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            pagina = self._pagina(response.json())
+            if not pagina:
+                break
+            candles = pagina[::-1] + candles
+            self.estatisticas['candles_baixados'] += len(pagina)
+            restante -= len(pagina)
+            # Página cheia: a Bybit entrega os mais recentes; continua para trás até `inicio`
+            mais_antigo = pagina[-1][0]
+            if len(pagina) < params['limit'] or (inicio is not None and mais_antigo <= inicio):
+                break
+            fim = mais_antigo - 1
+        return candles
+
+    @staticmethod
+    def _pagina(dados: Dict[str, Any]) -> List[Tuple]:
+        """Candles de uma resposta de /v5/market/kline, do mais recente para o mais antigo (como a Bybit)"""
+        if dados.get('retCode') != 0:
+            raise ValueError(dados.get('retMsg', 'erro desconhecido'))
+        return [tuple([int(l[0])] + [float(v) for v in l[1:7]])
+                for l in (dados.get('result', {}) or {}).get('list', [])]
+
+    def obter_varios(self, simbolos: List[str], intervalo: str = '1', http=None) -> Dict[str, CacheKlines]:
+        """
+        Caches atualizados de vários pares, com as buscas disparadas juntas
+
+        Cada cache que precisa de busca (mesmo critério de obter()) vira um único
+        pedido no lote do cliente HTTP assíncrono; só os que não cabem numa página
+        (bootstrap maior que MAX_POR_REQUISICAO, atraso de mais de uma página)
+        seguem pelo caminho paginado de obter().
+
+        Args:
+            simbolos: Pares
+            intervalo: Intervalo dos candles
+            http: ClienteHTTP (padrão: o compartilhado do processo)
+
+        Returns:
+            Dicionário símbolo -> cache (pares sem candles ficam de fora)
+        """
+        if http is None:
+            from cliente_http import obter_cliente_http
+            http = obter_cliente_http()
+        agora = time.monotonic()
+        pendentes, paginados = [], []
+        for simbolo in simbolos:
+            cache = self.cache(simbolo, intervalo)
+            if self._dispensa_busca(cache, agora):
+                self.estatisticas['leituras_sem_requisicao'] += 1
+            elif len(cache) or cache.capacidade <= MAX_POR_REQUISICAO:
+                pendentes.append(cache)
+            else:
+                paginados.append(simbolo)
+
+        pedidos = []
+        for cache in pendentes:
+            params = {'category': self.categoria, 'symbol': cache.simbolo, 'interval': cache.intervalo,
+                      'limit': min(cache.capacidade, MAX_POR_REQUISICAO)}
+            if len(cache):
+                params['start'] = cache.ultimo_inicio
+            pedidos.append({'url': f"{self.base_url}/v5/market/kline", 'params': params, 'timeout': self.timeout})
+        self.estatisticas['requisicoes'] += len(pedidos)
+        for cache, pedido, resposta in zip(pendentes, pedidos, http.em_lote(pedidos)):
+            try:
+                if isinstance(resposta, Exception):
+                    raise resposta
+                resposta.raise_for_status()
+                pagina = self._pagina(resposta.json())
+            except Exception as e:
+                self.estatisticas['erros'] += 1
+                logger.error(f"❌ Erro ao atualizar klines {cache.simbolo}/{cache.intervalo}: {e}")
+                continue
+            self.estatisticas['candles_baixados'] += len(pagina)
+            if len(pagina) == pedido['params']['limit'] and len(cache):
+                paginados.append(cache.simbolo)  # atraso maior que uma página: completa pelo caminho paginado
+                continue
+            if not len(cache):
+                self.estatisticas['bootstraps'] += 1
+            elif cache.precisa_backfill:
+                self.estatisticas['backfills'] += 1
+            cache.mesclar(pagina[::-1])
+            cache.precisa_backfill = False
+
+        for simbolo in paginados:
+            self.obter(simbolo, intervalo)
+        caches = (self._caches.get((simbolo, str(intervalo))) for simbolo in simbolos)
+        return {cache.simbolo: cache for cache in caches if cache is not None and len(cache)}
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Requisições, candles baixados/recebidos do stream e backfills"""
+        stats = dict(self.estatisticas)
+        stats['caches'] = len(self._caches)
+        return stats
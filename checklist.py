@@ -8,13 +8,14 @@ import importlib
 import traceback
 import sys
 import os
-import sqlite3
 from pathlib import Path
 from typing import Callable
 from datetime import datetime
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from banco_dados import obter_banco
+
 # Utilitário para registrar testes
 TESTES = []
 def registrar_teste(nome):
@@ -25,11 +26,7 @@ def registrar_teste(nome):
 
 def checar_tabela_colunas(db_path, tabela, colunas):
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({tabela})")
-        cols = [row[1] for row in cursor.fetchall()]
-        conn.close()
+        cols = [row[1] for row in obter_banco(db_path).consultar(f"PRAGMA table_info({tabela})")]
         for col in colunas:
             if col not in cols:
                 return False, f"Coluna '{col}' não existe na tabela '{tabela}'"
@@ -0,0 +1,508 @@
+"""
+Cliente HTTP assíncrono da coleta (asyncio puro, sem dependências extras)
+
+Todas as requisições de um ciclo (tickers por par, contratos da B3, prompts
+ao Ollama) podem sair ao mesmo tempo: o ClienteHTTPAssincrono mantém um pool
+de conexões keep-alive por host (HTTP/1.1, TLS quando https) e limita o
+número de conexões simultâneas por host. Um balde de fichas por host
+(LimitadorTaxa) é compartilhado por todas as requisições do processo e
+segura o ritmo dentro dos limites da Bybit e da B3.
+
+Cada endpoint (host + caminho, sem query) acumula latência média, máxima,
+p50/p95 das últimas amostras e erros. Ouvintes registrados com ao_responder()
+recebem o status de cada requisição (o agendador de coleta usa os 429);
+ao_receber_resposta() entrega a resposta inteira (o gravador de mercado
+guarda os corpos brutos).
+
+Os robôs continuam síncronos: ClienteHTTP roda o cliente assíncrono num
+event loop em thread própria e expõe get/post/em_lote bloqueantes.
+obter_cliente_http() devolve a instância do processo configurada por
+coleta.http no config.yaml.
+"""
+
+import ssl
+import gzip
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+from loguru import logger
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+MAX_CABECALHO = 64 * 1024
+AMOSTRAS_LATENCIA = 256
+
+
+class ErroHTTP(Exception):
+    """Falha de rede, timeout ou status HTTP de erro"""
+
+    def __init__(self, mensagem: str, status: Optional[int] = None):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class RespostaHTTP:
+    """Resposta já lida por completo"""
+
+    def __init__(self, status: int, cabecalhos: Dict[str, str], corpo: bytes, url: str, latencia_ms: float):
+        self.status = status
+        self.cabecalhos = cabecalhos
+        self.corpo = corpo
+        self.url = url
+        self.latencia_ms = latencia_ms
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def texto(self) -> str:
+        return self.corpo.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.corpo)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise ErroHTTP(f"HTTP {self.status} em {self.url}", self.status)
+
+
+class LimitadorTaxa:
+    """
+    Balde de fichas: `taxa_por_segundo` fichas por segundo, até `rajada` acumuladas
+
+    Cada chamada reserva uma ficha (o saldo pode ficar negativo) e espera o
+    tempo até ela existir, então as requisições saem em ordem de chegada e
+    no ritmo exato. Seguro entre threads e entre event loops.
+    """
+
+    def __init__(self, taxa_por_segundo: float, rajada: Optional[float] = None):
+        self.taxa = float(taxa_por_segundo)
+        self.capacidade = float(rajada or max(1.0, self.taxa))
+        self.fichas = self.capacidade
+        self.atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reservar(self) -> float:
+        with self._lock:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado_em) * self.taxa)
+            self.atualizado_em = agora
+            self.fichas -= 1
+            return max(0.0, -self.fichas / self.taxa)
+
+    async def adquirir(self) -> float:
+        """Espera a vez da requisição; devolve os segundos esperados"""
+        espera = self._reservar()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return espera
+
+
+class _Conexao:
+    def __init__(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        self.leitor = leitor
+        self.escritor = escritor
+        self.livre_desde = time.monotonic()
+
+    def utilizavel(self, max_ocioso: float) -> bool:
+        return (not self.escritor.is_closing() and not self.leitor.at_eof()
+                and time.monotonic() - self.livre_desde < max_ocioso)
+
+    def fechar(self):
+        try:
+            self.escritor.close()
+        except Exception:
+            pass
+
+
+class _PoolHost:
+    """Conexões ociosas e limite de conexões simultâneas de um host"""
+
+    def __init__(self, esquema: str, host: str, porta: int, max_conexoes: int):
+        self.esquema = esquema
+        self.host = host
+        self.porta = porta
+        self.semaforo = asyncio.Semaphore(max_conexoes)
+        self.ociosas: deque = deque()
+
+
+class ClienteHTTPAssincrono:
+    """Requisições concorrentes com pool keep-alive e limite de taxa por host"""
+
+    def __init__(self, limites: Optional[Mapping[str, Mapping[str, float]]] = None, max_conexoes_por_host: int = 8,
+                 timeout: float = 10.0, max_ocioso_segundos: float = 30.0,
+                 cabecalhos: Optional[Mapping[str, str]] = None):
+        """
+        Inicializa o cliente (as conexões abrem sob demanda)
+
+        Args:
+            limites: {host: {'taxa_por_segundo': x, 'rajada': y}}; hosts fora da lista não são limitados
+            max_conexoes_por_host: Conexões simultâneas por host
+            timeout: Timeout padrão de cada requisição (segundos)
+            max_ocioso_segundos: Conexão ociosa há mais tempo que isso é descartada
+            cabecalhos: Cabeçalhos enviados em toda requisição
+        """
+        self.max_conexoes = max(1, int(max_conexoes_por_host))
+        self.timeout = timeout
+        self.max_ocioso = max_ocioso_segundos
+        self.cabecalhos = {'User-Agent': USER_AGENT, 'Accept': '*/*', 'Accept-Encoding': 'gzip'}
+        self.cabecalhos.update(cabecalhos or {})
+        self.limitadores: Dict[str, LimitadorTaxa] = {
+            host: LimitadorTaxa(cfg.get('taxa_por_segundo', 10), cfg.get('rajada'))
+            for host, cfg in (limites or {}).items()
+        }
+        self._pools: Dict[Tuple[str, str, int], _PoolHost] = {}
+        self._ssl: Optional[ssl.SSLContext] = None
+        self._latencias: Dict[str, Dict[str, Any]] = {}
+        self._ouvintes: List[Callable] = []
+        self._ouvintes_resposta: List[Callable] = []
+        self._lock_stats = threading.Lock()
+        self.estatisticas = {
+            'requisicoes': 0,
+            'erros': 0,
+            'conexoes_abertas': 0,
+            'conexoes_reutilizadas': 0,
+            'esperas_limite': 0,
+            'tempo_espera_limite_ms': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    async def requisitar(self, metodo: str, url: str, params: Optional[Mapping[str, Any]] = None,
+                         json_corpo: Any = None, timeout: Optional[float] = None,
+                         cabecalhos: Optional[Mapping[str, str]] = None) -> RespostaHTTP:
+        """
+        Executa uma requisição e lê a resposta inteira
+
+        Raises:
+            ErroHTTP: falha de rede ou timeout (status HTTP de erro não levanta; ver raise_for_status)
+        """
+        partes = urlsplit(url)
+        esquema = partes.scheme or 'http'
+        host = partes.hostname or ''
+        porta = partes.port or (443 if esquema == 'https' else 80)
+        caminho = partes.path or '/'
+        query = partes.query
+        if params:
+            query = f"{query}&{urlencode(params)}" if query else urlencode(params)
+        alvo = f"{caminho}?{query}" if query else caminho
+        endpoint = f"{host}{caminho}"
+
+        limitador = self.limitadores.get(host)
+        if limitador:
+            espera = await limitador.adquirir()
+            if espera:
+                with self._lock_stats:
+                    self.estatisticas['esperas_limite'] += 1
+                    self.estatisticas['tempo_espera_limite_ms'] += espera * 1000
+
+        corpo = b''
+        extras = dict(cabecalhos or {})
+        if json_corpo is not None:
+            corpo = json.dumps(json_corpo).encode('utf-8')
+            extras.setdefault('Content-Type', 'application/json')
+
+        inicio = time.perf_counter()
+        try:
+            resposta = await asyncio.wait_for(
+                self._executar(esquema, host, porta, metodo.upper(), alvo, corpo, extras),
+                timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._registrar(host, endpoint, (time.perf_counter() - inicio) * 1000, None, None)
+            raise ErroHTTP(f"Timeout em {metodo.upper()} {url}")
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ssl.SSLError) as e:
+            self._registrar(host, endpoint, (time.perf_counter() - inicio) * 1000, None, None)
+            raise ErroHTTP(f"Falha em {metodo.upper()} {url}: {e}")
+        status, cabecalhos_resp, dados = resposta
+        latencia = (time.perf_counter() - inicio) * 1000
+        self._registrar(host, endpoint, latencia, status, cabecalhos_resp)
+        resposta = RespostaHTTP(status, cabecalhos_resp, dados, url, latencia)
+        for ouvinte in self._ouvintes_resposta:
+            try:
+                ouvinte(metodo.upper(), url, params, resposta)
+            except Exception as e:
+                logger.debug(f"Erro em ouvinte de resposta HTTP: {e}")
+        return resposta
+
+    async def get_json(self, url: str, params: Optional[Mapping[str, Any]] = None,
+                       timeout: Optional[float] = None) -> Any:
+        """GET que exige 2xx e devolve o JSON"""
+        resposta = await self.requisitar('GET', url, params=params, timeout=timeout)
+        resposta.raise_for_status()
+        return resposta.json()
+
+    async def em_lote(self, pedidos: Iterable[Mapping[str, Any]]) -> List[Any]:
+        """
+        Dispara todas as requisições juntas
+
+        Args:
+            pedidos: Dicionários com os argumentos de requisitar() (metodo padrão GET)
+
+        Returns:
+            Uma RespostaHTTP ou a exceção de cada pedido, na mesma ordem
+        """
+        tarefas = [self.requisitar(p.get('metodo', 'GET'), p['url'], params=p.get('params'),
+                                   json_corpo=p.get('json_corpo'), timeout=p.get('timeout'))
+                   for p in pedidos]
+        return await asyncio.gather(*tarefas, return_exceptions=True)
+
+    async def fechar(self):
+        for pool in self._pools.values():
+            while pool.ociosas:
+                pool.ociosas.popleft().fechar()
+        self._pools.clear()
+
+    # ------------------------------------------------------------------
+    # Conexões
+    # ------------------------------------------------------------------
+    def _pool(self, esquema: str, host: str, porta: int) -> _PoolHost:
+        chave = (esquema, host, porta)
+        pool = self._pools.get(chave)
+        if pool is None:
+            pool = self._pools[chave] = _PoolHost(esquema, host, porta, self.max_conexoes)
+        return pool
+
+    async def _abrir(self, pool: _PoolHost) -> _Conexao:
+        contexto = None
+        if pool.esquema == 'https':
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            contexto = self._ssl
+        leitor, escritor = await asyncio.open_connection(pool.host, pool.porta, ssl=contexto,
+                                                         server_hostname=pool.host if contexto else None,
+                                                         limit=MAX_CABECALHO)
+        with self._lock_stats:
+            self.estatisticas['conexoes_abertas'] += 1
+        return _Conexao(leitor, escritor)
+
+    async def _executar(self, esquema: str, host: str, porta: int, metodo: str, alvo: str,
+                        corpo: bytes, extras: Mapping[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        pool = self._pool(esquema, host, porta)
+        async with pool.semaforo:
+            conexao = None
+            while pool.ociosas and conexao is None:
+                candidata = pool.ociosas.pop()
+                if candidata.utilizavel(self.max_ocioso):
+                    conexao = candidata
+                else:
+                    candidata.fechar()
+            reutilizada = conexao is not None
+            if conexao is None:
+                conexao = await self._abrir(pool)
+            try:
+                try:
+                    resultado = await self._trocar(conexao, pool, metodo, alvo, corpo, extras)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not reutilizada:
+                        raise
+                    # O servidor fechou a conexão ociosa: tenta uma vez numa conexão nova
+                    conexao.fechar()
+                    conexao = await self._abrir(pool)
+                    resultado = await self._trocar(conexao, pool, metodo, alvo, corpo, extras)
+            except BaseException:
+                conexao.fechar()
+                raise
+            status, cabecalhos, dados, manter = resultado
+            if manter:
+                conexao.livre_desde = time.monotonic()
+                pool.ociosas.append(conexao)
+            else:
+                conexao.fechar()
+            if reutilizada:
+                with self._lock_stats:
+                    self.estatisticas['conexoes_reutilizadas'] += 1
+            return status, cabecalhos, dados
+
+    async def _trocar(self, conexao: _Conexao, pool: _PoolHost, metodo: str, alvo: str, corpo: bytes,
+                      extras: Mapping[str, str]) -> Tuple[int, Dict[str, str], bytes, bool]:
+        host = pool.host if pool.porta in (80, 443) else f"{pool.host}:{pool.porta}"
+        cabecalhos = dict(self.cabecalhos)
+        cabecalhos.update(extras)
+        cabecalhos['Host'] = host
+        cabecalhos['Connection'] = 'keep-alive'
+        if corpo or metodo in ('POST', 'PUT', 'PATCH'):
+            cabecalhos['Content-Length'] = str(len(corpo))
+        linhas = [f"{metodo} {alvo} HTTP/1.1"] + [f"{k}: {v}" for k, v in cabecalhos.items()]
+        conexao.escritor.write(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1') + corpo)
+        await conexao.escritor.drain()
+
+        leitor = conexao.leitor
+        bruto = await leitor.readuntil(b'\r\n\r\n')
+        linhas_resp = bruto.decode('latin-1').split('\r\n')
+        versao, status_txt = linhas_resp[0].split(' ', 2)[:2]
+        status = int(status_txt)
+        cabecalhos_resp: Dict[str, str] = {}
+        for linha in linhas_resp[1:]:
+            if ':' in linha:
+                nome, valor = linha.split(':', 1)
+                cabecalhos_resp[nome.strip().lower()] = valor.strip()
+
+        manter = versao == 'HTTP/1.1' and cabecalhos_resp.get('connection', '').lower() != 'close'
+        if metodo == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            dados = b''
+        elif cabecalhos_resp.get('transfer-encoding', '').lower() == 'chunked':
+            pedacos = []
+            while True:
+                tamanho = int((await leitor.readline()).split(b';')[0].strip(), 16)
+                if tamanho == 0:
+                    while (await leitor.readline()) not in (b'\r\n', b''):
+                        pass
+                    break
+                pedacos.append(await leitor.readexactly(tamanho))
+                await leitor.readexactly(2)
+            dados = b''.join(pedacos)
+        elif 'content-length' in cabecalhos_resp:
+            dados = await leitor.readexactly(int(cabecalhos_resp['content-length']))
+        else:
+            dados = await leitor.read()
+            manter = False
+        if cabecalhos_resp.get('content-encoding', '').lower() == 'gzip':
+            dados = gzip.decompress(dados)
+        return status, cabecalhos_resp, dados, manter
+
+    # ------------------------------------------------------------------
+    # Estatísticas
+    # ------------------------------------------------------------------
+    def ao_responder(self, ouvinte: Callable[[str, Optional[int], float, Optional[Mapping[str, str]]], None]):
+        """Registra ouvinte(host, status ou None em falha de rede, latencia_ms, cabeçalhos)"""
+        self._ouvintes.append(ouvinte)
+
+    def ao_receber_resposta(self, ouvinte: Callable[[str, str, Optional[Mapping[str, Any]], RespostaHTTP], None]):
+        """Registra ouvinte(metodo, url, params, resposta) chamado a cada resposta recebida (qualquer status)"""
+        self._ouvintes_resposta.append(ouvinte)
+
+    def _registrar(self, host: str, endpoint: str, latencia_ms: float, status: Optional[int],
+                   cabecalhos: Optional[Mapping[str, str]]):
+        erro = status is None or status >= 400
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(host, status, latencia_ms, cabecalhos)
+            except Exception as e:
+                logger.debug(f"Erro em ouvinte HTTP: {e}")
+        with self._lock_stats:
+            self.estatisticas['requisicoes'] += 1
+            if erro:
+                self.estatisticas['erros'] += 1
+            stats = self._latencias.get(endpoint)
+            if stats is None:
+                stats = self._latencias[endpoint] = {'requisicoes': 0, 'erros': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                     'amostras': deque(maxlen=AMOSTRAS_LATENCIA)}
+            stats['requisicoes'] += 1
+            stats['erros'] += int(erro)
+            stats['total_ms'] += latencia_ms
+            stats['max_ms'] = max(stats['max_ms'], latencia_ms)
+            stats['amostras'].append(latencia_ms)
+
+    def obter_latencias(self) -> Dict[str, Dict[str, float]]:
+        """{endpoint: requisicoes, erros, media_ms, p50_ms, p95_ms, max_ms}"""
+        with self._lock_stats:
+            copia = {e: (dict(s), sorted(s['amostras'])) for e, s in self._latencias.items()}
+        resultado = {}
+        for endpoint, (stats, amostras) in copia.items():
+            resultado[endpoint] = {
+                'requisicoes': stats['requisicoes'],
+                'erros': stats['erros'],
+                'media_ms': stats['total_ms'] / stats['requisicoes'],
+                'p50_ms': amostras[len(amostras) // 2],
+                'p95_ms': amostras[min(len(amostras) - 1, int(len(amostras) * 0.95))],
+                'max_ms': stats['max_ms'],
+            }
+        return resultado
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        with self._lock_stats:
+            stats = dict(self.estatisticas)
+        stats['conexoes_ociosas'] = sum(len(p.ociosas) for p in self._pools.values())
+        return stats
+
+
+class ClienteHTTP:
+    """Fachada síncrona: o cliente assíncrono roda num event loop em thread própria"""
+
+    def __init__(self, **kwargs):
+        """
+        Inicializa o loop de fundo e o cliente
+
+        Args:
+            **kwargs: Repassados ao ClienteHTTPAssincrono
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cliente-http", daemon=True)
+        self._thread.start()
+        self.assincrono: ClienteHTTPAssincrono = self.executar(self._criar(kwargs))
+
+    @staticmethod
+    async def _criar(kwargs) -> ClienteHTTPAssincrono:
+        # Criado dentro do loop: semáforos e conexões pertencem a ele
+        return ClienteHTTPAssincrono(**kwargs)
+
+    def executar(self, coro, timeout: Optional[float] = None):
+        """Roda uma corrotina no loop de fundo e espera o resultado"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def requisitar(self, metodo: str, url: str, **kwargs) -> RespostaHTTP:
+        return self.executar(self.assincrono.requisitar(metodo, url, **kwargs))
+
+    def get(self, url: str, params: Optional[Mapping[str, Any]] = None, timeout: Optional[float] = None) -> RespostaHTTP:
+        return self.requisitar('GET', url, params=params, timeout=timeout)
+
+    def post(self, url: str, json_corpo: Any = None, timeout: Optional[float] = None) -> RespostaHTTP:
+        return self.requisitar('POST', url, json_corpo=json_corpo, timeout=timeout)
+
+    def get_json(self, url: str, params: Optional[Mapping[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        return self.executar(self.assincrono.get_json(url, params=params, timeout=timeout))
+
+    def em_lote(self, pedidos: Iterable[Mapping[str, Any]]) -> List[Any]:
+        """Dispara os pedidos juntos e devolve respostas/exceções na mesma ordem"""
+        return self.executar(self.assincrono.em_lote(list(pedidos)))
+
+    def obter_latencias(self) -> Dict[str, Dict[str, float]]:
+        return self.assincrono.obter_latencias()
+
+    def ao_responder(self, ouvinte: Callable[[str, Optional[int], float, Optional[Mapping[str, str]]], None]):
+        self.assincrono.ao_responder(ouvinte)
+
+    def ao_receber_resposta(self, ouvinte: Callable[[str, str, Optional[Mapping[str, Any]], RespostaHTTP], None]):
+        self.assincrono.ao_receber_resposta(ouvinte)
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        return self.assincrono.obter_estatisticas()
+
+    def fechar(self):
+        """Fecha as conexões ociosas e para o loop"""
+        if not self._loop.is_running():
+            return
+        try:
+            self.executar(self.assincrono.fechar(), timeout=5)
+        except Exception as e:
+            logger.debug(f"Erro ao fechar conexões HTTP: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_cliente: Optional[ClienteHTTP] = None
+_lock_cliente = threading.Lock()
+
+
+def obter_cliente_http() -> ClienteHTTP:
+    """Cliente HTTP do processo (limites e pool compartilhados por todos os coletores)"""
+    global _cliente
+    if _cliente is None:
+        with _lock_cliente:
+            if _cliente is None:
+                try:
+                    import config
+                    cfg = (config.load_config() or {}).get('coleta', {}).get('http', {}) or {}
+                except Exception:
+                    cfg = {}
+                _cliente = ClienteHTTP(limites=cfg.get('limites'),
+                                       max_conexoes_por_host=cfg.get('max_conexoes_por_host', 8),
+                                       timeout=cfg.get('timeout_segundos', 10),
+                                       max_ocioso_segundos=cfg.get('max_ocioso_segundos', 30))
+    return _cliente
@@ -5,7 +5,37 @@ from datetime import datetime
 from loguru import logger
 import config
 import random
+from datetime import timedelta
 from ia.coletor import obter_dados_order_book
+from cliente_http import ErroHTTP, obter_cliente_http
+from snapshot_mercado import ServicoSnapshotMercado
+from cache_klines import GerenciadorKlines
+from cache_features import obter_cache_features
+from indicadores_streaming import GerenciadorIndicadores
+from indicadores_lote import calcular_lote, matrizes_de_klines, resumo_lote
+from registro_features import declarar_consumidor
+
+# Tendência dos klines: cruzamento das médias de 5 e 20 candles com ±0,5%, como o coletor sempre calculou
+TENDENCIA_KLINES = {'metodo_tendencia': 'medias', 'tendencia_curta': 5, 'tendencia_longa': 20, 'limiar_tendencia': 0.005}
+
+VENCIMENTOS_WIN = {
+    2: 'G',   # Fevereiro
+    4: 'J',   # Abril
+    6: 'M',   # Junho
+    8: 'Q',   # Agosto
+    10: 'V',  # Outubro
+    12: 'Z',  # Dezembro
+}
+
+def _mes_contrato_win(data):
+    """(ano, mês) de vencimento do contrato vigente na data"""
+    for m in sorted(VENCIMENTOS_WIN.keys()):
+        if data.month <= m:
+            return data.year, m
+    return data.year + 1, 2
+
+def _codigo_win(ano, mes):
+    return f"WIN{VENCIMENTOS_WIN[mes]}{str(ano)[-2:]}"
 
 # Função para identificar o contrato vigente do mini-índice WIN
 # Exemplo: WINQ25 para agosto/2025
@@ -13,46 +43,77 @@ from ia.coletor import obter_dados_order_book
 def get_win_contract_code(data=None):
     if data is None:
         data = datetime.now()
-    ano = data.year
-    mes = data.month
-    vencimentos = {
-        2: 'G',   # Fevereiro
-        4: 'J',   # Abril
-        6: 'M',   # Junho
-        8: 'Q',   # Agosto
-        10: 'V',  # Outubro
-        12: 'Z',  # Dezembro
-    }
-    meses_ordenados = sorted(vencimentos.keys())
-    for m in meses_ordenados:
-        if mes <= m:
-            letra = vencimentos[m]
-            break
-    else:
-        ano += 1
-        letra = vencimentos[2]
-    return f"WIN{letra}{str(ano)[-2:]}"
+    return _codigo_win(*_mes_contrato_win(data))
+
+def fim_contrato_win(data=None):
+    """Instante em que get_win_contract_code passa para o próximo contrato (1º dia após o mês de vencimento)"""
+    if data is None:
+        data = datetime.now()
+    ano, mes = _mes_contrato_win(data)
+    return datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+
+def contratos_win_candidatos(data=None, quantidade=6):
+    """Contrato vigente, o seguinte e os anteriores, em ordem de preferência"""
+    if data is None:
+        data = datetime.now()
+    ano, mes = _mes_contrato_win(data)
+    seguinte = (ano + 1, 2) if mes == 12 else (ano, mes + 2)
+    candidatos = [(ano, mes), seguinte]
+    while len(candidatos) < quantidade:
+        ano, mes = (ano - 1, 12) if mes == 2 else (ano, mes - 2)
+        candidatos.append((ano, mes))
+    return [_codigo_win(a, m) for a, m in candidatos[:quantidade]]
 
 class Coletor:
-    def __init__(self):
+    def __init__(self, http=None):
+        """
+        Args:
+            http: Cliente HTTP (padrão: o cliente compartilhado do processo)
+        """
         self.config = config.load_config()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # Cliente assíncrono compartilhado: pool keep-alive e limite de taxa da B3
+        self.http = http if http is not None else obter_cliente_http()
+        self.base_url_b3 = "https://cotacao.b3.com.br/mds/api/v1/instrumentQuotation"
+        cfg_b3 = (self.config or {}).get('coleta', {}).get('b3', {}) or {}
+        self.timeout_b3 = cfg_b3.get('timeout_segundos', 10)
+        self.contratos_candidatos = cfg_b3.get('contratos_candidatos', 6)
+        self.cache_negativo = timedelta(seconds=cfg_b3.get('cache_negativo_segundos', 60))
+        # Contrato WIN que respondeu, válido até o próximo vencimento; contratos sem cotação, por pouco tempo
+        self._contrato_win = None
+        self._contrato_win_ate = None
+        self._win_indisponiveis = {}
+        self.estatisticas_win = {'sondagens': 0, 'acertos_cache': 0, 'cache_negativo': 0}
+    
+    def _agora(self):
+        """Data de referência do contrato vigente (a reprodução de gravações usa o relógio da gravação)"""
+        return datetime.now()
         
     def coletar_dados_b3(self, simbolo="IBOV"):
         """
         Coleta dados da API oficial da B3
         """
+        return self.coletar_lote_b3([simbolo]).get(simbolo)
+    
+    def coletar_lote_b3(self, simbolos):
+        """
+        Coleta vários símbolos da B3 com as requisições em paralelo
+        
+        Returns:
+            {simbolo: dados ou None}
+        """
+        logger.info(f"Coletando dados da B3 para {', '.join(simbolos)}")
+        respostas = self.http.em_lote({'url': f"{self.base_url_b3}/{simbolo}", 'timeout': self.timeout_b3}
+                                      for simbolo in simbolos)
+        return {simbolo: self._interpretar_b3(simbolo, resposta) for simbolo, resposta in zip(simbolos, respostas)}
+    
+    def _interpretar_b3(self, simbolo, resposta):
+        """Converte a resposta da B3 (ou a exceção da requisição) nos dados do símbolo"""
         try:
-            url = f"https://cotacao.b3.com.br/mds/api/v1/instrumentQuotation/{simbolo}"
-            logger.info(f"Coletando dados da B3 para {simbolo}")
+            if isinstance(resposta, Exception):
+                raise resposta
+            resposta.raise_for_status()
             
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            dados = response.json()
+            dados = resposta.json()
             
             if dados.get('BizSts', {}).get('cd') == 'OK':
                 trad = dados.get('Trad', [])
@@ -76,7 +137,7 @@ class Coletor:
                 logger.warning(f"Erro na API da B3 para {simbolo}: {dados.get('BizSts', {}).get('desc', 'Erro desconhecido')}")
                 return None
                 
-        except requests.exceptions.RequestException as e:
+        except ErroHTTP as e:
             logger.error(f"Erro ao coletar dados da B3 para {simbolo}: {e}")
             return None
         except json.JSONDecodeError as e:
@@ -86,36 +147,80 @@ class Coletor:
             logger.error(f"Erro inesperado ao coletar dados da B3 para {simbolo}: {e}")
             return None
     
+    def _contratos_win(self, agora):
+        """
+        Contratos WIN a pedir neste ciclo
+
+        Returns:
+            [contrato em cache] enquanto válido; senão os candidatos sem resultado negativo recente
+        """
+        if self._contrato_win and agora < self._contrato_win_ate:
+            self.estatisticas_win['acertos_cache'] += 1
+            return [self._contrato_win]
+        self._contrato_win = None
+        candidatos = []
+        for contrato in contratos_win_candidatos(agora, self.contratos_candidatos):
+            if self._win_indisponiveis.get(contrato, agora) > agora:
+                self.estatisticas_win['cache_negativo'] += 1
+            else:
+                candidatos.append(contrato)
+        if candidatos:
+            self.estatisticas_win['sondagens'] += 1
+        return candidatos
+
+    def _resolver_win(self, agora, contratos, lote):
+        """Primeiro contrato com cotação (ordem de preferência) vira o cache até o próximo vencimento"""
+        for contrato in contratos:
+            if lote.get(contrato):
+                if contrato != self._contrato_win:
+                    self._contrato_win = contrato
+                    self._contrato_win_ate = fim_contrato_win(agora)
+                    logger.info(f"📌 Contrato WIN {contrato} em uso até {self._contrato_win_ate:%d/%m/%Y}")
+                self._win_indisponiveis.pop(contrato, None)
+                return contrato, lote[contrato]
+            self._win_indisponiveis[contrato] = agora + self.cache_negativo
+        # Contrato em cache sem resposta: a próxima rodada sonda os candidatos de novo
+        self._contrato_win = None
+        return None, None
+
+    def coletar_simbolos(self, simbolos):
+        """
+        Coleta os símbolos pedidos num único lote
+        'WIN' representa o contrato vigente do mini-índice: o contrato que respondeu fica em cache até o
+        próximo vencimento e, sem cache, os candidatos são sondados juntos no mesmo lote (uma rodada de
+        requisições por chamada: no pior caso um timeout)
+        
+        Returns:
+            {simbolo pedido: dados ou None}
+        """
+        agora = self._agora()
+        outros = [simbolo for simbolo in simbolos if simbolo != 'WIN']
+        contratos = self._contratos_win(agora) if 'WIN' in simbolos else []
+        pedidos = list(dict.fromkeys(outros + contratos))
+        lote = self.coletar_lote_b3(pedidos) if pedidos else {}
+        resultado = {simbolo: lote.get(simbolo) for simbolo in outros}
+        
+        if 'WIN' in simbolos:
+            contrato, dados = self._resolver_win(agora, contratos, lote)
+            resultado['WIN'] = dados
+            if dados:
+                origem = "" if contrato == get_win_contract_code(agora) else " (fallback)"
+                logger.info(f"Dados coletados da B3 para {contrato}{origem}: {dados['preco_atual']}")
+            else:
+                logger.warning(f"⚠️ Nenhum contrato WIN com cotação ({', '.join(contratos) or 'candidatos em cache negativo'})")
+        return {simbolo: resultado[simbolo] for simbolo in simbolos}
+    
     def coletar_dados(self):
         """
         Coleta dados APENAS da API oficial da B3
         Retorna None se não conseguir dados reais
         """
-        dados_coletados = []
-        
-        # Coleta IBOV
-        dados_b3 = self.coletar_dados_b3("IBOV")
-        if dados_b3:
-            dados_coletados.append(dados_b3)
-            logger.info(f"Dados coletados da B3: {dados_b3['preco_atual']}")
+        # IBOV e contrato vigente do WIN no mesmo lote
+        lote = self.coletar_simbolos(["IBOV", "WIN"])
         
-        # Coleta contrato vigente do WIN
-        contrato_vigente = get_win_contract_code()
-        dados_win = self.coletar_dados_b3(contrato_vigente)
-        if dados_win:
-            dados_coletados.append(dados_win)
-            logger.info(f"Dados coletados da B3 para {contrato_vigente}: {dados_win['preco_atual']}")
-        else:
-            # Fallback para outros contratos WIN (caso o vigente não esteja disponível)
-            simbolos_fallback = ["WINZ25", "WINV25", "WINQ25", "WINM25", "WINJ25", "WING25"]
-            for simbolo in simbolos_fallback:
-                if simbolo == contrato_vigente:
-                    continue
-                dados_fallback = self.coletar_dados_b3(simbolo)
-                if dados_fallback:
-                    dados_coletados.append(dados_fallback)
-                    logger.info(f"Dados coletados da B3 para {simbolo} (fallback): {dados_fallback['preco_atual']}")
-                    break
+        if lote["IBOV"]:
+            logger.info(f"Dados coletados da B3: {lote['IBOV']['preco_atual']}")
+        dados_coletados = [dados for dados in lote.values() if dados]
         
         # Se não conseguiu dados reais da B3, retorna None
         if not dados_coletados:
@@ -149,46 +254,109 @@ class Coletor:
 class ColetorBybit:
     """Coletor específico para dados da Bybit"""
     
-    def __init__(self):
+    def __init__(self, base_url=None, http=None):
+        """
+        Args:
+            base_url: API REST (padrão: exchange.base_url; servidor_bybit_local.py para testes de carga)
+            http: Cliente HTTP (padrão: o cliente compartilhado do processo)
+        """
         self.config = config.load_config()
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-        self.base_url = "https://api.bybit.com"
+        self._base_url = base_url or (self.config.get('exchange', {}) or {}).get('base_url') or "https://api.bybit.com"
+        # Pedidos por símbolo (fallback do snapshot) saem juntos pelo cliente assíncrono
+        self.http = http if http is not None else obter_cliente_http()
+        self.stream = None
+        self.max_idade_stream = (self.config.get('coleta', {}).get('stream', {}) or {}).get('preco_max_idade_segundos', 10)
+        # Um GET de todos os tickers por ciclo, compartilhado por preço, coleta e PnL
+        self.snapshot = ServicoSnapshotMercado(self.session, self.base_url)
+        # Histórico de candles baixado uma vez e atualizado só com os candles novos
+        cfg_klines = self.config.get('coleta', {}).get('klines', {}) or {}
+        self.klines = GerenciadorKlines(self.session, self.base_url)
+        self.intervalo_klines = str(cfg_klines.get('intervalo', '1'))
+        self.janela_klines = cfg_klines.get('janela', 100)
+        # Indicadores atualizados só com os candles confirmados novos de cada cache
+        declarar_consumidor('coletor', ('rsi', 'volatilidade', 'tendencia'))
+        self.indicadores = GerenciadorIndicadores(**TENDENCIA_KLINES)
+        # Mesmo vetor para todos os consumidores até chegar candle novo
+        self.features = obter_cache_features()
         
+    @property
+    def base_url(self):
+        return self._base_url
+    
+    @base_url.setter
+    def base_url(self, url):
+        """Troca a API REST do coletor, do snapshot e dos klines juntos"""
+        self._base_url = url
+        self.snapshot.base_url = url
+        self.klines.base_url = url
+    
+    def anexar_stream(self, stream):
+        """Usa o stream WebSocket (StreamBybit) como fonte de preço; REST fica como fallback"""
+        self.stream = stream
+        self.snapshot.stream = stream
+        self.klines.anexar_stream(stream)
+    
+    def obter_snapshot(self, max_idade=None):
+        """Snapshot imutável {símbolo: ticker} do ciclo atual (ver snapshot_mercado.py)"""
+        return self.snapshot.obter(max_idade)
+    
     def obter_preco_atual(self, symbol="BTCUSDT"):
         """Obtém o preço atual de um símbolo na Bybit"""
-        try:
-            url = f"{self.base_url}/v5/market/tickers"
-            params = {"category": "spot", "symbol": symbol}
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            dados = response.json()
-            
-            if dados.get('retCode') == 0 and dados.get('result', {}).get('list'):
-                ticker = dados['result']['list'][0]
-                return float(ticker.get('lastPrice', 0))
-            else:
-                logger.warning(f"Erro na API da Bybit para {symbol}: {dados.get('retMsg', 'Erro desconhecido')}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Erro ao obter preço da Bybit para {symbol}: {e}")
-            return None
+        if self.stream:
+            preco = self.stream.preco_atual(symbol, self.max_idade_stream)
+            if preco:
+                return preco
+        snapshot = self.snapshot.obter()
+        if snapshot and snapshot.preco(symbol):
+            return snapshot.preco(symbol)
+        ticker = self.coletar_lote_bybit([symbol]).get(symbol)
+        return ticker['preco_atual'] if ticker else None
+    
+    def _ticker_local(self, symbol):
+        """Ticker do stream ou do snapshot do ciclo, sem requisição própria (None se nenhum cobrir)"""
+        if self.stream:
+            ticker = self.stream.ultimo_ticker(symbol, self.max_idade_stream)
+            if ticker and ticker.get('preco_atual'):
+                ticker['timestamp'] = datetime.now().isoformat()
+                return ticker
+        snapshot = self.snapshot.obter()
+        if snapshot and snapshot.preco(symbol):
+            ticker = dict(snapshot.ticker(symbol))
+            ticker['timestamp'] = datetime.now().isoformat()
+            return ticker
+        return None
     
     def coletar_dados_bybit(self, symbol="BTCUSDT"):
         """Coleta dados completos de um símbolo na Bybit"""
+        ticker = self._ticker_local(symbol)
+        if ticker:
+            return ticker
+        return self.coletar_lote_bybit([symbol]).get(symbol)
+    
+    def coletar_lote_bybit(self, simbolos):
+        """
+        Busca /v5/market/tickers de vários símbolos com as requisições em paralelo
+        
+        Returns:
+            {symbol: dados ou None}
+        """
+        url = f"{self.base_url}/v5/market/tickers"
+        respostas = self.http.em_lote({'url': url, 'params': {"category": "spot", "symbol": symbol}, 'timeout': 10}
+                                      for symbol in simbolos)
+        return {symbol: self._interpretar_ticker(symbol, resposta) for symbol, resposta in zip(simbolos, respostas)}
+    
+    def _interpretar_ticker(self, symbol, resposta):
+        """Converte a resposta de /v5/market/tickers (ou a exceção da requisição) no formato do coletor"""
         try:
-            url = f"{self.base_url}/v5/market/tickers"
-            params = {"category": "spot", "symbol": symbol}
-            
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            if isinstance(resposta, Exception):
+                raise resposta
+            resposta.raise_for_status()
             
-            dados = response.json()
+            dados = resposta.json()
             
             if dados.get('retCode') == 0 and dados.get('result', {}).get('list'):
                 ticker = dados['result']['list'][0]
@@ -217,8 +385,14 @@ class ColetorBybit:
         pares = self.config.get('trading', {}).get('pares', ['BTCUSDT', 'ETHUSDT'])
         dados_coletados = []
         
+        # Stream/snapshot primeiro; os pares que faltarem vão à API todos juntos
+        por_par = {par: self._ticker_local(par) for par in pares}
+        faltando = [par for par, dados in por_par.items() if not dados]
+        if faltando:
+            por_par.update(self.coletar_lote_bybit(faltando))
+        
         for par in pares:
-            dados = self.coletar_dados_bybit(par)
+            dados = por_par.get(par)
             if dados:
                 dados_coletados.append(dados)
                 logger.info(f"Dados coletados da Bybit para {par}: {dados['preco_atual']}")
@@ -245,95 +419,61 @@ class ColetorBybit:
             logger.error(f"❌ Erro na API da Bybit: {e}")
             return False
 
-    def obter_dados_rest(self, symbol, *args, **kwargs):
-        """Obtém dados de mercado do par solicitado via Bybit (REST) com dados simulados mais realistas"""
+    def obter_dados_rest(self, symbol, intervalo=None, *args, **kwargs):
+        """Obtém dados de mercado do par a partir do cache incremental de klines (REST /v5/market/kline)"""
         try:
-            # Obter preço atual real
-            preco_atual = self.obter_preco_atual(symbol)
-            if not preco_atual:
+            intervalo = str(intervalo or self.intervalo_klines)
+            cache = self.klines.obter(symbol, intervalo)
+            if cache is None or len(cache) < 2:
+                logger.warning(f"Sem histórico de klines para {symbol}/{intervalo}")
                 return None
             
-            # Simular dados históricos mais realistas
-            import pandas as pd
-            from datetime import datetime, timedelta
-            import random
-            
-            # Gerar dados históricos simulados com variação realista
-            dados_historicos = []
-            preco_base = preco_atual
-            
-            for i in range(100):  # 100 períodos de dados
-                # Variação de preço realista (±2% por período)
-                variacao = random.uniform(-0.02, 0.02)
-                preco = preco_base * (1 + variacao)
-                
-                # Simular volume
-                volume = random.uniform(1000, 10000)
-                
-                # Timestamp
-                timestamp = datetime.now() - timedelta(minutes=100-i)
-                
-                dados_historicos.append({
-                    'timestamp': timestamp,
-                    'open': preco * random.uniform(0.995, 1.005),
-                    'high': preco * random.uniform(1.001, 1.02),
-                    'low': preco * random.uniform(0.98, 0.999),
-                    'close': preco,
-                    'volume': volume
-                })
-                
-                preco_base = preco
-            
-            # Converter para DataFrame
-            df = pd.DataFrame(dados_historicos)
-            
-            # Calcular RSI realista
-            delta = df['close'].diff().astype(float)
-            gain = delta.copy()
-            gain[gain < 0] = 0
-            gain = gain.rolling(window=14).mean()
-            loss = delta.copy()
-            loss[loss > 0] = 0
-            loss = (-loss).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            rsi_atual = float(rsi.iloc[-1])
-            
-            # Calcular volatilidade realista
-            returns = df['close'].pct_change()
-            volatilidade = returns.rolling(window=20).std()
-            volatilidade_atual = float(volatilidade.iloc[-1])
-            
-            # Determinar tendência realista
-            media_curta = df['close'].tail(5).mean()
-            media_longa = df['close'].tail(20).mean()
-            
-            if media_curta > media_longa * 1.005:
-                tendencia = 'alta'
-            elif media_curta < media_longa * 0.995:
-                tendencia = 'baixa'
-            else:
-                tendencia = 'lateral'
+            janela = cache.janela(self.janela_klines)
+            indicadores = self.features.de_klines(cache, self.indicadores)
+            preco_atual = self.obter_preco_atual(symbol) or float(janela['close'][-1])
+            abertura = float(janela['open'][-1])
             
             return {
                 'symbol': symbol,
                 'preco_atual': preco_atual,
-                'preco_abertura': float(df['open'].iloc[-1]),
-                'preco_minimo': float(df['low'].iloc[-1]),
-                'preco_maximo': float(df['high'].iloc[-1]),
-                'volume': float(df['volume'].iloc[-1]),
-                'variacao': ((preco_atual - float(df['open'].iloc[-1])) / float(df['open'].iloc[-1])) * 100,
-                'rsi': rsi_atual,
-                'volatilidade': volatilidade_atual,
-                'tendencia': tendencia,
+                'preco_abertura': abertura,
+                'preco_minimo': float(janela['low'][-1]),
+                'preco_maximo': float(janela['high'][-1]),
+                'volume': float(janela['volume'][-1]),
+                'variacao': ((preco_atual - abertura) / abertura) * 100 if abertura else 0.0,
+                'rsi': indicadores['rsi'],
+                'volatilidade': indicadores['volatilidade'],
+                'tendencia': indicadores['tendencia'],
+                'versao_features': indicadores.versao,
                 'timestamp': datetime.now().isoformat(),
-                'fonte': 'Bybit_API_Simulada',
-                'dados_historicos': df  # DataFrame completo para cálculos
+                'fonte': 'Bybit_API',
+                'dados_historicos': janela  # colunas NumPy (ts_ms, open, high, low, close, volume, turnover)
             }
             
         except Exception as e:
             logger.error(f"Erro ao obter dados rest para {symbol}: {e}")
             return None
+    
+    def obter_indicadores_lote(self, simbolos, intervalo=None):
+        """
+        Indicadores de muitos pares de uma vez (triagem): klines buscados juntos e
+        calculados numa matriz símbolos × candles em uma passada vetorizada
+        
+        Returns:
+            {symbol: indicadores do último candle} (pares sem klines ficam de fora)
+        """
+        try:
+            intervalo = str(intervalo or self.intervalo_klines)
+            caches = self.klines.obter_varios(list(simbolos), intervalo, http=self.http)
+            if not caches:
+                return {}
+            matrizes = matrizes_de_klines(list(caches.values()), self.janela_klines)
+            lote = calcular_lote(matrizes['close'], matrizes['high'], matrizes['low'], matrizes['volume'],
+                                 matrizes['mascara'], **TENDENCIA_KLINES)
+            return resumo_lote(lote, matrizes['close'], list(caches))
+        except Exception as e:
+            logger.error(f"Erro ao calcular indicadores em lote: {e}")
+            return {}
 
 def coletar_dados_mercado(par: str) -> dict:
     # Exemplo de coleta real (substitua pelos dados reais do seu sistema)
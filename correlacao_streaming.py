@@ -0,0 +1,342 @@
+"""
+Correlação e covariância entre os pares, atualizadas a cada barra fechada
+
+Guarda médias, variâncias e covariâncias com peso exponencial (EWMA) dos
+retornos logarítmicos de N símbolos. Cada período fechado é um vetor de
+retornos r e a atualização é feita em O(N²) com NumPy, sem janelas:
+
+    d = r - média
+    média += α·d
+    cov = (1 - α)·(cov + α·d·dᵀ)
+
+a mesma recursão de pandas ewm(alpha=α, adjust=False).cov(bias=True).
+Símbolo sem barra no período fica de fora da atualização (só os pares em
+que os dois têm retorno são atualizados) e o retorno seguinte cobre os
+períodos que faltaram.
+
+As barras vêm dos eventos ao_fechar do AgregadorBarras e, na partida ou sem
+stream, dos caches de klines. Um período só é aplicado quando chega barra de
+um período posterior (ou em fechar_ate), para juntar os símbolos que fecham
+em instantes diferentes. Filtros, aprendizado e prompt leem a correlação,
+o beta contra o BTC e os grupos de pares correlacionados.
+"""
+
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from barras_tempo import duracao_timeframe_ms
+
+
+class MatrizCorrelacao:
+    """Médias, variâncias e covariâncias EWMA dos retornos de N símbolos"""
+
+    def __init__(self, simbolos: Optional[Iterable[str]] = None, meia_vida_barras: Optional[float] = None,
+                 timeframe: Optional[str] = None, referencia: Optional[str] = None,
+                 limiar_cluster: Optional[float] = None, min_barras: Optional[int] = None):
+        """
+        Inicializa a matriz (símbolos novos entram quando chega a primeira barra)
+
+        Args:
+            simbolos: Símbolos já conhecidos (padrão: trading.pares)
+            meia_vida_barras: Barras para o peso de um retorno cair à metade
+            timeframe: Timeframe das barras aceitas ('1m')
+            referencia: Símbolo do beta e da correlação de referência (BTCUSDT)
+            limiar_cluster: |ρ| a partir do qual dois pares ficam no mesmo grupo
+            min_barras: Barras em comum antes de o par ter correlação
+        """
+        try:
+            import config
+            cfg = config.load_config() or {}
+        except Exception:
+            cfg = {}
+        cfg_corr = cfg.get('correlacao', {}) or {}
+        self.meia_vida = meia_vida_barras or cfg_corr.get('meia_vida_barras', 60)
+        self.alfa = 1.0 - 0.5 ** (1.0 / self.meia_vida)
+        self.timeframe = timeframe or cfg_corr.get('timeframe', '1m')
+        self.duracao_ms = duracao_timeframe_ms(self.timeframe)
+        self.referencia = referencia or cfg_corr.get('referencia', 'BTCUSDT')
+        self.limiar_cluster = limiar_cluster if limiar_cluster is not None else cfg_corr.get('limiar_cluster', 0.7)
+        self.min_barras = min_barras if min_barras is not None else cfg_corr.get('min_barras', 30)
+
+        self.simbolos: List[str] = []
+        self._indices: Dict[str, int] = {}
+        self._media = np.zeros(0)
+        self._cov = np.zeros((0, 0))
+        self._n = np.zeros((0, 0), dtype=np.int64)  # retornos em comum por par
+        self._ultimo_fechamento = np.zeros(0)
+        self._pendentes: Dict[int, Dict[str, float]] = {}  # início do período -> {símbolo: fechamento}
+        self.ultimo_inicio: Optional[int] = None
+        self.revisao = 0  # sobe a cada período aplicado
+        self._correlacao: Optional[Tuple[int, np.ndarray]] = None
+        self._lock = threading.RLock()
+        self.estatisticas = {
+            'barras': 0,
+            'barras_atrasadas': 0,
+            'periodos': 0,
+            'tempo_atualizacao_ms': 0.0,
+        }
+        for simbolo in simbolos if simbolos is not None else (cfg.get('trading', {}) or {}).get('pares', []):
+            self._indice(simbolo.replace('/', ''))
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+    def _indice(self, simbolo: str) -> int:
+        i = self._indices.get(simbolo)
+        if i is None:
+            i = self._indices[simbolo] = len(self.simbolos)
+            self.simbolos.append(simbolo)
+            self._media = np.append(self._media, 0.0)
+            self._ultimo_fechamento = np.append(self._ultimo_fechamento, 0.0)
+            self._cov = np.pad(self._cov, ((0, 1), (0, 1)))
+            self._n = np.pad(self._n, ((0, 1), (0, 1)))
+        return i
+
+    def anexar_barras(self, agregador):
+        """Alimenta a matriz com as barras do timeframe fechadas pelo AgregadorBarras"""
+        if self.timeframe not in agregador.timeframes:
+            raise ValueError(f"Timeframe {self.timeframe} não montado pelo agregador ({', '.join(agregador.timeframes)})")
+        agregador.ao_fechar(self._barra_fechada)
+
+    def _barra_fechada(self, evento: Dict[str, Any]):
+        if evento['timeframe'] == self.timeframe:
+            self.adicionar_barra(evento['symbol'], evento['inicio_ms'], evento['close'])
+
+    def adicionar_barra(self, simbolo: str, inicio_ms: int, fechamento: float) -> int:
+        """
+        Registra o fechamento de uma barra; aplica os períodos anteriores ainda pendentes
+
+        Returns:
+            Períodos aplicados
+        """
+        with self._lock:
+            self.estatisticas['barras'] += 1
+            if self.ultimo_inicio is not None and inicio_ms <= self.ultimo_inicio:
+                self.estatisticas['barras_atrasadas'] += 1
+                return 0
+            self._pendentes.setdefault(inicio_ms, {})[simbolo] = fechamento
+            return self._aplicar_pendentes(inicio_ms - 1)
+
+    def fechar_ate(self, inicio_ms: Optional[int] = None) -> int:
+        """Aplica os períodos pendentes que começam até inicio_ms (padrão: todos)"""
+        with self._lock:
+            return self._aplicar_pendentes(inicio_ms if inicio_ms is not None else max(self._pendentes, default=0))
+
+    def alimentar_klines(self, caches: Iterable) -> int:
+        """
+        Alimenta a matriz com os candles fechados dos caches de klines (partida ou coleta sem stream)
+
+        O último candle de cada cache fica de fora (pode estar em formação);
+        candles já cobertos pelas barras recebidas são ignorados. Aplica até o
+        último candle comum a todos os caches; o resto fica pendente.
+
+        Returns:
+            Períodos aplicados
+        """
+        fim = None
+        with self._lock:
+            for cache in caches:
+                if cache is None or len(cache) < 2 or cache.duracao_ms != self.duracao_ms:
+                    continue
+                janela = cache.janela()
+                inicios, fechamentos = janela['ts_ms'][:-1], janela['close'][:-1]
+                if self.ultimo_inicio is not None:
+                    novos = inicios > self.ultimo_inicio
+                    inicios, fechamentos = inicios[novos], fechamentos[novos]
+                for inicio, fechamento in zip(inicios.tolist(), fechamentos.tolist()):
+                    self._pendentes.setdefault(inicio, {})[cache.simbolo] = fechamento
+                if len(inicios):
+                    fim = int(inicios[-1]) if fim is None else min(fim, int(inicios[-1]))
+            return self._aplicar_pendentes(fim) if fim is not None else 0
+
+    def _aplicar_pendentes(self, ate_ms: int) -> int:
+        aplicados = 0
+        for inicio in sorted(self._pendentes):
+            if inicio > ate_ms:
+                break
+            self._aplicar(inicio, self._pendentes.pop(inicio))
+            aplicados += 1
+        return aplicados
+
+    def _aplicar(self, inicio_ms: int, fechamentos: Dict[str, float]):
+        comeco = time.perf_counter()
+        indices = [self._indice(simbolo) for simbolo in fechamentos]
+        novos = np.fromiter(fechamentos.values(), dtype=np.float64, count=len(indices))
+        indices = np.array(indices, dtype=np.intp)
+        anteriores = self._ultimo_fechamento[indices]
+        validos = (anteriores > 0) & (novos > 0)
+        self._ultimo_fechamento[indices[novos > 0]] = novos[novos > 0]
+        self.ultimo_inicio = inicio_ms
+        if validos.any():
+            retornos = np.zeros(len(self.simbolos))
+            presentes = np.zeros(len(self.simbolos), dtype=bool)
+            retornos[indices[validos]] = np.log(novos[validos] / anteriores[validos])
+            presentes[indices[validos]] = True
+            self.atualizar(retornos, presentes)
+        self.estatisticas['periodos'] += 1
+        self.estatisticas['tempo_atualizacao_ms'] += (time.perf_counter() - comeco) * 1000
+
+    def atualizar(self, retornos: np.ndarray, presentes: Optional[np.ndarray] = None):
+        """
+        Atualização EWMA com um vetor de retornos na ordem de self.simbolos, O(N²)
+
+        Args:
+            retornos: Retorno de cada símbolo no período
+            presentes: Máscara dos símbolos com retorno (padrão: todos)
+        """
+        with self._lock:
+            alfa = self.alfa
+            if presentes is None or presentes.all():
+                primeiros = np.diagonal(self._n) == 0
+                self._media[primeiros] = retornos[primeiros]
+                desvio = retornos - self._media
+                self._media += alfa * desvio
+                self._cov += alfa * np.outer(desvio, desvio)
+                self._cov *= 1.0 - alfa
+                self._n += 1
+            else:
+                primeiros = presentes & (np.diagonal(self._n) == 0)
+                self._media[primeiros] = retornos[primeiros]
+                desvio = np.where(presentes, retornos - self._media, 0.0)
+                self._media += alfa * desvio
+                pares = np.outer(presentes, presentes)
+                self._cov = np.where(pares, (1.0 - alfa) * (self._cov + alfa * np.outer(desvio, desvio)), self._cov)
+                self._n += pares
+            self.revisao += 1
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def covariancia(self) -> Tuple[List[str], np.ndarray]:
+        """(símbolos, covariância dos retornos); NaN nos pares com menos de min_barras em comum"""
+        with self._lock:
+            cov = np.where(self._n >= self.min_barras, self._cov, np.nan)
+            return list(self.simbolos), cov
+
+    def correlacao(self) -> Tuple[List[str], np.ndarray]:
+        """(símbolos, matriz de correlação); NaN nos pares sem barras suficientes ou sem variância"""
+        with self._lock:
+            return list(self.simbolos), self._matriz_correlacao().copy()
+
+    def _matriz_correlacao(self) -> np.ndarray:
+        """Correlação da revisão atual, calculada uma vez por revisão (não alterar)"""
+        with self._lock:
+            if self._correlacao is None or self._correlacao[0] != self.revisao:
+                desvios = np.sqrt(np.diagonal(self._cov))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    corr = self._cov / np.outer(desvios, desvios)
+                corr = np.where((self._n >= self.min_barras) & np.isfinite(corr), np.clip(corr, -1.0, 1.0), np.nan)
+                self._correlacao = (self.revisao, corr)
+            return self._correlacao[1]
+
+    def correlacao_entre(self, a: str, b: str) -> Optional[float]:
+        """Correlação entre dois símbolos (None se ainda não há barras suficientes)"""
+        with self._lock:
+            if a not in self._indices or b not in self._indices:
+                return None
+            valor = self._matriz_correlacao()[self._indices[a], self._indices[b]]
+            return None if math.isnan(valor) else float(valor)
+
+    def beta(self, simbolo: str, referencia: Optional[str] = None) -> Optional[float]:
+        """Beta do símbolo contra a referência: cov(s, ref) / var(ref)"""
+        referencia = referencia or self.referencia
+        with self._lock:
+            if simbolo not in self._indices or referencia not in self._indices:
+                return None
+            i, j = self._indices[simbolo], self._indices[referencia]
+            if self._n[i, j] < self.min_barras or self._cov[j, j] <= 0:
+                return None
+            return float(self._cov[i, j] / self._cov[j, j])
+
+    def correlacionados(self, simbolo: str, limiar: Optional[float] = None) -> Dict[str, float]:
+        """Outros símbolos com |ρ| ≥ limiar contra o símbolo, com o ρ de cada um"""
+        limiar = self.limiar_cluster if limiar is None else limiar
+        with self._lock:
+            if simbolo not in self._indices:
+                return {}
+            linha = self._matriz_correlacao()[self._indices[simbolo]]
+            return {outro: float(rho) for outro, rho in zip(self.simbolos, linha)
+                    if outro != simbolo and not math.isnan(rho) and abs(rho) >= limiar}
+
+    def agrupar(self, simbolos: Optional[Iterable[str]] = None, limiar: Optional[float] = None) -> List[List[str]]:
+        """
+        Grupos de pares correlacionados (componentes ligadas por ρ ≥ limiar)
+
+        Args:
+            simbolos: Símbolos a agrupar (padrão: todos); desconhecidos ficam sozinhos
+            limiar: ρ mínimo para ligar dois pares (padrão: limiar_cluster)
+
+        Returns:
+            Grupos ordenados, cada um com os símbolos em ordem alfabética
+        """
+        limiar = self.limiar_cluster if limiar is None else limiar
+        with self._lock:
+            corr = self._matriz_correlacao()
+            simbolos = sorted(set(self.simbolos if simbolos is None else simbolos))
+            indices = [self._indices.get(s) for s in simbolos]
+        ligados = np.zeros((len(simbolos), len(simbolos)), dtype=bool)
+        conhecidos = [k for k, i in enumerate(indices) if i is not None]
+        if conhecidos:
+            sub = corr[np.ix_([indices[k] for k in conhecidos], [indices[k] for k in conhecidos])]
+            ligados[np.ix_(conhecidos, conhecidos)] = np.nan_to_num(sub, nan=-1.0) >= limiar
+        grupos, visitados = [], set()
+        for inicio in range(len(simbolos)):
+            if inicio in visitados:
+                continue
+            grupo, fila = [], [inicio]
+            visitados.add(inicio)
+            while fila:
+                k = fila.pop()
+                grupo.append(simbolos[k])
+                for vizinho in np.flatnonzero(ligados[k]).tolist():
+                    if vizinho not in visitados:
+                        visitados.add(vizinho)
+                        fila.append(vizinho)
+            grupos.append(sorted(grupo))
+        return sorted(grupos)
+
+    def grupo(self, simbolo: str) -> List[str]:
+        """Grupo de pares correlacionados do símbolo (inclui o próprio)"""
+        return next(g for g in self.agrupar() + [[simbolo]] if simbolo in g)
+
+    def resumo(self, simbolo: str) -> Dict[str, Any]:
+        """Correlação e beta contra a referência, grupo e pares correlacionados (para dados_mercado)"""
+        with self._lock:
+            i = self._indices.get(simbolo)
+            return {
+                'referencia': self.referencia,
+                'correlacao_referencia': self.correlacao_entre(simbolo, self.referencia),
+                'beta_referencia': self.beta(simbolo),
+                'grupo': self.grupo(simbolo),
+                'correlacionados': self.correlacionados(simbolo),
+                'barras': int(self._n[i, i]) if i is not None else 0,
+            }
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Barras recebidas, períodos aplicados e custo médio por período"""
+        with self._lock:
+            stats = dict(self.estatisticas)
+            stats['simbolos'] = len(self.simbolos)
+            stats['periodos_pendentes'] = len(self._pendentes)
+            stats['grupos'] = len(self.agrupar())
+        stats['tempo_medio_atualizacao_us'] = (stats['tempo_atualizacao_ms'] * 1000 / stats['periodos']
+                                               if stats['periodos'] else 0.0)
+        return stats
+
+
+_matriz: Optional[MatrizCorrelacao] = None
+_lock_matriz = threading.Lock()
+
+
+def obter_matriz_correlacao() -> MatrizCorrelacao:
+    """Matriz compartilhada do processo"""
+    global _matriz
+    with _lock_matriz:
+        if _matriz is None:
+            _matriz = MatrizCorrelacao()
+            logger.debug(f"🔗 Matriz de correlação criada ({_matriz.timeframe}, meia-vida {_matriz.meia_vida} barras)")
+        return _matriz
@@ -0,0 +1,89 @@
+"""
+Leitura dos agregados incrementais (migração 6)
+
+Triggers mantêm estatisticas_ordens, estatisticas_decisoes e contagens na mesma
+transação das escritas; aqui cada leitura é uma busca pela chave primária.
+Períodos: granularidade 'total' (periodo ''), 'dia' (YYYY-MM-DD) e 'semana'
+(data da segunda-feira), sempre em hora local; symbol '*' = todos os símbolos.
+"""
+
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+
+def periodo(granularidade: str, referencia: Optional[date] = None) -> str:
+    """Chave de período usada pelos triggers ('' para o total)"""
+    if granularidade == 'total':
+        return ''
+    dia = referencia or datetime.now().date()
+    if isinstance(dia, datetime):
+        dia = dia.date()
+    if granularidade == 'semana':
+        dia = dia - timedelta(days=dia.weekday())
+    return dia.isoformat()
+
+
+def _chave(granularidade: str, referencia: Optional[date]) -> Tuple[str, str]:
+    return granularidade, periodo(granularidade, referencia)
+
+
+def obter_estatisticas_ordens(conn: sqlite3.Connection, origem: str = 'dinamicas', granularidade: str = 'total',
+                              symbol: str = '*', referencia: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Agregado das ordens fechadas
+
+    Args:
+        conn: Conexão de leitura
+        origem: 'dinamicas' (ordens_dinamicas) ou 'simuladas' (ordens_simuladas)
+        granularidade: 'total', 'dia' ou 'semana'
+        symbol: Símbolo ou '*' para todos
+        referencia: Dia de referência (padrão: hoje)
+
+    Returns:
+        total, wins, losses, neutras, pnl_total, tempo_medio_segundos, win_rate
+    """
+    linha = conn.execute(
+        "SELECT total, wins, losses, neutras, pnl_total, duracao_total_s, duracoes FROM estatisticas_ordens "
+        "WHERE origem = ? AND granularidade = ? AND periodo = ? AND symbol = ?",
+        (origem, *_chave(granularidade, referencia), symbol)
+    ).fetchone()
+    total, wins, losses, neutras, pnl_total, duracao_total, duracoes = linha or (0, 0, 0, 0, 0.0, 0.0, 0)
+    return {
+        'total': total,
+        'wins': wins,
+        'losses': losses,
+        'neutras': neutras,
+        'pnl_total': pnl_total,
+        'tempo_medio_segundos': (duracao_total / duracoes) if duracoes else 0,
+        'win_rate': (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0.0,
+    }
+
+
+def obter_estatisticas_decisoes(conn: sqlite3.Connection, granularidade: str = 'total', symbol: str = '*',
+                                referencia: Optional[date] = None) -> Dict[str, Any]:
+    """Agregado das decisões da IA: total, comprar, vender, aguardar, acertos, taxa_acerto (%)"""
+    linha = conn.execute(
+        "SELECT total, comprar, vender, aguardar, acertos FROM estatisticas_decisoes "
+        "WHERE granularidade = ? AND periodo = ? AND symbol = ?",
+        (*_chave(granularidade, referencia), symbol)
+    ).fetchone()
+    total, comprar, vender, aguardar, acertos = linha or (0, 0, 0, 0, 0)
+    return {
+        'total': total,
+        'comprar': comprar,
+        'vender': vender,
+        'aguardar': aguardar,
+        'acertos': acertos,
+        'taxa_acerto': (acertos / total * 100) if total > 0 else 0,
+    }
+
+
+def contar_linhas(conn: sqlite3.Connection, tabela: str, granularidade: str = 'total',
+                  referencia: Optional[date] = None) -> int:
+    """Linhas da tabela (total atual) ou inseridas no dia/semana"""
+    linha = conn.execute(
+        "SELECT linhas FROM contagens WHERE tabela = ? AND granularidade = ? AND periodo = ?",
+        (tabela, *_chave(granularidade, referencia))
+    ).fetchone()
+    return linha[0] if linha else 0
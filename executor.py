@@ -8,8 +8,9 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from loguru import logger
-import sqlite3
 import os
+from banco_dados import obter_banco, agora_ms
+from estatisticas import obter_estatisticas_ordens
 
 class ExecutorOrdensSimuladas:
     def __init__(self, db_path: str = "dados/trading.db"):
@@ -20,64 +21,8 @@ class ExecutorOrdensSimuladas:
             db_path: Caminho para banco de dados
         """
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
         self.ordens_ativas: Dict[str, Dict[str, Any]] = {}  # {ordem_id: {dados_ordem}}
-        self.criar_tabelas()
-        
-    def criar_tabelas(self):
-        """Cria tabelas necessárias para execução simulada"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Verificar se a tabela existe e tem a coluna razao_fechamento
-        c.execute("PRAGMA table_info(ordens_simuladas)")
-        colunas = [col[1] for col in c.fetchall()]
-        
-        if 'razao_fechamento' not in colunas:
-            # Recriar tabela com a nova coluna
-            c.execute('DROP TABLE IF EXISTS ordens_simuladas')
-            logger.info("Recriando tabela ordens_simuladas com coluna razao_fechamento")
-        
-        # Tabela de ordens simuladas
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS ordens_simuladas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id TEXT UNIQUE,
-            timestamp DATETIME NOT NULL,
-            tipo TEXT NOT NULL,
-            simbolo TEXT NOT NULL,
-            quantidade INTEGER NOT NULL,
-            preco_entrada DECIMAL(10,2) NOT NULL,
-            preco_alvo DECIMAL(10,2) NOT NULL,
-            preco_stop DECIMAL(10,2) NOT NULL,
-            status TEXT NOT NULL,
-            resultado TEXT,
-            lucro_percentual DECIMAL(5,2),
-            duracao_segundos INTEGER,
-            confianca_ia DECIMAL(5,2),
-            dados_analise TEXT,
-            timestamp_fechamento DATETIME,
-            razao_fechamento TEXT
-        )
-        ''')
-        
-        # Tabela de aprendizado da IA
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS aprendizado_ia (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME NOT NULL,
-            padrao_entrada TEXT,
-            decisao_ia TEXT,
-            confianca_ia DECIMAL(5,2),
-            resultado_ordem TEXT,
-            lucro_percentual DECIMAL(5,2),
-            acerto BOOLEAN,
-            dados_mercado TEXT
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logger.info("Tabelas de execução simulada criadas")
     
     def executar_ordem_simulada(self, decisao: Dict[str, Any], dados_mercado: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -255,9 +200,7 @@ class ExecutorOrdensSimuladas:
     def salvar_ordem_simulada(self, ordem: Dict[str, Any]) -> bool:
         """Salva ordem simulada no banco"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            self.banco.executar('''
             INSERT INTO ordens_simuladas 
             (timestamp, ordem_id, tipo, simbolo, quantidade, preco_entrada, 
              preco_alvo, preco_stop, status, confianca_ia, dados_analise)
@@ -275,8 +218,6 @@ class ExecutorOrdensSimuladas:
                 ordem['confianca_ia'],
                 ordem['dados_analise']
             ))
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar ordem simulada: {e}")
@@ -285,12 +226,10 @@ class ExecutorOrdensSimuladas:
     def fechar_ordem_simulada(self, ordem_id: str, resultado: str, lucro_percentual: float, duracao: float, razao_fechamento: str = "") -> bool:
         """Fecha ordem simulada no banco"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            self.banco.executar('''
             UPDATE ordens_simuladas 
             SET status = ?, resultado = ?, lucro_percentual = ?, 
-                duracao_segundos = ?, timestamp_fechamento = ?, razao_fechamento = ?
+                duracao_segundos = ?, timestamp_fechamento = ?, fechamento_ms = ?, razao_fechamento = ?
             WHERE ordem_id = ?
             ''', (
                 'fechada',
@@ -298,11 +237,10 @@ class ExecutorOrdensSimuladas:
                 lucro_percentual,
                 duracao,
                 datetime.now(),
+                agora_ms(),
                 razao_fechamento,
                 ordem_id
             ))
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"Erro ao fechar ordem simulada: {e}")
@@ -342,9 +280,7 @@ class ExecutorOrdensSimuladas:
                 'acerto': acerto
             }
             
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
+            self.banco.executar('''
             INSERT INTO aprendizado_ia 
             (timestamp, padrao_entrada, decisao_ia, confianca_ia, resultado_ordem, 
              lucro_percentual, acerto, dados_mercado)
@@ -359,8 +295,6 @@ class ExecutorOrdensSimuladas:
                 acerto,
                 json.dumps(dados_mercado)
             ))
-            conn.commit()
-            conn.close()
             
             logger.info(f"📚 Aprendizado registrado: {ordem['tipo']} | "
                        f"Confiança: {ordem['confianca_ia']:.2f} | "
@@ -374,48 +308,36 @@ class ExecutorOrdensSimuladas:
     def obter_estatisticas_aprendizado(self) -> Dict[str, Any]:
         """Obtém estatísticas de aprendizado da IA"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Total de ordens
-            c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "fechada"')
-            total_ordens = c.fetchone()[0]
-            
-            # Wins e losses
-            c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "fechada" AND resultado = "win"')
-            wins = c.fetchone()[0]
-            
-            c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "fechada" AND resultado = "loss"')
-            losses = c.fetchone()[0]
-            
-            # Lucro total
-            c.execute('SELECT SUM(lucro_percentual) FROM ordens_simuladas WHERE status = "fechada"')
-            lucro_total = c.fetchone()[0] or 0.0
-            
-            # Taxa de acerto por confiança
-            c.execute('''
-            SELECT 
-                CASE 
-                    WHEN confianca_ia >= 0.8 THEN 'Alta (>=0.8)'
-                    WHEN confianca_ia >= 0.7 THEN 'Média (0.7-0.8)'
-                    ELSE 'Baixa (<0.7)'
-                END as nivel_confianca,
-                COUNT(*) as total,
-                SUM(CASE WHEN resultado = 'win' THEN 1 ELSE 0 END) as wins,
-                AVG(lucro_percentual) as lucro_medio
-            FROM ordens_simuladas 
-            WHERE status = 'fechada'
-            GROUP BY nivel_confianca
-            ''')
-            performance_confianca = {}
-            for row in c.fetchall():
-                performance_confianca[row[0]] = {
-                    'total': row[1],
-                    'wins': row[2],
-                    'lucro_medio': row[3] or 0.0
-                }
-            
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
+            
+                # Totais do agregado mantido por trigger
+                fechadas = obter_estatisticas_ordens(conn, 'simuladas')
+                total_ordens, wins, losses = fechadas['total'], fechadas['wins'], fechadas['losses']
+                lucro_total = fechadas['pnl_total']
+            
+                # Taxa de acerto por confiança
+                c.execute('''
+                SELECT 
+                    CASE 
+                        WHEN confianca_ia >= 0.8 THEN 'Alta (>=0.8)'
+                        WHEN confianca_ia >= 0.7 THEN 'Média (0.7-0.8)'
+                        ELSE 'Baixa (<0.7)'
+                    END as nivel_confianca,
+                    COUNT(*) as total,
+                    SUM(CASE WHEN resultado = 'win' THEN 1 ELSE 0 END) as wins,
+                    AVG(lucro_percentual) as lucro_medio
+                FROM ordens_simuladas 
+                WHERE status = 'fechada'
+                GROUP BY nivel_confianca
+                ''')
+                performance_confianca = {}
+                for row in c.fetchall():
+                    performance_confianca[row[0]] = {
+                        'total': row[1],
+                        'wins': row[2],
+                        'lucro_medio': row[3] or 0.0
+                    }
             
             return {
                 'total_ordens': total_ordens,
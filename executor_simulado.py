@@ -9,7 +9,8 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 from loguru import logger
-import sqlite3
+from banco_dados import obter_banco
+from estatisticas import obter_estatisticas_ordens
 import os
 import random
 from gestor_ordens_dinamico import GestorOrdensDinamico, TipoOrdem
@@ -20,6 +21,7 @@ class ExecutorSimulado:
     def __init__(self, config: Dict[str, Any], db_path: str = "dados/trading.db"):
         self.config = config
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
         self.capital_atual = config['simulacao']['capital_inicial']
         self.gestor_ordens = GestorOrdensDinamico(db_path)
         self.ordens_ativas: Dict[str, Dict[str, Any]] = {}  # order_id -> info
@@ -34,13 +36,8 @@ class ExecutorSimulado:
             'win_rate': 0.0,
             'profit_factor': 0.0
         }
-        self._criar_tabelas()
         logger.info(f"🎮 Executor Simulado REALISTA inicializado com capital: ${self.capital_atual:.2f}")
 
-    def _criar_tabelas(self):
-        # Já criado pelo gestor_ordens_dinamico
-        pass
-
     def enviar_ordem_market(self, symbol, side, qty, dados_mercado=None, confianca=None):
         """
         Simula envio de ordem market: abre ordem dinâmica e monitora até fechar por stop/take
@@ -93,11 +90,8 @@ class ExecutorSimulado:
         """
         Simula um tick de mercado: atualiza preço e verifica fechamento de ordens
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         # Buscar ordens abertas
-        cursor.execute("SELECT order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss_atual, take_profit_atual, status FROM ordens_dinamicas WHERE status = 'aberta'")
-        ordens = cursor.fetchall()
+        ordens = self.banco.consultar("SELECT order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss_atual, take_profit_atual, status FROM ordens_dinamicas WHERE status = 'aberta'")
         for ordem in ordens:
             order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss, take_profit, status = ordem
             preco_atual = self._simular_preco_tick(symbol)
@@ -116,7 +110,6 @@ class ExecutorSimulado:
                 elif preco_atual <= take_profit:
                     self.gestor_ordens.fechar_ordem_dinamica(order_id, preco_atual, 'take_profit', {'preco_atual': preco_atual})
                     logger.info(f"🟢 Ordem {order_id} FECHADA por TAKE PROFIT @ {preco_atual:.2f}")
-        conn.close()
 
     def _simular_preco_execucao(self, symbol: str, side: str) -> float:
         precos_base = {'BTCUSDT': 117000.0, 'ETHUSDT': 3100.0}
@@ -133,22 +126,13 @@ class ExecutorSimulado:
 
     def obter_estatisticas_ordens_simuladas(self):
         """Obtém estatísticas detalhadas das ordens simuladas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT lucro_prejuizo FROM ordens_dinamicas WHERE status = 'fechada'")
-        resultados = cursor.fetchall()
-        conn.close()
-        total = len(resultados)
-        wins = sum(1 for (lucro,) in resultados if lucro is not None and lucro > 0)
-        losses = sum(1 for (lucro,) in resultados if lucro is not None and lucro < 0)
-        neutras = sum(1 for (lucro,) in resultados if lucro is not None and lucro == 0)
-        pnl_total = sum(lucro for (lucro,) in resultados if lucro is not None)
-        win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0.0
+        with self.banco.conexao_leitura() as conn:
+            stats = obter_estatisticas_ordens(conn, 'dinamicas')
         return {
-            'total': total,
-            'wins': wins,
-            'losses': losses,
-            'neutras': neutras,
-            'win_rate': win_rate,
-            'pnl_total': pnl_total
+            'total': stats['total'],
+            'wins': stats['wins'],
+            'losses': stats['losses'],
+            'neutras': stats['neutras'],
+            'win_rate': stats['win_rate'],
+            'pnl_total': stats['pnl_total']
         } 
\ No newline at end of file
@@ -10,7 +10,13 @@ import threading
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List, Tuple
 from loguru import logger
-import sqlite3
+import numpy as np
+from banco_dados import obter_banco, agora_ms
+from estatisticas import contar_linhas, obter_estatisticas_ordens
+from cache_features import obter_cache_features
+from indicadores_streaming import GerenciadorIndicadores
+from registro_features import declarar_consumidor
+from volatilidade_streaming import GerenciadorVolatilidade, obter_gerenciador_volatilidade
 from dataclasses import dataclass
 from enum import Enum
 
@@ -50,7 +56,8 @@ class ConfiguracaoOrdem:
 
 class GestorOrdensDinamico:
     """Gestor de ordens onde a IA tem controle total sobre saídas"""
-    def __init__(self, db_path: str = "dados/trading.db", risco_maximo_permitido: float = 3.0, decisor_ia=None, sistema_aprendizado=None):
+    def __init__(self, db_path: str = "dados/trading.db", risco_maximo_permitido: float = 3.0, decisor_ia=None, sistema_aprendizado=None, stream=None,
+                 snapshot_mercado=None, barras=None, volatilidade: Optional[GerenciadorVolatilidade] = None):
         """
         Inicializa gestor de ordens dinâmico
         Args:
@@ -58,14 +65,27 @@ class GestorOrdensDinamico:
             risco_maximo_permitido: Valor máximo de risco permitido por ordem (USDT)
             decisor_ia: Instância do DecisorIA para aprendizado
             sistema_aprendizado: Instância do SistemaAprendizado para aprendizado detalhado
+            stream: StreamBybit com os ticks em tempo real (None = mercado simulado)
+            snapshot_mercado: ServicoSnapshotMercado com os tickers do ciclo
+            barras: AgregadorBarras com as barras multi-timeframe montadas dos ticks
+            volatilidade: Modelos EWMA/GARCH por símbolo (padrão: os do processo)
         """
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
         self.ordens_ativas: Dict[str, Dict[str, Any]] = {}
         self.thread_monitoramento = None
         self.monitoramento_ativo = False
         self.risco_maximo_permitido = risco_maximo_permitido
         self.decisor_ia = decisor_ia
         self.sistema_aprendizado = sistema_aprendizado
+        self.stream = stream
+        self.snapshot_mercado = snapshot_mercado
+        self.barras = barras
+        self.volatilidade = volatilidade or obter_gerenciador_volatilidade()
+        # Motores próprios para os buffers do stream, só com o que stops e saídas leem
+        self.indicadores = GerenciadorIndicadores(
+            features=declarar_consumidor('gestor_ordens_dinamico', ('rsi', 'volatilidade', 'tendencia')))
+        self.features = obter_cache_features()
         # Configurações dinâmicas
         self.config_dinamica = {
             'stop_loss_percentual_alvo': 0.5,  # 50% do alvo
@@ -73,83 +93,8 @@ class GestorOrdensDinamico:
             'ajuste_stop_loss_intervalo': 10,  # Ajustar a cada 10 segundos
             'saida_inteligente_intervalo': 5,  # Verificar saída a cada 5 segundos
         }
-        self._criar_tabelas_gestao()
         logger.info("🎯 Gestor de Ordens Dinâmico inicializado")
     
-    def _criar_tabelas_gestao(self):
-        """Cria tabelas para gestão dinâmica de ordens"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Tabela de ordens dinâmicas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ordens_dinamicas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id TEXT UNIQUE NOT NULL,
-                    symbol TEXT NOT NULL,
-                    tipo_ordem TEXT NOT NULL,
-                    preco_entrada REAL NOT NULL,
-                    quantidade REAL NOT NULL,
-                    stop_loss_inicial REAL,
-                    take_profit_inicial REAL,
-                    stop_loss_atual REAL,
-                    take_profit_atual REAL,
-                    status TEXT NOT NULL,
-                    timestamp_abertura DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    timestamp_fechamento DATETIME,
-                    preco_saida REAL,
-                    lucro_prejuizo REAL,
-                    tempo_aberta_segundos INTEGER,
-                    ajustes_stop_loss INTEGER DEFAULT 0,
-                    ajustes_take_profit INTEGER DEFAULT 0,
-                    saida_inteligente_utilizada BOOLEAN DEFAULT FALSE,
-                    razao_saida TEXT,
-                    dados_mercado_saida TEXT,
-                    confianca_ia REAL,
-                    previsoes_ia TEXT,
-                    cenarios_ia TEXT,
-                    justificativa_ia TEXT
-                )
-            """)
-            
-            # Tabela de ajustes dinâmicos
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ajustes_dinamicos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id TEXT NOT NULL,
-                    tipo_ajuste TEXT NOT NULL,
-                    valor_anterior REAL NOT NULL,
-                    valor_novo REAL NOT NULL,
-                    razao_ajuste TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    dados_mercado TEXT
-                )
-            """)
-            
-            # Tabela de aprendizado de saídas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS aprendizado_saidas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id TEXT NOT NULL,
-                    tipo_saida TEXT NOT NULL,
-                    tempo_aberta_segundos INTEGER,
-                    lucro_prejuizo REAL,
-                    confianca_saida REAL,
-                    razao_saida TEXT,
-                    sucesso BOOLEAN,
-                    aprendizado TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
-            conn.close()
-            logger.info("✅ Tabelas de gestão dinâmica criadas")
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao criar tabelas de gestão: {e}")
-    
     def abrir_ordem_dinamica(self, order_id: str, symbol: str, tipo_ordem: TipoOrdem, 
                            preco_entrada: float, quantidade: float, 
                            dados_mercado: Dict[str, Any], confianca_ia: float) -> Dict[str, Any]:
@@ -169,9 +114,11 @@ class GestorOrdensDinamico:
             Configuração da ordem dinâmica
         """
         try:
-            # Calcular stop loss e take profit dinâmicos
+            # Calcular tempo máximo e, com a volatilidade prevista até ele, stop loss e take profit dinâmicos
+            dados_mercado = dict(dados_mercado, symbol=dados_mercado.get('symbol') or symbol)
+            tempo_maximo = self._calcular_tempo_maximo(confianca_ia, dados_mercado)
             stop_loss, take_profit = self._calcular_stop_take_dinamico(
-                tipo_ordem, preco_entrada, dados_mercado, confianca_ia
+                tipo_ordem, preco_entrada, dados_mercado, confianca_ia, tempo_maximo
             )
             
             # Configuração da ordem
@@ -180,7 +127,7 @@ class GestorOrdensDinamico:
                 take_profit_inicial=take_profit,
                 stop_loss_atual=stop_loss,
                 take_profit_atual=take_profit,
-                tempo_maximo_segundos=self._calcular_tempo_maximo(confianca_ia, dados_mercado),
+                tempo_maximo_segundos=tempo_maximo,
                 saida_inteligente_ativada=True
             )
             
@@ -228,19 +175,39 @@ class GestorOrdensDinamico:
             logger.error(f"❌ Erro ao abrir ordem dinâmica: {e}")
             return {}
     
+    def _previsao_volatilidade(self, dados_mercado: Dict[str, Any],
+                               horizonte_segundos: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Volatilidade realizada/prevista do símbolo (None sem modelo aquecido)"""
+        symbol = dados_mercado.get('symbol')
+        if not self.volatilidade or not symbol:
+            return None
+        return self.volatilidade.previsao(symbol, horizonte_segundos)
+    
     def _calcular_stop_take_dinamico(self, tipo_ordem: TipoOrdem, preco_entrada: float,
-                                   dados_mercado: Dict[str, Any], confianca_ia: float) -> Tuple[float, float]:
-        """Calcula stop loss e take profit dinâmicos baseado na volatilidade"""
-        volatilidade = dados_mercado.get('volatilidade', 0.2)
+                                   dados_mercado: Dict[str, Any], confianca_ia: float,
+                                   tempo_maximo: Optional[int] = None) -> Tuple[float, float]:
+        """
+        Calcula stop loss e take profit dinâmicos baseado na volatilidade
+        
+        Com o modelo GARCH do símbolo aquecido, a volatilidade é a prevista até o
+        tempo máximo da ordem; sem ele, a dos indicadores.
+        """
+        previsao = self._previsao_volatilidade(dados_mercado, tempo_maximo)
+        if previsao and previsao['prevista_horizonte'] > 0:
+            volatilidade = previsao['prevista_horizonte']
+        else:
+            volatilidade = dados_mercado.get('volatilidade', 0.2)
         N = 0.005  # multiplicador do alvo - EXTREMAMENTE REDUZIDO para alvos curtos ($4-$13)
         M = 0.003  # multiplicador do stop - EXTREMAMENTE REDUZIDO para stops curtos ($3-$7)
+        alvo = N * volatilidade * preco_entrada
+        protecao = M * volatilidade * preco_entrada
         
         if tipo_ordem == TipoOrdem.COMPRA:
-            take_profit = preco_entrada + (N * volatilidade * preco_entrada)
-            stop_loss = preco_entrada - (M * volatilidade * preco_entrada)
+            take_profit = preco_entrada + alvo
+            stop_loss = preco_entrada - protecao
         else:
-            take_profit = preco_entrada - (N * volatilidade * preco_entrada)
-            stop_loss = preco_entrada + (M * volatilidade * preco_entrada)
+            take_profit = preco_entrada - alvo
+            stop_loss = preco_entrada + protecao
         
         return stop_loss, take_profit
     
@@ -256,12 +223,19 @@ class GestorOrdensDinamico:
         elif confianca_ia < 0.5:
             tempo_base = 600  # 10 minutos - mais conservador
         
-        # Ajustar baseado na volatilidade
-        volatilidade = dados_mercado.get('volatilidade', 0.02)
-        if volatilidade > 0.03:
-            tempo_base = int(tempo_base * 0.7)  # Menos tempo em alta volatilidade
-        elif volatilidade < 0.01:
-            tempo_base = int(tempo_base * 1.3)  # Mais tempo em baixa volatilidade
+        # Ajustar baseado na volatilidade: prevista (GARCH) contra a de longo prazo do símbolo
+        previsao = self._previsao_volatilidade(dados_mercado, tempo_base)
+        if previsao:
+            if previsao['regime'] > 1.3:
+                tempo_base = int(tempo_base * 0.7)  # Menos tempo em alta volatilidade
+            elif previsao['regime'] < 0.77:
+                tempo_base = int(tempo_base * 1.3)  # Mais tempo em baixa volatilidade
+        else:
+            volatilidade = dados_mercado.get('volatilidade', 0.02)
+            if volatilidade > 0.03:
+                tempo_base = int(tempo_base * 0.7)  # Menos tempo em alta volatilidade
+            elif volatilidade < 0.01:
+                tempo_base = int(tempo_base * 1.3)  # Mais tempo em baixa volatilidade
         
         return max(60, min(1800, tempo_base))  # Entre 1 min e 30 min
     
@@ -613,13 +587,15 @@ class GestorOrdensDinamico:
         """Thread de monitoramento das ordens ativas"""
         while self.monitoramento_ativo:
             try:
+                # Um snapshot de tickers por volta, compartilhado por todas as ordens
+                snapshot = self.snapshot_mercado.obter() if self.snapshot_mercado and self.ordens_ativas else None
                 # Processar cada ordem ativa
                 for order_id in list(self.ordens_ativas.keys()):
                     try:
                         ordem = self.ordens_ativas[order_id]
                         # Adicionar order_id à ordem para o processamento
                         ordem['order_id'] = order_id
-                        dados_mercado = self._obter_dados_mercado_simulados(ordem['symbol'])
+                        dados_mercado = self._obter_dados_mercado(ordem['symbol'], snapshot)
                         
                         # Processar ordem e verificar se foi fechada
                         if self._processar_ordem_ativa(ordem, dados_mercado):
@@ -731,20 +707,15 @@ class GestorOrdensDinamico:
                 preco_atual = self.ordens_ativas[order_id]['preco_entrada']
             
             # Buscar ordem no banco
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 UPDATE ordens_dinamicas 
                 SET status = 'fechada', 
                     timestamp_fechamento = ?, 
+                    fechamento_ms = ?,
                     razao_saida = ?,
                     preco_saida = ?
                 WHERE order_id = ?
-            """, (datetime.now(), motivo, preco_atual, order_id))
-            
-            conn.commit()
-            conn.close()
+            """, (datetime.now(), agora_ms(), motivo, preco_atual, order_id))
             
             logger.info(f"✅ Ordem {order_id} fechada por tempo: {motivo}")
             
@@ -754,20 +725,15 @@ class GestorOrdensDinamico:
     def _fechar_ordem_por_stop_loss(self, order_id: str, preco_atual: float, stop_loss_preco: float):
         """Fecha ordem por stop loss"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 UPDATE ordens_dinamicas 
                 SET status = 'fechada', 
                     timestamp_fechamento = ?, 
+                    fechamento_ms = ?,
                     razao_saida = ?,
                     preco_saida = ?
                 WHERE order_id = ?
-            """, (datetime.now(), f"Stop Loss: {preco_atual:.2f} <= {stop_loss_preco:.2f}", preco_atual, order_id))
-            
-            conn.commit()
-            conn.close()
+            """, (datetime.now(), agora_ms(), f"Stop Loss: {preco_atual:.2f} <= {stop_loss_preco:.2f}", preco_atual, order_id))
             
             logger.info(f"🛑 Ordem {order_id} fechada por Stop Loss")
             
@@ -777,20 +743,15 @@ class GestorOrdensDinamico:
     def _fechar_ordem_por_take_profit(self, order_id: str, preco_atual: float, take_profit_preco: float):
         """Fecha ordem por take profit"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 UPDATE ordens_dinamicas 
                 SET status = 'fechada', 
                     timestamp_fechamento = ?, 
+                    fechamento_ms = ?,
                     razao_saida = ?,
                     preco_saida = ?
                 WHERE order_id = ?
-            """, (datetime.now(), f"Take Profit: {preco_atual:.2f} >= {take_profit_preco:.2f}", preco_atual, order_id))
-            
-            conn.commit()
-            conn.close()
+            """, (datetime.now(), agora_ms(), f"Take Profit: {preco_atual:.2f} >= {take_profit_preco:.2f}", preco_atual, order_id))
             
             logger.info(f"🎯 Ordem {order_id} fechada por Take Profit")
             
@@ -806,20 +767,15 @@ class GestorOrdensDinamico:
                 # Usar preço de entrada como aproximação
                 preco_atual = self.ordens_ativas[order_id]['preco_entrada']
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 UPDATE ordens_dinamicas 
                 SET status = 'fechada', 
                     timestamp_fechamento = ?, 
+                    fechamento_ms = ?,
                     razao_saida = ?,
                     preco_saida = ?
                 WHERE order_id = ?
-            """, (datetime.now(), f"IA: {motivo}", preco_atual, order_id))
-            
-            conn.commit()
-            conn.close()
+            """, (datetime.now(), agora_ms(), f"IA: {motivo}", preco_atual, order_id))
             
             logger.info(f"🤖 Ordem {order_id} fechada por decisão da IA: {motivo}")
             
@@ -856,6 +812,43 @@ class GestorOrdensDinamico:
         else:
             return preco_atual <= take_profit
     
+    def _obter_dados_mercado(self, symbol: str, snapshot=None, max_idade: float = 10.0) -> Dict[str, Any]:
+        """Dados de mercado do buffer de ticks do stream ou do snapshot do ciclo; sem nenhum dos dois simula"""
+        if self.stream:
+            preco_atual = self.stream.preco_atual(symbol, max_idade)
+            buffer = self.stream.buffer(symbol)
+            if preco_atual and buffer is not None and len(buffer) > 1:
+                features = self.features.de_buffer(symbol, buffer, self.indicadores)
+                if features['amostras'] >= 20:
+                    # Mesmo vetor para todas as ordens do símbolo até chegar tick novo
+                    return {
+                        'preco_atual': preco_atual,
+                        'rsi': features['rsi'],
+                        'volatilidade': features['volatilidade'],
+                        'tendencia': features['tendencia'],
+                        'versao_features': features.versao,
+                        'multi_timeframe': self.barras.contexto(symbol) if self.barras else {}
+                    }
+                precos = buffer.copia(100)['preco']
+                retornos = np.diff(np.log(precos))
+                variacao = precos[-1] / precos[0] - 1
+                return {
+                    'preco_atual': preco_atual,
+                    'rsi': 50.0,
+                    'volatilidade': float(retornos.std()) if len(retornos) > 1 else 0.0,
+                    'tendencia': 'alta' if variacao > 0.001 else 'baixa' if variacao < -0.001 else 'lateral',
+                    'multi_timeframe': self.barras.contexto(symbol) if self.barras else {}
+                }
+        if snapshot and snapshot.preco(symbol):
+            variacao = (snapshot.ticker(symbol).get('variacao') or 0.0) / 100
+            return {
+                'preco_atual': snapshot.preco(symbol),
+                'rsi': 50.0,
+                'volatilidade': 0.02,
+                'tendencia': 'alta' if variacao > 0.001 else 'baixa' if variacao < -0.001 else 'lateral'
+            }
+        return self._obter_dados_mercado_simulados(symbol)
+    
     def _obter_dados_mercado_simulados(self, symbol=None, ultimo_preco=None) -> Dict[str, Any]:
         """Simula dados de mercado de forma realista: preço varia até 0.1% por ciclo em relação ao último preço."""
         # Buscar último preço de ordem aberta se não informado
@@ -883,28 +876,22 @@ class GestorOrdensDinamico:
         """Salva ordem dinâmica no banco de dados"""
         try:
             import json
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
             previsoes_str = json.dumps(previsoes_ia) if previsoes_ia else None
             cenarios_str = json.dumps(previsoes_ia.get('cenarios', {})) if previsoes_ia and 'cenarios' in previsoes_ia else None
             justificativa = previsoes_ia.get('justificativa', "") if previsoes_ia and 'justificativa' in previsoes_ia else None
 
-            cursor.execute("""
+            self.banco.executar("""
                 INSERT INTO ordens_dinamicas 
                 (order_id, symbol, tipo_ordem, preco_entrada, quantidade,
                  stop_loss_inicial, take_profit_inicial, stop_loss_atual, take_profit_atual, 
-                 status, confianca_ia, previsoes_ia, cenarios_ia, justificativa_ia)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 status, abertura_ms, confianca_ia, previsoes_ia, cenarios_ia, justificativa_ia)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 order_id, symbol, tipo_ordem.value, preco_entrada, quantidade,
                 config.stop_loss_inicial, config.take_profit_inicial,
                 config.stop_loss_atual, config.take_profit_atual, 'aberta',
-                confianca_ia, previsoes_str, cenarios_str, justificativa
+                agora_ms(), confianca_ia, previsoes_str, cenarios_str, justificativa
             ))
-
-            conn.commit()
-            conn.close()
         except Exception as e:
             logger.error(f"❌ Erro ao salvar ordem dinâmica: {e}")
     
@@ -913,10 +900,7 @@ class GestorOrdensDinamico:
                                  dados_mercado: Dict[str, Any]):
         """Registra ajuste dinâmico no banco de dados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 INSERT INTO ajustes_dinamicos 
                 (order_id, tipo_ajuste, valor_anterior, valor_novo, razao_ajuste, dados_mercado)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -926,9 +910,6 @@ class GestorOrdensDinamico:
                 json.dumps(dados_mercado)
             ))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"❌ Erro ao registrar ajuste: {e}")
     
@@ -937,23 +918,17 @@ class GestorOrdensDinamico:
                                   razao_saida: str, dados_mercado: Dict[str, Any]):
         """Registra fechamento da ordem no banco de dados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 UPDATE ordens_dinamicas SET
-                status = ?, timestamp_fechamento = ?, preco_saida = ?,
+                status = ?, timestamp_fechamento = ?, fechamento_ms = ?, preco_saida = ?,
                 lucro_prejuizo = ?, tempo_aberta_segundos = ?, razao_saida = ?,
                 dados_mercado_saida = ?
                 WHERE order_id = ?
             """, (
-                'fechada', datetime.now(), preco_saida, lucro_prejuizo,
+                'fechada', datetime.now(), agora_ms(), preco_saida, lucro_prejuizo,
                 tempo_aberta, razao_saida, json.dumps(dados_mercado), order_id
             ))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"❌ Erro ao registrar fechamento: {e}")
     
@@ -964,10 +939,7 @@ class GestorOrdensDinamico:
         try:
             aprendizado = self._gerar_aprendizado_saida(tipo_saida, tempo_aberta, sucesso)
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 INSERT INTO aprendizado_saidas 
                 (order_id, tipo_saida, tempo_aberta_segundos, lucro_prejuizo,
                  confianca_saida, razao_saida, sucesso, aprendizado)
@@ -977,9 +949,6 @@ class GestorOrdensDinamico:
                 confianca_saida, tipo_saida, sucesso, aprendizado
             ))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"❌ Erro ao registrar aprendizado: {e}")
     
@@ -1003,37 +972,18 @@ class GestorOrdensDinamico:
     def obter_estatisticas_gestao(self) -> Dict[str, Any]:
         """Retorna estatísticas da gestão dinâmica"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Total de ordens
-            cursor.execute("SELECT COUNT(*) FROM ordens_dinamicas")
-            total_ordens = cursor.fetchone()[0]
-            
-            # Ordens fechadas
-            cursor.execute("SELECT COUNT(*) FROM ordens_dinamicas WHERE status = 'fechada'")
-            ordens_fechadas = cursor.fetchone()[0]
-            
-            # Lucro total
-            cursor.execute("SELECT SUM(lucro_prejuizo) FROM ordens_dinamicas WHERE status = 'fechada'")
-            lucro_total = cursor.fetchone()[0] or 0
-            
-            # Tempo médio
-            cursor.execute("SELECT AVG(tempo_aberta_segundos) FROM ordens_dinamicas WHERE status = 'fechada'")
-            tempo_medio = cursor.fetchone()[0] or 0
-            
-            # Ajustes realizados
-            cursor.execute("SELECT COUNT(*) FROM ajustes_dinamicos")
-            total_ajustes = cursor.fetchone()[0]
-            
-            conn.close()
-            
+            with self.banco.conexao_leitura() as conn:
+                # Agregados mantidos por trigger (sem varrer ordens_dinamicas)
+                total_ordens = contar_linhas(conn, 'ordens_dinamicas')
+                fechadas = obter_estatisticas_ordens(conn, 'dinamicas')
+                total_ajustes = contar_linhas(conn, 'ajustes_dinamicos')
+
             return {
                 'total_ordens': total_ordens,
-                'ordens_fechadas': ordens_fechadas,
+                'ordens_fechadas': fechadas['total'],
                 'ordens_ativas': len(self.ordens_ativas),
-                'lucro_total': lucro_total,
-                'tempo_medio_segundos': tempo_medio,
+                'lucro_total': fechadas['pnl_total'],
+                'tempo_medio_segundos': fechadas['tempo_medio_segundos'],
                 'total_ajustes': total_ajustes
             }
             
@@ -1051,29 +1001,28 @@ class GestorOrdensDinamico:
     def carregar_ordens_abertas(self):
         """Reimporta ordens abertas do banco para o dicionário ordens_ativas ao iniciar o robô"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss_atual, take_profit_atual, timestamp_abertura FROM ordens_dinamicas WHERE status = 'aberta'")
-            rows = cursor.fetchall()
-            for row in rows:
-                order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss, take_profit, timestamp_abertura = row
-                self.ordens_ativas[order_id] = {
-                    'symbol': symbol,
-                    'tipo_ordem': tipo_ordem,
-                    'preco_entrada': preco_entrada,
-                    'quantidade': quantidade,
-                    'config': {
-                        'stop_loss_inicial': stop_loss,
-                        'take_profit_inicial': take_profit,
-                        'stop_loss_atual': stop_loss,
-                        'take_profit_atual': take_profit,
-                        'tempo_maximo_segundos': 300
-                    },
-                    'timestamp_abertura': datetime.fromisoformat(timestamp_abertura) if isinstance(timestamp_abertura, str) else (timestamp_abertura if isinstance(timestamp_abertura, datetime) else datetime.now()),
-                    'confianca_ia': 0.5,  # Valor padrão para ordens carregadas
-                    'ajustes_realizados': 0
-                }
-                logger.info(f"♻️ Ordem reimportada para monitoramento: {order_id}")
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss_atual, take_profit_atual, timestamp_abertura FROM ordens_dinamicas WHERE status = 'aberta'")
+                rows = cursor.fetchall()
+                for row in rows:
+                    order_id, symbol, tipo_ordem, preco_entrada, quantidade, stop_loss, take_profit, timestamp_abertura = row
+                    self.ordens_ativas[order_id] = {
+                        'symbol': symbol,
+                        'tipo_ordem': tipo_ordem,
+                        'preco_entrada': preco_entrada,
+                        'quantidade': quantidade,
+                        'config': {
+                            'stop_loss_inicial': stop_loss,
+                            'take_profit_inicial': take_profit,
+                            'stop_loss_atual': stop_loss,
+                            'take_profit_atual': take_profit,
+                            'tempo_maximo_segundos': 300
+                        },
+                        'timestamp_abertura': datetime.fromisoformat(timestamp_abertura) if isinstance(timestamp_abertura, str) else (timestamp_abertura if isinstance(timestamp_abertura, datetime) else datetime.now()),
+                        'confianca_ia': 0.5,  # Valor padrão para ordens carregadas
+                        'ajustes_realizados': 0
+                    }
+                    logger.info(f"♻️ Ordem reimportada para monitoramento: {order_id}")
         except Exception as e:
             logger.error(f"❌ Erro ao reimportar ordens abertas: {e}") 
\ No newline at end of file
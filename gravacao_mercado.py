@@ -0,0 +1,669 @@
+"""
+Gravação e reprodução determinística de dados de mercado
+
+GravadorMercado guarda cada resposta bruta que chega da exchange, com o
+instante de recebimento, em segmentos gzip só de acréscimo
+(<diretorio>/mercado-AAAAMMDD-HHMMSS-mmm.jsonl.gz, horário UTC de abertura):
+  - REST do ClienteHTTP (coletor.http) e da requests.Session (snapshot, klines)
+  - mensagens WebSocket do StreamBybit (evento 'bruto')
+Uma linha JSON por resposta. Uma thread esvazia a fila a cada
+intervalo_flush_segundos e acrescenta o lote como um membro gzip novo no fim
+do segmento: uma queda perde no máximo o último lote e o resto do arquivo
+continua legível. O segmento troca ao passar de max_mb_segmento ou de
+max_minutos_segmento.
+
+ReprodutorMercado toca uma gravação num relógio próprio: velocidade 1 (tempo
+real), N (N vezes mais rápido) ou 0 (o mais rápido possível: o relógio só
+anda quando o robô dorme via reprodutor.dormir()). ColetorBybitReplay e
+ColetorB3Replay têm a interface dos coletores ao vivo e rodam o mesmo código de
+interpretação sobre o que foi gravado: uma requisição REST recebe a resposta
+gravada mais recente do mesmo endpoint e parâmetros (start/end/cursor/limit
+não entram na comparação) e as mensagens WebSocket alimentam um StreamBybit
+sem conexão. Os robôs reproduzem uma gravação quando coleta.replay.diretorio
+está definido no config.yaml.
+"""
+
+import os
+import gzip
+import json
+import time
+import zlib
+import queue
+import atexit
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+import requests
+from loguru import logger
+
+from cliente_http import ErroHTTP, RespostaHTTP
+from coletor import Coletor, ColetorBybit
+from stream_bybit import StreamBybit
+
+DIRETORIO_PADRAO = os.path.join('dados', 'gravacoes')
+PREFIXO_SEGMENTO = 'mercado-'
+SUFIXO_SEGMENTO = '.jsonl.gz'
+MAX_REGISTROS_LOTE = 5000
+# Parâmetros que mudam a cada chamada do mesmo endpoint (paginação/janela)
+PARAMS_VARIAVEIS = frozenset({'start', 'end', 'cursor', 'limit'})
+# Cabeçalhos guardados junto da resposta (o agendador usa os de limite de taxa)
+CABECALHOS_GRAVADOS = ('retry-after', 'x-bapi-')
+
+
+def _agora_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _config_coleta() -> Dict[str, Any]:
+    try:
+        import config
+        return (config.load_config() or {}).get('coleta', {}) or {}
+    except Exception:
+        return {}
+
+
+def separar_url(url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple[str, Dict[str, str]]:
+    """URL sem query e todos os parâmetros (query da URL + params) como texto"""
+    partes = urlsplit(url)
+    base = urlunsplit((partes.scheme, partes.netloc, partes.path, '', ''))
+    todos = dict(parse_qsl(partes.query))
+    todos.update({k: str(v) for k, v in (params or {}).items() if v is not None})
+    return base, todos
+
+
+def chave_rest(metodo: str, base: str, params: Optional[Mapping[str, str]]) -> Tuple:
+    """Chave de comparação entre a requisição reproduzida e as respostas gravadas"""
+    return (metodo.upper(), base,
+            tuple(sorted((k, v) for k, v in (params or {}).items() if k not in PARAMS_VARIAVEIS)))
+
+
+# ----------------------------------------------------------------------
+# Gravação
+# ----------------------------------------------------------------------
+class GravadorMercado:
+    """Fila em memória e thread que acrescenta lotes comprimidos aos segmentos"""
+
+    def __init__(self, diretorio: Optional[str] = None, max_mb_segmento: Optional[float] = None,
+                 max_minutos_segmento: Optional[float] = None, intervalo_flush_segundos: Optional[float] = None,
+                 capacidade_fila: Optional[int] = None):
+        """
+        Inicializa o gravador (a thread só começa em iniciar())
+
+        Args:
+            diretorio: Pasta dos segmentos
+            max_mb_segmento: Tamanho comprimido que fecha o segmento
+            max_minutos_segmento: Idade que fecha o segmento
+            intervalo_flush_segundos: Intervalo entre descargas da fila no disco
+            capacidade_fila: Respostas pendentes antes de começar a descartar
+        """
+        cfg = _config_coleta().get('gravacao', {}) or {}
+        self.diretorio = diretorio or cfg.get('diretorio', DIRETORIO_PADRAO)
+        self.max_bytes = int((max_mb_segmento or cfg.get('max_mb_segmento', 64)) * 1024 * 1024)
+        self.max_segundos = (max_minutos_segmento or cfg.get('max_minutos_segmento', 60)) * 60
+        self.intervalo_flush = intervalo_flush_segundos or cfg.get('intervalo_flush_segundos', 1)
+        self._fila: queue.Queue = queue.Queue(maxsize=capacidade_fila or cfg.get('capacidade_fila', 100_000))
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._segmento: Optional[str] = None
+        self._segmento_aberto_em = 0.0
+        self._segmento_bytes = 0
+        self.estatisticas = {
+            'registros': 0,
+            'rest': 0,
+            'ws': 0,
+            'lotes': 0,
+            'segmentos': 0,
+            'bytes_brutos': 0,
+            'bytes_gravados': 0,
+            'descartados': 0,
+            'erros': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def iniciar(self) -> 'GravadorMercado':
+        if self._thread and self._thread.is_alive():
+            return self
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="gravador-mercado", daemon=True)
+        self._thread.start()
+        logger.info(f"⏺️ Gravação de mercado em {self.diretorio}")
+        return self
+
+    def parar(self, timeout: float = 10.0):
+        """Grava o que ainda está na fila e encerra a thread"""
+        self._parar.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Entrada (chamada nas threads de coleta: só enfileira)
+    # ------------------------------------------------------------------
+    def gravar_rest(self, metodo: str, url: str, params: Optional[Mapping[str, Any]], status: int,
+                    corpo: Any, cabecalhos: Optional[Mapping[str, str]] = None, ts_ms: Optional[int] = None):
+        self._enfileirar(('rest', ts_ms or _agora_ms(), metodo, url, params, status, corpo, cabecalhos))
+
+    def gravar_ws(self, url: str, texto: str, ts_ms: Optional[int] = None):
+        self._enfileirar(('ws', ts_ms or _agora_ms(), url, texto))
+
+    def _enfileirar(self, item: Tuple):
+        try:
+            self._fila.put_nowait(item)
+        except queue.Full:
+            self.estatisticas['descartados'] += 1
+
+    def observar_cliente(self, cliente, hosts: Optional[Iterable[str]] = None):
+        """Grava as respostas de um ClienteHTTP (cliente_http.py), opcionalmente só de alguns hosts"""
+        hosts = set(hosts) if hosts else None
+
+        def _ouvinte(metodo, url, params, resposta):
+            if hosts is None or urlsplit(url).hostname in hosts:
+                self.gravar_rest(metodo, url, params, resposta.status, resposta.corpo, resposta.cabecalhos)
+
+        cliente.ao_receber_resposta(_ouvinte)
+
+    def observar_sessao(self, session: requests.Session):
+        """Grava as respostas de uma requests.Session (gancho 'response')"""
+
+        def _gancho(response, *args, **kwargs):
+            self.gravar_rest(response.request.method, response.url, None, response.status_code,
+                             response.content, response.headers)
+
+        session.hooks['response'].append(_gancho)
+
+    def observar_stream(self, stream: StreamBybit):
+        """Grava cada mensagem recebida pelo StreamBybit antes de ser processada"""
+        stream.ao_receber('bruto', lambda mensagem: self.gravar_ws(mensagem['url'], mensagem['texto'],
+                                                                  mensagem['ts_ms']))
+
+    def observar_coletor(self, coletor):
+        """Observa coletor.http (só os hosts do coletor), coletor.session e coletor.stream, se existirem"""
+        hosts = {urlsplit(url).hostname for url in (getattr(coletor, 'base_url', None),
+                                                   getattr(coletor, 'base_url_b3', None)) if url}
+        if getattr(coletor, 'http', None) is not None:
+            self.observar_cliente(coletor.http, hosts)
+        if getattr(coletor, 'session', None) is not None:
+            self.observar_sessao(coletor.session)
+        if getattr(coletor, 'stream', None) is not None:
+            self.observar_stream(coletor.stream)
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def _loop(self):
+        while True:
+            lote = self._drenar()
+            if lote:
+                self._gravar_lote(lote)
+            elif self._parar.is_set():
+                break
+
+    def _drenar(self) -> List[Tuple]:
+        lote = []
+        limite = time.monotonic() + self.intervalo_flush
+        while len(lote) < MAX_REGISTROS_LOTE:
+            try:
+                if self._parar.is_set():
+                    lote.append(self._fila.get_nowait())
+                else:
+                    lote.append(self._fila.get(timeout=max(0.0, limite - time.monotonic())))
+            except queue.Empty:
+                break
+        return lote
+
+    @staticmethod
+    def _serializar(item: Tuple) -> Dict[str, Any]:
+        if item[0] == 'ws':
+            _, ts_ms, url, texto = item
+            return {'t': ts_ms, 'c': 'ws', 'u': url, 'b': texto}
+        _, ts_ms, metodo, url, params, status, corpo, cabecalhos = item
+        base, todos = separar_url(url, params)
+        registro = {'t': ts_ms, 'c': 'rest', 'm': metodo.upper(), 'u': base, 'p': todos, 's': status,
+                    'b': corpo.decode('utf-8', errors='replace') if isinstance(corpo, bytes) else corpo}
+        extras = {k.lower(): v for k, v in (cabecalhos or {}).items() if k.lower().startswith(CABECALHOS_GRAVADOS)}
+        if extras:
+            registro['h'] = extras
+        return registro
+
+    def _gravar_lote(self, lote: List[Tuple]):
+        linhas = []
+        for item in lote:
+            try:
+                linhas.append(json.dumps(self._serializar(item), ensure_ascii=False, separators=(',', ':')))
+                self.estatisticas[item[0]] += 1
+            except Exception as e:
+                self.estatisticas['erros'] += 1
+                logger.debug(f"Resposta não gravada: {e}")
+        if not linhas:
+            return
+        try:
+            dados = ('\n'.join(linhas) + '\n').encode('utf-8')
+            comprimido = gzip.compress(dados, compresslevel=6)
+            caminho = self._segmento_atual()
+            with open(caminho, 'ab') as arquivo:
+                arquivo.write(comprimido)
+            self._segmento_bytes += len(comprimido)
+            self.estatisticas['registros'] += len(linhas)
+            self.estatisticas['lotes'] += 1
+            self.estatisticas['bytes_brutos'] += len(dados)
+            self.estatisticas['bytes_gravados'] += len(comprimido)
+        except Exception as e:
+            self.estatisticas['erros'] += 1
+            logger.error(f"❌ Erro ao gravar lote de mercado: {e}")
+
+    def _segmento_atual(self) -> str:
+        agora = time.time()
+        if (self._segmento is None or self._segmento_bytes >= self.max_bytes
+                or agora - self._segmento_aberto_em >= self.max_segundos):
+            os.makedirs(self.diretorio, exist_ok=True)
+            ms = int(agora * 1000)
+            while True:
+                nome = (f"{PREFIXO_SEGMENTO}{time.strftime('%Y%m%d-%H%M%S', time.gmtime(ms / 1000))}"
+                        f"-{ms % 1000:03d}{SUFIXO_SEGMENTO}")
+                caminho = os.path.join(self.diretorio, nome)
+                if not os.path.exists(caminho):
+                    break
+                ms += 1
+            self._segmento, self._segmento_aberto_em, self._segmento_bytes = caminho, agora, 0
+            self.estatisticas['segmentos'] += 1
+            logger.debug(f"Novo segmento de gravação: {nome}")
+        return self._segmento
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Registros gravados, segmentos, compressão e descartes"""
+        stats = dict(self.estatisticas)
+        stats['pendentes'] = self._fila.qsize()
+        stats['segmento_atual'] = os.path.basename(self._segmento) if self._segmento else None
+        stats['taxa_compressao'] = (stats['bytes_brutos'] / stats['bytes_gravados']
+                                    if stats['bytes_gravados'] else 0.0)
+        return stats
+
+
+# ----------------------------------------------------------------------
+# Leitura
+# ----------------------------------------------------------------------
+def listar_segmentos(origem: str) -> List[str]:
+    """Segmentos de uma pasta em ordem cronológica (ou o próprio arquivo)"""
+    if not os.path.isdir(origem):
+        return [origem]
+    return [os.path.join(origem, nome) for nome in sorted(os.listdir(origem))
+            if nome.startswith(PREFIXO_SEGMENTO) and nome.endswith(SUFIXO_SEGMENTO)]
+
+
+def ler_gravacao(origem: str, inicio_ms: Optional[int] = None, fim_ms: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Registros gravados em ordem, segmento a segmento
+
+    Um segmento cortado no meio (queda durante a escrita) é lido até o último
+    trecho íntegro; linhas ilegíveis são puladas.
+
+    Args:
+        origem: Pasta de segmentos ou um segmento
+        inicio_ms: Ignora registros anteriores
+        fim_ms: Para no primeiro registro posterior
+    """
+    for caminho in listar_segmentos(origem):
+        try:
+            with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        logger.debug(f"Linha ilegível em {os.path.basename(caminho)} ignorada")
+                        continue
+                    if inicio_ms is not None and registro['t'] < inicio_ms:
+                        continue
+                    if fim_ms is not None and registro['t'] > fim_ms:
+                        return
+                    yield registro
+        except (EOFError, OSError, zlib.error) as e:
+            logger.warning(f"⚠️ Segmento {os.path.basename(caminho)} incompleto ({e}); lido até o trecho íntegro")
+
+
+# ----------------------------------------------------------------------
+# Reprodução
+# ----------------------------------------------------------------------
+class ReprodutorMercado:
+    """Relógio da reprodução e estado do que já foi 'recebido' até o instante atual"""
+
+    def __init__(self, origem: str, velocidade: Optional[float] = None, inicio_ms: Optional[int] = None,
+                 fim_ms: Optional[int] = None, simbolos: Optional[Iterable[str]] = None,
+                 topicos: Optional[Iterable[str]] = None):
+        """
+        Abre a gravação (o relógio começa no primeiro registro)
+
+        Args:
+            origem: Pasta de segmentos ou um segmento
+            velocidade: 1 = tempo real, N = N vezes mais rápido, 0 = o mais rápido possível
+            inicio_ms: Começa a reprodução neste instante da gravação
+            fim_ms: Termina a reprodução neste instante da gravação
+            simbolos: Símbolos do stream reproduzido (padrão: trading.pares)
+            topicos: Tópicos do stream reproduzido (padrão: coleta.stream.topicos)
+
+        Raises:
+            ValueError: gravação vazia ou inexistente
+        """
+        cfg = _config_coleta().get('replay', {}) or {}
+        self.origem = origem
+        self.velocidade = float(velocidade if velocidade is not None else cfg.get('velocidade', 1) or 0)
+        self.fim_ms = fim_ms
+        self._registros = ler_gravacao(origem, inicio_ms, fim_ms)
+        self._proximo = next(self._registros, None)
+        if self._proximo is None:
+            raise ValueError(f"Gravação vazia ou inexistente: {origem}")
+        self.inicio_ms = self._proximo['t']
+        self._inicio_real = time.monotonic()
+        self._deslocamento_ms = 0.0
+        self._rest: Dict[Tuple, Dict[str, Any]] = {}
+        self._primeiras: Dict[Tuple, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+        self.estatisticas = {
+            'registros': 0,
+            'rest': 0,
+            'ws': 0,
+            'consultas_rest': 0,
+            'respostas_antecipadas': 0,
+            'sem_resposta': 0,
+        }
+        self.stream = StreamReplay(self, simbolos, topicos)
+
+    # ------------------------------------------------------------------
+    # Relógio
+    # ------------------------------------------------------------------
+    def agora_ms(self) -> int:
+        """Instante atual da reprodução (relógio da gravação, epoch ms)"""
+        decorrido = (time.monotonic() - self._inicio_real) * 1000 * self.velocidade if self.velocidade > 0 else 0.0
+        return int(self.inicio_ms + decorrido + self._deslocamento_ms)
+
+    def agora(self) -> datetime:
+        return datetime.fromtimestamp(self.agora_ms() / 1000)
+
+    def dormir(self, segundos: float):
+        """Espera no relógio da reprodução (sem espera real na velocidade 0)"""
+        if segundos <= 0:
+            return
+        if self.velocidade > 0:
+            time.sleep(segundos / self.velocidade)
+        else:
+            with self._lock:
+                self._deslocamento_ms += segundos * 1000
+
+    def avancar(self) -> int:
+        """Entrega tudo que foi gravado até o instante atual; devolve quantos registros"""
+        with self._lock:
+            limite = self.agora_ms()
+            entregues = 0
+            while self._proximo is not None and self._proximo['t'] <= limite:
+                self._entregar(self._proximo)
+                self._proximo = next(self._registros, None)
+                entregues += 1
+            return entregues
+
+    def terminou(self) -> bool:
+        """True quando o relógio passou do último registro da gravação"""
+        self.avancar()
+        return self._proximo is None
+
+    def _entregar(self, registro: Dict[str, Any]):
+        self.estatisticas['registros'] += 1
+        if registro.get('c') == 'ws':
+            self.estatisticas['ws'] += 1
+            self.stream.entregar(registro['b'])
+        elif registro.get('c') == 'rest':
+            self.estatisticas['rest'] += 1
+            self._rest[chave_rest(registro['m'], registro['u'], registro.get('p'))] = registro
+
+    # ------------------------------------------------------------------
+    # REST
+    # ------------------------------------------------------------------
+    def resposta(self, metodo: str, url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Resposta gravada para a requisição no instante atual
+
+        Returns:
+            A mais recente do mesmo endpoint até agora; antes da primeira, a
+            primeira da gravação; None se o endpoint nunca foi gravado
+        """
+        base, todos = separar_url(url, params)
+        chave = chave_rest(metodo, base, todos)
+        self.avancar()
+        with self._lock:
+            self.estatisticas['consultas_rest'] += 1
+            registro = self._rest.get(chave)
+            if registro is None:
+                registro = self._primeira_resposta(chave)
+            if registro is None:
+                self.estatisticas['sem_resposta'] += 1
+            return registro
+
+    def _primeira_resposta(self, chave: Tuple) -> Optional[Dict[str, Any]]:
+        # Lê a gravação à frente uma vez por endpoint (bootstrap de klines pedido antes da resposta gravada)
+        if chave not in self._primeiras:
+            self._primeiras[chave] = next(
+                (r for r in ler_gravacao(self.origem, self.inicio_ms, self.fim_ms)
+                 if r.get('c') == 'rest' and chave_rest(r['m'], r['u'], r.get('p')) == chave), None)
+        if self._primeiras[chave] is not None:
+            self.estatisticas['respostas_antecipadas'] += 1
+        return self._primeiras[chave]
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        stats = dict(self.estatisticas)
+        stats['velocidade'] = self.velocidade
+        stats['decorrido_segundos'] = (self.agora_ms() - self.inicio_ms) / 1000
+        stats['terminou'] = self._proximo is None
+        return stats
+
+
+class StreamReplay(StreamBybit):
+    """StreamBybit sem conexão: as mensagens chegam da gravação no relógio do reprodutor"""
+
+    def __init__(self, reprodutor: ReprodutorMercado, simbolos: Optional[Iterable[str]] = None,
+                 topicos: Optional[Iterable[str]] = None):
+        super().__init__(simbolos, url=f"replay://{reprodutor.origem}", topicos=topicos, reconexao_automatica=False)
+        self.reprodutor = reprodutor
+
+    def iniciar(self):
+        self.conectado = True
+        logger.info(f"📼 Stream reproduzido de {self.reprodutor.origem}: {len(self._simbolos)} símbolos")
+
+    def parar(self, timeout: float = 5.0):
+        self.conectado = False
+
+    def entregar(self, texto: str):
+        """Processa uma mensagem gravada como se tivesse chegado agora"""
+        if self._ouvintes['bruto']:
+            self._emitir('bruto', {'url': self.url, 'texto': texto, 'ts_ms': self.reprodutor.agora_ms()})
+        self._processar(texto)
+
+    def aguardar_dados(self, simbolos: Optional[Iterable[str]] = None, timeout: float = 10.0) -> bool:
+        """Espera no relógio da reprodução até todos os símbolos terem preço"""
+        simbolos = list(simbolos or self._simbolos)
+        limite = self.reprodutor.agora_ms() + timeout * 1000
+        while self.reprodutor.agora_ms() < limite and not self.reprodutor.terminou():
+            if all(self.preco_atual(s) is not None for s in simbolos):
+                return True
+            self.reprodutor.dormir(0.05)
+        return all(self.preco_atual(s) is not None for s in simbolos)
+
+    # Toda leitura entrega antes as mensagens gravadas até o instante atual
+    def preco_atual(self, simbolo: str, max_idade: Optional[float] = None) -> Optional[float]:
+        self.reprodutor.avancar()
+        return super().preco_atual(simbolo, max_idade)
+
+    def ultimo_ticker(self, simbolo: str, max_idade: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        self.reprodutor.avancar()
+        return super().ultimo_ticker(simbolo, max_idade)
+
+    def ultimo_kline(self, simbolo: str, intervalo: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        self.reprodutor.avancar()
+        return super().ultimo_kline(simbolo, intervalo)
+
+    def livro(self, simbolo: str):
+        self.reprodutor.avancar()
+        return super().livro(simbolo)
+
+    def buffer(self, simbolo: str):
+        self.reprodutor.avancar()
+        return super().buffer(simbolo)
+
+
+class ClienteHTTPReplay:
+    """Interface do ClienteHTTP respondendo com as respostas gravadas"""
+
+    def __init__(self, reprodutor: ReprodutorMercado):
+        self.reprodutor = reprodutor
+        self._ouvintes: List[Callable] = []
+        self._ouvintes_resposta: List[Callable] = []
+
+    def requisitar(self, metodo: str, url: str, params: Optional[Mapping[str, Any]] = None,
+                   json_corpo: Any = None, timeout: Optional[float] = None,
+                   cabecalhos: Optional[Mapping[str, str]] = None) -> RespostaHTTP:
+        registro = self.reprodutor.resposta(metodo, url, params)
+        host = urlsplit(url).hostname or ''
+        if registro is None:
+            self._notificar(host, None, None)
+            raise ErroHTTP(f"Sem resposta gravada para {metodo.upper()} {url}")
+        resposta = RespostaHTTP(registro['s'], dict(registro.get('h') or {}), registro['b'].encode('utf-8'), url, 0.0)
+        self._notificar(host, resposta.status, resposta.cabecalhos)
+        for ouvinte in self._ouvintes_resposta:
+            ouvinte(metodo.upper(), url, params, resposta)
+        return resposta
+
+    def _notificar(self, host: str, status: Optional[int], cabecalhos: Optional[Mapping[str, str]]):
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(host, status, 0.0, cabecalhos)
+            except Exception as e:
+                logger.debug(f"Erro em ouvinte HTTP: {e}")
+
+    def get(self, url: str, params: Optional[Mapping[str, Any]] = None, timeout: Optional[float] = None) -> RespostaHTTP:
+        return self.requisitar('GET', url, params=params, timeout=timeout)
+
+    def post(self, url: str, json_corpo: Any = None, timeout: Optional[float] = None) -> RespostaHTTP:
+        return self.requisitar('POST', url, json_corpo=json_corpo, timeout=timeout)
+
+    def get_json(self, url: str, params: Optional[Mapping[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        resposta = self.get(url, params=params, timeout=timeout)
+        resposta.raise_for_status()
+        return resposta.json()
+
+    def em_lote(self, pedidos: Iterable[Mapping[str, Any]]) -> List[Any]:
+        """Mesmo contrato do ClienteHTTP: resposta ou exceção de cada pedido, na ordem"""
+        resultados = []
+        for pedido in pedidos:
+            pedido = dict(pedido)
+            try:
+                resultados.append(self.requisitar(pedido.pop('metodo', 'GET'), **pedido))
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+
+    def ao_responder(self, ouvinte: Callable[[str, Optional[int], float, Optional[Mapping[str, str]]], None]):
+        self._ouvintes.append(ouvinte)
+
+    def ao_receber_resposta(self, ouvinte: Callable[[str, str, Optional[Mapping[str, Any]], RespostaHTTP], None]):
+        self._ouvintes_resposta.append(ouvinte)
+
+    def obter_latencias(self) -> Dict[str, Dict[str, float]]:
+        return {}
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        return self.reprodutor.obter_estatisticas()
+
+    def fechar(self):
+        pass
+
+
+class SessaoReplay(requests.Session):
+    """requests.Session respondendo com as respostas gravadas (snapshot e klines)"""
+
+    def __init__(self, reprodutor: ReprodutorMercado):
+        super().__init__()
+        self.reprodutor = reprodutor
+
+    def request(self, method, url, params=None, **kwargs) -> requests.Response:
+        registro = self.reprodutor.resposta(method, url, params)
+        preparada = requests.Request(method, url, params=params).prepare()
+        if registro is None:
+            raise requests.ConnectionError(f"Sem resposta gravada para {method.upper()} {url}")
+        resposta = requests.Response()
+        resposta.status_code = registro['s']
+        resposta._content = registro['b'].encode('utf-8')
+        resposta.headers.update(registro.get('h') or {})
+        resposta.encoding = 'utf-8'
+        resposta.reason = 'OK' if registro['s'] < 400 else 'Erro gravado'
+        resposta.url = preparada.url
+        resposta.request = preparada
+        return requests.sessions.dispatch_hook('response', self.hooks, resposta)
+
+
+class ColetorBybitReplay(ColetorBybit):
+    """ColetorBybit sobre uma gravação: mesmas chamadas, respostas e mensagens gravadas"""
+
+    def __init__(self, reprodutor: ReprodutorMercado):
+        super().__init__(http=ClienteHTTPReplay(reprodutor))
+        self.reprodutor = reprodutor
+        self.session = SessaoReplay(reprodutor)
+        self.snapshot.session = self.session
+        self.klines.session = self.session
+        if reprodutor.velocidade != 1:
+            # Validades medidas em tempo real: mesma validade no relógio da gravação
+            fator = 1 / reprodutor.velocidade if reprodutor.velocidade > 0 else 0.0
+            self.snapshot.ttl *= fator
+            self.klines.intervalo_minimo *= fator
+        reprodutor.stream.iniciar()
+        ColetorBybit.anexar_stream(self, reprodutor.stream)
+
+    def anexar_stream(self, stream):
+        """O stream da reprodução continua anexado (um stream ao vivo seria outra fonte)"""
+        if stream is not self.reprodutor.stream:
+            logger.warning("⚠️ Coletor em reprodução: stream ao vivo ignorado")
+
+
+class ColetorB3Replay(Coletor):
+    """Coletor da B3 sobre uma gravação (contrato vigente do WIN pela data gravada)"""
+
+    def __init__(self, reprodutor: ReprodutorMercado):
+        super().__init__(http=ClienteHTTPReplay(reprodutor))
+        self.reprodutor = reprodutor
+
+    def _agora(self):
+        return self.reprodutor.agora()
+
+
+# ----------------------------------------------------------------------
+# Configuração dos robôs
+# ----------------------------------------------------------------------
+_gravador: Optional[GravadorMercado] = None
+_lock_gravador = threading.Lock()
+
+
+def obter_gravador() -> Optional[GravadorMercado]:
+    """Gravador do processo, iniciado na primeira chamada (None se coleta.gravacao.ativa for falso)"""
+    global _gravador
+    if not (_config_coleta().get('gravacao', {}) or {}).get('ativa', False):
+        return None
+    with _lock_gravador:
+        if _gravador is None:
+            _gravador = GravadorMercado().iniciar()
+            atexit.register(_gravador.parar)
+        return _gravador
+
+
+def abrir_reprodutor() -> Optional[ReprodutorMercado]:
+    """Reprodutor de coleta.replay.diretorio (None = robô ao vivo)"""
+    cfg = _config_coleta().get('replay', {}) or {}
+    if not cfg.get('diretorio'):
+        return None
+    try:
+        reprodutor = ReprodutorMercado(cfg['diretorio'], cfg.get('velocidade', 1))
+    except Exception as e:
+        logger.error(f"❌ Erro ao abrir gravação {cfg['diretorio']}: {e}")
+        return None
+    velocidade = f"{reprodutor.velocidade:g}x" if reprodutor.velocidade > 0 else "máxima"
+    logger.info(f"📼 Reproduzindo {cfg['diretorio']} a partir de {reprodutor.agora():%Y-%m-%d %H:%M:%S} "
+                f"(velocidade {velocidade})")
+    return reprodutor
@@ -1,13 +1,22 @@
-import random
+from livro_ordens import FEATURES_NEUTRAS, obter_livro
 
 def obter_dados_order_book(par: str) -> dict:
-    """Coleta features do livro de ordens para o par"""
-    # Simulação: valores aleatórios para exemplo
+    """
+    Coleta features do livro de ordens para o par
+
+    Lê as últimas features publicadas pelo livro L2 mantido pelo stream
+    (livro_ordens.py), sem lock. Sem stream de orderbook ou com o livro
+    aguardando snapshot, devolve valores neutros (nunca aleatórios).
+    """
+    livro = obter_livro(par.replace('/', ''))
+    features = livro.features if livro is not None and livro.consistente else FEATURES_NEUTRAS
     return {
-        'bid_ask_imbalance': round(random.uniform(-1, 1), 2),
-        'max_bid_size': round(random.uniform(1, 10), 2),
-        'max_ask_size': round(random.uniform(1, 10), 2),
-        'liquidity_clusters': random.randint(0, 3)
+        'bid_ask_imbalance': round(features['bid_ask_imbalance'], 4),
+        'max_bid_size': features['max_bid_size'],
+        'max_ask_size': features['max_ask_size'],
+        'liquidity_clusters': features['liquidity_clusters'],
+        'spread_bps': features.get('spread_bps', 0.0),
+        'microprice': features.get('microprice', 0.0),
     }
 
 # No método de coleta de dados de mercado:
@@ -10,6 +10,13 @@ from typing import Dict, Any
 from loguru import logger
 from datetime import datetime
 
+from cliente_http import obter_cliente_http
+from registro_features import declarar_consumidor
+
+# Indicadores citados no prompt detalhado (montados pelo PreparadorDadosIA)
+FEATURES_PROMPT_DETALHADO = ('rsi', 'macd', 'macd_signal', 'bb_upper', 'bb_lower', 'ma_20', 'ma_50',
+                             'volatilidade', 'volume_medio', 'tendencia', 'historico_precos')
+
 class CursorAITradingClient:
     def __init__(self, model_name: str = "llama2:7b-chat"):
         """
@@ -22,6 +29,9 @@ class CursorAITradingClient:
         self.ollama_url = "http://localhost:11434"
         self.timeout = 20
         self.max_retries = 3        
+        # Pool keep-alive compartilhado: prompts de vários pares/threads saem em paralelo sem novo handshake
+        self.http = obter_cliente_http()
+        declarar_consumidor('prompt_detalhado', FEATURES_PROMPT_DETALHADO)
         # Verificar disponibilidade do Ollama
         self._verificar_ollama()
     
@@ -222,16 +232,16 @@ IMPORTANTE:
         
         for tentativa in range(self.max_retries):
             try:
-                response = requests.post(
+                response = self.http.post(
                     f"{self.ollama_url}/api/generate",
-                    json=payload,
+                    json_corpo=payload,
                     timeout=self.timeout
                 )
                 
-                if response.status_code == 200:
+                if response.status == 200:
                     return response.json()['response']
                 else:
-                    logger.warning(f"Tentativa {tentativa + 1}: Status {response.status_code}")
+                    logger.warning(f"Tentativa {tentativa + 1}: Status {response.status}")
                     
             except Exception as e:
                 logger.warning(f"Tentativa {tentativa + 1} falhou: {e}")
@@ -7,18 +7,28 @@ A IA controla TUDO: win rate, tempo de expiração, thresholds, etc.
 import logging
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime, timedelta
-import sqlite3
 import json
 
+from banco_dados import obter_banco
+from correlacao_streaming import MatrizCorrelacao, obter_matriz_correlacao
+from estatisticas import obter_estatisticas_ordens
+from registro_features import declarar_consumidor
+
 logger = logging.getLogger(__name__)
 
 class FiltrosQualidade:
-    def __init__(self, db_path: str = "dados/trading.db"):
+    def __init__(self, db_path: str = "dados/trading.db", correlacao: Optional[MatrizCorrelacao] = None):
         """
         Inicializa sistema de filtros de qualidade TOTALMENTE AUTÔNOMO
         A IA controla todos os parâmetros dinamicamente
+        
+        Args:
+            db_path: Banco com as ordens dinâmicas
+            correlacao: Matriz de correlação entre os pares (padrão: a do processo)
         """
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
+        self.correlacao = correlacao
         
         # FILTROS MÍNIMOS ABSOLUTOS (apenas para evitar crashes)
         # A IA controla TUDO o resto dinamicamente
@@ -26,6 +36,13 @@ class FiltrosQualidade:
         self.min_confianca = 0.1  # Confiança mínima 10% (muito baixa para permitir aprendizado)
         self.max_perdas_consecutivas = 50  # Máximo 50 perdas consecutivas (muito permissivo)
         self.tempo_pausa = 2  # Apenas 2 segundos de pausa (muito permissivo)
+        try:
+            import config
+            cfg_correlacao = (config.load_config() or {}).get('correlacao', {}) or {}
+        except Exception:
+            cfg_correlacao = {}
+        # Ordens abertas na mesma direção efetiva em pares correlacionados (mesma exposição)
+        self.max_ordens_correlacionadas = cfg_correlacao.get('max_ordens_correlacionadas', 1)
         
         # REMOVIDO: min_win_rate - A IA determina seu próprio win rate
         # REMOVIDO: tempo_estagnacao_fixo - A IA determina tempo dinamicamente
@@ -34,6 +51,9 @@ class FiltrosQualidade:
         self.ultimas_10_ordens: List[Dict[str, Any]] = []
         self.ultima_pausa: Optional[datetime] = None
         
+        # Indicadores lidos de dados_mercado pelos filtros
+        declarar_consumidor('filtros', ('rsi', 'volatilidade', 'tendencia'))
+        
         logger.info("[FILTROS] Sistema de filtros TOTALMENTE AUTÔNOMO inicializado")
         logger.info("[FILTROS] A IA controla: win rate, tempo de expiração, thresholds, etc.")
     
@@ -70,6 +90,11 @@ class FiltrosQualidade:
             if not self._verificar_limite_ordens_permissivo(symbol):
                 return False, f"Máximo de ordens atingido para {symbol}"
             
+            # 3.1 Filtro de Exposição Correlacionada (pares que andam juntos somam o mesmo risco)
+            correlacionadas = self._ordens_correlacionadas_abertas(symbol, str(decisao.get('decisao', '')).lower())
+            if len(correlacionadas) >= self.max_ordens_correlacionadas:
+                return False, f"Exposição correlacionada já aberta: {', '.join(correlacionadas)}"
+            
             # 4. Filtro de Performance Recente (MÍNIMO ABSOLUTO)
             if not self._verificar_performance_recente_permissivo():
                 return False, "Performance extremamente baixa - pausa ativa"
@@ -121,16 +146,15 @@ class FiltrosQualidade:
         Verifica limite de ordens simultâneas (SEGURANÇA)
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT COUNT(*) FROM ordens_dinamicas 
-                WHERE symbol = ? AND status = 'aberta'
-            """, (symbol,))
+                cursor.execute("""
+                    SELECT COUNT(*) FROM ordens_dinamicas 
+                    WHERE symbol = ? AND status = 'aberta'
+                """, (symbol,))
             
-            count = cursor.fetchone()[0]
-            conn.close()
+                count = cursor.fetchone()[0]
             
             return count < self.max_ordens_simultaneas
             
@@ -138,6 +162,34 @@ class FiltrosQualidade:
             logger.error(f"[FILTROS] Erro ao verificar limite de ordens: {e}")
             return True  # Em caso de erro, permite
     
+    def _ordens_correlacionadas_abertas(self, symbol: str, decisao: str) -> List[str]:
+        """
+        Ordens abertas em pares correlacionados com o symbol na mesma direção efetiva
+        (compra num par com ρ > 0 soma com compra; com ρ < 0, soma com venda)
+        
+        Returns:
+            "PAR (compra, ρ=0.85)" de cada ordem que soma exposição com a nova
+        """
+        try:
+            if decisao not in ('comprar', 'vender'):
+                return []
+            correlacionados = (self.correlacao or obter_matriz_correlacao()).correlacionados(symbol)
+            if not correlacionados:
+                return []
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT symbol, tipo_ordem FROM ordens_dinamicas
+                    WHERE status = 'aberta' AND symbol IN ({', '.join('?' * len(correlacionados))})
+                """, tuple(correlacionados))
+                abertas = cursor.fetchall()
+            direcao = 1 if decisao == 'comprar' else -1
+            return [f"{par} ({tipo}, ρ={correlacionados[par]:.2f})" for par, tipo in abertas
+                    if (1 if tipo == 'compra' else -1) * (1 if correlacionados[par] > 0 else -1) == direcao]
+        except Exception as e:
+            logger.error(f"[FILTROS] Erro ao verificar ordens correlacionadas: {e}")
+            return []  # Em caso de erro, permite
+    
     def _verificar_performance_recente_permissivo(self) -> bool:
         """
         Verifica se a performance recente permite novas entradas (MÍNIMO ABSOLUTO)
@@ -151,18 +203,17 @@ class FiltrosQualidade:
                     return False
             
             # Obter últimas 10 ordens do banco
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT lucro_prejuizo FROM ordens_dinamicas 
-                WHERE status = 'fechada' 
-                ORDER BY timestamp_fechamento DESC 
-                LIMIT 10
-            """)
+                cursor.execute("""
+                    SELECT lucro_prejuizo FROM ordens_dinamicas 
+                    WHERE status = 'fechada' 
+                    ORDER BY fechamento_ms DESC 
+                    LIMIT 10
+                """)
             
-            resultados = cursor.fetchall()
-            conn.close()
+                resultados = cursor.fetchall()
             
             if len(resultados) < 3:  # Poucas ordens, permite
                 return True
@@ -242,6 +293,12 @@ class FiltrosQualidade:
         if 48 <= rsi <= 52 and volatilidade < 0.001:
             return False
         
+        # Com barras multi-timeframe: parado também se nenhuma barra atual andou 0.1%
+        multi_timeframe = dados_mercado.get('multi_timeframe') or {}
+        if multi_timeframe and 48 <= rsi <= 52:
+            if all(ctx.get('amplitude', 0.0) < 0.1 for ctx in multi_timeframe.values()):
+                return False
+        
         return True
     
     def registrar_resultado(self, resultado: str, lucro: float):
@@ -274,34 +331,25 @@ class FiltrosQualidade:
         Retorna status atual dos filtros
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Estatísticas gerais
-            cursor.execute("""
-                SELECT COUNT(*) as total,
-                       SUM(CASE WHEN lucro_prejuizo > 0 THEN 1 ELSE 0 END) as wins,
-                       SUM(CASE WHEN lucro_prejuizo < 0 THEN 1 ELSE 0 END) as losses,
-                       AVG(lucro_prejuizo) as lucro_medio
-                FROM ordens_dinamicas 
-                WHERE status = 'fechada'
-            """)
-            
-            stats = cursor.fetchone()
-            total, wins, losses, lucro_medio = stats
-            
-            win_rate = (wins / total * 100) if total > 0 else 0
-            
-            # Ordens ativas por símbolo
-            cursor.execute("""
-                SELECT symbol, COUNT(*) as count
-                FROM ordens_dinamicas 
-                WHERE status = 'aberta'
-                GROUP BY symbol
-            """)
-            
-            ordens_ativas = dict(cursor.fetchall())
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+            
+                # Estatísticas gerais (agregado mantido por trigger)
+                fechadas = obter_estatisticas_ordens(conn, 'dinamicas')
+                total, wins, losses = fechadas['total'], fechadas['wins'], fechadas['losses']
+                lucro_medio = (fechadas['pnl_total'] / total) if total > 0 else 0
+            
+                win_rate = (wins / total * 100) if total > 0 else 0
+            
+                # Ordens ativas por símbolo
+                cursor.execute("""
+                    SELECT symbol, COUNT(*) as count
+                    FROM ordens_dinamicas 
+                    WHERE status = 'aberta'
+                    GROUP BY symbol
+                """)
+            
+                ordens_ativas = dict(cursor.fetchall())
             
             return {
                 'win_rate': win_rate,
@@ -6,7 +6,14 @@ Analisa ordens abertas e decide quando sair baseado em análise técnica e apren
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from loguru import logger
-import sqlite3
+from banco_dados import obter_banco
+from buffer_precos import obter_buffer_precos
+from cache_features import obter_cache_features
+from indicadores_streaming import obter_gerenciador_indicadores
+from registro_features import declarar_consumidor
+
+# RSI e cruzamento de médias para o fechamento por reversão
+FEATURES_GESTOR = ('rsi', 'ma_20', 'ma_50')
 
 class GestorOrdensIA:
     def __init__(self, db_path: str = "dados/trading.db", parametros_ia: Optional[Dict[str, Any]] = None):
@@ -17,11 +24,31 @@ class GestorOrdensIA:
             parametros_ia: Parâmetros dinâmicos da IA (opcional)
         """
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
         self.parametros_ia = parametros_ia if parametros_ia is not None else {}
         self.ordens_ativas: Dict[str, Dict[str, Any]] = {}
         self.historico_aprendizado: List[Dict[str, Any]] = []
+        # Indicadores lidos do mesmo vetor que o preparador calculou para o tick atual
+        self.features = obter_cache_features()
+        declarar_consumidor('gestor_ordens', FEATURES_GESTOR)
         self.carregar_ordens_abertas()
         
+    def _indicadores_simbolo(self, simbolo: str) -> Dict[str, Any]:
+        """RSI e médias do vetor de features do buffer de ticks do símbolo ({} sem histórico suficiente)"""
+        try:
+            buffer = obter_buffer_precos(simbolo)
+            gerenciador = obter_gerenciador_indicadores()
+            if len(buffer) < gerenciador.janela_necessaria(('rsi',)):
+                return {}
+            features = self.features.de_buffer(simbolo, buffer, gerenciador)
+            indicadores = {'rsi': features['rsi'], 'versao_features': features.versao}
+            if features['amostras'] >= gerenciador.janela_necessaria(('ma_20', 'ma_50')):
+                indicadores.update(media_curta=features['ma_20'], media_longa=features['ma_50'])
+            return indicadores
+        except Exception as e:
+            logger.error(f"Erro ao obter indicadores de {simbolo}: {e}")
+            return {}
+    
     def adicionar_ordem_ativa(self, ordem: Dict[str, Any]) -> None:
         """Adiciona ordem à lista de ordens ativas para monitoramento"""
         self.ordens_ativas[ordem['ordem_id']] = ordem
@@ -46,6 +73,7 @@ class GestorOrdensIA:
         decisoes_saida = []
         preco_atual = dados_mercado['preco_atual']
         simbolo = dados_mercado.get('simbolo', 'WIN')
+        indicadores = dados_mercado.get('indicadores') or self._indicadores_simbolo(simbolo)
         
         for ordem_id, ordem in list(self.ordens_ativas.items()):
             if ordem['simbolo'] != simbolo:
@@ -97,7 +125,6 @@ class GestorOrdensIA:
                         ordem['preco_stop'] = novo_stop
                 
             # --- Fechamento inteligente por sinais de reversão ---
-            indicadores = dados_mercado.get('indicadores', {})
             rsi = indicadores.get('rsi', None)
             media_curta = indicadores.get('media_curta', None)
             media_longa = indicadores.get('media_longa', None)
@@ -519,27 +546,7 @@ class GestorOrdensIA:
     def salvar_aprendizado_saida(self, aprendizado: Dict[str, Any]) -> bool:
         """Salva aprendizado de saída no banco"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Criar tabela se não existir
-            c.execute('''
-            CREATE TABLE IF NOT EXISTS aprendizado_saida (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME NOT NULL,
-                ordem_id TEXT,
-                tipo_ordem TEXT,
-                confianca_entrada DECIMAL(5,2),
-                duracao_segundos DECIMAL(10,2),
-                lucro_percentual DECIMAL(5,2),
-                tipo_saida TEXT,
-                razao_saida TEXT,
-                decisao_saida TEXT,
-                acerto BOOLEAN
-            )
-            ''')
-            
-            c.execute('''
+            self.banco.executar('''
             INSERT INTO aprendizado_saida 
             (timestamp, ordem_id, tipo_ordem, confianca_entrada, duracao_segundos,
              lucro_percentual, tipo_saida, razao_saida, decisao_saida, acerto)
@@ -556,9 +563,6 @@ class GestorOrdensIA:
                 aprendizado['decisao_saida'],
                 aprendizado['acerto']
             ))
-            
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar aprendizado de saída: {e}")
@@ -567,34 +571,32 @@ class GestorOrdensIA:
     def obter_estatisticas_saida(self) -> Dict[str, Any]:
         """Obtém estatísticas de decisões de saída"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
             
-            # Total de saídas
-            c.execute('SELECT COUNT(*) FROM aprendizado_saida')
-            total_saidas = c.fetchone()[0]
+                # Total de saídas
+                c.execute('SELECT COUNT(*) FROM aprendizado_saida')
+                total_saidas = c.fetchone()[0]
             
-            # Taxa de acerto por tipo de saída
-            c.execute('''
-            SELECT tipo_saida, COUNT(*) as total, 
-                   SUM(CASE WHEN acerto = 1 THEN 1 ELSE 0 END) as acertos,
-                   AVG(lucro_percentual) as lucro_medio
-            FROM aprendizado_saida 
-            GROUP BY tipo_saida
-            ''')
-            performance_tipos = {}
-            for row in c.fetchall():
-                performance_tipos[row[0]] = {
-                    'total': row[1],
-                    'acertos': row[2],
-                    'lucro_medio': row[3] or 0.0
-                }
-            
-            # Taxa de acerto geral
-            c.execute('SELECT AVG(CASE WHEN acerto = 1 THEN 1.0 ELSE 0.0 END) FROM aprendizado_saida')
-            taxa_acerto_geral = c.fetchone()[0] or 0.0
+                # Taxa de acerto por tipo de saída
+                c.execute('''
+                SELECT tipo_saida, COUNT(*) as total, 
+                       SUM(CASE WHEN acerto = 1 THEN 1 ELSE 0 END) as acertos,
+                       AVG(lucro_percentual) as lucro_medio
+                FROM aprendizado_saida 
+                GROUP BY tipo_saida
+                ''')
+                performance_tipos = {}
+                for row in c.fetchall():
+                    performance_tipos[row[0]] = {
+                        'total': row[1],
+                        'acertos': row[2],
+                        'lucro_medio': row[3] or 0.0
+                    }
             
-            conn.close()
+                # Taxa de acerto geral
+                c.execute('SELECT AVG(CASE WHEN acerto = 1 THEN 1.0 ELSE 0.0 END) FROM aprendizado_saida')
+                taxa_acerto_geral = c.fetchone()[0] or 0.0
             
             return {
                 'total_saidas': total_saidas,
@@ -612,16 +614,15 @@ class GestorOrdensIA:
         Carrega ordens abertas do banco de dados e adiciona ao monitoramento.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute('''
-                SELECT ordem_id, tipo, simbolo, preco_entrada, preco_alvo, preco_stop, 
-                       confianca_ia, timestamp
-                FROM ordens_simuladas 
-                WHERE status = 'aberta' 
-            ''')
-            rows = c.fetchall()
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
+                c.execute('''
+                    SELECT ordem_id, tipo, simbolo, preco_entrada, preco_alvo, preco_stop, 
+                           confianca_ia, timestamp
+                    FROM ordens_simuladas 
+                    WHERE status = 'aberta' 
+                ''')
+                rows = c.fetchall()
             for row in rows:
                 ordem = self.converter_row_para_ordem(row)
                 self.ordens_ativas[ordem['ordem_id']] = ordem
@@ -5,8 +5,13 @@ from typing import Dict, Any, Optional
 import hashlib
 import time
 
+from registro_features import declarar_consumidor
+
 logger = logging.getLogger(__name__)
 
+# Indicadores que entram no prompt (o contexto multi-timeframe vem das barras)
+FEATURES_PROMPT = ('rsi', 'tendencia', 'volatilidade')
+
 class LlamaCppClient:
     def __init__(self, model_path: str = "phi3:mini", timeout: int = 45, cache_ttl: int = 30):
         """
@@ -16,6 +21,7 @@ class LlamaCppClient:
         self.timeout = timeout
         self.cache: Dict[str, tuple] = {}  # Cache simples para decisões
         self.cache_ttl = cache_ttl  # TTL configurável
+        declarar_consumidor('prompt', FEATURES_PROMPT)
         logger.info(f"[IA] Cliente Llama otimizado inicializado com modelo: {self.model_name} (timeout: {self.timeout}s, cache_ttl: {self.cache_ttl}s)")
     
     def _criar_prompt_trading_otimizado(self, dados: Dict[str, Any]) -> str:
@@ -28,9 +34,29 @@ class LlamaCppClient:
         volume_info = ""
         if 'volume_24h' in dados:
             volume_info = f", Volume24h={dados['volume_24h']:.0f}"
+        # Barra atual de cada timeframe (variação da barra e tendência das últimas barras)
+        timeframes_info = ""
+        if dados.get('multi_timeframe'):
+            timeframes_info = "\nTimeframes: " + " | ".join(
+                f"{tf}={ctx['variacao']:+.2f}% {ctx['tendencia']}" for tf, ctx in dados['multi_timeframe'].items())
+        # Correlação/beta contra o BTC e pares que andam junto (mesma exposição)
+        correlacao_info = ""
+        correlacao = dados.get('correlacao') or {}
+        if None not in (correlacao.get('beta_referencia'), correlacao.get('correlacao_referencia')) \
+                and symbol != correlacao.get('referencia'):
+            correlacao_info = (f"\nCorrelação: ρ={correlacao['correlacao_referencia']:.2f} "
+                               f"β={correlacao['beta_referencia']:.2f} vs {correlacao['referencia']}")
+        if len(correlacao.get('grupo', [])) > 1:
+            correlacao_info += f"\nGrupo correlacionado: {', '.join(correlacao['grupo'])}"
+        # Volatilidade por barra: realizada (EWMA) e prevista (GARCH) contra a de longo prazo
+        previsao_info = ""
+        previsao = dados.get('previsao_volatilidade')
+        if previsao:
+            previsao_info = (f"\nVolatilidade {previsao['timeframe']}: realizada {previsao['realizada'] * 100:.3f}%, "
+                             f"prevista {previsao['prevista'] * 100:.3f}% ({previsao['regime']:.2f}x o normal)")
         
         return f"""ANÁLISE TÉCNICA PREDITIVA - {symbol}
-Dados: RSI={rsi:.1f}, Tendência={tendencia}, Volatilidade={volatilidade:.4f}, Preço=${preco:.2f}{volume_info}
+Dados: RSI={rsi:.1f}, Tendência={tendencia}, Volatilidade={volatilidade:.4f}, Preço=${preco:.2f}{volume_info}{timeframes_info}{correlacao_info}{previsao_info}
 
 REGRAS:
 - Preveja o próximo movimento provável do preço.
@@ -4,11 +4,11 @@ Analisa resultados e permite que a IA ajuste seus próprios parâmetros
 """
 
 import json
-import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from loguru import logger
 import statistics
+from banco_dados import obter_banco
 
 class SistemaAprendizado:
     def __init__(self, db_path: str = "dados/trading.db"):
@@ -19,6 +19,7 @@ class SistemaAprendizado:
             db_path: Caminho para banco de dados
         """
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
         
         # PARÂMETROS INICIAIS (TOTALMENTE AUTÔNOMOS)
         self.parametros_atuais = {
@@ -48,23 +49,22 @@ class SistemaAprendizado:
             Análise de desempenho
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
             
-            # Data limite
-            data_limite = datetime.now() - timedelta(days=dias)
+                # Data limite
+                data_limite = datetime.now() - timedelta(days=dias)
             
-            # Buscar ordens recentes
-            c.execute('''
-            SELECT confianca_ia, resultado, lucro_percentual, duracao_segundos, 
-                   razao_fechamento, tipo, timestamp
-            FROM ordens_simuladas 
-            WHERE status = 'fechada' AND timestamp > ?
-            ORDER BY timestamp DESC
-            ''', (data_limite,))
+                # Buscar ordens recentes
+                c.execute('''
+                SELECT confianca_ia, resultado, lucro_percentual, duracao_segundos, 
+                       razao_fechamento, tipo, timestamp
+                FROM ordens_simuladas 
+                WHERE status = 'fechada' AND timestamp > ?
+                ORDER BY timestamp DESC
+                ''', (data_limite,))
             
-            ordens = c.fetchall()
-            conn.close()
+                ordens = c.fetchall()
             
             if not ordens:
                 return {'total_ordens': 0, 'mensagem': 'Nenhuma ordem recente encontrada'}
@@ -306,12 +306,11 @@ class SistemaAprendizado:
         - Registra todos os ajustes e contexto no histórico.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            # Buscar últimas 7 ordens fechadas
-            c.execute("SELECT resultado FROM ordens_simuladas WHERE status = 'fechada' ORDER BY timestamp_fechamento DESC LIMIT 7;")
-            ultimos_resultados = [row[0] for row in c.fetchall()]
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
+                # Buscar últimas 7 ordens fechadas
+                c.execute("SELECT resultado FROM ordens_simuladas WHERE status = 'fechada' ORDER BY fechamento_ms DESC LIMIT 7;")
+                ultimos_resultados = [row[0] for row in c.fetchall()]
             # Detectar drawdown
             sequencia_losses = 0
             sequencia_wins = 0
@@ -472,19 +471,18 @@ class SistemaAprendizado:
     def _obter_contexto_recente(self, num_ordens: int = 20) -> Dict[str, Any]:
         """Obtém contexto das últimas ordens para ajuste autônomo"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT resultado, confianca_ia, timestamp_fechamento
-                FROM ordens_dinamicas 
-                WHERE status = 'fechada'
-                ORDER BY timestamp_fechamento DESC 
-                LIMIT ?
-            """, (num_ordens,))
+                cursor.execute("""
+                    SELECT resultado, confianca_ia, timestamp_fechamento
+                    FROM ordens_dinamicas 
+                    WHERE status = 'fechada'
+                    ORDER BY fechamento_ms DESC 
+                    LIMIT ?
+                """, (num_ordens,))
             
-            resultados = cursor.fetchall()
-            conn.close()
+                resultados = cursor.fetchall()
             
             if not resultados:
                 return {
@@ -559,10 +557,7 @@ class SistemaAprendizado:
     def _registrar_resultado_basico(self, ordem: Dict[str, Any], resultado: str, lucro_percentual: float):
         """Registra o resultado básico de uma ordem fechada"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            c.execute('''
+            self.banco.executar('''
             INSERT INTO ordens_dinamicas (
                 order_id, confianca_ia, resultado, lucro_percentual,
                 duracao_segundos, razao_fechamento, dados_mercado, timestamp_fechamento
@@ -578,9 +573,6 @@ class SistemaAprendizado:
                 datetime.now()
             ))
             
-            conn.commit()
-            conn.close()
-            
             logger.info(f"📚 Resultado básico registrado para ordem {ordem.get('order_id', '')}")
             
         except Exception as e:
@@ -654,28 +646,7 @@ class SistemaAprendizado:
                     analise_precisao['cenarios_acertados'].append('manter')
             
             # Salvar análise no banco
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Criar tabela se não existir
-            c.execute('''
-            CREATE TABLE IF NOT EXISTS analise_previsoes_ia (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id TEXT,
-                target_previsto REAL,
-                stop_previsto REAL,
-                preco_entrada REAL,
-                preco_fechamento REAL,
-                resultado_real TEXT,
-                lucro_real REAL,
-                precisao_target TEXT,
-                precisao_stop TEXT,
-                cenarios_acertados TEXT,
-                timestamp DATETIME
-            )
-            ''')
-            
-            c.execute('''
+            self.banco.executar('''
             INSERT INTO analise_previsoes_ia (
                 order_id, target_previsto, stop_previsto, preco_entrada, preco_fechamento,
                 resultado_real, lucro_real, precisao_target, precisao_stop, 
@@ -695,9 +666,6 @@ class SistemaAprendizado:
                 analise_precisao['timestamp']
             ))
             
-            conn.commit()
-            conn.close()
-            
             logger.info(f"🎯 Análise de previsões registrada: Target {analise_precisao['precisao_target']}, Stop {analise_precisao['precisao_stop']}")
             
         except Exception as e:
@@ -759,24 +727,22 @@ class SistemaAprendizado:
     def obter_estatisticas_aprendizado(self) -> Dict[str, Any]:
         """Obtém estatísticas do sistema de aprendizado"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Total de registros de aprendizado
-            c.execute('SELECT COUNT(*) FROM aprendizado_ia')
-            total_registros = c.fetchone()[0]
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
             
-            # Taxa de acerto geral
-            c.execute('SELECT AVG(CASE WHEN resultado = \'win\' THEN 1.0 ELSE 0.0 END) FROM aprendizado_ia')
-            taxa_acerto_geral = c.fetchone()[0] or 0.0
+                # Total de registros de aprendizado
+                c.execute('SELECT COUNT(*) FROM aprendizado_ia')
+                total_registros = c.fetchone()[0]
             
-            # Ajustes realizados
-            total_ajustes = len(self.historico_ajustes)
+                # Taxa de acerto geral
+                c.execute('SELECT AVG(CASE WHEN resultado = \'win\' THEN 1.0 ELSE 0.0 END) FROM aprendizado_ia')
+                taxa_acerto_geral = c.fetchone()[0] or 0.0
             
-            # Últimos ajustes
-            ultimos_ajustes = self.historico_ajustes[-5:] if self.historico_ajustes else []
+                # Ajustes realizados
+                total_ajustes = len(self.historico_ajustes)
             
-            conn.close()
+                # Últimos ajustes
+                ultimos_ajustes = self.historico_ajustes[-5:] if self.historico_ajustes else []
             
             return {
                 'total_registros_aprendizado': total_registros,
@@ -793,27 +759,25 @@ class SistemaAprendizado:
     def obter_estatisticas_previsoes(self, dias: int = 7) -> Dict[str, Any]:
         """Obtém estatísticas de precisão das previsões da IA"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Verificar se tabela existe
-            c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='analise_previsoes_ia'")
-            if not c.fetchone():
-                conn.close()
-                return {'mensagem': 'Nenhuma análise de previsões encontrada'}
-            
-            # Data limite
-            data_limite = datetime.now() - timedelta(days=dias)
-            
-            # Buscar análises recentes
-            c.execute('''
-            SELECT precisao_target, precisao_stop, resultado_real, lucro_real, cenarios_acertados
-            FROM analise_previsoes_ia 
-            WHERE timestamp > ?
-            ''', (data_limite,))
-            
-            analises = c.fetchall()
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                c = conn.cursor()
+            
+                # Verificar se tabela existe
+                c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='analise_previsoes_ia'")
+                if not c.fetchone():
+                    return {'mensagem': 'Nenhuma análise de previsões encontrada'}
+            
+                # Data limite
+                data_limite = datetime.now() - timedelta(days=dias)
+            
+                # Buscar análises recentes
+                c.execute('''
+                SELECT precisao_target, precisao_stop, resultado_real, lucro_real, cenarios_acertados
+                FROM analise_previsoes_ia 
+                WHERE timestamp > ?
+                ''', (data_limite,))
+            
+                analises = c.fetchall()
             
             if not analises:
                 return {'total_analises': 0, 'mensagem': 'Nenhuma análise recente encontrada'}
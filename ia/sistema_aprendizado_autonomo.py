@@ -4,7 +4,6 @@ Sistema de Aprendizado Autônomo da IA
 A IA determina sua própria confiança e aprende com resultados
 """
 
-import sqlite3
 import json
 import time
 import logging
@@ -14,6 +13,10 @@ from dataclasses import dataclass, asdict
 import numpy as np
 from collections import defaultdict, deque
 
+from banco_dados import obter_banco
+from correlacao_streaming import MatrizCorrelacao, obter_matriz_correlacao
+from registro_features import declarar_consumidor
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -74,9 +77,11 @@ class ParametrosIA:
 class SistemaAprendizadoAutonomo:
     """Sistema de IA autônoma com controle total"""
     
-    def __init__(self, db_path: str = "dados/trading.db"):
-        """Inicializa o sistema de aprendizado autônomo"""
+    def __init__(self, db_path: str = "dados/trading.db", correlacao: Optional[MatrizCorrelacao] = None):
+        """Inicializa o sistema de aprendizado autônomo (correlacao: matriz entre os pares, padrão a do processo)"""
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
+        self.correlacao = correlacao
         self.parametros_padrao = {
             'stop_loss_padrao': -2.0,
             'take_profit_padrao': 3.0,
@@ -88,120 +93,65 @@ class SistemaAprendizadoAutonomo:
         self.resultados = deque(maxlen=100)  # Memória de resultados
         self.estatisticas = defaultdict(list)  # Estatísticas por período
         self.ultima_analise = {}  # Sempre um dicionário para contexto de análise
-        self._criar_tabelas()
         self._carregar_estado()
+        # Indicadores de entrada guardados em ResultadoTrade
+        declarar_consumidor('aprendizado', ('rsi', 'volatilidade', 'tendencia'))
         logger.info("🧠 Sistema de Aprendizado Autônomo inicializado")
     
-    def _criar_tabelas(self):
-        """Cria tabelas no banco de dados se não existirem"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ajustes_parametros (
-                    timestamp TEXT PRIMARY KEY,
-                    parametros TEXT NOT NULL,
-                    win_rate REAL NOT NULL,
-                    pnl_medio REAL NOT NULL,
-                    resultado TEXT NOT NULL
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS aprendizado_autonomo (
-                    timestamp TEXT PRIMARY KEY,
-                    symbol TEXT NOT NULL,
-                    direcao TEXT NOT NULL,
-                    preco_entrada REAL NOT NULL,
-                    preco_saida REAL NOT NULL,
-                    quantidade REAL NOT NULL,
-                    lucro_prejuizo REAL NOT NULL,
-                    duracao REAL NOT NULL,
-                    rsi_entrada REAL NOT NULL,
-                    volatilidade_entrada REAL NOT NULL,
-                    tendencia_entrada TEXT NOT NULL,
-                    confianca_entrada REAL NOT NULL,
-                    stop_loss REAL NOT NULL,
-                    take_profit REAL NOT NULL,
-                    motivo_saida TEXT NOT NULL,
-                    indicadores_entrada TEXT NOT NULL,
-                    sucesso INTEGER NOT NULL,
-                    contexto_order_book TEXT
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ordens_dinamicas (
-                    order_id TEXT PRIMARY KEY,
-                    symbol TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    timestamp TEXT NOT NULL
-                )
-            """)
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao criar tabelas: {e}")
-    
     def _carregar_estado(self):
         """Carrega o estado atual do sistema do banco de dados"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM ajustes_parametros ORDER BY timestamp DESC LIMIT 1
-            """)
-            ultimo_ajuste = cursor.fetchone()
-            
-            if ultimo_ajuste:
-                ajuste_data = json.loads(ultimo_ajuste[1])
-                self.parametros = ParametrosIA(**ajuste_data)
-                self.performance_global = {
-                    'total_trades': 0, # Placeholder, precisa ser atualizado
-                    'wins': 0, # Placeholder, precisa ser atualizado
-                    'losses': 0, # Placeholder, precisa ser atualizado
-                    'pnl_total': 0.0, # Placeholder, precisa ser atualizado
-                    'win_rate': 0.0, # Placeholder, precisa ser atualizado
-                    'avg_win': 0.0, # Placeholder, precisa ser atualizado
-                    'avg_loss': 0.0, # Placeholder, precisa ser atualizado
-                    'max_drawdown': 0.0 # Placeholder, precisa ser atualizado
-                }
-                self.historico_ajustes = [ajuste_data] # Carregar apenas o último ajuste
-            else:
-                self.parametros = ParametrosIA()
-                self.performance_global = {
-                    'total_trades': 0,
-                    'wins': 0,
-                    'losses': 0,
-                    'pnl_total': 0.0,
-                    'win_rate': 0.0,
-                    'avg_win': 0.0,
-                    'avg_loss': 0.0,
-                    'max_drawdown': 0.0
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute("""
+                    SELECT * FROM ajustes_parametros ORDER BY timestamp DESC LIMIT 1
+                """)
+                ultimo_ajuste = cursor.fetchone()
+            
+                if ultimo_ajuste:
+                    ajuste_data = json.loads(ultimo_ajuste[1])
+                    self.parametros = ParametrosIA(**ajuste_data)
+                    self.performance_global = {
+                        'total_trades': 0, # Placeholder, precisa ser atualizado
+                        'wins': 0, # Placeholder, precisa ser atualizado
+                        'losses': 0, # Placeholder, precisa ser atualizado
+                        'pnl_total': 0.0, # Placeholder, precisa ser atualizado
+                        'win_rate': 0.0, # Placeholder, precisa ser atualizado
+                        'avg_win': 0.0, # Placeholder, precisa ser atualizado
+                        'avg_loss': 0.0, # Placeholder, precisa ser atualizado
+                        'max_drawdown': 0.0 # Placeholder, precisa ser atualizado
+                    }
+                    self.historico_ajustes = [ajuste_data] # Carregar apenas o último ajuste
+                else:
+                    self.parametros = ParametrosIA()
+                    self.performance_global = {
+                        'total_trades': 0,
+                        'wins': 0,
+                        'losses': 0,
+                        'pnl_total': 0.0,
+                        'win_rate': 0.0,
+                        'avg_win': 0.0,
+                        'avg_loss': 0.0,
+                        'max_drawdown': 0.0
+                    }
+                    self.historico_ajustes = []
+            
+                # Carregar estado do mercado
+                cursor.execute("""
+                    SELECT * FROM ordens_dinamicas
+                """)
+                ordens_ativas = cursor.fetchall()
+                self.estado_mercado = {
+                    'btcusdt': {'ultima_ordem': None, 'ordens_ativas': 0, 'direcao_atual': None},
+                    'ethusdt': {'ultima_ordem': None, 'ordens_ativas': 0, 'direcao_atual': None}
                 }
-                self.historico_ajustes = []
-            
-            # Carregar estado do mercado
-            cursor.execute("""
-                SELECT * FROM ordens_dinamicas
-            """)
-            ordens_ativas = cursor.fetchall()
-            self.estado_mercado = {
-                'btcusdt': {'ultima_ordem': None, 'ordens_ativas': 0, 'direcao_atual': None},
-                'ethusdt': {'ultima_ordem': None, 'ordens_ativas': 0, 'direcao_atual': None}
-            }
-            for ordem in ordens_ativas:
-                par = ordem[2].upper()
-                if par in self.estado_mercado:
-                    self.estado_mercado[par]['ordens_ativas'] = 1
-                    self.estado_mercado[par]['direcao_atual'] = 'compra' if ordem[3] == 'compra' else 'venda'
-                    self.estado_mercado[par]['ultima_ordem'] = datetime.fromisoformat(ordem[4]).timestamp()
-            
-            conn.close()
+                for ordem in ordens_ativas:
+                    par = ordem[2].upper()
+                    if par in self.estado_mercado:
+                        self.estado_mercado[par]['ordens_ativas'] = 1
+                        self.estado_mercado[par]['direcao_atual'] = 'compra' if ordem[3] == 'compra' else 'venda'
+                        self.estado_mercado[par]['ultima_ordem'] = datetime.fromisoformat(ordem[4]).timestamp()
             
         except Exception as e:
             logger.error(f"❌ Erro ao carregar estado do sistema: {e}")
@@ -216,9 +166,6 @@ class SistemaAprendizadoAutonomo:
             self._atualizar_estatisticas(resultado)
             
             # Salvar no banco de dados com contexto completo
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Incluir contexto do order book se disponível
             contexto_order_book = ""
             if hasattr(resultado, 'indicadores_entrada') and resultado.indicadores_entrada:
@@ -230,7 +177,7 @@ class SistemaAprendizadoAutonomo:
                     'liquidity_clusters': ob_data.get('liquidity_clusters', 0)
                 })
             
-            cursor.execute("""
+            self.banco.executar("""
                 INSERT INTO aprendizado_autonomo (
                     timestamp, symbol, direcao, preco_entrada, preco_saida, quantidade,
                     lucro_prejuizo, duracao, rsi_entrada, volatilidade_entrada,
@@ -247,9 +194,6 @@ class SistemaAprendizadoAutonomo:
                 1 if resultado.sucesso else 0, contexto_order_book
             ))
             
-            conn.commit()
-            conn.close()
-            
             logger.info(f"📊 Resultado registrado: {resultado.symbol} {resultado.direcao} - PnL: {resultado.pnl:.4f} ({resultado.pnl_percentual:.2f}%) - {'✅' if resultado.sucesso else '❌'}")
             
             # Ajustar parâmetros baseado no resultado
@@ -275,11 +219,12 @@ class SistemaAprendizadoAutonomo:
         win_rate_recente = sum(1 for r in resultados_recentes if r.sucesso) / len(resultados_recentes)
         pnl_medio_recente = float(np.mean([r.pnl_percentual for r in resultados_recentes]))
         
-        # Análise por par
-        for par in ['BTCUSDT', 'ETHUSDT']:
-            resultados_par = [r for r in resultados_recentes if r.symbol == par]
-            if len(resultados_par) >= 3:
-                self.ajustar_parametros_par(par, resultados_par)
+        # Análise por grupo de pares correlacionados (pares que andam juntos são a mesma aposta)
+        simbolos = {r.symbol for r in resultados_recentes}
+        for grupo in (self.correlacao or obter_matriz_correlacao()).agrupar(simbolos):
+            resultados_grupo = [r for r in resultados_recentes if r.symbol in grupo]
+            if len(resultados_grupo) >= 3:
+                self.ajustar_parametros_par('/'.join(grupo), resultados_grupo)
         
         # Ajustes globais baseados em performance
         self.ajustar_parametros_globais(win_rate_recente, pnl_medio_recente)
@@ -297,7 +242,7 @@ class SistemaAprendizadoAutonomo:
         logger.info(f"[IA AUTÔNOMA] Ajuste realizado - Win Rate: {win_rate_recente:.2%}, PnL Médio: {pnl_medio_recente:.2f}%")
     
     def ajustar_parametros_par(self, par: str, resultados: List[ResultadoTrade]):
-        """Ajusta parâmetros específicos para um par"""
+        """Ajusta parâmetros específicos para um par (ou grupo de pares correlacionados, "BTCUSDT/ETHUSDT")"""
         if not resultados:
             return
         
@@ -409,10 +354,7 @@ class SistemaAprendizadoAutonomo:
     def _salvar_ajuste_parametros(self, parametros: Dict[str, Any], win_rate: float, pnl_medio: float):
         """Salva ajustes de parâmetros para aprendizado"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 INSERT INTO ajustes_parametros (
                     timestamp, parametros, win_rate, pnl_medio, resultado
                 ) VALUES (?, ?, ?, ?, ?)
@@ -424,9 +366,6 @@ class SistemaAprendizadoAutonomo:
                 'melhoria' if pnl_medio > 0 else 'piora'
             ))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"❌ Erro ao salvar ajuste de parâmetros: {e}")
     
@@ -489,13 +428,12 @@ class SistemaAprendizadoAutonomo:
     def _em_pausa(self, par: str) -> bool:
         """Verifica se o par está em pausa automática"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) FROM pausas_inteligentes WHERE par = ? AND ativa = 1 AND timestamp > datetime('now', '-30 minutes')
-            """, (par,))
-            em_pausa = cursor.fetchone()[0] > 0
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT COUNT(*) FROM pausas_inteligentes WHERE par = ? AND ativa = 1 AND timestamp > datetime('now', '-30 minutes')
+                """, (par,))
+                em_pausa = cursor.fetchone()[0] > 0
             return em_pausa
         except Exception as e:
             logger.error(f"❌ Erro ao verificar pausa: {e}")
@@ -504,23 +442,9 @@ class SistemaAprendizadoAutonomo:
     def _registrar_pausa(self, par: str, motivo: str):
         """Registra uma pausa automática para o par"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS pausas_inteligentes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    par TEXT NOT NULL,
-                    motivo TEXT NOT NULL,
-                    duracao_minutos INTEGER DEFAULT 30,
-                    ativa BOOLEAN DEFAULT TRUE
-                )
-            """)
-            cursor.execute("""
+            self.banco.executar("""
                 INSERT INTO pausas_inteligentes (par, motivo, duracao_minutos, ativa) VALUES (?, ?, ?, 1)
             """, (par, motivo, 30))
-            conn.commit()
-            conn.close()
         except Exception as e:
             logger.error(f"❌ Erro ao registrar pausa: {e}")
     
@@ -613,42 +537,40 @@ class SistemaAprendizadoAutonomo:
     def _obter_resultados_recentes(self, limite: int = 50) -> List[ResultadoTrade]:
         """Obtém resultados recentes para análise"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM aprendizado_autonomo 
-                WHERE lucro_prejuizo IS NOT NULL 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (limite,))
-            
-            resultados = []
-            for row in cursor.fetchall():
-                # Converter row para ResultadoTrade
-                resultado = ResultadoTrade(
-                    timestamp=row[1],
-                    symbol=row[2],
-                    direcao=row[3],
-                    preco_entrada=0.0,  # Não disponível na tabela atual
-                    preco_saida=0.0,
-                    quantidade=0.0,
-                    pnl=row[10] or 0.0,
-                    pnl_percentual=0.0,
-                    duracao=0.0,
-                    rsi_entrada=50.0,  # Valor padrão
-                    volatilidade_entrada=0.01,  # Valor padrão
-                    tendencia_entrada='lateral',  # Valor padrão
-                    confianca_entrada=row[4] or 0.0,
-                    stop_loss=0.0,
-                    take_profit=0.0,
-                    motivo_saida='',
-                    indicadores_entrada={},
-                    sucesso=row[10] > 0 if row[10] else False
-                )
-                resultados.append(resultado)
-            
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute("""
+                    SELECT * FROM aprendizado_autonomo 
+                    WHERE lucro_prejuizo IS NOT NULL 
+                    ORDER BY timestamp DESC 
+                    LIMIT ?
+                """, (limite,))
+            
+                resultados = []
+                for row in cursor.fetchall():
+                    # Converter row para ResultadoTrade
+                    resultado = ResultadoTrade(
+                        timestamp=row[1],
+                        symbol=row[2],
+                        direcao=row[3],
+                        preco_entrada=0.0,  # Não disponível na tabela atual
+                        preco_saida=0.0,
+                        quantidade=0.0,
+                        pnl=row[10] or 0.0,
+                        pnl_percentual=0.0,
+                        duracao=0.0,
+                        rsi_entrada=50.0,  # Valor padrão
+                        volatilidade_entrada=0.01,  # Valor padrão
+                        tendencia_entrada='lateral',  # Valor padrão
+                        confianca_entrada=row[4] or 0.0,
+                        stop_loss=0.0,
+                        take_profit=0.0,
+                        motivo_saida='',
+                        indicadores_entrada={},
+                        sucesso=row[10] > 0 if row[10] else False
+                    )
+                    resultados.append(resultado)
             return resultados
             
         except Exception as e:
@@ -658,23 +580,21 @@ class SistemaAprendizadoAutonomo:
     def _obter_ordens_abertas(self, par: str) -> List[Dict[str, Any]]:
         """Obtém ordens abertas para um par específico"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM ordens_dinamicas 
-                WHERE symbol = ? AND status = 'aberta'
-            """, (par,))
-            
-            ordens = []
-            for row in cursor.fetchall():
-                ordens.append({
-                    'order_id': row[1],
-                    'symbol': row[2],
-                    'status': row[11]
-                })
-            
-            conn.close()
+            with self.banco.conexao_leitura() as conn:
+                cursor = conn.cursor()
+            
+                cursor.execute("""
+                    SELECT * FROM ordens_dinamicas 
+                    WHERE symbol = ? AND status = 'aberta'
+                """, (par,))
+            
+                ordens = []
+                for row in cursor.fetchall():
+                    ordens.append({
+                        'order_id': row[1],
+                        'symbol': row[2],
+                        'status': row[11]
+                    })
             return ordens
             
         except Exception as e:
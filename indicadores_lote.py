@@ -0,0 +1,339 @@
+"""
+Indicadores técnicos em lote sobre uma matriz símbolos × candles
+
+Em vez de calcular símbolo por símbolo, as séries de todos os pares ficam numa
+matriz 2-D (uma linha por símbolo, do candle mais antigo para o mais recente)
+e cada indicador sai de uma passada vetorizada para todas as linhas:
+  - médias exponenciais (EMA/MACD, RSI e ATR de Wilder): uma só recorrência
+    no tempo para todas as séries empilhadas, cada passo é uma operação
+    NumPy sobre o vetor de símbolos
+  - médias móveis, Bandas de Bollinger, volatilidade dos retornos e volume
+    médio: somas móveis por diferença de somas acumuladas, sem laço em Python
+Históricos de tamanhos diferentes ficam alinhados à direita, com NaN (ou a
+máscara) onde o símbolo ainda não tem candle; janelas que tocam um NaN saem
+NaN, como no pandas rolling, e as médias exponenciais pulam os NaN.
+
+As fórmulas e os neutros são os mesmos de indicadores_streaming.py (RSI de
+Wilder, EMAs ajustadas como pandas ewm(span=n), desvio amostral ddof=1).
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+
+from indicadores_streaming import PARAMETROS_PADRAO, _config_indicadores
+
+PARAMETROS_LOTE = dict(PARAMETROS_PADRAO, periodo_atr=14)
+TENDENCIAS = {1: 'alta', -1: 'baixa', 0: 'lateral'}
+
+
+_padrao: Optional[Dict[str, Any]] = None
+
+
+def _parametros(parametros: Mapping[str, Any]) -> Dict[str, Any]:
+    """PARAMETROS_LOTE + seção indicadores do config.yaml (lida uma vez) + sobrescritas"""
+    global _padrao
+    if _padrao is None:
+        _padrao = dict(PARAMETROS_LOTE)
+        _padrao.update(_config_indicadores())
+    p = dict(_padrao)
+    p.update(parametros)
+    return p
+
+
+# ----------------------------------------------------------------------
+# Montagem da matriz
+# ----------------------------------------------------------------------
+def montar_matriz(series: Sequence[np.ndarray], n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Alinha séries de tamanhos diferentes à direita numa matriz
+
+    Args:
+        series: Uma série por símbolo, do mais antigo para o mais recente
+        n: Colunas da matriz (padrão: a maior série); séries maiores perdem o início
+
+    Returns:
+        (matriz símbolos × n com NaN à esquerda das séries curtas, máscara dos valores presentes)
+    """
+    n = n if n is not None else max((len(s) for s in series), default=0)
+    matriz = np.full((len(series), n), np.nan)
+    for i, serie in enumerate(series):
+        k = min(len(serie), n)
+        if k:
+            matriz[i, n - k:] = np.asarray(serie, dtype=float)[-k:]
+    return matriz, ~np.isnan(matriz)
+
+
+def matrizes_de_klines(caches: Sequence[Any], n: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Matrizes open/high/low/close/volume dos últimos n candles de cada CacheKlines
+
+    Returns:
+        Dicionário coluna -> matriz símbolos × n, mais 'mascara'
+    """
+    janelas = [cache.janela(n) for cache in caches]
+    matrizes = {}
+    for coluna in ('open', 'high', 'low', 'close', 'volume'):
+        matrizes[coluna], mascara = montar_matriz([j[coluna] for j in janelas], n)
+    matrizes['mascara'] = mascara
+    return matrizes
+
+
+# ----------------------------------------------------------------------
+# Blocos vetorizados
+# ----------------------------------------------------------------------
+def _ewm(series: Sequence[Tuple[np.ndarray, float, bool]]) -> List[np.ndarray]:
+    """
+    Médias exponenciais de várias matrizes numa só passada no tempo
+
+    Cada item é (matriz, alfa, ajustada). Ajustada é pandas ewm(adjust=True);
+    senão ewm(adjust=False), a suavização de Wilder com alfa=1/n. As duas são a
+    razão numerador/denominador de pesos decaindo por (1-alfa): a primeira
+    observação pesa 1 e as seguintes 1 (ajustada) ou alfa. NaN não entra nem
+    decai o estado.
+    """
+    x = np.concatenate([m for m, _, _ in series])
+    validos = ~np.isnan(x)
+    decaimento = np.concatenate([np.full(len(m), 1 - alfa) for m, alfa, _ in series])
+    peso = np.concatenate([np.full(len(m), 1.0 if ajustada else alfa) for m, alfa, ajustada in series])
+    iniciado = (np.cumsum(validos, axis=1) - validos) > 0
+    pesos = np.where(validos, np.where(iniciado, peso[:, None], 1.0), 0.0)
+    # Tempo na primeira dimensão: cada passo lê e grava uma linha contígua
+    decaimentos = np.ascontiguousarray(np.where(validos, decaimento[:, None], 1.0).T)
+    termos = np.ascontiguousarray((pesos * np.where(validos, x, 0.0)).T)
+    pesos = np.ascontiguousarray(pesos.T)
+
+    numerador = np.empty_like(termos)
+    denominador = np.empty_like(termos)
+    num = np.zeros(len(x))
+    den = np.zeros(len(x))
+    for t in range(len(termos)):
+        num *= decaimentos[t]
+        num += termos[t]
+        den *= decaimentos[t]
+        den += pesos[t]
+        numerador[t] = num
+        denominador[t] = den
+    saida = np.full_like(x, np.nan)
+    np.divide(numerador.T, denominador.T, out=saida, where=validos)
+
+    resultado, inicio = [], 0
+    for m, _, _ in series:
+        resultado.append(saida[inicio:inicio + len(m)])
+        inicio += len(m)
+    return resultado
+
+
+def _somas_moveis(x: np.ndarray, n: int) -> np.ndarray:
+    """Soma dos últimos n valores de cada coluna por diferença de somas acumuladas"""
+    acumulado = np.zeros((len(x), x.shape[1] + n))
+    np.cumsum(x, axis=1, out=acumulado[:, n:])
+    return acumulado[:, n:] - acumulado[:, :-n]
+
+
+def _presentes(x: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(valores com NaN zerado, quantos dos últimos n valores estão presentes)"""
+    validos = ~np.isnan(x)
+    return np.where(validos, x, 0.0), _somas_moveis(validos.astype(float), n)
+
+
+def media_movel(x: np.ndarray, n: int) -> np.ndarray:
+    """Média dos últimos n valores (NaN se a janela não está completa)"""
+    valores, contagem = _presentes(x, n)
+    return np.where(contagem == n, _somas_moveis(valores, n) / n, np.nan)
+
+
+def desvio_movel(x: np.ndarray, n: int) -> np.ndarray:
+    """Desvio padrão amostral dos últimos n valores (NaN se a janela não está completa)"""
+    valores, contagem = _presentes(x, n)
+    # Deslocar cada linha pelo seu primeiro valor evita o cancelamento de soma(x²) - soma(x)²/n em preços altos
+    validos = ~np.isnan(x)
+    referencia = valores[np.arange(len(x)), np.argmax(validos, axis=1)]
+    centrados = np.where(validos, valores - referencia[:, None], 0.0)
+    soma = _somas_moveis(centrados, n)
+    quadrados = _somas_moveis(centrados * centrados, n)
+    variancia = np.maximum(quadrados - soma * soma / n, 0.0) / (n - 1)
+    return np.where(contagem == n, np.sqrt(variancia), np.nan)
+
+
+def _media_disponivel(x: np.ndarray, n: int) -> np.ndarray:
+    """Média dos valores presentes entre os últimos n (como o volume médio do motor incremental)"""
+    valores, contagem = _presentes(x, n)
+    saida = np.full_like(valores, np.nan)
+    np.divide(_somas_moveis(valores, n), contagem, out=saida, where=contagem > 0)
+    return saida
+
+
+def _anterior(x: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.full((len(x), 1), np.nan), x[:, :-1]], axis=1)
+
+
+def ema(x: np.ndarray, periodo: int) -> np.ndarray:
+    """EMA de cada linha (pandas ewm(span=periodo))"""
+    return _ewm([(x, 2 / (periodo + 1), True)])[0]
+
+
+def rsi(close: np.ndarray, periodo: int = 14) -> np.ndarray:
+    """RSI de Wilder de cada linha (NaN até haver periodo variações)"""
+    delta = close - _anterior(close)
+    ganho, perda = _ewm([(np.clip(delta, 0, None), 1 / periodo, False),
+                         (np.clip(-delta, 0, None), 1 / periodo, False)])
+    return _rsi(ganho, perda, _contagem(close), periodo)
+
+
+def _rsi(ganho: np.ndarray, perda: np.ndarray, contagem: np.ndarray, periodo: int) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valor = 100 - 100 / (1 + ganho / perda)
+    valor = np.where(perda == 0, np.where(ganho > 0, 100.0, 50.0), valor)
+    return np.where(contagem > periodo, valor, np.nan)
+
+
+def _contagem(x: np.ndarray) -> np.ndarray:
+    return np.cumsum(~np.isnan(x), axis=1)
+
+
+def macd(close: np.ndarray, rapida: int = 12, lenta: int = 26, sinal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(MACD, sinal, histograma) de cada linha (NaN antes de `lenta` candles)"""
+    ema_rapida, ema_lenta = _ewm([(close, 2 / (rapida + 1), True), (close, 2 / (lenta + 1), True)])
+    return _macd(ema_rapida, ema_lenta, _contagem(close), lenta, sinal)
+
+
+def _macd(ema_rapida, ema_lenta, contagem, lenta, sinal):
+    linha = ema_rapida - ema_lenta
+    linha_sinal = _ewm([(linha, 2 / (sinal + 1), True)])[0]
+    aquecido = contagem >= lenta
+    linha, linha_sinal = np.where(aquecido, linha, np.nan), np.where(aquecido, linha_sinal, np.nan)
+    return linha, linha_sinal, linha - linha_sinal
+
+
+def bollinger(close: np.ndarray, periodo: int = 20, desvios: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(média, banda superior, banda inferior) de cada linha"""
+    media = media_movel(close, periodo)
+    desvio = desvio_movel(close, periodo)
+    return media, media + desvios * desvio, media - desvios * desvio
+
+
+def _verdadeira(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    anterior = _anterior(close)
+    # fmax ignora o NaN do fechamento anterior no primeiro candle (amplitude = máxima - mínima)
+    return np.fmax(high - low, np.fmax(np.abs(high - anterior), np.abs(low - anterior)))
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, periodo: int = 14) -> np.ndarray:
+    """ATR de Wilder de cada linha (NaN antes de `periodo` candles)"""
+    media = _ewm([(_verdadeira(high, low, close), 1 / periodo, False)])[0]
+    return np.where(_contagem(close) >= periodo, media, np.nan)
+
+
+def volatilidade(close: np.ndarray, periodo: int = 20) -> np.ndarray:
+    """Desvio padrão amostral dos retornos simples dos últimos `periodo` candles"""
+    return desvio_movel(close / _anterior(close) - 1, periodo)
+
+
+# ----------------------------------------------------------------------
+# Todos os indicadores de uma vez
+# ----------------------------------------------------------------------
+def calcular_lote(close: np.ndarray, high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None,
+                  volume: Optional[np.ndarray] = None, mascara: Optional[np.ndarray] = None,
+                  **parametros) -> Dict[str, np.ndarray]:
+    """
+    Calcula todos os indicadores para todos os símbolos
+
+    Args:
+        close: Matriz símbolos × candles de fechamentos (NaN = sem candle)
+        high, low: Máximas e mínimas (ATR usa o fechamento quando ausentes)
+        volume: Volumes (volume_medio fica NaN quando ausente)
+        mascara: Valores presentes (False vira NaN em todas as matrizes)
+        **parametros: Sobrescrevem PARAMETROS_LOTE / seção indicadores do config.yaml
+
+    Returns:
+        Dicionário indicador -> matriz símbolos × candles ('tendencia' em 1/-1/0)
+    """
+    p = _parametros(parametros)
+    close = np.asarray(close, dtype=float)
+    high = close if high is None else np.asarray(high, dtype=float)
+    low = close if low is None else np.asarray(low, dtype=float)
+    volume = np.full_like(close, np.nan) if volume is None else np.asarray(volume, dtype=float)
+    if mascara is not None:
+        close, high, low, volume = (np.where(mascara, m, np.nan) for m in (close, high, low, volume))
+
+    contagem = _contagem(close)
+    delta = close - _anterior(close)
+    # Uma passada no tempo para as EMAs do MACD, as médias de Wilder do RSI e a do ATR
+    ema_rapida, ema_lenta, ganho, perda, media_verdadeira = _ewm([
+        (close, 2 / (p['ema_rapida'] + 1), True),
+        (close, 2 / (p['ema_lenta'] + 1), True),
+        (np.clip(delta, 0, None), 1 / p['periodo_rsi'], False),
+        (np.clip(-delta, 0, None), 1 / p['periodo_rsi'], False),
+        (_verdadeira(high, low, close), 1 / p['periodo_atr'], False),
+    ])
+    linha, linha_sinal, histograma = _macd(ema_rapida, ema_lenta, contagem, p['ema_lenta'], p['ema_sinal'])
+
+    resultado = {
+        'amostras': contagem,
+        'rsi': _rsi(ganho, perda, contagem, p['periodo_rsi']),
+        'macd': linha,
+        'macd_signal': linha_sinal,
+        'macd_hist': histograma,
+        'atr': np.where(contagem >= p['periodo_atr'], media_verdadeira, np.nan),
+        'volatilidade': volatilidade(close, p['periodo_volatilidade']),
+        'volume_medio': _media_disponivel(volume, p['periodo_volume']),
+    }
+    tamanhos = set(p['medias']) | {p['periodo_bollinger'], p['tendencia_curta'], p['tendencia_longa']}
+    medias = {n: media_movel(close, n) for n in tamanhos}
+    for n in p['medias']:
+        resultado[f"ma_{n}"] = medias[n]
+    media_bb = medias[p['periodo_bollinger']]
+    largura = p['desvios_bollinger'] * desvio_movel(close, p['periodo_bollinger'])
+    resultado.update(bb_media=media_bb, bb_upper=media_bb + largura, bb_lower=media_bb - largura)
+
+    n = p['tendencia_longa']
+    if p['metodo_tendencia'] == 'medias':
+        atual, base = medias[p['tendencia_curta']], medias[n]
+    else:
+        # Preço contra o de n - 1 candles antes (o mais antigo da janela de n), só com a janela completa
+        atual = np.where(np.isnan(medias[n]), np.nan, close)
+        base = np.concatenate([np.full((len(close), n - 1), np.nan), close[:, :close.shape[1] - n + 1]], axis=1)
+    limiar = p['limiar_tendencia']
+    with np.errstate(invalid='ignore'):
+        resultado['tendencia'] = np.where(atual > base * (1 + limiar), 1,
+                                          np.where(atual < base * (1 - limiar), -1, 0)).astype(np.int8)
+    return resultado
+
+
+def resumo_lote(lote: Dict[str, np.ndarray], close: np.ndarray, simbolos: Sequence[str],
+                historico: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Indicadores do último candle de cada símbolo, com os neutros do motor incremental
+
+    Args:
+        lote: Resultado de calcular_lote()
+        close: A mesma matriz de fechamentos
+        simbolos: Nome de cada linha
+        historico: Últimos preços em historico_precos (padrão: parâmetro historico)
+
+    Returns:
+        Dicionário símbolo -> indicadores (símbolos sem nenhum candle ficam de fora)
+    """
+    historico = historico or _parametros({})['historico']
+    ultimos = {chave: matriz[:, -1] for chave, matriz in lote.items()}
+    resultado = {}
+    for i, simbolo in enumerate(simbolos):
+        serie = close[i][~np.isnan(close[i])]
+        if not len(serie):
+            continue
+        preco = float(serie[-1])
+
+        def _valor(chave, neutro):
+            valor = ultimos[chave][i]
+            return neutro if np.isnan(valor) else float(valor)
+
+        valores = {'preco': preco, 'amostras': int(ultimos['amostras'][i]), 'rsi': _valor('rsi', 50.0)}
+        valores.update({chave: _valor(chave, preco) for chave in lote if chave.startswith('ma_')})
+        valores.update(bb_media=_valor('bb_media', preco), bb_upper=_valor('bb_upper', preco * 1.02),
+                       bb_lower=_valor('bb_lower', preco * 0.98))
+        valores.update({chave: _valor(chave, 0.0) for chave in ('macd', 'macd_signal', 'macd_hist',
+                                                                 'volatilidade', 'volume_medio', 'atr')})
+        valores['tendencia'] = TENDENCIAS[int(ultimos['tendencia'][i])]
+        valores['historico_precos'] = serie[-historico:].tolist()
+        resultado[simbolo] = valores
+    return resultado
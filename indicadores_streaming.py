@@ -0,0 +1,586 @@
+"""
+Indicadores técnicos incrementais por série (custo constante por preço novo)
+
+MotorIndicadores guarda o estado dos indicadores de uma série de preços e
+atualiza todos a cada preço sem voltar ao histórico:
+  - RSI de Wilder: médias de ganhos e perdas com suavização 1/periodo
+    (o mesmo que pandas ewm(alpha=1/periodo, adjust=False))
+  - MACD: EMAs recursivas com numerador e denominador acumulados (o mesmo
+    que pandas ewm(span=n), adjust=True) e a linha de sinal sobre o MACD
+  - médias móveis, Bandas de Bollinger, volatilidade dos retornos e volume
+    médio: janelas deslizantes com soma e variância de Welford (ddof=1, o
+    mesmo que pandas rolling), recalculadas da janela de tempos em tempos
+    para não acumular erro de arredondamento
+  - tendência: preço contra o de tendencia_longa períodos atrás, ±limiar
+    (a definição do preparador de dados); metodo_tendencia='medias' compara
+    a média curta com a longa (a definição do coletor de klines)
+previa(preco) devolve os indicadores como se o preço entrasse, sem mexer no
+estado (candle ainda em formação). estado() / MotorIndicadores.restaurar()
+levam o motor para um dict serializável em JSON e de volta.
+
+Com features=[...] o motor mantém só os estados de que essas features
+dependem (registro_features.py); sem isso calcula todas.
+
+GerenciadorIndicadores mantém um motor por série e os alimenta só com o que é
+novo no buffer de ticks (buffer_precos.py) ou no cache de klines
+(cache_klines.py). Sem features fixas, segue a união do que os consumidores
+declararam em registro_features.declarar_consumidor() (ou em um
+RegistroConsumidores próprio, passado em consumidores=).
+"""
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from itertools import repeat
+from typing import Any, Dict, Iterable, Optional
+from loguru import logger
+
+from registro_features import RegistroConsumidores, fecho, janela_necessaria, montar_registro, obter_registro_consumidores
+
+VERSAO_ESTADO = 2
+# A cada tantas atualizações a janela refaz soma e variância a partir dos valores guardados
+RECALCULO_JANELA = 4096
+PARAMETROS_PADRAO = {
+    'periodo_rsi': 14,
+    'ema_rapida': 12,
+    'ema_lenta': 26,
+    'ema_sinal': 9,
+    'medias': [20, 50],
+    'periodo_bollinger': 20,
+    'desvios_bollinger': 2.0,
+    'periodo_volatilidade': 20,
+    'periodo_volume': 20,
+    'metodo_tendencia': 'variacao',
+    'tendencia_curta': 5,
+    'tendencia_longa': 20,
+    'limiar_tendencia': 0.01,
+    'historico': 5,
+}
+METODOS_TENDENCIA = ('variacao', 'medias')
+_BOLLINGER = ('bb_media', 'bb_upper', 'bb_lower')
+_MACD = ('macd', 'macd_signal', 'macd_hist')
+
+
+def _config_indicadores() -> Dict[str, Any]:
+    try:
+        import config
+        return (config.load_config() or {}).get('indicadores', {}) or {}
+    except Exception:
+        return {}
+
+
+class _Janela:
+    """Média e variância de Welford dos últimos n valores, com remoção do mais antigo"""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.valores: deque = deque(maxlen=n)
+        self.media = 0.0
+        self.m2 = 0.0
+        self.atualizacoes = 0
+
+    def _apos(self, x: float):
+        """(média, m2, quantidade) depois de empurrar x"""
+        k = len(self.valores)
+        if k < self.n:
+            d = x - self.media
+            media = self.media + d / (k + 1)
+            return media, self.m2 + d * (x - media), k + 1
+        y = self.valores[0]
+        media = self.media + (x - y) / self.n
+        return media, max(0.0, self.m2 + (x - y) * (x - media + y - self.media)), self.n
+
+    def empurrar(self, x: float):
+        self.media, self.m2, _ = self._apos(x)
+        self.valores.append(x)
+        self.atualizacoes += 1
+        if self.atualizacoes % RECALCULO_JANELA == 0:
+            self._recalcular()
+
+    def _recalcular(self):
+        k = len(self.valores)
+        self.media = sum(self.valores) / k if k else 0.0
+        self.m2 = sum((v - self.media) ** 2 for v in self.valores)
+
+    def resumo(self, x: Optional[float] = None):
+        """(média, desvio padrão amostral, quantidade) atuais ou com x empurrado"""
+        if x is None:
+            media, m2, k = self.media, self.m2, len(self.valores)
+        else:
+            media, m2, k = self._apos(x)
+        return media, math.sqrt(m2 / (k - 1)) if k > 1 else 0.0, k
+
+    def estado(self) -> Dict[str, Any]:
+        return {'n': self.n, 'valores': list(self.valores), 'media': self.media, 'm2': self.m2,
+                'atualizacoes': self.atualizacoes}
+
+    @classmethod
+    def restaurar(cls, estado: Dict[str, Any]) -> '_Janela':
+        janela = cls(estado['n'])
+        janela.valores.extend(estado['valores'])
+        janela.media, janela.m2, janela.atualizacoes = estado['media'], estado['m2'], estado['atualizacoes']
+        return janela
+
+
+class _EMA:
+    """EMA de span n no modo adjust=True do pandas: numerador e denominador acumulados"""
+
+    def __init__(self, span: int):
+        self.span = span
+        self.fator = 1 - 2 / (span + 1)
+        self.numerador = 0.0
+        self.denominador = 0.0
+
+    def valor(self, x: Optional[float] = None) -> float:
+        if x is None:
+            return self.numerador / self.denominador if self.denominador else 0.0
+        return (x + self.fator * self.numerador) / (1 + self.fator * self.denominador)
+
+    def empurrar(self, x: float):
+        self.numerador = x + self.fator * self.numerador
+        self.denominador = 1 + self.fator * self.denominador
+
+
+class _Wilder:
+    """Média de Wilder (alpha = 1/periodo, começando do primeiro valor)"""
+
+    def __init__(self, periodo: int):
+        self.alpha = 1 / periodo
+        self.media: Optional[float] = None
+
+    def valor(self, x: Optional[float] = None) -> float:
+        if x is None:
+            return self.media or 0.0
+        return x if self.media is None else self.media + self.alpha * (x - self.media)
+
+    def empurrar(self, x: float):
+        self.media = self.valor(x)
+
+
+class MotorIndicadores:
+    """Estado dos indicadores de uma série; cada preço custa O(1)"""
+
+    def __init__(self, features: Optional[Iterable[str]] = None, **parametros):
+        """
+        Inicializa o motor vazio
+
+        Args:
+            features: Features do vetor (None = todas); só os estados de que elas dependem são mantidos
+            **parametros: Sobrescrevem PARAMETROS_PADRAO (periodo_rsi, ema_rapida, medias, ...)
+        """
+        self.parametros = dict(PARAMETROS_PADRAO)
+        self.parametros.update(parametros)
+        p = self.parametros
+        if p['metodo_tendencia'] not in METODOS_TENDENCIA:
+            raise ValueError(f"Método de tendência inválido: {p['metodo_tendencia']}")
+        self.registro = montar_registro(p)
+        self.features = None if features is None else sorted(set(features))
+        ativos = set(fecho(self.registro, self.features))
+        self._saidas = frozenset(nome for nome in ativos if not self.registro[nome].estado
+                                 and (self.features is None or nome in self.features))
+        self._ganhos = _Wilder(p['periodo_rsi']) if 'ganhos' in ativos else None
+        self._perdas = _Wilder(p['periodo_rsi']) if 'perdas' in ativos else None
+        self._ema_rapida = _EMA(p['ema_rapida']) if 'ema_rapida' in ativos else None
+        self._ema_lenta = _EMA(p['ema_lenta']) if 'ema_lenta' in ativos else None
+        self._ema_sinal = _EMA(p['ema_sinal']) if 'ema_sinal' in ativos else None
+        tamanhos = set(p['medias']) | {p['periodo_bollinger'], p['tendencia_curta'], p['tendencia_longa']}
+        self._precos = {n: _Janela(n) for n in sorted(tamanhos) if f"janela_{n}" in ativos}
+        self._retornos = _Janela(p['periodo_volatilidade']) if 'retornos' in ativos else None
+        self._volumes = _Janela(p['periodo_volume']) if 'volumes' in ativos else None
+        self._historico: Optional[deque] = deque(maxlen=p['historico']) if 'historico' in ativos else None
+        self.ultimo_preco: Optional[float] = None
+        self.contagem = 0
+        # Posição na fonte (total do buffer / início do último candle confirmado)
+        self.posicao = 0
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+    def atualizar(self, preco: float, volume: float = 0.0) -> Dict[str, Any]:
+        """Inclui o preço no estado e devolve os indicadores"""
+        return self._calcular(float(preco), float(volume or 0.0), confirmar=True)
+
+    def previa(self, preco: float, volume: float = 0.0) -> Dict[str, Any]:
+        """Indicadores como se o preço entrasse, sem alterar o estado"""
+        return self._calcular(float(preco), float(volume or 0.0), confirmar=False)
+
+    def alimentar(self, precos: Iterable[float], volumes: Optional[Iterable[float]] = None):
+        """Inclui uma sequência de preços (bootstrap a partir de um histórico)"""
+        volumes = volumes if volumes is not None else repeat(0.0)
+        for preco, volume in zip(precos, volumes):
+            self._calcular(float(preco), float(volume), confirmar=True, valores=False)
+
+    def valores(self) -> Dict[str, Any]:
+        """Indicadores do estado atual (sem preço novo)"""
+        if self.ultimo_preco is None:
+            return {}
+        return self._montar(self.ultimo_preco, self.contagem,
+                            self._ganhos.valor() if self._ganhos else None,
+                            self._perdas.valor() if self._perdas else None,
+                            self._ema_rapida.valor() if self._ema_rapida else None,
+                            self._ema_lenta.valor() if self._ema_lenta else None,
+                            self._ema_sinal.valor() if self._ema_sinal else None,
+                            {n: j.resumo() for n, j in self._precos.items()},
+                            self._retornos.resumo() if self._retornos else None,
+                            self._volumes.resumo() if self._volumes else None,
+                            list(self._historico) if self._historico is not None else None,
+                            self._referencia_tendencia())
+
+    def _calcular(self, preco: float, volume: float, confirmar: bool, valores: bool = True):
+        anterior = self.ultimo_preco
+        ganho = perda = retorno = None
+        if anterior is not None:
+            delta = preco - anterior
+            ganho, perda = max(delta, 0.0), max(-delta, 0.0)
+            retorno = preco / anterior - 1 if anterior else 0.0
+
+        if confirmar:
+            if anterior is not None:
+                if self._ganhos:
+                    self._ganhos.empurrar(ganho)
+                    self._perdas.empurrar(perda)
+                if self._retornos:
+                    self._retornos.empurrar(retorno)
+            if self._ema_rapida:
+                self._ema_rapida.empurrar(preco)
+                self._ema_lenta.empurrar(preco)
+                if self._ema_sinal:
+                    self._ema_sinal.empurrar(self._ema_rapida.valor() - self._ema_lenta.valor())
+            for janela in self._precos.values():
+                janela.empurrar(preco)
+            if self._volumes:
+                self._volumes.empurrar(volume)
+            if self._historico is not None:
+                self._historico.append(preco)
+            self.ultimo_preco = preco
+            self.contagem += 1
+            return self.valores() if valores else None
+
+        # Wilder, EMA e janelas devolvem o valor atual quando recebem None (primeiro preço)
+        rapida = self._ema_rapida.valor(preco) if self._ema_rapida else None
+        lenta = self._ema_lenta.valor(preco) if self._ema_lenta else None
+        historico = None
+        if self._historico is not None:
+            historico = (list(self._historico) + [preco])[-self._historico.maxlen:]
+        return self._montar(
+            preco, self.contagem + 1,
+            self._ganhos.valor(ganho) if self._ganhos else None,
+            self._perdas.valor(perda) if self._perdas else None,
+            rapida, lenta, self._ema_sinal.valor(rapida - lenta) if self._ema_sinal else None,
+            {n: j.resumo(preco) for n, j in self._precos.items()},
+            self._retornos.resumo(retorno) if self._retornos else None,
+            self._volumes.resumo(volume) if self._volumes else None, historico,
+            self._referencia_tendencia(preco))
+
+    def _referencia_tendencia(self, preco: Optional[float] = None) -> Optional[float]:
+        """Preço de tendencia_longa períodos atrás (o mais antigo da janela), atual ou com o preço empurrado"""
+        janela = self._precos.get(self.parametros['tendencia_longa'])
+        if janela is None or not janela.valores:
+            return preco
+        if preco is not None and len(janela.valores) == janela.n:
+            return janela.valores[1] if janela.n > 1 else preco
+        return janela.valores[0]
+
+    def _montar(self, preco, contagem, ganho, perda, rapida, lenta, sinal, precos, retornos, volumes, historico,
+                referencia):
+        """Dicionário de saída; sem amostras suficientes usa os mesmos neutros do preparador de dados"""
+        p, pedidas = self.parametros, self._saidas
+        resultado = {'preco': preco, 'amostras': contagem}
+        if 'rsi' in pedidas:
+            if contagem > p['periodo_rsi']:
+                rsi = 100.0 if perda == 0 and ganho > 0 else 50.0 if perda == 0 else 100 - 100 / (1 + ganho / perda)
+            else:
+                rsi = 50.0
+            resultado['rsi'] = float(rsi)
+        for n in p['medias']:
+            if f"ma_{n}" in pedidas:
+                media, _, k = precos[n]
+                resultado[f"ma_{n}"] = media if k >= n else preco
+
+        if not pedidas.isdisjoint(_BOLLINGER):
+            media_bb, desvio_bb, k = precos[p['periodo_bollinger']]
+            if k >= p['periodo_bollinger']:
+                resultado.update(bb_media=media_bb, bb_upper=media_bb + p['desvios_bollinger'] * desvio_bb,
+                                 bb_lower=media_bb - p['desvios_bollinger'] * desvio_bb)
+            else:
+                resultado.update(bb_media=preco, bb_upper=preco * 1.02, bb_lower=preco * 0.98)
+
+        if not pedidas.isdisjoint(_MACD):
+            if contagem >= p['ema_lenta']:
+                macd = rapida - lenta
+                resultado['macd'] = macd
+                if sinal is not None:
+                    resultado.update(macd_signal=sinal, macd_hist=macd - sinal)
+            else:
+                resultado.update(macd=0.0, macd_signal=0.0, macd_hist=0.0)
+
+        if 'volatilidade' in pedidas:
+            _, desvio_ret, k = retornos
+            resultado['volatilidade'] = desvio_ret if k >= p['periodo_volatilidade'] else 0.0
+        if 'volume_medio' in pedidas:
+            resultado['volume_medio'] = volumes[0]
+
+        if 'tendencia' in pedidas:
+            longa = precos[p['tendencia_longa']]
+            tendencia = 'lateral'
+            if longa[2] >= p['tendencia_longa']:
+                # 'variacao': preço contra o de tendencia_longa períodos atrás; 'medias': média curta contra a longa
+                atual, base = (precos[p['tendencia_curta']][0], longa[0]) if p['metodo_tendencia'] == 'medias' \
+                    else (preco, referencia)
+                if atual > base * (1 + p['limiar_tendencia']):
+                    tendencia = 'alta'
+                elif atual < base * (1 - p['limiar_tendencia']):
+                    tendencia = 'baixa'
+            resultado['tendencia'] = tendencia
+        if 'historico_precos' in pedidas:
+            resultado['historico_precos'] = historico
+        if self.features is not None:
+            # Grupos calculados juntos (Bollinger, MACD) saem só com o que foi pedido
+            resultado = {nome: valor for nome, valor in resultado.items()
+                         if nome in pedidas or nome in ('preco', 'amostras')}
+        return resultado
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+    def estado(self) -> Dict[str, Any]:
+        """Estado completo serializável em JSON"""
+        emas = (self._ema_rapida, self._ema_lenta, self._ema_sinal)
+        return {
+            'versao': VERSAO_ESTADO,
+            'parametros': self.parametros,
+            'features': self.features,
+            'ultimo_preco': self.ultimo_preco,
+            'contagem': self.contagem,
+            'posicao': self.posicao,
+            'wilder': [self._ganhos.media, self._perdas.media] if self._ganhos else None,
+            'ema': [[e.numerador, e.denominador] if e else None for e in emas],
+            'precos': [j.estado() for j in self._precos.values()],
+            'retornos': self._retornos.estado() if self._retornos else None,
+            'volumes': self._volumes.estado() if self._volumes else None,
+            'historico': list(self._historico) if self._historico is not None else None,
+        }
+
+    @classmethod
+    def restaurar(cls, estado: Dict[str, Any]) -> 'MotorIndicadores':
+        """Motor no ponto exato em que estado() foi tirado"""
+        if estado.get('versao') != VERSAO_ESTADO:
+            raise ValueError(f"Versão de estado de indicadores não suportada: {estado.get('versao')}")
+        motor = cls(estado.get('features'), **estado['parametros'])
+        motor.ultimo_preco, motor.contagem, motor.posicao = estado['ultimo_preco'], estado['contagem'], estado['posicao']
+        if estado['wilder'] is not None:
+            motor._ganhos.media, motor._perdas.media = estado['wilder']
+        for ema, salvo in zip((motor._ema_rapida, motor._ema_lenta, motor._ema_sinal), estado['ema']):
+            if salvo is not None:
+                ema.numerador, ema.denominador = salvo
+        for janela in estado['precos']:
+            motor._precos[janela['n']] = _Janela.restaurar(janela)
+        if estado['retornos'] is not None:
+            motor._retornos = _Janela.restaurar(estado['retornos'])
+        if estado['volumes'] is not None:
+            motor._volumes = _Janela.restaurar(estado['volumes'])
+        if estado['historico'] is not None:
+            motor._historico.extend(estado['historico'])
+        return motor
+
+
+class GerenciadorIndicadores:
+    """Um motor por série (símbolo ou símbolo/intervalo), alimentado só com o que é novo"""
+
+    def __init__(self, features: Optional[Iterable[str]] = None,
+                 consumidores: Optional[RegistroConsumidores] = None, **parametros):
+        """
+        Args:
+            features: Features dos motores (None = as declaradas pelos consumidores)
+            consumidores: Registro de consumidores seguido (padrão: o do processo)
+            **parametros: Parâmetros dos motores (padrão: seção indicadores do config.yaml)
+        """
+        self.parametros = dict(_config_indicadores())
+        self.parametros.update(parametros)
+        self.registro = montar_registro(dict(PARAMETROS_PADRAO, **self.parametros))
+        self._features_fixas = None if features is None else frozenset(features)
+        self.features = self._features_fixas
+        self.consumidores = consumidores if consumidores is not None else obter_registro_consumidores()
+        self._geracao: Optional[int] = None
+        self._motores: Dict[str, MotorIndicadores] = {}
+        # Reentrante: a atualização de uma série segura o lock enquanto cria/reinicia o motor
+        self._lock = threading.RLock()
+        self.estatisticas = {
+            'precos': 0,
+            'previas': 0,
+            'reconstrucoes': 0,
+        }
+
+    @property
+    def geracao(self) -> Optional[int]:
+        """Geração das declarações de consumidores que os motores seguem (None com features fixas)"""
+        with self._lock:
+            self._sincronizar()
+            return self._geracao
+
+    def _sincronizar(self):
+        """Segue a união das features declaradas; se mudou, os motores recomeçam da fonte"""
+        if self._features_fixas is not None:
+            return
+        geracao, features = self.consumidores.features_consumidas()
+        if geracao == self._geracao:
+            return
+        try:
+            fecho(self.registro, features)
+        except ValueError as e:
+            logger.error(f"❌ {e}; calculando todas as features")
+            features = None
+        self._geracao, self.features = geracao, features
+        if self._motores:
+            self.estatisticas['reconstrucoes'] += len(self._motores)
+            self._motores.clear()
+
+    def janela_necessaria(self, nomes: Optional[Iterable[str]] = None) -> int:
+        """Amostras para as features pedidas (padrão: as dos motores) saírem do valor neutro"""
+        with self._lock:
+            self._sincronizar()
+            return janela_necessaria(self.registro, self.features if nomes is None else nomes)
+
+    def novo_motor(self) -> MotorIndicadores:
+        """Motor avulso (fora do gerenciador) com os mesmos parâmetros e features"""
+        with self._lock:
+            self._sincronizar()
+            return MotorIndicadores(self.features, **self.parametros)
+
+    def motor(self, chave: str) -> MotorIndicadores:
+        with self._lock:
+            self._sincronizar()
+            motor = self._motores.get(chave)
+            if motor is None:
+                motor = self._motores[chave] = MotorIndicadores(self.features, **self.parametros)
+            return motor
+
+    def _reiniciar(self, chave: str) -> MotorIndicadores:
+        with self._lock:
+            motor = self._motores[chave] = MotorIndicadores(self.features, **self.parametros)
+        self.estatisticas['reconstrucoes'] += 1
+        return motor
+
+    def atualizar(self, chave: str, preco: float, volume: float = 0.0) -> Dict[str, Any]:
+        with self._lock:
+            self.estatisticas['precos'] += 1
+            return self.motor(chave).atualizar(preco, volume)
+
+    def de_buffer(self, simbolo: str, buffer) -> Dict[str, Any]:
+        """
+        Indicadores do buffer de ticks do símbolo (BufferCircularPrecos)
+
+        Só os ticks anexados desde a última chamada entram no motor; se o anel já
+        sobrescreveu ticks que o motor não viu, o motor recomeça da janela inteira.
+        """
+        with self._lock:
+            return self._de_buffer(simbolo, buffer)
+
+    def _de_buffer(self, simbolo: str, buffer) -> Dict[str, Any]:
+        motor = self.motor(simbolo)
+        total = buffer.total
+        novos = total - motor.posicao
+        if novos < 0 or (novos > len(buffer) and motor.contagem):
+            motor = self._reiniciar(simbolo)
+            novos = total
+        novos = min(novos, len(buffer))
+        if novos:
+            janela = buffer.copia(novos)
+            motor.alimentar(janela['preco'], janela['volume'])
+            self.estatisticas['precos'] += novos
+        motor.posicao = total
+        return motor.valores()
+
+    def de_klines(self, cache) -> Dict[str, Any]:
+        """
+        Indicadores dos fechamentos de um CacheKlines
+
+        Candles confirmados (todos menos o último) entram no motor uma vez; o
+        último, ainda em formação, entra só na prévia.
+        """
+        with self._lock:
+            return self._de_klines(cache)
+
+    def _de_klines(self, cache) -> Dict[str, Any]:
+        chave = f"{cache.simbolo}/{cache.intervalo}"
+        motor = self.motor(chave)
+        disponiveis = len(cache)
+        if not disponiveis:
+            return motor.valores()
+        # Janela crescente até alcançar o último candle confirmado que o motor já viu
+        k = 2 if motor.contagem else disponiveis
+        while True:
+            janela = cache.janela(k)
+            if janela['ts_ms'][0] <= motor.posicao or k >= disponiveis:
+                break
+            k = min(disponiveis, k * 2)
+        if motor.contagem and janela['ts_ms'][0] > motor.posicao:
+            # O cache andou além do que o motor viu (lacuna maior que o cache): recomeça
+            motor = self._reiniciar(chave)
+        novos = janela['ts_ms'][:-1] > motor.posicao
+        if novos.any():
+            motor.alimentar(janela['close'][:-1][novos], janela['volume'][:-1][novos])
+            motor.posicao = int(janela['ts_ms'][:-1][novos][-1])
+            self.estatisticas['precos'] += int(novos.sum())
+        self.estatisticas['previas'] += 1
+        return motor.previa(janela['close'][-1], janela['volume'][-1])
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            motores = dict(self._motores)
+        return {chave: motor.estado() for chave, motor in motores.items()}
+
+    def restaurar(self, estado: Dict[str, Any]):
+        motores = {chave: MotorIndicadores.restaurar(e) for chave, e in estado.items()}
+        with self._lock:
+            self._sincronizar()
+            # Motores gravados com outro conjunto de features recomeçam da fonte
+            features = sorted(self.features) if self.features is not None else None
+            self._motores.update((chave, motor) for chave, motor in motores.items() if motor.features == features)
+
+    def salvar(self, caminho: str):
+        """Grava o estado de todos os motores em JSON (troca atômica do arquivo)"""
+        try:
+            os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+            temporario = f"{caminho}.tmp"
+            with open(temporario, 'w') as arquivo:
+                json.dump(self.estado(), arquivo)
+            os.replace(temporario, caminho)
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar estado dos indicadores: {e}")
+
+    def carregar(self, caminho: str) -> bool:
+        """Restaura os motores gravados por salvar(); False se o arquivo não existe ou é inválido"""
+        try:
+            with open(caminho) as arquivo:
+                self.restaurar(json.load(arquivo))
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar estado dos indicadores: {e}")
+            return False
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        stats = dict(self.estatisticas)
+        stats['motores'] = len(self._motores)
+        stats['features'] = sorted(self.features) if self.features is not None else 'todas'
+        return stats
+
+
+_gerenciador: Optional[GerenciadorIndicadores] = None
+_lock_gerenciador = threading.Lock()
+
+
+def obter_gerenciador_indicadores() -> GerenciadorIndicadores:
+    """Gerenciador compartilhado do processo"""
+    global _gerenciador
+    with _lock_gerenciador:
+        if _gerenciador is None:
+            _gerenciador = GerenciadorIndicadores()
+        return _gerenciador
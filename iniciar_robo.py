@@ -83,17 +83,13 @@ def verificar_banco_dados():
     try:
         logger.info("🗄️ Verificando banco de dados...")
         
-        import sqlite3
         from armazenamento import Armazenamento
         
         armazenamento = Armazenamento()
         
         # Testar conexão
         try:
-            conn = sqlite3.connect(armazenamento.db_path)
-            c = conn.cursor()
-            c.execute('SELECT 1')
-            conn.close()
+            armazenamento.banco.consultar('SELECT 1')
             logger.info("✅ Banco de dados OK")
             return True
         except Exception as e:
@@ -0,0 +1,182 @@
+"""
+Camada de leitura dos monitores (monitor.py, monitor_ordens.py, monitor_simulador.py)
+
+Os monitores não passam pelo GerenciadorBanco (não sobem thread de escrita nem
+rodam migrações): abrem uma conexão própria `mode=ro`, executam todas as
+consultas de um painel numa única transação de leitura (snapshot consistente)
+e guardam o resultado junto com o PRAGMA data_version. Enquanto nenhum outro
+processo fizer commit, data_version não muda e a atualização do painel é
+respondida do cache sem executar nenhuma consulta.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from loguru import logger
+
+from banco_dados import DB_PADRAO
+
+Consulta = Callable[[sqlite3.Connection], Any]
+
+
+def conectar_somente_leitura(db_path: str = DB_PADRAO, busy_timeout_ms: int = 5000) -> Optional[sqlite3.Connection]:
+    """
+    Abre uma conexão `mode=ro` própria, sem GerenciadorBanco
+
+    Args:
+        db_path: Caminho do arquivo SQLite
+        busy_timeout_ms: Espera máxima por lock (checkpoint/recovery do WAL)
+
+    Returns:
+        Conexão somente leitura (None se o arquivo não existe)
+    """
+    if not os.path.exists(db_path):
+        return None
+    uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+    # isolation_level=None: a transação de leitura é aberta/fechada explicitamente
+    conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout_ms / 1000,
+                           isolation_level=None, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+class LeitorMonitor:
+    """Conexão somente leitura com snapshot por painel e cache por data_version"""
+
+    def __init__(self, db_path: str = DB_PADRAO, busy_timeout_ms: int = 5000):
+        """
+        Inicializa o leitor
+
+        Args:
+            db_path: Caminho do arquivo SQLite
+            busy_timeout_ms: Espera máxima por lock (checkpoint/recovery do WAL)
+        """
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._conn: Optional[sqlite3.Connection] = None
+        self._cache: Dict[str, Tuple[int, Hashable, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {
+            'snapshots': 0,
+            'consultas': 0,
+            'acertos_cache': 0,
+            'erros': 0,
+            'tempo_total_ms': 0.0,
+        }
+
+    def _conectar(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None:
+            return self._conn
+        conn = conectar_somente_leitura(self.db_path, self.busy_timeout_ms)
+        if conn is None:
+            return None
+        self._conn = conn
+        self._cache.clear()  # data_version só é comparável na mesma conexão
+        return conn
+
+    def versao(self) -> Optional[int]:
+        """PRAGMA data_version da conexão (muda quando outra conexão faz commit)"""
+        with self._lock:
+            conn = self._conectar()
+            return conn.execute("PRAGMA data_version").fetchone()[0] if conn else None
+
+    def instantaneo(self, painel: str, consultas: Dict[str, Consulta],
+                    chave: Hashable = None) -> Dict[str, Any]:
+        """
+        Executa as consultas de um painel numa única transação de leitura
+
+        Args:
+            painel: Nome do painel (entrada do cache)
+            consultas: {nome: função(conn) -> valor}
+            chave: Parte extra da chave do cache (ex.: dia de referência)
+
+        Returns:
+            {nome: valor}; {} se o banco não existe ou a leitura falhar
+        """
+        with self._lock:
+            try:
+                conn = self._conectar()
+                if conn is None:
+                    return {}
+                versao = conn.execute("PRAGMA data_version").fetchone()[0]
+                em_cache = self._cache.get(painel)
+                if em_cache and em_cache[0] == versao and em_cache[1] == chave:
+                    self.estatisticas['acertos_cache'] += 1
+                    return em_cache[2]
+
+                inicio = time.perf_counter()
+                conn.execute("BEGIN")
+                try:
+                    resultado = {nome: consulta(conn) for nome, consulta in consultas.items()}
+                finally:
+                    conn.execute("COMMIT")
+                self._cache[painel] = (versao, chave, resultado)
+                self.estatisticas['snapshots'] += 1
+                self.estatisticas['consultas'] += len(consultas)
+                self.estatisticas['tempo_total_ms'] += (time.perf_counter() - inicio) * 1000
+                return resultado
+            except Exception as e:
+                self.estatisticas['erros'] += 1
+                logger.error(f"❌ Erro ao ler painel {painel}: {e}")
+                self._fechar_conexao()
+                return {}
+
+    def _fechar_conexao(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self._cache.clear()
+
+    def fechar(self):
+        """Fecha a conexão somente leitura"""
+        with self._lock:
+            self._fechar_conexao()
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Snapshots executados, consultas e acertos de cache"""
+        return dict(self.estatisticas)
+
+
+def um(sql: str, params: tuple = (), padrao: Any = None) -> Consulta:
+    """Consulta que retorna a primeira linha (ou `padrao`)"""
+    def _consulta(conn: sqlite3.Connection):
+        linha = conn.execute(sql, params).fetchone()
+        return linha if linha is not None else padrao
+    return _consulta
+
+
+def todos(sql: str, params: tuple = ()) -> Consulta:
+    """Consulta que retorna todas as linhas"""
+    return lambda conn: conn.execute(sql, params).fetchall()
+
+
+def opcional(consulta: Consulta, padrao: Any = None) -> Consulta:
+    """Devolve `padrao` se a tabela/coluna ainda não existe (banco em versão antiga)"""
+    def _consulta(conn: sqlite3.Connection):
+        try:
+            return consulta(conn)
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Consulta opcional ignorada: {e}")
+            return padrao
+    return _consulta
+
+
+_leitores: Dict[str, LeitorMonitor] = {}
+_lock_leitores = threading.Lock()
+
+
+def obter_leitor(db_path: str = DB_PADRAO) -> LeitorMonitor:
+    """Retorna o leitor do arquivo no processo (um por caminho)"""
+    chave = os.path.abspath(db_path)
+    with _lock_leitores:
+        leitor = _leitores.get(chave)
+        if leitor is None:
+            leitor = LeitorMonitor(db_path)
+            _leitores[chave] = leitor
+        return leitor
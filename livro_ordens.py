@@ -0,0 +1,314 @@
+"""
+Livro de ordens L2 incremental (Bybit orderbook.<profundidade>.<símbolo>)
+
+Cada lado do livro é um par de arrays NumPy ordenados (bids por preço
+decrescente, asks crescente). Uma mensagem delta altera só os níveis que
+trouxe: busca binária + deslocamento do trecho à direita (memmove), tamanho
+"0" remove o nível. Snapshot (ou u == 1, reinício do serviço na Bybit) zera o
+lado e recarrega. O id de atualização `u` deve crescer de 1 em 1; um salto
+marca o livro como inconsistente até o próximo snapshot (o StreamBybit
+reassina o tópico para receber um novo); deltas com `u` já coberto pelo
+snapshot são descartados.
+
+Depois de cada mensagem as features são recalculadas sobre a janela de
+preços perto do mid (não sobre o livro inteiro) e publicadas como um
+dicionário imutável novo. O caminho de decisão lê `livro.features` sem lock:
+a troca da referência é atômica e o dicionário publicado nunca é alterado.
+
+Features: melhor bid/ask, spread, mid, microprice, profundidade a N bps por
+lado, desequilíbrio bid/ask, maior nível por lado e clusters de liquidez
+(sequências de níveis com tamanho acima de `fator_cluster` × a média da janela).
+"""
+
+import json
+import time
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+
+BPS_PADRAO = (10, 25, 50)
+FEATURES_NEUTRAS = MappingProxyType({
+    'bid_ask_imbalance': 0.0,
+    'max_bid_size': 0.0,
+    'max_ask_size': 0.0,
+    'liquidity_clusters': 0,
+})
+
+
+class _LadoLivro:
+    """Níveis de um lado em arrays ordenados pela chave (preço, ou -preço nos bids)"""
+
+    def __init__(self, decrescente: bool, capacidade: int = 256):
+        self.decrescente = decrescente
+        self.chaves = np.empty(capacidade, dtype=np.float64)
+        self.tamanhos = np.empty(capacidade, dtype=np.float64)
+        self.n = 0
+        self.total = 0.0
+
+    def limpar(self):
+        self.n = 0
+        self.total = 0.0
+
+    def _crescer(self):
+        capacidade = 2 * len(self.chaves)
+        for nome in ('chaves', 'tamanhos'):
+            novo = np.empty(capacidade, dtype=np.float64)
+            novo[:self.n] = getattr(self, nome)[:self.n]
+            setattr(self, nome, novo)
+
+    def aplicar(self, preco: float, tamanho: float):
+        """Insere, atualiza ou remove (tamanho 0) um nível"""
+        chave = -preco if self.decrescente else preco
+        n = self.n
+        i = int(np.searchsorted(self.chaves[:n], chave))
+        existe = i < n and self.chaves[i] == chave
+        if existe:
+            self.total += tamanho - self.tamanhos[i]
+            if tamanho == 0:
+                self.chaves[i:n - 1] = self.chaves[i + 1:n]
+                self.tamanhos[i:n - 1] = self.tamanhos[i + 1:n]
+                self.n -= 1
+            else:
+                self.tamanhos[i] = tamanho
+        elif tamanho > 0:
+            if n == len(self.chaves):
+                self._crescer()
+            self.chaves[i + 1:n + 1] = self.chaves[i:n]
+            self.tamanhos[i + 1:n + 1] = self.tamanhos[i:n]
+            self.chaves[i] = chave
+            self.tamanhos[i] = tamanho
+            self.n += 1
+            self.total += tamanho
+
+    def melhor(self) -> Tuple[Optional[float], float]:
+        if not self.n:
+            return None, 0.0
+        return float(-self.chaves[0] if self.decrescente else self.chaves[0]), float(self.tamanhos[0])
+
+    def ate(self, preco_limite: float) -> int:
+        """Quantidade de níveis do topo até `preco_limite` (inclusive)"""
+        chave = -preco_limite if self.decrescente else preco_limite
+        return int(np.searchsorted(self.chaves[:self.n], chave, side='right'))
+
+    def precos(self, k: Optional[int] = None) -> np.ndarray:
+        k = self.n if k is None else min(k, self.n)
+        return -self.chaves[:k] if self.decrescente else self.chaves[:k].copy()
+
+    def niveis(self) -> List[Tuple[float, float]]:
+        return list(zip(self.precos().tolist(), self.tamanhos[:self.n].tolist()))
+
+
+def _clusters(precos: np.ndarray, tamanhos: np.ndarray, fator: float, minimo_niveis: int) -> List[Tuple[float, float]]:
+    """Sequências contíguas de níveis grandes -> [(preço do maior nível, tamanho somado)]"""
+    if len(tamanhos) < minimo_niveis:
+        return []
+    grandes = tamanhos > fator * tamanhos.mean()
+    if not grandes.any():
+        return []
+    # Bordas das sequências de True
+    bordas = np.diff(np.concatenate(([0], grandes.view(np.int8), [0])))
+    inicios = np.flatnonzero(bordas == 1)
+    fins = np.flatnonzero(bordas == -1)
+    resultado = []
+    for a, b in zip(inicios, fins):
+        maior = a + int(np.argmax(tamanhos[a:b]))
+        resultado.append((float(precos[maior]), float(tamanhos[a:b].sum())))
+    return resultado
+
+
+class LivroOrdens:
+    """Livro L2 de um símbolo mantido por snapshot + deltas da Bybit"""
+
+    def __init__(self, simbolo: str, bps: Sequence[float] = BPS_PADRAO, bps_imbalance: Optional[float] = None,
+                 fator_cluster: float = 3.0, minimo_niveis_cluster: int = 5):
+        """
+        Inicializa o livro vazio
+
+        Args:
+            simbolo: Símbolo do ativo
+            bps: Distâncias do mid (em bps) para a profundidade por lado
+            bps_imbalance: Janela do desequilíbrio bid/ask (padrão: menor de `bps`)
+            fator_cluster: Nível é "grande" acima de fator × média da janela
+            minimo_niveis_cluster: Níveis mínimos na janela para procurar clusters
+        """
+        self.simbolo = simbolo
+        self.bps = tuple(sorted(bps))
+        self.bps_imbalance = bps_imbalance or self.bps[0]
+        self.fator_cluster = fator_cluster
+        self.minimo_niveis_cluster = minimo_niveis_cluster
+        self.bids = _LadoLivro(decrescente=True)
+        self.asks = _LadoLivro(decrescente=False)
+        self.ultimo_u: Optional[int] = None
+        self.consistente = False
+        self._features: Mapping[str, Any] = FEATURES_NEUTRAS
+        self._lock_escrita = threading.Lock()
+        self.estatisticas = {
+            'mensagens': 0,
+            'snapshots': 0,
+            'deltas': 0,
+            'niveis_alterados': 0,
+            'lacunas': 0,
+            'ignoradas': 0,
+            'tempo_total_us': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Atualização (thread do stream)
+    # ------------------------------------------------------------------
+    def aplicar_mensagem(self, mensagem: Dict[str, Any]) -> bool:
+        """
+        Aplica uma mensagem orderbook da Bybit
+
+        Returns:
+            False se o livro ficou (ou continua) inconsistente e precisa de snapshot
+        """
+        inicio = time.perf_counter()
+        dados = mensagem.get('data') or {}
+        u = dados.get('u')
+        snapshot = mensagem.get('type') == 'snapshot' or u == 1
+        with self._lock_escrita:
+            self.estatisticas['mensagens'] += 1
+            if snapshot:
+                self.bids.limpar()
+                self.asks.limpar()
+                self.consistente = True
+                self.estatisticas['snapshots'] += 1
+            elif not self.consistente:
+                self.estatisticas['ignoradas'] += 1
+                return False
+            elif u is not None and self.ultimo_u is not None and u <= self.ultimo_u:
+                # Delta já contido no snapshot recebido (corrida na reassinatura)
+                self.estatisticas['ignoradas'] += 1
+                return True
+            elif u is not None and self.ultimo_u is not None and u != self.ultimo_u + 1:
+                self.consistente = False
+                self.estatisticas['lacunas'] += 1
+                logger.warning(f"⚠️ Livro {self.simbolo}: update {u} após {self.ultimo_u}, aguardando snapshot")
+                return False
+            else:
+                self.estatisticas['deltas'] += 1
+
+            for preco, tamanho in dados.get('b') or []:
+                self.bids.aplicar(float(preco), float(tamanho))
+            for preco, tamanho in dados.get('a') or []:
+                self.asks.aplicar(float(preco), float(tamanho))
+            self.estatisticas['niveis_alterados'] += len(dados.get('b') or []) + len(dados.get('a') or [])
+            self.ultimo_u = u
+            self._publicar(int(mensagem.get('ts') or time.time() * 1000), u)
+            self.estatisticas['tempo_total_us'] += (time.perf_counter() - inicio) * 1e6
+        return True
+
+    def _publicar(self, ts_ms: int, u: Optional[int]):
+        melhor_bid, tamanho_bid = self.bids.melhor()
+        melhor_ask, tamanho_ask = self.asks.melhor()
+        if melhor_bid is None or melhor_ask is None:
+            self._features = FEATURES_NEUTRAS
+            return
+
+        mid = (melhor_bid + melhor_ask) / 2
+        microprice = ((melhor_bid * tamanho_ask + melhor_ask * tamanho_bid) / (tamanho_bid + tamanho_ask)
+                      if tamanho_bid + tamanho_ask else mid)
+
+        profundidade_bid, profundidade_ask = {}, {}
+        for bps in self.bps:
+            k_bid = self.bids.ate(mid * (1 - bps / 10_000))
+            k_ask = self.asks.ate(mid * (1 + bps / 10_000))
+            profundidade_bid[bps] = float(self.bids.tamanhos[:k_bid].sum())
+            profundidade_ask[bps] = float(self.asks.tamanhos[:k_ask].sum())
+
+        soma = profundidade_bid[self.bps_imbalance] + profundidade_ask[self.bps_imbalance]
+        imbalance = ((profundidade_bid[self.bps_imbalance] - profundidade_ask[self.bps_imbalance]) / soma
+                     if soma else 0.0)
+
+        # Maior nível e clusters na janela mais larga
+        k_bid = self.bids.ate(mid * (1 - self.bps[-1] / 10_000))
+        k_ask = self.asks.ate(mid * (1 + self.bps[-1] / 10_000))
+        tamanhos_bid = self.bids.tamanhos[:k_bid]
+        tamanhos_ask = self.asks.tamanhos[:k_ask]
+        clusters_bid = _clusters(self.bids.precos(k_bid), tamanhos_bid, self.fator_cluster, self.minimo_niveis_cluster)
+        clusters_ask = _clusters(self.asks.precos(k_ask), tamanhos_ask, self.fator_cluster, self.minimo_niveis_cluster)
+
+        self._features = MappingProxyType({
+            'symbol': self.simbolo,
+            'ts_ms': ts_ms,
+            'u': u,
+            'melhor_bid': melhor_bid,
+            'melhor_ask': melhor_ask,
+            'spread': melhor_ask - melhor_bid,
+            'spread_bps': (melhor_ask - melhor_bid) / mid * 10_000,
+            'mid': mid,
+            'microprice': microprice,
+            'profundidade_bid': MappingProxyType(profundidade_bid),
+            'profundidade_ask': MappingProxyType(profundidade_ask),
+            'bid_ask_imbalance': imbalance,
+            'max_bid_size': float(tamanhos_bid.max()) if len(tamanhos_bid) else 0.0,
+            'max_ask_size': float(tamanhos_ask.max()) if len(tamanhos_ask) else 0.0,
+            'clusters_bid': tuple(clusters_bid),
+            'clusters_ask': tuple(clusters_ask),
+            'liquidity_clusters': len(clusters_bid) + len(clusters_ask),
+            'niveis_bid': self.bids.n,
+            'niveis_ask': self.asks.n,
+        })
+
+    def invalidar(self):
+        """Conexão caiu: features voltam ao neutro até o próximo snapshot"""
+        with self._lock_escrita:
+            self.consistente = False
+            self._features = FEATURES_NEUTRAS
+
+    # ------------------------------------------------------------------
+    # Leitura (qualquer thread, sem lock)
+    # ------------------------------------------------------------------
+    @property
+    def features(self) -> Mapping[str, Any]:
+        """Últimas features publicadas (dicionário imutável)"""
+        return self._features
+
+    def niveis(self, lado: str = 'bid') -> List[Tuple[float, float]]:
+        """Níveis [(preço, tamanho)] do melhor para o pior (cópia, com lock)"""
+        with self._lock_escrita:
+            return (self.bids if lado == 'bid' else self.asks).niveis()
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Mensagens, níveis alterados, lacunas e custo médio por mensagem"""
+        stats = dict(self.estatisticas)
+        stats['tempo_medio_us'] = stats['tempo_total_us'] / stats['mensagens'] if stats['mensagens'] else 0.0
+        stats['consistente'] = self.consistente
+        return stats
+
+
+def reproduzir_arquivo(caminho: str, livro: Optional[LivroOrdens] = None) -> Iterable[Tuple[Dict[str, Any], LivroOrdens]]:
+    """
+    Reaplica mensagens gravadas (uma mensagem JSON da Bybit por linha)
+
+    Args:
+        caminho: Arquivo .jsonl com as mensagens do tópico orderbook
+        livro: Livro alvo (padrão: novo livro do símbolo da primeira mensagem)
+
+    Yields:
+        (mensagem, livro) depois de aplicar cada mensagem
+    """
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            mensagem = json.loads(linha)
+            if livro is None:
+                livro = LivroOrdens(mensagem['topic'].split('.')[-1])
+            livro.aplicar_mensagem(mensagem)
+            yield mensagem, livro
+
+
+_livros: Dict[str, LivroOrdens] = {}
+_lock_livros = threading.Lock()
+
+
+def obter_livro(simbolo: str, criar: bool = False) -> Optional[LivroOrdens]:
+    """Livro do símbolo mantido pelo stream do processo (None se não houver)"""
+    livro = _livros.get(simbolo)
+    if livro is None and criar:
+        with _lock_livros:
+            livro = _livros.setdefault(simbolo, LivroOrdens(simbolo))
+    return livro
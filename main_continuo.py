@@ -3,17 +3,23 @@ import signal
 import sys
 from datetime import datetime, time as dt_time
 from loguru import logger
+from urllib.parse import urlsplit
 from coletor import Coletor
 from armazenamento import Armazenamento
+from agendador_coleta import AgendadorAdaptativo, espera_sugerida
 import config
 
 class ColetaContinua:
-    def __init__(self):
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path: Banco onde os dados coletados são gravados (padrão: dados/trading.db)
+        """
         self.coletor = Coletor()
-        self.armazenamento = Armazenamento()
+        self.armazenamento = Armazenamento(db_path)
         self.config = config.load_config()
         self.rodando = True
-        self.frequencia = 10  # segundos (será otimizada pelos testes)
+        self.frequencia = 10  # intervalo inicial por símbolo (o agendador ajusta em tempo de execução)
         self.falhas_consecutivas = 0
         self.max_falhas_consecutivas = 5
         
@@ -22,10 +28,10 @@ class ColetaContinua:
         self.horario_fim = dt_time(17, 0)    # 17:00
         self.dias_semana = [0, 1, 2, 3, 4]  # Segunda a Sexta (0=Segunda)
         
-        # Configurações de backoff
-        self.backoff_inicial = 5
-        self.backoff_maximo = 300
-        self.backoff_atual = self.backoff_inicial
+        # Intervalo por símbolo: volatilidade, falhas (backoff) e orçamento de requisições com 429
+        self.agendador = AgendadorAdaptativo(['IBOV', 'WIN'], intervalo_inicial=self.frequencia, backoff_max=300)
+        self.host_b3 = urlsplit(self.coletor.base_url_b3).hostname
+        self.coletor.http.ao_responder(self._ao_responder)
         
         # Métricas
         self.metricas = {
@@ -59,29 +65,38 @@ class ColetaContinua:
             self.horario_inicio <= agora.time() <= self.horario_fim
         )
     
-    def aplicar_backoff(self):
+    def _ao_responder(self, host, status, latencia_ms, cabecalhos):
         """
-        Aplica backoff exponencial em caso de falhas
+        Status das requisições à B3 alimentam as métricas e o agendador
         """
-        if self.falhas_consecutivas > 0:
-            self.backoff_atual = min(
-                self.backoff_inicial * (2 ** (self.falhas_consecutivas - 1)),
-                self.backoff_maximo
-            )
-            logger.warning(f"Backoff aplicado: {self.backoff_atual}s (falhas consecutivas: {self.falhas_consecutivas})")
-            time.sleep(self.backoff_atual)
-        else:
-            self.backoff_atual = self.backoff_inicial
+        if host != self.host_b3:
+            return
+        if status == 429:
+            self.metricas['erros_429'] += 1
+        elif status is None:
+            self.metricas['timeouts'] += 1
+        self.agendador.registrar_resposta(status, espera_sugerida(cabecalhos))
     
     def coletar_dados_ciclo(self):
         """
-        Executa um ciclo de coleta de dados
+        Executa um ciclo de coleta dos símbolos vencidos no agendador
         """
+        simbolos = self.agendador.vencidos()
+        if not simbolos:
+            return
+        
         inicio_request = time.time()
         
         try:
-            # Coleta dados
-            dados_coletados = self.coletor.coletar_dados()
+            # Coleta só os símbolos vencidos, num único lote
+            lote = self.coletor.coletar_simbolos(simbolos)
+            dados_coletados = []
+            for simbolo, dados in lote.items():
+                if dados and dados.get('preco_atual'):
+                    dados_coletados.append(dados)
+                    self.agendador.registrar_preco(simbolo, float(dados['preco_atual']))
+                else:
+                    self.agendador.registrar_falha(simbolo)
             
             if dados_coletados:
                 # Salva dados no banco
@@ -119,13 +134,13 @@ class ColetaContinua:
         except Exception as e:
             self.falhas_consecutivas += 1
             self.metricas['falhas'] += 1
+            for simbolo in simbolos:
+                self.agendador.registrar_falha(simbolo)
             logger.error(f"❌ Erro durante coleta: {e}")
         
         self.metricas['tentativas'] += 1
         
-        # Verifica se precisa aplicar backoff
-        if self.falhas_consecutivas > 0:
-            self.aplicar_backoff()
+        # Backoff fica no agendador: cada falha seguida dobra o intervalo do símbolo
         
         # Alerta se muitas falhas consecutivas
         if self.falhas_consecutivas >= self.max_falhas_consecutivas:
@@ -155,6 +170,8 @@ class ColetaContinua:
         logger.info(f"📈 Taxa de sucesso: {taxa_sucesso:.1f}%")
         logger.info(f"⚡ Latência média: {latencia_media:.3f}s")
         logger.info(f"🚨 Falhas consecutivas: {self.falhas_consecutivas}")
+        logger.info(f"⏲️  Intervalos por símbolo: {self.agendador.intervalos()}")
+        logger.info(f"🚦 Orçamento efetivo: {self.agendador.orcamento_efetivo:.2f} req/s (429: {self.metricas['erros_429']})")
         logger.info(f"⏰ Horário de mercado: {'SIM' if self.esta_horario_mercado() else 'NÃO'}")
         logger.info("="*60)
     
@@ -163,7 +180,7 @@ class ColetaContinua:
         Executa a coleta contínua
         """
         logger.info("🚀 Iniciando Coleta Contínua de Dados")
-        logger.info(f"⏰ Frequência: {self.frequencia} segundos")
+        logger.info(f"⏰ Intervalo inicial: {self.frequencia} segundos por símbolo (adaptativo)")
         logger.info(f"🕐 Horário de mercado: {self.horario_inicio} - {self.horario_fim}")
         logger.info(f"📅 Dias úteis: Segunda a Sexta")
         logger.info("="*60)
@@ -186,9 +203,9 @@ class ColetaContinua:
                     self.exibir_status()
                     ultimo_status = datetime.now()
                 
-                # Aguarda próxima coleta
+                # Aguarda o próximo símbolo vencer
                 if self.rodando:
-                    time.sleep(self.frequencia)
+                    time.sleep(min(max(self.agendador.tempo_ate_proximo(), 0.05), 5))
                     
             except KeyboardInterrupt:
                 logger.info("⚠️  Interrupção manual detectada")
@@ -0,0 +1,335 @@
+"""
+Backup online e manutenção do banco (dados/trading.db) sem parar os escritores
+
+O backup usa a API de backup do SQLite em passos de poucas páginas: cada passo
+segura só um lock de leitura (em WAL os escritores continuam) e entre passos há
+uma pausa. A cópia é verificada, comprimida com gzip e os backups mais antigos
+são removidos. incremental_vacuum e ANALYZE rodam pela fila do escritor, em
+passos curtos, somente quando o banco está em período tranquilo.
+
+Cada passo tem o tempo medido (quanto segurou o banco) e fica em obter_estatisticas().
+"""
+
+import os
+import glob
+import gzip
+import time
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+from banco_dados import obter_banco, carregar_config_banco, GerenciadorBanco
+
+DIRETORIO_PADRAO = os.path.join('dados', 'backups')
+
+
+class _ReiniciosExcessivos(Exception):
+    """A origem mudou tantas vezes durante o backup em passos que ele não avança"""
+
+
+class ManutencaoBanco:
+    """Agenda backups online comprimidos, incremental_vacuum e ANALYZE"""
+
+    def __init__(self, banco: Optional[GerenciadorBanco] = None, diretorio: Optional[str] = None,
+                 intervalo_backup_minutos: Optional[float] = None, manter: Optional[int] = None,
+                 paginas_por_passo: Optional[int] = None, pausa_passo_ms: Optional[float] = None,
+                 intervalo_manutencao_minutos: Optional[float] = None,
+                 max_escritas_por_segundo: Optional[float] = None):
+        """
+        Inicializa a manutenção
+
+        Args:
+            banco: Gerenciador do banco (padrão: dados/trading.db)
+            diretorio: Onde ficam os backups .db.gz
+            intervalo_backup_minutos: Intervalo entre backups
+            manter: Quantidade de backups mantidos na rotação
+            paginas_por_passo: Páginas copiadas/liberadas por passo
+            pausa_passo_ms: Pausa entre passos do backup
+            intervalo_manutencao_minutos: Intervalo mínimo entre vacuum/ANALYZE
+            max_escritas_por_segundo: Taxa de escritas abaixo da qual o período é tranquilo
+        """
+        cfg_banco = carregar_config_banco()
+        cfg_backup = cfg_banco.get('backup', {}) or {}
+        cfg_manutencao = cfg_banco.get('manutencao', {}) or {}
+        self.banco = banco or obter_banco()
+        self.diretorio = diretorio or cfg_backup.get('diretorio', DIRETORIO_PADRAO)
+        self.intervalo_backup = (intervalo_backup_minutos or cfg_backup.get('intervalo_minutos', 360)) * 60
+        self.manter = max(1, manter or cfg_backup.get('manter', 7))
+        self.paginas_por_passo = max(1, paginas_por_passo or cfg_backup.get('paginas_por_passo', 256))
+        self.pausa_passo = (pausa_passo_ms if pausa_passo_ms is not None else cfg_backup.get('pausa_passo_ms', 10)) / 1000
+        self.max_reinicios = cfg_backup.get('max_reinicios', 3)
+        self.manutencao_ativa = cfg_manutencao.get('ativo', True)
+        self.intervalo_manutencao = (intervalo_manutencao_minutos or cfg_manutencao.get('intervalo_minutos', 60)) * 60
+        self.paginas_vacuum = max(1, cfg_manutencao.get('paginas_vacuum_por_passo', 256))
+        self.max_escritas_por_segundo = (max_escritas_por_segundo if max_escritas_por_segundo is not None
+                                         else cfg_manutencao.get('max_escritas_por_segundo', 5))
+        self.limite_analyze = cfg_manutencao.get('limite_analyze', 1000)
+
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_execucao = threading.Lock()
+        self._ultimo_backup = 0.0
+        self._ultima_manutencao = 0.0
+        self._amostra_escritas = (time.monotonic(), self.banco.obter_metricas()['escritas'])
+
+        self.estatisticas = {
+            'backups': 0,
+            'backups_removidos': 0,
+            'passos_backup': 0,
+            'reinicios_backup': 0,
+            'passo_backup_max_ms': 0.0,
+            'ultimo_backup': None,
+            'ultimo_backup_arquivo': None,
+            'ultimo_backup_ms': 0.0,
+            'ultimo_backup_bytes': 0,
+            'passos_vacuum': 0,
+            'paginas_liberadas': 0,
+            'passo_vacuum_max_ms': 0.0,
+            'analyzes': 0,
+            'analyze_max_ms': 0.0,
+            'manutencoes_adiadas': 0,
+            'erros': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def iniciar(self, intervalo_verificacao: float = 60.0):
+        """Inicia a thread de agendamento"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, args=(intervalo_verificacao,),
+                                        name="manutencao-banco", daemon=True)
+        self._thread.start()
+        logger.info(f"💾 Manutenção do banco iniciada: backup a cada {self.intervalo_backup / 60:.0f} min "
+                    f"(mantendo {self.manter}) em {self.diretorio}")
+
+    def parar(self, timeout: float = 30.0):
+        """Interrompe a thread (backup em andamento é abandonado no próximo passo)"""
+        self._parar.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _loop(self, intervalo_verificacao: float):
+        while not self._parar.is_set():
+            agora = time.monotonic()
+            try:
+                if agora - self._ultimo_backup >= self.intervalo_backup:
+                    self.fazer_backup()
+                if self.manutencao_ativa and agora - self._ultima_manutencao >= self.intervalo_manutencao:
+                    if self.periodo_tranquilo():
+                        self.compactar()
+                        self.analisar()
+                        self._ultima_manutencao = agora
+                    else:
+                        self.estatisticas['manutencoes_adiadas'] += 1
+            except Exception as e:
+                self.estatisticas['erros'] += 1
+                logger.error(f"❌ Erro na manutenção do banco: {e}")
+            self._parar.wait(intervalo_verificacao)
+
+    def periodo_tranquilo(self) -> bool:
+        """Fila do escritor vazia e taxa de escritas desde a última amostra abaixo do limite"""
+        metricas = self.banco.obter_metricas()
+        agora = time.monotonic()
+        inicio, escritas_antes = self._amostra_escritas
+        self._amostra_escritas = (agora, metricas['escritas'])
+        taxa = (metricas['escritas'] - escritas_antes) / max(agora - inicio, 1e-3)
+        return metricas['profundidade_fila'] == 0 and taxa <= self.max_escritas_por_segundo
+
+    # ------------------------------------------------------------------
+    # Backup
+    # ------------------------------------------------------------------
+    def fazer_backup(self) -> Optional[str]:
+        """
+        Copia o banco com a API de backup em passos, verifica, comprime e rotaciona
+
+        Returns:
+            Caminho do backup .db.gz ou None em caso de falha/interrupção
+        """
+        with self._lock_execucao:
+            self._ultimo_backup = time.monotonic()
+            os.makedirs(self.diretorio, exist_ok=True)
+            base = os.path.splitext(os.path.basename(self.banco.db_path))[0]
+            carimbo = datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]
+            destino_db = os.path.join(self.diretorio, f"{base}-{carimbo}.db")
+            temporario = destino_db + '.tmp'
+            inicio = time.perf_counter()
+            try:
+                passos = self._copiar(temporario)
+                if passos is None:
+                    return None
+                self._verificar(temporario)
+                arquivo = self._comprimir(temporario, destino_db + '.gz')
+            except Exception as e:
+                self.estatisticas['erros'] += 1
+                logger.error(f"❌ Erro no backup do banco: {e}")
+                return None
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            tamanho = os.path.getsize(arquivo)
+            self.estatisticas['backups'] += 1
+            self.estatisticas['ultimo_backup'] = datetime.now().isoformat()
+            self.estatisticas['ultimo_backup_arquivo'] = arquivo
+            self.estatisticas['ultimo_backup_ms'] = duracao_ms
+            self.estatisticas['ultimo_backup_bytes'] = tamanho
+            logger.info(f"💾 Backup {os.path.basename(arquivo)}: {len(passos)} passos, maior passo "
+                        f"{max(passos, default=0):.1f}ms, total {duracao_ms:.0f}ms, {tamanho / 1024:.0f}KB")
+            self.rotacionar()
+            return arquivo
+
+    def _copiar(self, destino: str) -> Optional[List[float]]:
+        """Backup em passos; retorna o tempo (ms) de cada passo ou None se interrompido"""
+        uri = f"file:{os.path.abspath(self.banco.db_path)}?mode=ro"
+        origem = sqlite3.connect(uri, uri=True, timeout=self.banco.busy_timeout_ms / 1000)
+        alvo = sqlite3.connect(destino)
+        passos: List[float] = []
+        estado = {'fim_anterior': time.perf_counter(), 'restante': None, 'reinicios': 0}
+
+        def _progresso(status, restante, total):
+            passo_ms = (time.perf_counter() - estado['fim_anterior']) * 1000
+            passos.append(passo_ms)
+            if passo_ms > self.estatisticas['passo_backup_max_ms']:
+                self.estatisticas['passo_backup_max_ms'] = passo_ms
+            # A origem foi alterada por outra conexão: o SQLite recomeça a cópia
+            if estado['restante'] is not None and restante > estado['restante']:
+                estado['reinicios'] += 1
+                self.estatisticas['reinicios_backup'] += 1
+                if estado['reinicios'] > self.max_reinicios:
+                    raise _ReiniciosExcessivos()
+            estado['restante'] = restante
+            if self._parar.is_set():
+                raise InterruptedError("manutenção parada")
+            if restante:
+                time.sleep(self.pausa_passo)
+            estado['fim_anterior'] = time.perf_counter()
+
+        try:
+            try:
+                origem.backup(alvo, pages=self.paginas_por_passo, progress=_progresso)
+            except _ReiniciosExcessivos:
+                # Banco muito movimentado: o restante vai num passo só, que em WAL
+                # segura apenas um snapshot de leitura (os escritores não esperam)
+                logger.debug("💾 Backup reiniciado várias vezes, copiando o restante em um passo")
+                inicio = time.perf_counter()
+                origem.backup(alvo)
+                passos.append((time.perf_counter() - inicio) * 1000)
+                self.estatisticas['passo_backup_max_ms'] = max(self.estatisticas['passo_backup_max_ms'], passos[-1])
+            self.estatisticas['passos_backup'] += len(passos)
+            return passos
+        except InterruptedError:
+            logger.info("💾 Backup interrompido pela parada do robô")
+            return None
+        finally:
+            alvo.close()
+            origem.close()
+
+    @staticmethod
+    def _verificar(caminho: str):
+        conn = sqlite3.connect(caminho)
+        try:
+            resultado = conn.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conn.close()
+        if resultado != 'ok':
+            raise RuntimeError(f"backup corrompido ({resultado})")
+
+    @staticmethod
+    def _comprimir(origem: str, destino: str) -> str:
+        parcial = destino + '.parcial'
+        with open(origem, 'rb') as entrada, gzip.open(parcial, 'wb', compresslevel=6) as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        os.replace(parcial, destino)
+        return destino
+
+    def listar_backups(self) -> List[str]:
+        """Backups deste banco, do mais antigo para o mais recente"""
+        base = os.path.splitext(os.path.basename(self.banco.db_path))[0]
+        return sorted(glob.glob(os.path.join(self.diretorio, f"{base}-*.db.gz")))
+
+    def rotacionar(self) -> int:
+        """Remove os backups além de `manter`; retorna quantos foram removidos"""
+        antigos = self.listar_backups()[:-self.manter]
+        for caminho in antigos:
+            try:
+                os.remove(caminho)
+                self.estatisticas['backups_removidos'] += 1
+            except OSError as e:
+                logger.warning(f"⚠️ Não foi possível remover backup {caminho}: {e}")
+        return len(antigos)
+
+    # ------------------------------------------------------------------
+    # Vacuum incremental e ANALYZE
+    # ------------------------------------------------------------------
+    def compactar(self) -> int:
+        """
+        Devolve páginas livres ao sistema com incremental_vacuum, em passos pela fila do escritor
+
+        Para quando a fila deixa de estar vazia. Bancos criados antes de
+        auto_vacuum=INCREMENTAL precisam de um VACUUM manual (offline) uma vez.
+
+        Returns:
+            Páginas liberadas
+        """
+        if self.banco.consultar_um("PRAGMA auto_vacuum")[0] != 2:
+            logger.debug("🧹 auto_vacuum não é INCREMENTAL neste banco; incremental_vacuum ignorado")
+            return 0
+        liberadas = 0
+        while not self._parar.is_set():
+            livres = self.banco.consultar_um("PRAGMA freelist_count")[0]
+            if not livres or self.banco.obter_metricas()['profundidade_fila'] > 0:
+                break
+            segurou_ms, paginas = self.banco.transacao(lambda conn: self._passo_vacuum(conn, self.paginas_vacuum))
+            if not paginas:
+                break
+            liberadas += paginas
+            self.estatisticas['passos_vacuum'] += 1
+            self.estatisticas['paginas_liberadas'] += paginas
+            self.estatisticas['passo_vacuum_max_ms'] = max(self.estatisticas['passo_vacuum_max_ms'], segurou_ms)
+            self._parar.wait(self.pausa_passo)
+        if liberadas:
+            logger.info(f"🧹 incremental_vacuum liberou {liberadas} páginas "
+                        f"(maior passo {self.estatisticas['passo_vacuum_max_ms']:.1f}ms)")
+        return liberadas
+
+    def analisar(self) -> float:
+        """ANALYZE amostrado (analysis_limit) pela fila do escritor; retorna ms com o lock"""
+        def _analyze(conn: sqlite3.Connection) -> float:
+            conn.execute(f"PRAGMA analysis_limit = {int(self.limite_analyze)}")
+            return self._medir(conn, "ANALYZE")
+
+        segurou_ms = self.banco.transacao(_analyze)
+        self.estatisticas['analyzes'] += 1
+        self.estatisticas['analyze_max_ms'] = max(self.estatisticas['analyze_max_ms'], segurou_ms)
+        logger.info(f"📈 ANALYZE concluído em {segurou_ms:.1f}ms")
+        return segurou_ms
+
+    @staticmethod
+    def _passo_vacuum(conn: sqlite3.Connection, paginas: int):
+        """Libera até `paginas` páginas; retorna (ms com o lock, páginas liberadas)"""
+        inicio = time.perf_counter()
+        antes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # O módulo sqlite3 dá um único step em comandos sem colunas e cada step
+        # de incremental_vacuum libera uma página: um comando por página
+        for _ in range(min(antes, paginas)):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+        depois = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (time.perf_counter() - inicio) * 1000, antes - depois
+
+    @staticmethod
+    def _medir(conn: sqlite3.Connection, sql: str) -> float:
+        inicio = time.perf_counter()
+        conn.execute(sql).fetchall()
+        return (time.perf_counter() - inicio) * 1000
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Retorna contadores de backup e manutenção"""
+        return dict(self.estatisticas, diretorio=self.diretorio, backups_disponiveis=len(self.listar_backups()))
@@ -4,12 +4,13 @@ Melhorias Imediatas para IA - Baseado na Análise de Performance
 Implementa correções urgentes identificadas na análise
 """
 
-import sqlite3
 import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
 
+from banco_dados import obter_banco
+
 logger = logging.getLogger(__name__)
 
 class MelhoriasIA:
@@ -17,15 +18,13 @@ class MelhoriasIA:
     
     def __init__(self, db_path: str = "dados/trading.db"):
         self.db_path = db_path
+        self.banco = obter_banco(db_path)
     
     def analisar_problemas(self) -> Dict[str, Any]:
         """Analisa problemas atuais da IA"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Estatísticas gerais
-            cursor.execute("""
+            stats = self.banco.consultar_um("""
                 SELECT COUNT(*) as total, 
                        SUM(CASE WHEN status = 'fechada' THEN 1 ELSE 0 END) as fechadas,
                        SUM(CASE WHEN lucro_prejuizo > 0 THEN 1 ELSE 0 END) as wins,
@@ -35,10 +34,8 @@ class MelhoriasIA:
                 WHERE status = 'fechada'
             """)
             
-            stats = cursor.fetchone()
-            
             # Análise por par
-            cursor.execute("""
+            stats_por_par = self.banco.consultar("""
                 SELECT symbol, 
                        COUNT(*) as total,
                        SUM(CASE WHEN lucro_prejuizo > 0 THEN 1 ELSE 0 END) as wins,
@@ -48,19 +45,13 @@ class MelhoriasIA:
                 GROUP BY symbol
             """)
             
-            stats_por_par = cursor.fetchall()
-            
             # Análise de confiança
-            cursor.execute("""
+            confianca_stats = self.banco.consultar_um("""
                 SELECT AVG(confianca_ia) as confianca_media,
                        COUNT(*) as total_decisoes
                 FROM aprendizado_autonomo
             """)
             
-            confianca_stats = cursor.fetchone()
-            
-            conn.close()
-            
             return {
                 'total_ordens': stats[0],
                 'ordens_fechadas': stats[1],
@@ -148,20 +139,6 @@ class MelhoriasIA:
         try:
             logger.info("🔍 Implementando filtros de qualidade")
             
-            # Criar tabela de filtros
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS filtros_qualidade (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    filtro_tipo TEXT NOT NULL,
-                    parametros TEXT NOT NULL,
-                    ativo BOOLEAN DEFAULT TRUE
-                )
-            """)
-            
             # Inserir filtros básicos
             filtros = [
                 ('confianca_minima', '0.6'),
@@ -171,14 +148,24 @@ class MelhoriasIA:
                 ('tendencia_requerida', 'alta,baixa')
             ]
             
-            for filtro_tipo, parametros in filtros:
-                cursor.execute("""
+            def gravar(conn):
+                # Criar tabela de filtros
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS filtros_qualidade (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        filtro_tipo TEXT NOT NULL,
+                        parametros TEXT NOT NULL,
+                        ativo BOOLEAN DEFAULT TRUE
+                    )
+                """)
+                conn.executemany("""
                     INSERT OR REPLACE INTO filtros_qualidade (filtro_tipo, parametros)
                     VALUES (?, ?)
-                """, (filtro_tipo, parametros))
+                """, filtros)
             
-            conn.commit()
-            conn.close()
+            # Tabela e filtros numa transação do escritor único
+            self.banco.transacao(gravar)
             
             logger.info("✅ Filtros de qualidade implementados")
             
@@ -190,31 +177,28 @@ class MelhoriasIA:
         try:
             logger.info("🛡️ Melhorando gestão de risco")
             
-            # Criar tabela de gestão de risco
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS gestao_risco (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    max_drawdown_diario REAL DEFAULT 0.05,
-                    max_exposicao_par REAL DEFAULT 0.3,
-                    stop_loss_dinamico BOOLEAN DEFAULT TRUE,
-                    take_profit_dinamico BOOLEAN DEFAULT TRUE,
-                    pausa_apos_losses INTEGER DEFAULT 3
-                )
-            """)
-            
-            # Inserir configurações de risco
-            cursor.execute("""
-                INSERT OR REPLACE INTO gestao_risco 
-                (max_drawdown_diario, max_exposicao_par, pausa_apos_losses)
-                VALUES (0.03, 0.2, 5)
-            """)
+            def gravar(conn):
+                # Criar tabela de gestão de risco
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS gestao_risco (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        max_drawdown_diario REAL DEFAULT 0.05,
+                        max_exposicao_par REAL DEFAULT 0.3,
+                        stop_loss_dinamico BOOLEAN DEFAULT TRUE,
+                        take_profit_dinamico BOOLEAN DEFAULT TRUE,
+                        pausa_apos_losses INTEGER DEFAULT 3
+                    )
+                """)
+                
+                # Inserir configurações de risco
+                conn.execute("""
+                    INSERT OR REPLACE INTO gestao_risco 
+                    (max_drawdown_diario, max_exposicao_par, pausa_apos_losses)
+                    VALUES (0.03, 0.2, 5)
+                """)
             
-            conn.commit()
-            conn.close()
+            self.banco.transacao(gravar)
             
             logger.info("✅ Gestão de risco melhorada")
             
@@ -227,10 +211,7 @@ class MelhoriasIA:
             logger.info("⏸️ Implementando pausa inteligente")
             
             # Criar tabela de pausas
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.banco.executar("""
                 CREATE TABLE IF NOT EXISTS pausas_inteligentes (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -241,9 +222,6 @@ class MelhoriasIA:
                 )
             """)
             
-            conn.commit()
-            conn.close()
-            
             logger.info("✅ Pausa inteligente implementada")
             
         except Exception as e:
@@ -252,25 +230,22 @@ class MelhoriasIA:
     def _atualizar_config(self, chave: str, valor: Any):
         """Atualiza configuração no banco"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Criar tabela se não existir
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS configuracoes_ajustadas (
-                    chave TEXT PRIMARY KEY,
-                    valor TEXT NOT NULL,
-                    timestamp TEXT NOT NULL
-                )
-            """)
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO configuracoes_ajustadas 
-                (chave, valor, timestamp) VALUES (?, ?, ?)
-            """, (chave, str(valor), datetime.now().isoformat()))
+            def gravar(conn):
+                # Criar tabela se não existir
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS configuracoes_ajustadas (
+                        chave TEXT PRIMARY KEY,
+                        valor TEXT NOT NULL,
+                        timestamp TEXT NOT NULL
+                    )
+                """)
+                
+                conn.execute("""
+                    INSERT OR REPLACE INTO configuracoes_ajustadas 
+                    (chave, valor, timestamp) VALUES (?, ?, ?)
+                """, (chave, str(valor), datetime.now().isoformat()))
             
-            conn.commit()
-            conn.close()
+            self.banco.transacao(gravar)
             
             logger.info(f"⚙️ Configuração atualizada: {chave} = {valor}")
             
@@ -0,0 +1,750 @@
+"""
+Migrações versionadas do banco de dados (dados/trading.db)
+
+Cada migração roda uma única vez, em ordem, numa transação própria do escritor.
+A versão aplicada fica registrada na tabela schema_version; se o banco já está
+na última versão a inicialização não executa nenhum DDL.
+"""
+
+import time
+import sqlite3
+from typing import Callable, Dict, List, Tuple
+from loguru import logger
+
+from banco_dados import executar_comandos
+
+# Conversão de TEXT (hora local, formato ISO) para epoch em milissegundos
+_EXPR_EPOCH_MS = "CAST(ROUND((julianday({coluna}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+_DDL_ORDENS_DINAMICAS = """
+        CREATE TABLE IF NOT EXISTS ordens_dinamicas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT UNIQUE NOT NULL,
+            symbol TEXT NOT NULL,
+            tipo_ordem TEXT NOT NULL,
+            preco_entrada REAL NOT NULL,
+            quantidade REAL NOT NULL,
+            stop_loss_inicial REAL,
+            take_profit_inicial REAL,
+            stop_loss_atual REAL,
+            take_profit_atual REAL,
+            status TEXT NOT NULL,
+            timestamp_abertura DATETIME DEFAULT CURRENT_TIMESTAMP,
+            timestamp_fechamento DATETIME,
+            preco_saida REAL,
+            lucro_prejuizo REAL,
+            pnl_percentual REAL,
+            tempo_aberta_segundos INTEGER,
+            ajustes_stop_loss INTEGER DEFAULT 0,
+            ajustes_take_profit INTEGER DEFAULT 0,
+            saida_inteligente_utilizada BOOLEAN DEFAULT FALSE,
+            razao_saida TEXT,
+            dados_mercado_saida TEXT,
+            confianca_ia REAL,
+            previsoes_ia TEXT,
+            cenarios_ia TEXT,
+            justificativa_ia TEXT
+        );
+"""
+
+
+def _v1_esquema_unificado(conn: sqlite3.Connection):
+    """Esquema único de todas as tabelas (antes criado em vários módulos)"""
+    executar_comandos(conn, _DDL_ORDENS_DINAMICAS)
+    executar_comandos(conn, """
+        CREATE TABLE IF NOT EXISTS precos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            preco_atual DECIMAL(10,2),
+            bid DECIMAL(10,2),
+            ask DECIMAL(10,2),
+            volume INTEGER,
+            open_price DECIMAL(10,2),
+            high_price DECIMAL(10,2),
+            low_price DECIMAL(10,2),
+            close_price DECIMAL(10,2),
+            simbolo TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS analises (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            dados_entrada TEXT,
+            resultado TEXT,
+            confianca DECIMAL(5,2)
+        );
+
+        CREATE TABLE IF NOT EXISTS ordens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            tipo TEXT,
+            quantidade INTEGER,
+            preco DECIMAL(10,2),
+            status TEXT,
+            resposta_api TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS crypto_dados (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            symbol TEXT NOT NULL,
+            preco_atual DECIMAL(15,8),
+            preco_abertura DECIMAL(15,8),
+            preco_minimo DECIMAL(15,8),
+            preco_maximo DECIMAL(15,8),
+            volume DECIMAL(20,8),
+            variacao_percentual DECIMAL(10,4),
+            rsi DECIMAL(5,2),
+            volatilidade DECIMAL(10,6),
+            tendencia TEXT,
+            fonte TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS decisoes_ia (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            symbol TEXT NOT NULL,
+            decisao TEXT NOT NULL,
+            confianca DECIMAL(5,2),
+            razao TEXT,
+            dados_entrada TEXT,
+            resultado TEXT,
+            acerto BOOLEAN
+        );
+
+        CREATE TABLE IF NOT EXISTS ordens_crypto (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            order_id TEXT UNIQUE,
+            symbol TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            quantidade DECIMAL(15,8),
+            preco_entrada DECIMAL(15,8),
+            preco_atual DECIMAL(15,8),
+            status TEXT NOT NULL,
+            lucro_prejuizo DECIMAL(15,8),
+            pnl_percentual DECIMAL(10,4),
+            confianca_ia DECIMAL(5,2),
+            dados_mercado TEXT
+        );
+
+
+        CREATE TABLE IF NOT EXISTS ajustes_dinamicos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL,
+            tipo_ajuste TEXT NOT NULL,
+            valor_anterior REAL NOT NULL,
+            valor_novo REAL NOT NULL,
+            razao_ajuste TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            dados_mercado TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS aprendizado_saidas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL,
+            tipo_saida TEXT NOT NULL,
+            tempo_aberta_segundos INTEGER,
+            lucro_prejuizo REAL,
+            confianca_saida REAL,
+            razao_saida TEXT,
+            sucesso BOOLEAN,
+            aprendizado TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS ordens_simuladas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ordem_id TEXT UNIQUE,
+            timestamp DATETIME NOT NULL,
+            tipo TEXT NOT NULL,
+            simbolo TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_entrada DECIMAL(10,2) NOT NULL,
+            preco_alvo DECIMAL(10,2) NOT NULL,
+            preco_stop DECIMAL(10,2) NOT NULL,
+            status TEXT NOT NULL,
+            resultado TEXT,
+            lucro_percentual DECIMAL(5,2),
+            duracao_segundos INTEGER,
+            confianca_ia DECIMAL(5,2),
+            dados_analise TEXT,
+            timestamp_fechamento DATETIME,
+            razao_fechamento TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS aprendizado_ia (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            padrao_entrada TEXT,
+            decisao_ia TEXT,
+            confianca_ia DECIMAL(5,2),
+            resultado_ordem TEXT,
+            lucro_percentual DECIMAL(5,2),
+            acerto BOOLEAN,
+            dados_mercado TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS aprendizado_saida (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            ordem_id TEXT,
+            tipo_ordem TEXT,
+            confianca_entrada DECIMAL(5,2),
+            duracao_segundos DECIMAL(10,2),
+            lucro_percentual DECIMAL(5,2),
+            tipo_saida TEXT,
+            razao_saida TEXT,
+            decisao_saida TEXT,
+            acerto BOOLEAN
+        );
+
+        CREATE TABLE IF NOT EXISTS ajustes_parametros (
+            timestamp TEXT PRIMARY KEY,
+            parametros TEXT NOT NULL,
+            win_rate REAL NOT NULL,
+            pnl_medio REAL NOT NULL,
+            resultado TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS aprendizado_autonomo (
+            timestamp TEXT PRIMARY KEY,
+            symbol TEXT NOT NULL,
+            direcao TEXT NOT NULL,
+            preco_entrada REAL NOT NULL,
+            preco_saida REAL NOT NULL,
+            quantidade REAL NOT NULL,
+            lucro_prejuizo REAL NOT NULL,
+            duracao REAL NOT NULL,
+            rsi_entrada REAL NOT NULL,
+            volatilidade_entrada REAL NOT NULL,
+            tendencia_entrada TEXT NOT NULL,
+            confianca_entrada REAL NOT NULL,
+            stop_loss REAL NOT NULL,
+            take_profit REAL NOT NULL,
+            motivo_saida TEXT NOT NULL,
+            indicadores_entrada TEXT NOT NULL,
+            sucesso INTEGER NOT NULL,
+            contexto_order_book TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS pausas_inteligentes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            par TEXT NOT NULL,
+            motivo TEXT NOT NULL,
+            duracao_minutos INTEGER DEFAULT 30,
+            ativa BOOLEAN DEFAULT TRUE
+        );
+
+        CREATE TABLE IF NOT EXISTS analise_previsoes_ia (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT,
+            target_previsto REAL,
+            stop_previsto REAL,
+            preco_entrada REAL,
+            preco_fechamento REAL,
+            resultado_real TEXT,
+            lucro_real REAL,
+            precisao_target TEXT,
+            precisao_stop TEXT,
+            cenarios_acertados TEXT,
+            timestamp DATETIME
+        );
+    """)
+
+
+# Colunas que bancos antigos podem não ter (tabelas criadas com esquemas divergentes)
+_COLUNAS_LEGADAS: Dict[str, Dict[str, str]] = {
+    'ordens_dinamicas': {
+        'tipo_ordem': "TEXT NOT NULL DEFAULT 'compra'",
+        'preco_entrada': 'REAL NOT NULL DEFAULT 0',
+        'quantidade': 'REAL NOT NULL DEFAULT 0',
+        'stop_loss_inicial': 'REAL',
+        'take_profit_inicial': 'REAL',
+        'stop_loss_atual': 'REAL',
+        'take_profit_atual': 'REAL',
+        'timestamp_abertura': 'DATETIME',
+        'timestamp_fechamento': 'DATETIME',
+        'preco_saida': 'REAL',
+        'lucro_prejuizo': 'REAL',
+        'pnl_percentual': 'REAL',
+        'tempo_aberta_segundos': 'INTEGER',
+        'ajustes_stop_loss': 'INTEGER DEFAULT 0',
+        'ajustes_take_profit': 'INTEGER DEFAULT 0',
+        'saida_inteligente_utilizada': 'BOOLEAN DEFAULT FALSE',
+        'razao_saida': 'TEXT',
+        'dados_mercado_saida': 'TEXT',
+        'confianca_ia': 'REAL',
+        'previsoes_ia': 'TEXT',
+        'cenarios_ia': 'TEXT',
+        'justificativa_ia': 'TEXT',
+    },
+    'ordens_simuladas': {
+        'ordem_id': 'TEXT',
+        'timestamp_fechamento': 'DATETIME',
+        'razao_fechamento': 'TEXT',
+    },
+}
+
+
+def _colunas(conn: sqlite3.Connection, tabela: str) -> List[str]:
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")]
+
+
+def _adicionar_coluna(conn: sqlite3.Connection, tabela: str, coluna: str, definicao: str):
+    if coluna not in _colunas(conn, tabela):
+        conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+
+def _v2_colunas_legadas(conn: sqlite3.Connection):
+    """Completa tabelas criadas por versões antigas com as colunas que faltam"""
+    # SistemaAprendizadoAutonomo criava uma ordens_dinamicas reduzida com 'timestamp NOT NULL',
+    # incompatível com os INSERTs do gestor: reconstrói a tabela preservando as ordens
+    if 'timestamp' in _colunas(conn, 'ordens_dinamicas'):
+        conn.execute("ALTER TABLE ordens_dinamicas RENAME TO ordens_dinamicas_legado")
+        executar_comandos(conn, _DDL_ORDENS_DINAMICAS)
+        conn.execute("""
+            INSERT INTO ordens_dinamicas (order_id, symbol, status, timestamp_abertura, tipo_ordem, preco_entrada, quantidade)
+            SELECT order_id, symbol, status, timestamp, 'compra', 0, 0 FROM ordens_dinamicas_legado
+        """)
+        conn.execute("DROP TABLE ordens_dinamicas_legado")
+        logger.info("🧱 ordens_dinamicas reconstruída a partir do esquema legado")
+    for tabela, colunas in _COLUNAS_LEGADAS.items():
+        for coluna, definicao in colunas.items():
+            _adicionar_coluna(conn, tabela, coluna, definicao)
+    # ordens_simuladas antigas tinham order_id no lugar de ordem_id
+    if 'order_id' in _colunas(conn, 'ordens_simuladas'):
+        conn.execute("UPDATE ordens_simuladas SET ordem_id = order_id WHERE ordem_id IS NULL")
+
+
+# Tabelas quentes: coluna TEXT de origem -> coluna INTEGER epoch-ms
+_TIMESTAMPS_MS: List[Tuple[str, str, str]] = [
+    ('precos', 'timestamp', 'ts_ms'),
+    ('analises', 'timestamp', 'ts_ms'),
+    ('ordens', 'timestamp', 'ts_ms'),
+    ('crypto_dados', 'timestamp', 'ts_ms'),
+    ('decisoes_ia', 'timestamp', 'ts_ms'),
+    ('ordens_dinamicas', 'timestamp_abertura', 'abertura_ms'),
+    ('ordens_dinamicas', 'timestamp_fechamento', 'fechamento_ms'),
+    ('ordens_simuladas', 'timestamp_fechamento', 'fechamento_ms'),
+]
+
+
+def _v3_timestamps_epoch_ms(conn: sqlite3.Connection):
+    """
+    Adiciona colunas INTEGER epoch-ms nas tabelas quentes e preenche o histórico
+
+    As colunas TEXT continuam existindo para os scripts antigos; gravações que
+    não informam a coluna epoch são completadas por trigger.
+    """
+    for tabela, origem, destino in _TIMESTAMPS_MS:
+        _adicionar_coluna(conn, tabela, destino, 'INTEGER')
+        expr = _EXPR_EPOCH_MS.format(coluna=origem)
+        conn.execute(f"UPDATE {tabela} SET {destino} = {expr} WHERE {destino} IS NULL AND {origem} IS NOT NULL")
+
+    for tabela in ('precos', 'analises', 'ordens', 'crypto_dados', 'decisoes_ia'):
+        expr = _EXPR_EPOCH_MS.format(coluna='NEW.timestamp')
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_ts_ms AFTER INSERT ON {tabela}
+            WHEN NEW.ts_ms IS NULL
+            BEGIN
+                UPDATE {tabela} SET ts_ms = {expr} WHERE id = NEW.id;
+            END
+        """)
+
+    expr = _EXPR_EPOCH_MS.format(coluna='NEW.timestamp_abertura')
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ordens_dinamicas_abertura_ms AFTER INSERT ON ordens_dinamicas
+        WHEN NEW.abertura_ms IS NULL
+        BEGIN
+            UPDATE ordens_dinamicas SET abertura_ms = {expr} WHERE id = NEW.id;
+        END
+    """)
+    for tabela in ('ordens_dinamicas', 'ordens_simuladas'):
+        expr = _EXPR_EPOCH_MS.format(coluna='NEW.timestamp_fechamento')
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_fechamento_ms AFTER UPDATE OF timestamp_fechamento ON {tabela}
+            WHEN NEW.timestamp_fechamento IS NOT NULL AND NEW.fechamento_ms IS NULL
+            BEGIN
+                UPDATE {tabela} SET fechamento_ms = {expr} WHERE id = NEW.id;
+            END
+        """)
+
+
+def _v4_indices(conn: sqlite3.Connection):
+    """Índices compostos/cobrindo alinhados às consultas reais"""
+    executar_comandos(conn, """
+        -- PreparadorDadosIA: WHERE simbolo = ? ORDER BY ts_ms DESC LIMIT ? (cobre as colunas lidas)
+        CREATE INDEX IF NOT EXISTS idx_precos_simbolo_ts
+            ON precos (simbolo, ts_ms, preco_atual, volume, bid, ask, timestamp);
+        -- monitor.py: contagens por dia/semana
+        CREATE INDEX IF NOT EXISTS idx_precos_ts ON precos (ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_analises_ts ON analises (ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_ordens_ts ON ordens (ts_ms);
+
+        CREATE INDEX IF NOT EXISTS idx_crypto_dados_symbol_ts ON crypto_dados (symbol, ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_crypto_dados_ts ON crypto_dados (ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_decisoes_ia_symbol_ts ON decisoes_ia (symbol, ts_ms);
+        CREATE INDEX IF NOT EXISTS idx_ordens_crypto_symbol_status ON ordens_crypto (symbol, status);
+
+        -- FiltrosQualidade / monitores: WHERE symbol = ? AND status = 'aberta', últimas fechadas
+        CREATE INDEX IF NOT EXISTS idx_ordens_dinamicas_symbol_status ON ordens_dinamicas (symbol, status);
+        CREATE INDEX IF NOT EXISTS idx_ordens_dinamicas_status_fechamento
+            ON ordens_dinamicas (status, fechamento_ms, lucro_prejuizo);
+        CREATE INDEX IF NOT EXISTS idx_ordens_dinamicas_status_abertura ON ordens_dinamicas (status, abertura_ms);
+        CREATE INDEX IF NOT EXISTS idx_ajustes_dinamicos_order ON ajustes_dinamicos (order_id);
+
+        -- monitor.py / monitor_ordens.py: ordens simuladas por status e data de fechamento
+        CREATE INDEX IF NOT EXISTS idx_ordens_simuladas_status_fechamento
+            ON ordens_simuladas (status, fechamento_ms, resultado, lucro_percentual);
+        CREATE INDEX IF NOT EXISTS idx_ordens_simuladas_status_ts ON ordens_simuladas (status, timestamp);
+
+        CREATE INDEX IF NOT EXISTS idx_aprendizado_autonomo_symbol ON aprendizado_autonomo (symbol, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_pausas_par_ativa ON pausas_inteligentes (par, ativa, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_analise_previsoes_ts ON analise_previsoes_ia (timestamp);
+    """)
+
+
+# Colunas novas de referência a payload e campos numéricos promovidos
+_COLUNAS_PAYLOAD: Dict[str, Dict[str, str]] = {
+    'analises': {'payload_id': 'TEXT', 'rsi': 'REAL', 'volatilidade': 'REAL', 'preco_atual': 'REAL'},
+    'decisoes_ia': {'payload_id': 'TEXT', 'rsi': 'REAL', 'volatilidade': 'REAL', 'preco_atual': 'REAL'},
+    'ordens': {'payload_id': 'TEXT'},
+    'ordens_crypto': {'payload_id': 'TEXT', 'rsi': 'REAL', 'volatilidade': 'REAL'},
+}
+
+
+def _v5_payloads(conn: sqlite3.Connection):
+    """
+    Armazém de payloads endereçado por conteúdo (ver payloads.py)
+
+    As colunas TEXT antigas (dados_entrada, resposta_api, dados_mercado) ficam
+    para as linhas já gravadas; linhas novas usam payload_id e colunas numéricas.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS payloads (
+            payload_id TEXT PRIMARY KEY,
+            compressao INTEGER NOT NULL DEFAULT 0,
+            conteudo BLOB NOT NULL,
+            tamanho INTEGER NOT NULL,
+            criado_em_ms INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    for tabela, colunas in _COLUNAS_PAYLOAD.items():
+        for coluna, definicao in colunas.items():
+            _adicionar_coluna(conn, tabela, coluna, definicao)
+
+
+# Expressões SQL de período (hora local) a partir de um epoch-ms
+_EXPR_AGORA_MS = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+_EXPR_DIA = "date(({ms}) / 1000, 'unixepoch', 'localtime')"
+_EXPR_SEMANA = "date(({ms}) / 1000, 'unixepoch', 'localtime', '-6 days', 'weekday 1')"  # segunda-feira
+
+# Ordens fechadas agregadas por origem: expressões sobre a linha ({r} = NEW/OLD/alias)
+_ORIGENS_ORDENS: Dict[str, Dict[str, str]] = {
+    'dinamicas': {
+        'tabela': 'ordens_dinamicas',
+        'symbol': '{r}.symbol',
+        'win': '{r}.lucro_prejuizo > 0',
+        'loss': '{r}.lucro_prejuizo < 0',
+        'neutra': '{r}.lucro_prejuizo = 0',
+        'pnl': '{r}.lucro_prejuizo',
+        'duracao': '{r}.tempo_aberta_segundos',
+        'colunas': 'status, symbol, lucro_prejuizo, tempo_aberta_segundos, timestamp_fechamento, fechamento_ms',
+    },
+    'simuladas': {
+        'tabela': 'ordens_simuladas',
+        'symbol': '{r}.simbolo',
+        'win': "{r}.resultado = 'win'",
+        'loss': "{r}.resultado = 'loss'",
+        'neutra': "{r}.resultado NOT IN ('win', 'loss')",
+        'pnl': '{r}.lucro_percentual',
+        'duracao': '{r}.duracao_segundos',
+        'colunas': 'status, simbolo, resultado, lucro_percentual, duracao_segundos, timestamp_fechamento, fechamento_ms',
+    },
+}
+
+# Tabelas com contagem de linhas mantida por trigger (coluna de data usada no backfill)
+_TABELAS_CONTAGEM: Dict[str, str] = {
+    'precos': 'ts_ms',
+    'analises': 'ts_ms',
+    'ordens': 'ts_ms',
+    'crypto_dados': 'ts_ms',
+    'ordens_crypto': _EXPR_EPOCH_MS.format(coluna='timestamp'),
+    'ordens_dinamicas': 'abertura_ms',
+    'ajustes_dinamicos': _EXPR_EPOCH_MS.format(coluna='timestamp'),
+}
+
+
+def _periodos(ms: str) -> str:
+    """Linhas (granularidade, periodo) de um instante: total, dia e semana"""
+    return (f"SELECT 'total' AS granularidade, '' AS periodo "
+            f"UNION ALL SELECT 'dia', {_EXPR_DIA.format(ms=ms)} "
+            f"UNION ALL SELECT 'semana', {_EXPR_SEMANA.format(ms=ms)}")
+
+
+def _sql_acumular_ordem(origem: str, r: str, sinal: int) -> str:
+    """Soma (sinal=1) ou subtrai (sinal=-1) a ordem NEW/OLD dos agregados"""
+    cfg = {chave: valor.format(r=r) for chave, valor in _ORIGENS_ORDENS[origem].items()}
+    ms = (f"COALESCE({r}.fechamento_ms, {_EXPR_EPOCH_MS.format(coluna=f'{r}.timestamp_fechamento')}, "
+          f"{_EXPR_AGORA_MS})")
+    return f"""
+        INSERT INTO estatisticas_ordens
+            (origem, granularidade, periodo, symbol, total, wins, losses, neutras, pnl_total, duracao_total_s, duracoes)
+        SELECT '{origem}', g.granularidade, g.periodo, s.symbol, {sinal},
+               {sinal} * COALESCE({cfg['win']}, 0), {sinal} * COALESCE({cfg['loss']}, 0),
+               {sinal} * COALESCE({cfg['neutra']}, 0), {sinal} * COALESCE({cfg['pnl']}, 0),
+               {sinal} * COALESCE({cfg['duracao']}, 0), {sinal} * ({cfg['duracao']} IS NOT NULL)
+        FROM ({_periodos(ms)}) AS g,
+             (SELECT '*' AS symbol UNION ALL SELECT COALESCE({cfg['symbol']}, '?')) AS s
+        WHERE {r}.status = 'fechada'
+        ON CONFLICT (origem, granularidade, periodo, symbol) DO UPDATE SET
+            total = total + excluded.total,
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses,
+            neutras = neutras + excluded.neutras,
+            pnl_total = pnl_total + excluded.pnl_total,
+            duracao_total_s = duracao_total_s + excluded.duracao_total_s,
+            duracoes = duracoes + excluded.duracoes;
+    """
+
+
+def _sql_backfill_ordens(origem: str) -> List[str]:
+    """Agregados iniciais das ordens já fechadas (um GROUP BY por granularidade/nível)"""
+    cfg = {chave: valor.format(r='t') for chave, valor in _ORIGENS_ORDENS[origem].items()}
+    ms = f"COALESCE(t.fechamento_ms, {_EXPR_EPOCH_MS.format(coluna='t.timestamp_fechamento')}, {_EXPR_AGORA_MS})"
+    comandos = []
+    for granularidade, periodo in (('total', "''"), ('dia', _EXPR_DIA.format(ms=ms)),
+                                   ('semana', _EXPR_SEMANA.format(ms=ms))):
+        for symbol in ("'*'", f"COALESCE({cfg['symbol']}, '?')"):
+            comandos.append(f"""
+                INSERT INTO estatisticas_ordens
+                    (origem, granularidade, periodo, symbol, total, wins, losses, neutras, pnl_total, duracao_total_s, duracoes)
+                SELECT '{origem}', '{granularidade}', {periodo} AS p, {symbol} AS s, COUNT(*),
+                       SUM(COALESCE({cfg['win']}, 0)), SUM(COALESCE({cfg['loss']}, 0)),
+                       SUM(COALESCE({cfg['neutra']}, 0)), SUM(COALESCE({cfg['pnl']}, 0)),
+                       SUM(COALESCE({cfg['duracao']}, 0)), COUNT({cfg['duracao']})
+                FROM {cfg['tabela']} AS t
+                WHERE t.status = 'fechada'
+                GROUP BY p, s
+            """)
+    return comandos
+
+
+def _sql_acumular_decisao(r: str, sinal: int, so_acerto: bool = False) -> str:
+    """Soma/subtrai a decisão NEW/OLD (so_acerto: mexe só na coluna acertos)"""
+    ms = f"COALESCE({r}.ts_ms, {_EXPR_EPOCH_MS.format(coluna=f'{r}.timestamp')}, {_EXPR_AGORA_MS})"
+    contagem = '0' if so_acerto else str(sinal)
+    decisao = (lambda valor: '0') if so_acerto else (lambda valor: f"{sinal} * ({r}.decisao = '{valor}')")
+    return f"""
+        INSERT INTO estatisticas_decisoes (granularidade, periodo, symbol, total, comprar, vender, aguardar, acertos)
+        SELECT g.granularidade, g.periodo, s.symbol, {contagem},
+               {decisao('comprar')}, {decisao('vender')}, {decisao('aguardar')}, {sinal} * COALESCE({r}.acerto = 1, 0)
+        FROM ({_periodos(ms)}) AS g,
+             (SELECT '*' AS symbol UNION ALL SELECT COALESCE({r}.symbol, '?')) AS s
+        WHERE 1
+        ON CONFLICT (granularidade, periodo, symbol) DO UPDATE SET
+            total = total + excluded.total,
+            comprar = comprar + excluded.comprar,
+            vender = vender + excluded.vender,
+            aguardar = aguardar + excluded.aguardar,
+            acertos = acertos + excluded.acertos;
+    """
+
+
+def _v6_estatisticas_incrementais(conn: sqlite3.Connection):
+    """
+    Agregados mantidos por trigger na mesma transação da escrita
+
+    Painéis e filtros leem contagens, wins/losses, PnL e tempo médio por
+    origem/dia/semana/símbolo com uma busca pela chave primária, sem varrer
+    as tabelas. DELETE nas tabelas de ordens desconta os agregados; o
+    arquivamento de decisoes_ia não desconta (as estatísticas são do histórico
+    completo) e as contagens por dia/semana refletem o dia da inserção.
+    """
+    executar_comandos(conn, """
+        CREATE TABLE IF NOT EXISTS estatisticas_ordens (
+            origem TEXT NOT NULL,
+            granularidade TEXT NOT NULL,
+            periodo TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            neutras INTEGER NOT NULL DEFAULT 0,
+            pnl_total REAL NOT NULL DEFAULT 0,
+            duracao_total_s REAL NOT NULL DEFAULT 0,
+            duracoes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (origem, granularidade, periodo, symbol)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS estatisticas_decisoes (
+            granularidade TEXT NOT NULL,
+            periodo TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            comprar INTEGER NOT NULL DEFAULT 0,
+            vender INTEGER NOT NULL DEFAULT 0,
+            aguardar INTEGER NOT NULL DEFAULT 0,
+            acertos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularidade, periodo, symbol)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS contagens (
+            tabela TEXT NOT NULL,
+            granularidade TEXT NOT NULL,
+            periodo TEXT NOT NULL,
+            linhas INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabela, granularidade, periodo)
+        ) WITHOUT ROWID;
+    """)
+
+    for origem, cfg in _ORIGENS_ORDENS.items():
+        tabela = cfg['tabela']
+        for comando in _sql_backfill_ordens(origem):
+            conn.execute(comando)
+        executar_comandos(conn, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_estatisticas_ins AFTER INSERT ON {tabela}
+            WHEN NEW.status = 'fechada'
+            BEGIN {_sql_acumular_ordem(origem, 'NEW', 1)} END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_estatisticas_upd AFTER UPDATE OF {cfg['colunas']} ON {tabela}
+            WHEN OLD.status = 'fechada' OR NEW.status = 'fechada'
+            BEGIN {_sql_acumular_ordem(origem, 'OLD', -1)} {_sql_acumular_ordem(origem, 'NEW', 1)} END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_estatisticas_del AFTER DELETE ON {tabela}
+            WHEN OLD.status = 'fechada'
+            BEGIN {_sql_acumular_ordem(origem, 'OLD', -1)} END;
+        """)
+
+    ms = f"COALESCE(t.ts_ms, {_EXPR_EPOCH_MS.format(coluna='t.timestamp')}, {_EXPR_AGORA_MS})"
+    for granularidade, periodo in (('total', "''"), ('dia', _EXPR_DIA.format(ms=ms)),
+                                   ('semana', _EXPR_SEMANA.format(ms=ms))):
+        for symbol in ("'*'", "COALESCE(t.symbol, '?')"):
+            conn.execute(f"""
+                INSERT INTO estatisticas_decisoes (granularidade, periodo, symbol, total, comprar, vender, aguardar, acertos)
+                SELECT '{granularidade}', {periodo} AS p, {symbol} AS s, COUNT(*),
+                       SUM(t.decisao = 'comprar'), SUM(t.decisao = 'vender'), SUM(t.decisao = 'aguardar'),
+                       SUM(COALESCE(t.acerto = 1, 0))
+                FROM decisoes_ia AS t
+                GROUP BY p, s
+            """)
+    executar_comandos(conn, f"""
+        CREATE TRIGGER IF NOT EXISTS trg_decisoes_ia_estatisticas_ins AFTER INSERT ON decisoes_ia
+        BEGIN {_sql_acumular_decisao('NEW', 1)} END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_decisoes_ia_estatisticas_acerto AFTER UPDATE OF acerto ON decisoes_ia
+        BEGIN {_sql_acumular_decisao('OLD', -1, so_acerto=True)} {_sql_acumular_decisao('NEW', 1, so_acerto=True)} END;
+    """)
+
+    for tabela, coluna_ms in _TABELAS_CONTAGEM.items():
+        ms = f"COALESCE({coluna_ms}, {_EXPR_AGORA_MS})"
+        conn.execute(f"""
+            INSERT INTO contagens (tabela, granularidade, periodo, linhas)
+            SELECT '{tabela}', 'total', '', COUNT(*) FROM {tabela}
+        """)
+        for granularidade, expr in (('dia', _EXPR_DIA), ('semana', _EXPR_SEMANA)):
+            conn.execute(f"""
+                INSERT INTO contagens (tabela, granularidade, periodo, linhas)
+                SELECT '{tabela}', '{granularidade}', {expr.format(ms=ms)} AS p, COUNT(*)
+                FROM {tabela} WHERE 1 GROUP BY p
+            """)
+        executar_comandos(conn, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_contagem_ins AFTER INSERT ON {tabela}
+            BEGIN
+                INSERT INTO contagens (tabela, granularidade, periodo, linhas)
+                SELECT '{tabela}', g.granularidade, g.periodo, 1 FROM ({_periodos(_EXPR_AGORA_MS)}) AS g
+                WHERE 1
+                ON CONFLICT (tabela, granularidade, periodo) DO UPDATE SET linhas = linhas + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_contagem_del AFTER DELETE ON {tabela}
+            BEGIN
+                UPDATE contagens SET linhas = linhas - 1
+                WHERE tabela = '{tabela}' AND granularidade = 'total' AND periodo = '';
+            END;
+        """)
+
+
+def _v7_ordens_crypto_ts_ms(conn: sqlite3.Connection):
+    """ts_ms em ordens_crypto, que ficou fora da v3 (mesma coluna, trigger e índice das outras tabelas)"""
+    _adicionar_coluna(conn, 'ordens_crypto', 'ts_ms', 'INTEGER')
+    expr = _EXPR_EPOCH_MS.format(coluna='timestamp')
+    conn.execute(f"UPDATE ordens_crypto SET ts_ms = {expr} WHERE ts_ms IS NULL AND timestamp IS NOT NULL")
+    expr = _EXPR_EPOCH_MS.format(coluna='NEW.timestamp')
+    executar_comandos(conn, f"""
+        CREATE TRIGGER IF NOT EXISTS trg_ordens_crypto_ts_ms AFTER INSERT ON ordens_crypto
+        WHEN NEW.ts_ms IS NULL
+        BEGIN
+            UPDATE ordens_crypto SET ts_ms = {expr} WHERE id = NEW.id;
+        END;
+
+        CREATE INDEX IF NOT EXISTS idx_ordens_crypto_ts ON ordens_crypto (ts_ms);
+    """)
+
+
+# (versão, descrição, função) em ordem crescente; nunca alterar uma migração já publicada
+MIGRACOES: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, 'esquema unificado', _v1_esquema_unificado),
+    (2, 'colunas de esquemas legados', _v2_colunas_legadas),
+    (3, 'timestamps epoch-ms nas tabelas quentes', _v3_timestamps_epoch_ms),
+    (4, 'índices compostos e cobrindo', _v4_indices),
+    (5, 'payloads endereçados por conteúdo', _v5_payloads),
+    (6, 'estatísticas incrementais', _v6_estatisticas_incrementais),
+    (7, 'ts_ms em ordens_crypto', _v7_ordens_crypto_ts_ms),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def obter_versao(banco) -> int:
+    """Retorna a versão de esquema aplicada (0 para banco sem schema_version)"""
+    existe = banco.consultar_um("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if not existe:
+        return 0
+    linha = banco.consultar_um("SELECT MAX(versao) FROM schema_version")
+    return (linha[0] or 0) if linha else 0
+
+
+def aplicar_migracoes(banco) -> int:
+    """
+    Aplica as migrações pendentes
+
+    Args:
+        banco: GerenciadorBanco do arquivo
+
+    Returns:
+        Versão do esquema após a execução
+    """
+    versao = obter_versao(banco)
+    if versao >= VERSAO_ATUAL:
+        return versao
+
+    banco.executar("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em_ms INTEGER NOT NULL
+        )
+    """)
+    for numero, descricao, funcao in MIGRACOES:
+        if numero <= versao:
+            continue
+
+        def _migrar(conn: sqlite3.Connection, numero=numero, descricao=descricao, funcao=funcao):
+            # Reconfere dentro da transação: outro processo pode ter migrado antes
+            atual = conn.execute("SELECT MAX(versao) FROM schema_version").fetchone()[0] or 0
+            if atual >= numero:
+                return False
+            funcao(conn)
+            conn.execute("INSERT INTO schema_version (versao, descricao, aplicada_em_ms) VALUES (?, ?, ?)",
+                         (numero, descricao, int(time.time() * 1000)))
+            return True
+
+        inicio = time.perf_counter()
+        if banco.transacao(_migrar):
+            logger.info(f"🧱 Migração {numero} aplicada ({descricao}) em {(time.perf_counter() - inicio) * 1000:.0f}ms")
+        versao = numero
+    return versao
@@ -6,11 +6,24 @@ Exibe status em tempo real do sistema de forma mais rápida
 
 import os
 import time
-import sqlite3
 import requests
 from datetime import datetime, timedelta
 from loguru import logger
-from executor import ExecutorOrdensSimuladas
+from estatisticas import contar_linhas, obter_estatisticas_ordens
+from leitura_monitor import obter_leitor, opcional, um
+
+DB_PATH = "dados/trading.db"
+
+def _limites_periodo():
+    """
+    Retorna hoje e o início da semana (segunda-feira)
+
+    As contagens e agregados do painel são chaveados por dia/semana; só as
+    previsões filtram por timestamp (ISO, comparação textual)
+    """
+    hoje = datetime.now().date()
+    inicio_semana = hoje - timedelta(days=hoje.weekday())  # Segunda-feira
+    return hoje, inicio_semana
 
 def verificar_processo_robo():
     """
@@ -46,51 +59,68 @@ def verificar_ollama():
     except:
         return False, 0
 
+def _consultas_painel(hoje, inicio_semana):
+    """
+    Todas as consultas do painel (executadas juntas num único snapshot de leitura)
+    """
+    def _contagens(conn):
+        return {tabela: (contar_linhas(conn, tabela, 'dia', hoje), contar_linhas(conn, tabela, 'semana', hoje))
+                for tabela in ('precos', 'analises', 'ordens')}
+
+    def _previsoes(conn):
+        existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='analise_previsoes_ia'").fetchone()
+        if not existe:
+            return None
+        # timestamp ISO: comparação textual usa o índice; uma passada conta hoje e semana
+        sql = """
+            SELECT COUNT(*),
+                   COALESCE(SUM(precisao_target = 'acerto'), 0),
+                   COALESCE(SUM(precisao_stop = 'acerto'), 0),
+                   COALESCE(SUM(resultado_real = 'win'), 0)
+            FROM analise_previsoes_ia WHERE timestamp >= ?
+        """
+        return {
+            'hoje': conn.execute(sql, (hoje.isoformat(),)).fetchone(),
+            'semana': conn.execute(sql, (inicio_semana.isoformat(),)).fetchone(),
+        }
+
+    return {
+        'contagens': opcional(_contagens, {}),
+        'ultimo_preco_ibov': opcional(um("SELECT preco_atual, timestamp FROM precos WHERE simbolo = 'IBOV' ORDER BY ts_ms DESC LIMIT 1")),
+        'ultimo_preco_win': opcional(um("SELECT preco_atual, timestamp FROM precos WHERE simbolo LIKE 'WIN%' ORDER BY ts_ms DESC LIMIT 1")),
+        'ultima_analise': opcional(um('SELECT resultado, confianca, timestamp FROM analises ORDER BY ts_ms DESC LIMIT 1')),
+        'simuladas_dia': opcional(lambda conn: obter_estatisticas_ordens(conn, 'simuladas', 'dia', referencia=hoje)),
+        'simuladas_semana': opcional(lambda conn: obter_estatisticas_ordens(conn, 'simuladas', 'semana', referencia=hoje)),
+        'simuladas_abertas': opcional(um("SELECT COUNT(*) FROM ordens_simuladas WHERE status = 'aberta'", padrao=(0,)), (0,)),
+        'previsoes': opcional(_previsoes),
+    }
+
+def _painel():
+    """
+    Snapshot do painel; sem commit novo no banco volta do cache sem consultar
+    """
+    hoje, inicio_semana = _limites_periodo()
+    return obter_leitor(DB_PATH).instantaneo('monitor', _consultas_painel(hoje, inicio_semana), chave=hoje)
+
 def obter_estatisticas_banco_rapido():
     """
     Obtém estatísticas do banco de dados de forma otimizada
     """
     try:
-        db_path = "dados/trading.db"
-        if not os.path.exists(db_path):
+        painel = _painel()
+        if not painel:
             return {}
         
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        
-        # Obter data de hoje e início da semana
-        hoje = datetime.now().date()
-        inicio_semana = hoje - timedelta(days=hoje.weekday())  # Segunda-feira
-        
-        # Consultas otimizadas em batch
-        queries = [
-            ('total_precos_hoje', f"SELECT COUNT(*) FROM precos WHERE DATE(timestamp) = '{hoje}'"),
-            ('total_analises_hoje', f"SELECT COUNT(*) FROM analises WHERE DATE(timestamp) = '{hoje}'"),
-            ('total_ordens_hoje', f"SELECT COUNT(*) FROM ordens WHERE DATE(timestamp) = '{hoje}'"),
-            ('total_precos_semana', f"SELECT COUNT(*) FROM precos WHERE DATE(timestamp) >= '{inicio_semana}'"),
-            ('total_analises_semana', f"SELECT COUNT(*) FROM analises WHERE DATE(timestamp) >= '{inicio_semana}'"),
-            ('total_ordens_semana', f"SELECT COUNT(*) FROM ordens WHERE DATE(timestamp) >= '{inicio_semana}'"),
-            ('ultimo_preco_ibov', 'SELECT preco_atual, timestamp FROM precos WHERE simbolo = "IBOV" ORDER BY timestamp DESC LIMIT 1'),
-            ('ultimo_preco_win', 'SELECT preco_atual, timestamp FROM precos WHERE simbolo LIKE "WIN%" ORDER BY timestamp DESC LIMIT 1'),
-            ('ultima_analise', 'SELECT resultado, confianca, timestamp FROM analises ORDER BY timestamp DESC LIMIT 1')
-        ]
-        
         stats = {}
-        for key, query in queries:
-            try:
-                c.execute(query)
-                result = c.fetchone()
-                if result:
-                    if key.startswith('ultimo_preco_'):
-                        stats[key] = {'preco': result[0], 'timestamp': result[1]}
-                    elif key == 'ultima_analise':
-                        stats[key] = {'resultado': result[0], 'confianca': result[1], 'timestamp': result[2]}
-                    else:
-                        stats[key] = result[0]
-            except Exception as e:
-                logger.debug(f"Erro na query {key}: {e}")
-        
-        conn.close()
+        for tabela, (dia, semana) in (painel.get('contagens') or {}).items():
+            stats[f'total_{tabela}_hoje'] = dia
+            stats[f'total_{tabela}_semana'] = semana
+        for key in ('ultimo_preco_ibov', 'ultimo_preco_win'):
+            if painel.get(key):
+                stats[key] = {'preco': painel[key][0], 'timestamp': painel[key][1]}
+        if painel.get('ultima_analise'):
+            resultado, confianca, timestamp = painel['ultima_analise']
+            stats['ultima_analise'] = {'resultado': resultado, 'confianca': confianca, 'timestamp': timestamp}
         return stats
         
     except Exception as e:
@@ -102,60 +132,23 @@ def obter_estatisticas_aprendizado_rapido():
     Obtém estatísticas de aprendizado de forma otimizada (hoje e semana)
     """
     try:
-        executor = ExecutorOrdensSimuladas()
-        stats = executor.obter_estatisticas_aprendizado()
-        
-        # Obter data de hoje e início da semana
-        hoje = datetime.now().date()
-        inicio_semana = hoje - timedelta(days=hoje.weekday())
-        
-        # Conectar ao banco para obter dados diários e semanais
-        conn = sqlite3.connect(executor.db_path)
-        c = conn.cursor()
-        
-        # Estatísticas de hoje
-        c.execute(f"SELECT COUNT(*) FROM ordens_simuladas WHERE status = 'fechada' AND DATE(timestamp_fechamento) = '{hoje}'")
-        total_ordens_hoje = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM ordens_simuladas WHERE status = 'fechada' AND resultado = 'win' AND DATE(timestamp_fechamento) = '{hoje}'")
-        wins_hoje = c.fetchone()[0]
-        
-        c.execute(f"SELECT SUM(lucro_percentual) FROM ordens_simuladas WHERE status = 'fechada' AND DATE(timestamp_fechamento) = '{hoje}'")
-        lucro_hoje = c.fetchone()[0] or 0.0
-        
-        # Estatísticas da semana
-        c.execute(f"SELECT COUNT(*) FROM ordens_simuladas WHERE status = 'fechada' AND DATE(timestamp_fechamento) >= '{inicio_semana}'")
-        total_ordens_semana = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM ordens_simuladas WHERE status = 'fechada' AND resultado = 'win' AND DATE(timestamp_fechamento) >= '{inicio_semana}'")
-        wins_semana = c.fetchone()[0]
-        
-        c.execute(f"SELECT SUM(lucro_percentual) FROM ordens_simuladas WHERE status = 'fechada' AND DATE(timestamp_fechamento) >= '{inicio_semana}'")
-        lucro_semana = c.fetchone()[0] or 0.0
-        
-        conn.close()
-        
-        # Calcular taxas de acerto
-        taxa_acerto_hoje = (wins_hoje / total_ordens_hoje * 100) if total_ordens_hoje > 0 else 0
-        taxa_acerto_semana = (wins_semana / total_ordens_semana * 100) if total_ordens_semana > 0 else 0
+        painel = _painel()
+        if not painel:
+            return {}
         
-        return {
-            'hoje': {
-                'total_ordens': total_ordens_hoje,
-                'wins': wins_hoje,
-                'losses': total_ordens_hoje - wins_hoje,
-                'taxa_acerto': taxa_acerto_hoje,
-                'lucro_total': lucro_hoje
-            },
-            'semana': {
-                'total_ordens': total_ordens_semana,
-                'wins': wins_semana,
-                'losses': total_ordens_semana - wins_semana,
-                'taxa_acerto': taxa_acerto_semana,
-                'lucro_total': lucro_semana
-            },
-            'ordens_ativas': len(executor.ordens_ativas)
-        }
+        resumo = {}
+        for periodo, chave in (('hoje', 'simuladas_dia'), ('semana', 'simuladas_semana')):
+            stats = painel.get(chave) or {'total': 0, 'wins': 0, 'pnl_total': 0.0}
+            total, wins = stats['total'], stats['wins']
+            resumo[periodo] = {
+                'total_ordens': total,
+                'wins': wins,
+                'losses': total - wins,
+                'taxa_acerto': (wins / total * 100) if total > 0 else 0,
+                'lucro_total': stats['pnl_total']
+            }
+        resumo['ordens_ativas'] = painel['simuladas_abertas'][0]
+        return resumo
     except Exception as e:
         logger.error(f"Erro ao obter estatísticas de aprendizado: {e}")
         return {}
@@ -165,74 +158,24 @@ def obter_estatisticas_previsoes_rapido():
     Obtém estatísticas de previsões da IA de forma otimizada
     """
     try:
-        db_path = "dados/trading.db"
-        if not os.path.exists(db_path):
+        painel = _painel()
+        if not painel:
             return {}
         
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        
-        # Verificar se tabela existe
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='analise_previsoes_ia'")
-        if not c.fetchone():
-            conn.close()
+        previsoes = painel.get('previsoes')
+        if not previsoes:
             return {'mensagem': 'Nenhuma análise de previsões encontrada'}
         
-        # Obter data de hoje e início da semana
-        hoje = datetime.now().date()
-        inicio_semana = hoje - timedelta(days=hoje.weekday())
-        
-        # Estatísticas de hoje
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE DATE(timestamp) = '{hoje}'")
-        total_analises_hoje = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE precisao_target = 'acerto' AND DATE(timestamp) = '{hoje}'")
-        targets_acertos_hoje = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE precisao_stop = 'acerto' AND DATE(timestamp) = '{hoje}'")
-        stops_acertos_hoje = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE resultado_real = 'win' AND DATE(timestamp) = '{hoje}'")
-        wins_hoje = c.fetchone()[0]
-        
-        # Estatísticas da semana
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE DATE(timestamp) >= '{inicio_semana}'")
-        total_analises_semana = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE precisao_target = 'acerto' AND DATE(timestamp) >= '{inicio_semana}'")
-        targets_acertos_semana = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE precisao_stop = 'acerto' AND DATE(timestamp) >= '{inicio_semana}'")
-        stops_acertos_semana = c.fetchone()[0]
-        
-        c.execute(f"SELECT COUNT(*) FROM analise_previsoes_ia WHERE resultado_real = 'win' AND DATE(timestamp) >= '{inicio_semana}'")
-        wins_semana = c.fetchone()[0]
-        
-        conn.close()
-        
-        # Calcular taxas de precisão
-        precisao_target_hoje = (targets_acertos_hoje / total_analises_hoje * 100) if total_analises_hoje > 0 else 0
-        precisao_stop_hoje = (stops_acertos_hoje / total_analises_hoje * 100) if total_analises_hoje > 0 else 0
-        win_rate_hoje = (wins_hoje / total_analises_hoje * 100) if total_analises_hoje > 0 else 0
-        
-        precisao_target_semana = (targets_acertos_semana / total_analises_semana * 100) if total_analises_semana > 0 else 0
-        precisao_stop_semana = (stops_acertos_semana / total_analises_semana * 100) if total_analises_semana > 0 else 0
-        win_rate_semana = (wins_semana / total_analises_semana * 100) if total_analises_semana > 0 else 0
-        
-        return {
-            'hoje': {
-                'total_analises': total_analises_hoje,
-                'precisao_target': precisao_target_hoje,
-                'precisao_stop': precisao_stop_hoje,
-                'win_rate': win_rate_hoje
-            },
-            'semana': {
-                'total_analises': total_analises_semana,
-                'precisao_target': precisao_target_semana,
-                'precisao_stop': precisao_stop_semana,
-                'win_rate': win_rate_semana
+        resumo = {}
+        for periodo in ('hoje', 'semana'):
+            total, targets, stops, wins = previsoes[periodo]
+            resumo[periodo] = {
+                'total_analises': total,
+                'precisao_target': (targets / total * 100) if total > 0 else 0,
+                'precisao_stop': (stops / total * 100) if total > 0 else 0,
+                'win_rate': (wins / total * 100) if total > 0 else 0
             }
-        }
+        return resumo
         
     except Exception as e:
         logger.error(f"Erro ao obter estatísticas de previsões: {e}")
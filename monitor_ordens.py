@@ -4,34 +4,51 @@ Monitor de Ordens em Tempo Real
 Mostra ordens ativas, fechadas e estatísticas
 """
 
-import sqlite3
 import time
 import os
 from datetime import datetime
 from loguru import logger
+from estatisticas import obter_estatisticas_ordens
+from leitura_monitor import obter_leitor, opcional, todos
+
+DB_PATH = 'dados/trading.db'
+MAX_FECHADAS = 10  # últimas fechadas lidas por snapshot (exibição usa até este limite)
 
 def limpar_tela():
     """Limpa a tela do terminal"""
     os.system('clear' if os.name == 'posix' else 'cls')
 
-def obter_ordens_ativas():
-    """Obtém ordens ativas do banco"""
-    try:
-        conn = sqlite3.connect('dados/trading.db', timeout=30)
-        conn.execute("PRAGMA journal_mode=WAL;")
-        c = conn.cursor()
-        
-        c.execute('''
+def _painel():
+    """
+    Ordens ativas, últimas fechadas e estatísticas num único snapshot de leitura
+
+    Sem commit novo no banco (PRAGMA data_version igual) volta do cache sem consultar
+    """
+    consultas = {
+        'ativas': todos('''
         SELECT ordem_id, tipo, simbolo, preco_entrada, preco_alvo, preco_stop, 
                confianca_ia, timestamp
         FROM ordens_simuladas 
         WHERE status = 'aberta' 
         ORDER BY timestamp DESC
-        ''')
-        
-        ordens = c.fetchall()
-        conn.close()
-        return ordens
+        '''),
+        'fechadas': todos('''
+        SELECT ordem_id, tipo, simbolo, resultado, lucro_percentual, 
+               duracao_segundos, razao_fechamento, timestamp_fechamento
+        FROM ordens_simuladas 
+        WHERE status = 'fechada' 
+        ORDER BY fechamento_ms DESC 
+        LIMIT ?
+        ''', (MAX_FECHADAS,)),
+        # Totais do agregado mantido por trigger (sem varrer ordens_simuladas)
+        'estatisticas': opcional(lambda conn: obter_estatisticas_ordens(conn, 'simuladas')),
+    }
+    return obter_leitor(DB_PATH).instantaneo('ordens', consultas)
+
+def obter_ordens_ativas():
+    """Obtém ordens ativas do banco"""
+    try:
+        return _painel().get('ativas', [])
     except Exception as e:
         logger.error(f"Erro ao obter ordens ativas: {e}")
         return []
@@ -39,22 +56,7 @@ def obter_ordens_ativas():
 def obter_ultimas_ordens_fechadas(limite=10):
     """Obtém últimas ordens fechadas"""
     try:
-        conn = sqlite3.connect('dados/trading.db', timeout=30)
-        conn.execute("PRAGMA journal_mode=WAL;")
-        c = conn.cursor()
-        
-        c.execute('''
-        SELECT ordem_id, tipo, simbolo, resultado, lucro_percentual, 
-               duracao_segundos, razao_fechamento, timestamp_fechamento
-        FROM ordens_simuladas 
-        WHERE status = 'fechada' 
-        ORDER BY timestamp_fechamento DESC 
-        LIMIT ?
-        ''', (limite,))
-        
-        ordens = c.fetchall()
-        conn.close()
-        return ordens
+        return _painel().get('fechadas', [])[:limite]
     except Exception as e:
         logger.error(f"Erro ao obter ordens fechadas: {e}")
         return []
@@ -62,38 +64,19 @@ def obter_ultimas_ordens_fechadas(limite=10):
 def obter_estatisticas():
     """Obtém estatísticas gerais"""
     try:
-        conn = sqlite3.connect('dados/trading.db', timeout=30)
-        conn.execute("PRAGMA journal_mode=WAL;")
-        c = conn.cursor()
-        
-        # Total de ordens
-        c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "fechada"')
-        total_ordens = c.fetchone()[0]
-        
-        # Wins e losses
-        c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "fechada" AND resultado = "win"')
-        wins = c.fetchone()[0]
-        
-        c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "fechada" AND resultado = "loss"')
-        losses = c.fetchone()[0]
-        
-        # Lucro total
-        c.execute('SELECT SUM(lucro_percentual) FROM ordens_simuladas WHERE status = "fechada"')
-        lucro_total = c.fetchone()[0] or 0.0
-        
-        # Ordens ativas
-        c.execute('SELECT COUNT(*) FROM ordens_simuladas WHERE status = "aberta"')
-        ordens_ativas = c.fetchone()[0]
-        
-        conn.close()
+        painel = _painel()
+        if not painel:
+            return {}
+        stats = painel.get('estatisticas') or {'total': 0, 'wins': 0, 'losses': 0, 'pnl_total': 0.0}
+        total_ordens, wins = stats['total'], stats['wins']
         
         return {
             'total_ordens': total_ordens,
             'wins': wins,
-            'losses': losses,
+            'losses': stats['losses'],
             'taxa_acerto': (wins / total_ordens * 100) if total_ordens > 0 else 0,
-            'lucro_total': lucro_total,
-            'ordens_ativas': ordens_ativas
+            'lucro_total': stats['pnl_total'],
+            'ordens_ativas': len(painel.get('ativas', []))
         }
     except Exception as e:
         logger.error(f"Erro ao obter estatísticas: {e}")
@@ -1,83 +1,35 @@
-import sqlite3
 import os
 import time
-import requests
 from tabulate import tabulate
 from datetime import datetime
+from estatisticas import obter_estatisticas_ordens
+from leitura_monitor import obter_leitor, opcional, todos
+from snapshot_mercado import obter_servico_snapshot
 
 DB_PATH = 'dados/trading.db'
 
-# Garantir que a tabela ordens_dinamicas existe (schema unificado)
-import sqlite3
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
-c.execute('''
-CREATE TABLE IF NOT EXISTS ordens_dinamicas (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    order_id TEXT UNIQUE NOT NULL,
-    symbol TEXT NOT NULL,
-    tipo_ordem TEXT NOT NULL,
-    preco_entrada REAL NOT NULL,
-    quantidade REAL NOT NULL,
-    stop_loss_inicial REAL,
-    take_profit_inicial REAL,
-    stop_loss_atual REAL,
-    take_profit_atual REAL,
-    status TEXT NOT NULL,
-    timestamp_abertura DATETIME DEFAULT CURRENT_TIMESTAMP,
-    timestamp_fechamento DATETIME,
-    preco_saida REAL,
-    lucro_prejuizo REAL,
-    tempo_aberta_segundos INTEGER,
-    ajustes_stop_loss INTEGER DEFAULT 0,
-    ajustes_take_profit INTEGER DEFAULT 0,
-    saida_inteligente_utilizada BOOLEAN DEFAULT FALSE,
-    razao_saida TEXT,
-    dados_mercado_saida TEXT,
-    previsoes_ia TEXT,
-    cenarios_ia TEXT,
-    justificativa_ia TEXT
-)
-''')
-conn.commit()
-conn.close()
-
-# Garante que o diretório do banco existe
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-
-def get_current_prices():
-    """Obtém preços atuais de todos os ativos de uma vez só"""
-    try:
-        # Buscar todos os pares de uma vez
-        url = "https://api.bybit.com/v5/market/tickers?category=linear"
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('retCode') == 0 and data.get('result', {}).get('list'):
-                prices = {}
-                for ticker in data['result']['list']:
-                    symbol = ticker['symbol']
-                    prices[symbol] = float(ticker['lastPrice'])
-                return prices
-        return {}
-    except Exception as e:
-        print(f"Erro ao obter preços: {e}")
-        return {}
-
-def get_open_orders():
-    """Busca apenas ordens abertas do banco"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+def _painel():
+    """Ordens abertas e resumo das fechadas num único snapshot somente leitura (cache por data_version)"""
+    consultas = {
+        'abertas': todos("""
         SELECT order_id, symbol, tipo_ordem, preco_entrada, quantidade, 
                stop_loss_atual, take_profit_atual, timestamp_abertura
         FROM ordens_dinamicas
         WHERE status = 'aberta'
         ORDER BY timestamp_abertura DESC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    """),
+        'fechadas': opcional(lambda conn: obter_estatisticas_ordens(conn, 'dinamicas')),
+    }
+    return obter_leitor(DB_PATH).instantaneo('simulador', consultas)
+
+def get_current_prices():
+    """Obtém preços atuais de todos os ativos de uma vez só (snapshot compartilhado do ciclo)"""
+    snapshot = obter_servico_snapshot().obter()
+    return snapshot.precos() if snapshot else {}
+
+def get_open_orders():
+    """Busca apenas ordens abertas do banco"""
+    return _painel().get('abertas', [])
 
 def calculate_pnl(ordem_data, current_prices):
     """Calcula PnL em memória para uma ordem"""
@@ -110,28 +62,16 @@ def calculate_pnl(ordem_data, current_prices):
 
 def get_closed_orders_summary():
     """Busca resumo rápido das ordens fechadas"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*) as total, 
-               SUM(CASE WHEN lucro_prejuizo > 0 THEN 1 ELSE 0 END) as wins,
-               SUM(CASE WHEN lucro_prejuizo <= 0 THEN 1 ELSE 0 END) as losses,
-               SUM(lucro_prejuizo) as pnl_total
-        FROM ordens_dinamicas
-        WHERE status = 'fechada'
-    """)
-    result = cursor.fetchone()
-    conn.close()
+    stats = _painel().get('fechadas')
     
-    if result and result[0] > 0:
-        total, wins, losses, pnl_total = result
-        win_rate = (wins / total) * 100 if total > 0 else 0
+    if stats and stats['total'] > 0:
+        total = stats['total']
         return {
             'total': total,
-            'wins': wins or 0,
-            'losses': losses or 0,
-            'pnl_total': pnl_total or 0.0,
-            'win_rate': win_rate
+            'wins': stats['wins'],
+            'losses': stats['losses'] + stats['neutras'],
+            'pnl_total': stats['pnl_total'],
+            'win_rate': (stats['wins'] / total) * 100
         }
     return {'total': 0, 'wins': 0, 'losses': 0, 'pnl_total': 0.0, 'win_rate': 0.0}
 
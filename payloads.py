@@ -0,0 +1,230 @@
+"""
+Armazém de payloads endereçado por conteúdo
+
+Dicionários grandes (dados de entrada da IA, dados de mercado, respostas da API)
+são serializados em JSON canônico, identificados pelo hash do conteúdo e gravados
+uma única vez na tabela payloads. As linhas que usam o payload guardam só o id
+(payload_id). Payloads acima de um limite são comprimidos com zlib; os demais
+ficam como texto JSON, consultáveis com json_extract().
+"""
+
+import json
+import zlib
+import hashlib
+import threading
+import weakref
+from enum import Enum
+from datetime import date, datetime
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from banco_dados import agora_ms, carregar_config_banco
+
+COMPRESSAO_NENHUMA = 0
+COMPRESSAO_ZLIB = 1
+
+SQL_INSERIR = "INSERT OR IGNORE INTO payloads (payload_id, compressao, conteudo, tamanho, criado_em_ms) VALUES (?, ?, ?, ?, ?)"
+
+# Campos numéricos promovidos a colunas próprias (procurados no topo e nos sub-dicionários)
+CAMPOS_PROMOVIDOS = ('rsi', 'volatilidade', 'preco_atual')
+_SUBDICIONARIOS = ('indicadores', 'dados_mercado', 'mercado', 'dados')
+
+
+def _padrao_json(valor: Any) -> Any:
+    """Converte tipos que o json não conhece (datetime, NumPy, Enum, set)"""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, (set, frozenset)):
+        return sorted(valor, key=str)
+    if hasattr(valor, 'tolist'):  # arrays e escalares NumPy
+        return valor.tolist()
+    return str(valor)
+
+
+def canonicalizar(payload: Any) -> str:
+    """JSON canônico: chaves ordenadas, sem espaços, mesmo texto para o mesmo conteúdo"""
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=_padrao_json)
+
+
+def calcular_id(texto: str) -> str:
+    """Id do payload: BLAKE2b de 128 bits do JSON canônico (hex)"""
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def extrair_campos(payload: Any) -> Dict[str, Optional[float]]:
+    """
+    Extrai os campos numéricos promovidos de um payload
+
+    Returns:
+        {'rsi': ..., 'volatilidade': ..., 'preco_atual': ...} (None quando ausente)
+    """
+    campos: Dict[str, Optional[float]] = {campo: None for campo in CAMPOS_PROMOVIDOS}
+    if not isinstance(payload, dict):
+        return campos
+    fontes = [payload] + [payload[chave] for chave in _SUBDICIONARIOS if isinstance(payload.get(chave), dict)]
+    for campo in CAMPOS_PROMOVIDOS:
+        for fonte in fontes:
+            valor = fonte.get(campo)
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                campos[campo] = float(valor)
+                break
+            if hasattr(valor, 'item'):  # escalar NumPy
+                campos[campo] = float(valor.item())
+                break
+    return campos
+
+
+class ArmazemPayloads:
+    """Grava e lê payloads deduplicados de um banco"""
+
+    def __init__(self, banco, limite_compressao: int = 512, nivel_compressao: int = 6,
+                 tamanho_cache: int = 4096):
+        """
+        Inicializa o armazém
+
+        Args:
+            banco: GerenciadorBanco do arquivo
+            limite_compressao: Tamanho (bytes) a partir do qual o JSON é comprimido
+            nivel_compressao: Nível do zlib (1-9)
+            tamanho_cache: Ids recentes já gravados, lembrados para não reenviar payloads repetidos
+        """
+        self.banco = banco
+        self.limite_compressao = limite_compressao
+        self.nivel_compressao = nivel_compressao
+        self.tamanho_cache = tamanho_cache
+        # Só ids confirmados no banco: um payload ainda no buffer pode ser descartado ou falhar
+        self._gravados: 'OrderedDict[str, None]' = OrderedDict()
+        self._buffers = weakref.WeakSet()
+        self._lidos: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.estatisticas = {
+            'payloads_novos': 0,
+            'payloads_repetidos': 0,
+            'bytes_json': 0,
+            'bytes_gravados': 0,
+        }
+
+    def codificar(self, payload: Any) -> Tuple[str, int, Any, int]:
+        """
+        Serializa o payload
+
+        Returns:
+            (payload_id, compressao, conteudo, tamanho_json)
+        """
+        texto = canonicalizar(payload)
+        dados = texto.encode('utf-8')
+        if len(dados) >= self.limite_compressao:
+            comprimido = zlib.compress(dados, self.nivel_compressao)
+            if len(comprimido) < len(dados):
+                return calcular_id(texto), COMPRESSAO_ZLIB, comprimido, len(dados)
+        return calcular_id(texto), COMPRESSAO_NENHUMA, texto, len(dados)
+
+    def _ja_gravado(self, payload_id: str) -> bool:
+        with self._lock:
+            if payload_id in self._gravados:
+                self._gravados.move_to_end(payload_id)
+                self.estatisticas['payloads_repetidos'] += 1
+                return True
+            return False
+
+    def _confirmar(self, linhas: List[tuple]):
+        """Lembra os payloads cujo INSERT foi confirmado no banco"""
+        with self._lock:
+            for linha in linhas:
+                self._gravados[linha[0]] = None
+                self._gravados.move_to_end(linha[0])
+            while len(self._gravados) > self.tamanho_cache:
+                self._gravados.popitem(last=False)
+
+    def gravar(self, payload: Any, buffer=None) -> Optional[str]:
+        """
+        Garante que o payload existe no banco e retorna seu id
+
+        Args:
+            payload: Objeto serializável (dict, lista...); None/vazio não gera payload
+            buffer: BufferEscrita para gravar junto com a linha que referencia o payload
+                    (mesmo group commit); sem buffer grava direto pelo escritor
+
+        Returns:
+            payload_id ou None
+        """
+        if payload is None or payload == {} or payload == '':
+            return None
+        payload_id, compressao, conteudo, tamanho = self.codificar(payload)
+        if self._ja_gravado(payload_id):
+            return payload_id
+
+        params = (payload_id, compressao, conteudo, tamanho, agora_ms())
+        try:
+            if buffer is not None:
+                # Até o commit do lote o payload pode ser reenviado (INSERT OR IGNORE): assim uma linha
+                # que o referencia nunca depende de um INSERT descartado pelo overflow ou perdido num erro
+                with self._lock:
+                    if buffer not in self._buffers:
+                        buffer.ao_gravar(SQL_INSERIR, self._confirmar)
+                        self._buffers.add(buffer)
+                aceito = buffer.adicionar(SQL_INSERIR, params)
+            else:
+                self.banco.executar(SQL_INSERIR, params)
+                self._confirmar([params])
+                aceito = True
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar payload {payload_id}: {e}")
+            aceito = False
+        if not aceito:
+            return None
+        self.estatisticas['payloads_novos'] += 1
+        self.estatisticas['bytes_json'] += tamanho
+        self.estatisticas['bytes_gravados'] += len(conteudo) if compressao else tamanho
+        return payload_id
+
+    def ler(self, payload_id: Optional[str]) -> Any:
+        """Retorna o payload decodificado (None se não existir)"""
+        if not payload_id:
+            return None
+        with self._lock:
+            if payload_id in self._lidos:
+                self._lidos.move_to_end(payload_id)
+                return self._lidos[payload_id]
+        linha = self.banco.consultar_um("SELECT compressao, conteudo FROM payloads WHERE payload_id = ?", (payload_id,))
+        if not linha:
+            return None
+        compressao, conteudo = linha
+        texto = zlib.decompress(conteudo).decode('utf-8') if compressao == COMPRESSAO_ZLIB else conteudo
+        payload = json.loads(texto)
+        with self._lock:
+            self._lidos[payload_id] = payload
+            if len(self._lidos) > self.tamanho_cache:
+                self._lidos.popitem(last=False)
+        return payload
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Contadores de deduplicação e compressão"""
+        stats = dict(self.estatisticas)
+        stats['taxa_compressao'] = (stats['bytes_gravados'] / stats['bytes_json']) if stats['bytes_json'] else 1.0
+        return stats
+
+
+_armazens: Dict[int, ArmazemPayloads] = {}
+_lock_armazens = threading.Lock()
+
+
+def obter_armazem_payloads(banco) -> ArmazemPayloads:
+    """Retorna o armazém do gerenciador de banco (um por arquivo)"""
+    armazem = _armazens.get(id(banco))
+    if armazem is not None and armazem.banco is banco:
+        return armazem
+    with _lock_armazens:
+        armazem = _armazens.get(id(banco))
+        if armazem is None or armazem.banco is not banco:
+            cfg = carregar_config_banco().get('payloads', {}) or {}
+            armazem = ArmazemPayloads(
+                banco,
+                limite_compressao=cfg.get('limite_compressao', 512),
+                nivel_compressao=cfg.get('nivel_compressao', 6),
+            )
+            _armazens[id(banco)] = armazem
+        return armazem
@@ -0,0 +1,177 @@
+"""
+Registro de features com dependências e declaração dos consumidores
+
+Cada feature declara de que depende (outras features ou estados internos do
+motor de indicadores) e quantas amostras precisa para sair do valor neutro.
+Os consumidores (prompt, filtros, gestores de ordens, aprendizado...) declaram
+o que leem; o motor incremental (indicadores_streaming.py) mantém só os
+estados do fecho transitivo do que foi declarado, então uma feature cara não
+custa nada enquanto ninguém a consome.
+
+Os nomes das médias (ma_<n>) e as janelas seguem os parâmetros da seção
+indicadores do config.yaml, por isso o registro é montado a partir deles.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Feature:
+    """Feature (ou estado interno, quando estado=True) e suas dependências diretas"""
+    nome: str
+    entradas: Tuple[str, ...] = ()
+    janela: int = 1
+    estado: bool = False
+
+
+def montar_registro(parametros: Dict[str, Any]) -> Dict[str, Feature]:
+    """Registro completo para os parâmetros do motor de indicadores"""
+    p = parametros
+    curta, longa, bollinger = f"janela_{p['tendencia_curta']}", f"janela_{p['tendencia_longa']}", \
+        f"janela_{p['periodo_bollinger']}"
+    features = [
+        Feature('ganhos', estado=True),
+        Feature('perdas', estado=True),
+        Feature('ema_rapida', estado=True),
+        Feature('ema_lenta', estado=True),
+        Feature('ema_sinal', ('ema_rapida', 'ema_lenta'), estado=True),
+        Feature('retornos', estado=True),
+        Feature('volumes', estado=True),
+        Feature('historico', estado=True),
+        Feature('rsi', ('ganhos', 'perdas'), p['periodo_rsi'] + 1),
+        Feature('bb_media', (bollinger,), p['periodo_bollinger']),
+        Feature('bb_upper', (bollinger,), p['periodo_bollinger']),
+        Feature('bb_lower', (bollinger,), p['periodo_bollinger']),
+        Feature('macd', ('ema_rapida', 'ema_lenta'), p['ema_lenta']),
+        Feature('macd_signal', ('ema_sinal',), p['ema_lenta']),
+        Feature('macd_hist', ('macd', 'macd_signal'), p['ema_lenta']),
+        Feature('volatilidade', ('retornos',), p['periodo_volatilidade'] + 1),
+        Feature('volume_medio', ('volumes',)),
+        Feature('tendencia', (curta, longa) if p['metodo_tendencia'] == 'medias' else (longa,),
+                p['tendencia_longa']),
+        Feature('historico_precos', ('historico',)),
+    ]
+    tamanhos = set(p['medias']) | {p['periodo_bollinger'], p['tendencia_curta'], p['tendencia_longa']}
+    features += [Feature(f"janela_{n}", estado=True) for n in sorted(tamanhos)]
+    features += [Feature(f"ma_{n}", (f"janela_{n}",), n) for n in p['medias']]
+    return {feature.nome: feature for feature in features}
+
+
+def saidas(registro: Dict[str, Feature]) -> List[str]:
+    """Features que aparecem no vetor (sem os estados internos)"""
+    return [nome for nome, feature in registro.items() if not feature.estado]
+
+
+def fecho(registro: Dict[str, Feature], nomes: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Fecho transitivo das features pedidas, dependências antes de quem depende
+
+    Args:
+        registro: Registro montado por montar_registro
+        nomes: Features pedidas (None = todas as saídas)
+
+    Returns:
+        Nomes em ordem topológica (inclui os estados internos necessários)
+    """
+    ordem: List[str] = []
+    vistos = set()
+
+    def visitar(nome: str):
+        if nome in vistos:
+            return
+        if nome not in registro:
+            raise ValueError(f"Feature desconhecida: {nome}")
+        vistos.add(nome)
+        for entrada in registro[nome].entradas:
+            visitar(entrada)
+        ordem.append(nome)
+
+    for nome in (saidas(registro) if nomes is None else nomes):
+        visitar(nome)
+    return ordem
+
+
+def janela_necessaria(registro: Dict[str, Feature], nomes: Optional[Iterable[str]] = None) -> int:
+    """Amostras para que todas as features pedidas saiam do valor neutro"""
+    return max((registro[nome].janela for nome in fecho(registro, nomes)), default=1)
+
+
+# ----------------------------------------------------------------------
+# Consumidores
+# ----------------------------------------------------------------------
+class RegistroConsumidores:
+    """Declarações dos consumidores; a geração sobe quando a união das features muda"""
+
+    def __init__(self):
+        self._consumidores: Dict[str, FrozenSet[str]] = {}
+        self._geracao = 0
+        self._lock = threading.Lock()
+
+    def declarar(self, nome: str, features: Iterable[str]) -> FrozenSet[str]:
+        """
+        Registra as features que um consumidor lê
+
+        Quando a união das declarações muda, a geração sobe e os motores que
+        seguem as declarações se refazem com a nova união.
+
+        Returns:
+            Conjunto declarado
+        """
+        features = frozenset(features)
+        with self._lock:
+            antes = self._uniao()
+            self._consumidores[nome] = features
+            if self._uniao() != antes:
+                self._geracao += 1
+        return features
+
+    def limpar(self):
+        """Remove todas as declarações (os motores voltam a calcular todas as features)"""
+        with self._lock:
+            if self._consumidores:
+                self._consumidores.clear()
+                self._geracao += 1
+
+    def _uniao(self) -> Optional[FrozenSet[str]]:
+        return frozenset().union(*self._consumidores.values()) if self._consumidores else None
+
+    def features_consumidas(self) -> Tuple[int, Optional[FrozenSet[str]]]:
+        """(geração, união das features declaradas); união None = nenhum consumidor declarado (todas)"""
+        with self._lock:
+            return self._geracao, self._uniao()
+
+    def consumidores(self) -> Dict[str, FrozenSet[str]]:
+        """Cópia das declarações atuais"""
+        with self._lock:
+            return dict(self._consumidores)
+
+
+# Registro do processo, seguido por obter_gerenciador_indicadores()
+_registro = RegistroConsumidores()
+
+
+def obter_registro_consumidores() -> RegistroConsumidores:
+    """Registro de consumidores compartilhado do processo"""
+    return _registro
+
+
+def declarar_consumidor(nome: str, features: Iterable[str]) -> FrozenSet[str]:
+    """Declara o consumidor no registro do processo (ver RegistroConsumidores.declarar)"""
+    return _registro.declarar(nome, features)
+
+
+def limpar_consumidores():
+    """Remove as declarações do registro do processo"""
+    _registro.limpar()
+
+
+def features_consumidas() -> Tuple[int, Optional[FrozenSet[str]]]:
+    """(geração, união) do registro do processo"""
+    return _registro.features_consumidas()
+
+
+def consumidores() -> Dict[str, FrozenSet[str]]:
+    """Cópia das declarações do registro do processo"""
+    return _registro.consumidores()
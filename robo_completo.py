@@ -22,15 +22,25 @@ import yaml
 import json
 import threading
 from queue import Queue, Empty
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 from loguru import logger
 
 # Importar componentes
 from coletor import ColetorBybit
+from stream_bybit import StreamBybit
+from barras_tempo import AgregadorBarras
+from correlacao_streaming import obter_matriz_correlacao
+from volatilidade_streaming import obter_gerenciador_volatilidade
+from agendador_coleta import AgendadorAdaptativo
+from gravacao_mercado import ColetorBybitReplay, abrir_reprodutor, obter_gravador
 from executor_simulado import ExecutorSimulado
 from executor import ExecutorBybit
 from armazenamento import ArmazenamentoCrypto
+from banco_dados import obter_banco, fechar_bancos
+from arquivador import ArquivadorHistorico
+from manutencao_banco import ManutencaoBanco
 from gestor_ordens_dinamico import GestorOrdensDinamico, TipoOrdem
 
 # Importar IA
@@ -45,15 +55,26 @@ class RoboCompleto:
         """Inicializa o robô completo"""
         self.config = self._carregar_config()
         self.executando = False
+        self.parada_por_sinal = False  # Ctrl+C/SIGTERM: parar() fecha as ordens abertas
+        self._parado = False
         self.ciclos_executados = 0
         
         # Componentes principais
         self.coletor = None
+        self.stream = None
+        self.reprodutor = None   # gravação reproduzida no lugar da exchange (coleta.replay)
+        self.gravador = None     # gravação das respostas brutas (coleta.gravacao)
+        self.barras = None       # barras 1s/1m/5m/15m/1h montadas dos ticks do stream (coleta.barras)
+        self.correlacao = None   # correlação/covariância EWMA dos retornos entre os pares (correlacao)
+        self.volatilidade = None # volatilidade EWMA/GARCH por símbolo, ajustada em processo separado (volatilidade)
         self.executor = None
         self.armazenamento = None
+        self.arquivador = None
+        self.manutencao_banco = None
         self.decisor = None
         self.sistema_aprendizado = None
         self.gestor_ordens = None
+        self.agendador_coleta = None
         self.ai_client = LlamaCppClient()
         
         # Estatísticas
@@ -98,9 +119,9 @@ class RoboCompleto:
     def _handler_parada(self, signum, frame):
         """Handler para parada graciosa"""
         logger.info("🛑 Sinal de parada recebido. Finalizando...")
+        # Só sinaliza: o ciclo em andamento termina e o finally do loop principal chama parar()
+        self.parada_por_sinal = True
         self.executando = False
-        self.fechar_todas_ordens()
-        self.parar()
 
     def fechar_todas_ordens(self):
         """Fecha todas as ordens abertas imediatamente"""
@@ -131,10 +152,41 @@ class RoboCompleto:
             # 1. Armazenamento
             logger.info("📊 Inicializando armazenamento...")
             self.armazenamento = ArmazenamentoCrypto()
+            if self.config.get('banco_dados', {}).get('arquivamento', {}).get('ativo', True):
+                self.arquivador = ArquivadorHistorico(self.armazenamento.banco)
+                self.arquivador.iniciar()
             
             # 2. Coletor
             logger.info("📡 Inicializando coletor...")
-            self.coletor = ColetorBybit()
+            self.reprodutor = abrir_reprodutor()
+            if self.reprodutor:
+                self.coletor = ColetorBybitReplay(self.reprodutor)
+                self.stream = self.coletor.stream
+                self.stream.aguardar_dados(timeout=10)
+            else:
+                self.coletor = ColetorBybit()
+                if self.config.get('coleta', {}).get('websocket', False):
+                    self.stream = StreamBybit(self.config['trading']['pares'])
+                    self.stream.iniciar()
+                    self.coletor.anexar_stream(self.stream)
+                    if not self.stream.aguardar_dados(timeout=10):
+                        logger.warning("⚠️ Stream WebSocket ainda sem dados; preços via REST até conectar")
+                self.gravador = obter_gravador()
+                if self.gravador:
+                    self.gravador.observar_coletor(self.coletor)
+            if self.stream and self.config.get('coleta', {}).get('barras', {}).get('ativo', True):
+                self.barras = AgregadorBarras(relogio=self.reprodutor.agora_ms if self.reprodutor else None)
+                self.barras.anexar_stream(self.stream)
+                self.barras.iniciar()
+            if self.config.get('correlacao', {}).get('ativo', True):
+                self.correlacao = obter_matriz_correlacao()
+                if self.barras and self.correlacao.timeframe in self.barras.timeframes:
+                    self.correlacao.anexar_barras(self.barras)
+            if self.config.get('volatilidade', {}).get('ativo', True):
+                self.volatilidade = obter_gerenciador_volatilidade()
+                if self.barras and self.volatilidade.timeframe in self.barras.timeframes:
+                    self.volatilidade.anexar_barras(self.barras)
+                self.volatilidade.iniciar_ajuste(self.config['trading']['pares'])
             
             # 3. Sistema de Aprendizado Autônomo
             logger.info("🧠 Inicializando sistema de aprendizado...")
@@ -150,7 +202,9 @@ class RoboCompleto:
             # Se estiver dentro de 'risco', ler de lá
             if 'risco' in self.config and 'risco_maximo_permitido' in self.config['risco']:
                 risco_maximo = self.config['risco']['risco_maximo_permitido']
-            self.gestor_ordens = GestorOrdensDinamico(risco_maximo_permitido=risco_maximo, decisor_ia=self.decisor, sistema_aprendizado=self.sistema_aprendizado)
+            self.gestor_ordens = GestorOrdensDinamico(risco_maximo_permitido=risco_maximo, decisor_ia=self.decisor, sistema_aprendizado=self.sistema_aprendizado,
+                                                     stream=self.stream, snapshot_mercado=self.coletor.snapshot,
+                                                     barras=self.barras, volatilidade=self.volatilidade)
             
             # 6. Executor (Simulado ou Real)
             if self.config['simulacao']['ativo']:
@@ -182,6 +236,7 @@ class RoboCompleto:
         if not self.gestor_ordens or not hasattr(self.gestor_ordens, 'ordens_ativas'):
             logger.info("Nenhuma ordem ativa para processar ao iniciar.")
             return
+        snapshot = self.coletor.obter_snapshot() if self.coletor and hasattr(self.coletor, 'obter_snapshot') else None
         for ordem_id, ordem in list(self.gestor_ordens.ordens_ativas.items()):
             symbol = ordem.get('symbol')
             preco_entrada = ordem.get('preco_entrada')
@@ -195,7 +250,7 @@ class RoboCompleto:
                 logger.warning(f"Coletor não disponível para obter preço de {symbol}. PnL não atualizado.")
                 continue
             try:
-                preco_atual = self.coletor.obter_preco_atual(symbol)
+                preco_atual = (snapshot.preco(symbol) if snapshot else None) or self.coletor.obter_preco_atual(symbol)
             except Exception as e:
                 logger.error(f"Erro ao obter preço atual de {symbol}: {e}")
             if preco_atual is None:
@@ -205,14 +260,9 @@ class RoboCompleto:
             perc = (pnl / (preco_entrada * quantidade)) * 100 if preco_entrada else 0.0
             # Atualizar no banco
             try:
-                import sqlite3
-                conn = sqlite3.connect("dados/trading.db")
-                cursor = conn.cursor()
-                cursor.execute("""
+                obter_banco().executar("""
                     UPDATE ordens_dinamicas SET lucro_prejuizo = ?, pnl_percentual = ? WHERE order_id = ?
                 """, (pnl, perc, ordem_id))
-                conn.commit()
-                conn.close()
                 logger.info(f"🔄 Ordem {ordem_id} PnL atualizado: {pnl:.2f} ({perc:.2f}%)")
             except Exception as e:
                 logger.error(f"Erro ao atualizar PnL no banco para ordem {ordem_id}: {e}")
@@ -240,12 +290,7 @@ class RoboCompleto:
     
     def resetar_ordens(self):
         """Reseta a tabela de ordens e sincroniza o estado em memória"""
-        import sqlite3
-        conn = sqlite3.connect("dados/trading.db")
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM ordens_dinamicas;")
-        conn.commit()
-        conn.close()
+        obter_banco().executar("DELETE FROM ordens_dinamicas")
         if self.gestor_ordens and hasattr(self.gestor_ordens, 'carregar_ordens_abertas'):
             self.gestor_ordens.carregar_ordens_abertas()
         logger.info("🔄 Tabela de ordens resetada e ordens em memória sincronizadas.")
@@ -317,6 +362,11 @@ class RoboCompleto:
                 logger.error("❌ Falha na verificação de conectividade")
                 return False
             
+            # Backup online e manutenção do banco em segundo plano
+            if self.config.get('banco_dados', {}).get('backup_automatico', False):
+                self.manutencao_banco = ManutencaoBanco(self.armazenamento.banco)
+                self.manutencao_banco.iniciar()
+            
             # Iniciar coleta e análise em threads separadas
             self._parar_threads.clear()
             self.thread_analise_ia = threading.Thread(target=self._thread_analise_ia, daemon=True)
@@ -349,10 +399,13 @@ class RoboCompleto:
                     logger.info("⏹️ Execução interrompida durante ciclo.")
                     break
                 # Aguardar próximo ciclo
-                time.sleep(self.config['coleta']['frequencia'])
+                self._dormir(self.config['coleta']['frequencia'])
                 if not self.executando:
                     logger.info("⏹️ Execução interrompida durante sleep.")
                     break
+                if self.reprodutor and self.reprodutor.terminou():
+                    logger.info("📼 Fim da gravação reproduzida.")
+                    break
                 # Exibir estatísticas a cada 10 ciclos
                 if self.ciclos_executados % 10 == 0:
                     self._exibir_estatisticas_tempo_real()
@@ -363,20 +416,50 @@ class RoboCompleto:
         finally:
             self.parar()
 
+    def _dormir(self, segundos: float):
+        """Espera entre ciclos (no relógio da gravação quando reproduzindo)"""
+        if self.reprodutor:
+            self.reprodutor.dormir(segundos)
+        else:
+            time.sleep(segundos)
+
+    def _relogio_coleta(self) -> Optional[float]:
+        """Instante do agendador de coleta: relógio da gravação em reprodução, senão o monotônico"""
+        return self.reprodutor.agora_ms() / 1000 if self.reprodutor else None
+
+    def _simbolos_com_ordem(self) -> List[str]:
+        """Símbolos com ordem aberta no gestor dinâmico (consultados mais vezes pelo agendador)"""
+        if not self.gestor_ordens:
+            return []
+        return [ordem['symbol'] for ordem in list(self.gestor_ordens.ordens_ativas.values())]
+    
     def _loop_coleta_continua(self):
         """Loop principal de coleta contínua de dados (thread principal)"""
         try:
+            # Intervalo por par escolhido pelo agendador (volatilidade, ordens abertas, 429)
+            self.agendador_coleta = AgendadorAdaptativo(self.config['trading']['pares'],
+                                                        intervalo_inicial=self.config['coleta']['frequencia'],
+                                                        fonte_ordens=self._simbolos_com_ordem)
+            if self.coletor and hasattr(self.coletor, 'http'):
+                self.agendador_coleta.observar(self.coletor.http, hosts=[urlsplit(self.coletor.base_url).hostname])
             while self.executando and not self._parar_threads.is_set():
-                for par in self.config['trading']['pares']:
+                for par in self.agendador_coleta.vencidos(self._relogio_coleta()):
                     if not self.executando or self._parar_threads.is_set():
                         break
                     dados_mercado = self._coletar_dados_par(par)
                     if dados_mercado:
+                        self.agendador_coleta.registrar_preco(par, dados_mercado['preco_atual'], self._relogio_coleta())
                         try:
                             self.buffer_dados.put_nowait(dados_mercado)
                         except:
                             logger.warning("Buffer de dados cheio, descartando candle.")
-                time.sleep(self.config['coleta']['frequencia'])
+                    else:
+                        self.agendador_coleta.registrar_falha(par)
+                espera = min(max(self.agendador_coleta.tempo_ate_proximo(self._relogio_coleta()), 0.05), 1.0)
+                if self.reprodutor:
+                    self.reprodutor.dormir(espera)
+                else:
+                    self._parar_threads.wait(espera)
         except Exception as e:
             logger.error(f"❌ Erro no loop de coleta contínua: {e}")
         finally:
@@ -440,15 +523,17 @@ class RoboCompleto:
         """Atualiza o PnL de todas as ordens abertas no banco em tempo real e processa fechamento inteligente."""
         if not self.gestor_ordens or not hasattr(self.gestor_ordens, 'ordens_ativas'):
             return
+        # Um snapshot por ciclo para todas as ordens (ordens do mesmo par não repetem a requisição)
+        snapshot = self.coletor.obter_snapshot() if self.coletor and hasattr(self.coletor, 'obter_snapshot') else None
         threads = []
         for ordem_id, ordem in list(self.gestor_ordens.ordens_ativas.items()):
-            t = threading.Thread(target=self._atualizar_e_processar_ordem_thread, args=(ordem_id, ordem))
+            t = threading.Thread(target=self._atualizar_e_processar_ordem_thread, args=(ordem_id, ordem, snapshot))
             t.start()
             threads.append(t)
         for t in threads:
             t.join()
 
-    def _atualizar_e_processar_ordem_thread(self, ordem_id, ordem):
+    def _atualizar_e_processar_ordem_thread(self, ordem_id, ordem, snapshot=None):
         symbol = ordem.get('symbol')
         preco_entrada = ordem.get('preco_entrada')
         quantidade = ordem.get('quantidade', 1)
@@ -456,12 +541,13 @@ class RoboCompleto:
             return
         logger.info(f"[ORD] Iniciando processamento paralelo de ordem {ordem_id} ({symbol})")
         inicio = time.time()
-        preco_atual = None
-        if not self.coletor or not hasattr(self.coletor, 'obter_preco_atual'):
+        preco_atual = snapshot.preco(symbol) if snapshot else None
+        if preco_atual is None and (not self.coletor or not hasattr(self.coletor, 'obter_preco_atual')):
             logger.warning(f"Coletor não disponível para obter preço de {symbol}. PnL não atualizado.")
             return
         try:
-            preco_atual = self.coletor.obter_preco_atual(symbol)
+            if preco_atual is None:
+                preco_atual = self.coletor.obter_preco_atual(symbol)
         except Exception as e:
             logger.error(f"Erro ao obter preço atual de {symbol}: {e}")
         if preco_atual is None:
@@ -470,14 +556,9 @@ class RoboCompleto:
         perc = (pnl / (preco_entrada * quantidade)) * 100 if preco_entrada else 0.0
         if self.gestor_ordens and hasattr(self.gestor_ordens, 'db_path'):
             try:
-                import sqlite3
-                conn = sqlite3.connect("dados/trading.db")
-                cursor = conn.cursor()
-                cursor.execute("""
+                obter_banco().executar("""
                     UPDATE ordens_dinamicas SET lucro_prejuizo = ?, pnl_percentual = ? WHERE order_id = ?
                 """, (pnl, perc, ordem_id))
-                conn.commit()
-                conn.close()
                 logger.debug(f"🔄 [Realtime] Ordem {ordem_id} PnL atualizado: {pnl:.2f} ({perc:.2f}%)")
             except Exception as e:
                 logger.error(f"Erro ao atualizar PnL no banco para ordem {ordem_id}: {e}")
@@ -511,6 +592,7 @@ class RoboCompleto:
             self.ciclos_executados += 1
             self.estatisticas['ciclos_executados'] = self.ciclos_executados
             risco_maximo = self.config.get('risco_maximo_permitido', 3.0)
+            self._alimentar_modelos_com_klines()
             # Processar cada par configurado
             for par in self.config['trading']['pares']:
                 if not self.executando:
@@ -555,6 +637,19 @@ class RoboCompleto:
         except Exception as e:
             logger.error(f"❌ Erro no ciclo completo: {e}")
     
+    def _alimentar_modelos_com_klines(self):
+        """Leva à correlação e à volatilidade os candles fechados dos caches de klines (partida e coleta sem stream)"""
+        if not (self.correlacao or self.volatilidade) or not hasattr(self.coletor, 'klines'):
+            return
+        try:
+            pares = [par.replace("/", "") for par in self.config['trading']['pares']]
+            caches = [self.coletor.klines.cache(par, self.coletor.intervalo_klines) for par in pares]
+            for modelo in (self.correlacao, self.volatilidade):
+                if modelo:
+                    modelo.alimentar_klines(caches)
+        except Exception as e:
+            logger.error(f"❌ Erro ao alimentar correlação/volatilidade: {e}")
+    
     def _coletar_dados_par(self, par: str) -> Optional[Dict[str, Any]]:
         """Coleta dados para um par específico, incluindo features do livro de ordens"""
         try:
@@ -593,11 +688,18 @@ class RoboCompleto:
                     'tendencia': dados_completos['tendencia'],
                     'volume': dados_completos.get('volume', 0),
                     'variacao': dados_completos.get('variacao', 0),
+                    'versao_features': dados_completos.get('versao_features'),
                     # Features do livro de ordens
                     'bid_ask_imbalance': dados_order_book['bid_ask_imbalance'],
                     'max_bid_size': dados_order_book['max_bid_size'],
                     'max_ask_size': dados_order_book['max_ask_size'],
-                    'liquidity_clusters': dados_order_book['liquidity_clusters']
+                    'liquidity_clusters': dados_order_book['liquidity_clusters'],
+                    # Barras já montadas em memória: contexto multi-timeframe sem requisição
+                    'multi_timeframe': self.barras.contexto(par.replace("/", "")) if self.barras else {},
+                    # Correlação e beta contra o BTC, grupo de pares correlacionados
+                    'correlacao': self.correlacao.resumo(par.replace("/", "")) if self.correlacao else {},
+                    # Volatilidade realizada (EWMA) e prevista (GARCH) por barra
+                    'previsao_volatilidade': self.volatilidade.previsao(par.replace("/", "")) if self.volatilidade else None
                 }
             }
             
@@ -851,27 +953,6 @@ RESPONDA APENAS COM JSON:
         except Exception as e:
             logger.error(f"❌ Erro ao abrir ordem dinâmica: {e}")
     
-    def _calcular_rsi(self, df, periodo=14) -> float:
-        """Calcula RSI"""
-        try:
-            delta = df['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=periodo).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=periodo).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            return float(rsi.iloc[-1])
-        except:
-            return 50.0
-    
-    def _calcular_volatilidade(self, df, periodo=20) -> float:
-        """Calcula volatilidade"""
-        try:
-            returns = df['close'].pct_change()
-            volatilidade = returns.rolling(window=periodo).std()
-            return float(volatilidade.iloc[-1])
-        except:
-            return 0.02
-    
     def _determinar_tendencia(self, df) -> str:
         """Determina tendência"""
         try:
@@ -931,6 +1012,12 @@ RESPONDA APENAS COM JSON:
                 logger.info(f"   Lucro total: ${stats_gestao.get('lucro_total', 0):.2f}")
                 logger.info(f"   Ajustes realizados: {stats_gestao.get('total_ajustes', 0)}")
             
+            if self.agendador_coleta:
+                stats_agenda = self.agendador_coleta.obter_estatisticas()
+                logger.info(f"⏲️  AGENDADOR DE COLETA:")
+                logger.info(f"   Intervalos: {stats_agenda['intervalos']}")
+                logger.info(f"   Orçamento efetivo: {stats_agenda['orcamento_efetivo']} req/s | 429: {stats_agenda['erros_429']}")
+            
             if self.config['simulacao']['ativo'] and isinstance(self.executor, ExecutorSimulado):
                 stats_sim = self.executor.obter_estatisticas_ordens_simuladas()
                 logger.info(f"📈 ORDENS SIMULADAS:")
@@ -945,18 +1032,34 @@ RESPONDA APENAS COM JSON:
             logger.error(f"❌ Erro ao exibir estatísticas: {e}")
     
     def parar(self):
-        """Para o robô graciosamente"""
+        """Para o robô graciosamente (chamadas repetidas não fazem nada)"""
+        if self._parado:
+            return
+        self._parado = True
         try:
             logger.info("🛑 Parando robô...")
             self.executando = False
+            if self.parada_por_sinal:
+                self.fechar_todas_ordens()
             self._parar_threads.set()
             if self.thread_analise_ia and self.thread_analise_ia.is_alive():
                 self.thread_analise_ia.join(timeout=5)
             
-            # Parar coletor
-            if self.coletor:
-                # Removido: método parar_websocket não existe em ColetorBybit
-                pass
+            # Parar stream WebSocket do coletor
+            if self.stream:
+                stats_stream = self.stream.obter_estatisticas()
+                logger.info(f"📡 Stream: {stats_stream['ticks']} ticks, {stats_stream['reconexoes']} reconexões, "
+                            f"{stats_stream['lacunas']} lacunas")
+                self.stream.parar()
+            if self.barras:
+                self.barras.parar()
+            if self.volatilidade:
+                self.volatilidade.parar()
+            if self.gravador:
+                self.gravador.parar()
+                stats_gravacao = self.gravador.obter_estatisticas()
+                logger.info(f"⏺️ Gravação: {stats_gravacao['registros']} respostas em {stats_gravacao['segmentos']} "
+                            f"segmentos ({stats_gravacao['taxa_compressao']:.1f}x compressão)")
             
             # Parar gestor de ordens
             if self.gestor_ordens:
@@ -965,7 +1068,22 @@ RESPONDA APENAS COM JSON:
             
             # Exibir estatísticas finais
             self._exibir_estatisticas_finais()
-            
+
+            # Parar arquivamento e backup antes de fechar o banco
+            if self.arquivador:
+                self.arquivador.parar()
+            if self.manutencao_banco:
+                self.manutencao_banco.parar()
+
+            # Drenar buffer write-behind e escritas pendentes, depois fechar conexões do banco
+            if self.armazenamento:
+                linhas = self.armazenamento.buffer.descarregar()
+                logger.info(f"🗄️ Buffer write-behind descarregado: {linhas} linhas pendentes gravadas")
+                metricas_banco = self.armazenamento.banco.obter_metricas()
+                logger.info(f"🗄️ Banco: {metricas_banco['escritas']} escritas, fila máx {metricas_banco['profundidade_fila_max']}, "
+                            f"espera lock média {metricas_banco['espera_lock_media_ms']:.2f}ms")
+            fechar_bancos()
+
             logger.success("✅ Robô parado com sucesso!")
             
         except Exception as e:
@@ -1052,40 +1170,8 @@ def main():
             format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
         )
         
-        # Garantir que a tabela ordens_dinamicas existe (schema unificado)
-        import sqlite3
-        conn = sqlite3.connect("dados/trading.db")
-        c = conn.cursor()
-        c.execute('''
-CREATE TABLE IF NOT EXISTS ordens_dinamicas (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    order_id TEXT UNIQUE NOT NULL,
-    symbol TEXT NOT NULL,
-    tipo_ordem TEXT NOT NULL,
-    preco_entrada REAL NOT NULL,
-    quantidade REAL NOT NULL,
-    stop_loss_inicial REAL,
-    take_profit_inicial REAL,
-    stop_loss_atual REAL,
-    take_profit_atual REAL,
-    status TEXT NOT NULL,
-    timestamp_abertura DATETIME DEFAULT CURRENT_TIMESTAMP,
-    timestamp_fechamento DATETIME,
-    preco_saida REAL,
-    lucro_prejuizo REAL,
-    tempo_aberta_segundos INTEGER,
-    ajustes_stop_loss INTEGER DEFAULT 0,
-    ajustes_take_profit INTEGER DEFAULT 0,
-    saida_inteligente_utilizada BOOLEAN DEFAULT FALSE,
-    razao_saida TEXT,
-    dados_mercado_saida TEXT,
-    previsoes_ia TEXT,
-    cenarios_ia TEXT,
-    justificativa_ia TEXT
-)
-''')
-        conn.commit()
-        conn.close()
+        # Esquema do banco (migrações versionadas) é aplicado na primeira abertura
+        obter_banco()
 
         # Criar e iniciar robô
         robo = RoboCompleto()
@@ -17,6 +17,7 @@ os.makedirs('logs', exist_ok=True)
 logger.add("logs/robo_ia_tempo_real.log", rotation="1 week")
 
 from coletor import Coletor
+from gravacao_mercado import ColetorB3Replay, abrir_reprodutor, obter_gravador
 from armazenamento import Armazenamento
 from analisador import AnalisadorIA
 from executor import ExecutorOrdensSimuladas
@@ -30,7 +31,12 @@ class RoboIATempoReal:
         Inicializa o robô de IA em tempo real
         """
         self.config = config.load_config()
-        self.coletor = Coletor()
+        # Com coleta.replay definido, os dados da B3 vêm de uma gravação (no relógio dela)
+        self.reprodutor = abrir_reprodutor()
+        self.coletor = ColetorB3Replay(self.reprodutor) if self.reprodutor else Coletor()
+        self.gravador = None if self.reprodutor else obter_gravador()
+        if self.gravador:
+            self.gravador.observar_coletor(self.coletor)
         self.armazenamento = Armazenamento()
         self.analisador = AnalisadorIA(self.config)
         self.executor = ExecutorOrdensSimuladas()
@@ -46,7 +52,7 @@ class RoboIATempoReal:
         
         # Buffer para dados acumulados
         self.dados_buffer = []
-        self.ultima_analise = datetime.now()
+        self.ultima_analise = self._agora()
         
         # Configurações de horário de mercado
         self.horario_inicio = dt_time(9, 0)  # 09:00
@@ -78,11 +84,26 @@ class RoboIATempoReal:
         logger.info(f"Recebido sinal {signum}. Encerrando robô...")
         self.rodando = False
     
+    def _agora(self):
+        """
+        Horário atual (o da gravação quando reproduzindo)
+        """
+        return self.reprodutor.agora() if self.reprodutor else datetime.now()
+    
+    def _dormir(self, segundos):
+        """
+        Espera entre ciclos (no relógio da gravação quando reproduzindo)
+        """
+        if self.reprodutor:
+            self.reprodutor.dormir(segundos)
+        else:
+            time.sleep(segundos)
+    
     def esta_horario_mercado(self):
         """
         Verifica se está no horário de mercado
         """
-        agora = datetime.now()
+        agora = self._agora()
         return (
             agora.weekday() in self.dias_semana and
             self.horario_inicio <= agora.time() <= self.horario_fim
@@ -214,7 +235,7 @@ class RoboIATempoReal:
             
             # Limpar buffer após análise
             self.dados_buffer = []
-            self.ultima_analise = datetime.now()
+            self.ultima_analise = self._agora()
             
         except Exception as e:
             logger.error(f"❌ Erro na análise: {e}")
@@ -366,48 +387,55 @@ class RoboIATempoReal:
         logger.info(f"📅 Dias úteis: Segunda a Sexta")
         logger.info("=" * 60)
         
-        ultimo_status = datetime.now()
-        ultimo_ajuste = datetime.now()
+        ultimo_status = self._agora()
+        ultimo_ajuste = self._agora()
         
         while self.rodando:
             try:
                 # Verificar se está no horário de mercado
                 if not self.esta_horario_mercado():
                     logger.info("⏸️ Fora do horário de mercado. Aguardando...")
-                    time.sleep(60)  # Verifica a cada minuto
+                    self._dormir(60)  # Verifica a cada minuto
+                    if self.reprodutor and self.reprodutor.terminou():
+                        break
                     continue
                 
                 # 1. SEMPRE coletar dados da B3 (1 segundo)
                 self.coletar_dados()
                 
                 # 2. Verificar se é hora de analisar com IA (15 segundos)
-                tempo_desde_ultima_analise = (datetime.now() - self.ultima_analise).total_seconds()
+                tempo_desde_ultima_analise = (self._agora() - self.ultima_analise).total_seconds()
                 if tempo_desde_ultima_analise >= self.frequencia_analise:
                     self.analisar_dados_acumulados()
                     self.metricas['ciclos'] += 1
                 
                 # Exibir status a cada 10 minutos
-                if (datetime.now() - ultimo_status).seconds >= 600:
+                if (self._agora() - ultimo_status).seconds >= 600:
                     self.exibir_status()
-                    ultimo_status = datetime.now()
+                    ultimo_status = self._agora()
                 
                 # Ajustar parâmetros automaticamente a cada 30 minutos
-                if (datetime.now() - ultimo_ajuste).seconds >= 1800:
+                if (self._agora() - ultimo_ajuste).seconds >= 1800:
                     self.ajustar_parametros_automaticamente()
-                    ultimo_ajuste = datetime.now()
+                    ultimo_ajuste = self._agora()
                 
                 # Aguardar próxima execução
                 if self.rodando:
-                    time.sleep(self.frequencia_coleta)
+                    self._dormir(self.frequencia_coleta)
+                if self.reprodutor and self.reprodutor.terminou():
+                    logger.info("📼 Fim da gravação reproduzida")
+                    break
                     
             except KeyboardInterrupt:
                 logger.info("⚠️ Interrupção manual detectada")
                 break
             except Exception as e:
                 logger.error(f"❌ Erro crítico no loop principal: {e}")
-                time.sleep(10)  # Pausa breve antes de tentar novamente
+                self._dormir(10)  # Pausa breve antes de tentar novamente
         
         # Exibir status final
+        if self.gravador:
+            self.gravador.parar()
         self.exibir_status()
         logger.info("👋 Robô de IA encerrado")
 
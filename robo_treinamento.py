@@ -17,6 +17,7 @@ from loguru import logger
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from coletor import ColetorBybit
+from gravacao_mercado import ColetorBybitReplay, abrir_reprodutor, obter_gravador
 from executor_simulado import ExecutorSimulado
 from armazenamento import ArmazenamentoCrypto
 # from ia.preparador_dados import PreparadorDadosCrypto  # Removido pois não existe
@@ -31,8 +32,12 @@ class RoboTreinamento:
         """Inicializa o robô de treinamento"""
         self.config = self._carregar_config()
         
-        # Componentes principais
-        self.coletor = ColetorBybit()
+        # Componentes principais (com coleta.replay definido, os dados vêm de uma gravação)
+        self.reprodutor = abrir_reprodutor()
+        self.coletor = ColetorBybitReplay(self.reprodutor) if self.reprodutor else ColetorBybit()
+        self.gravador = None if self.reprodutor else obter_gravador()
+        if self.gravador:
+            self.gravador.observar_coletor(self.coletor)
         self.executor = ExecutorSimulado(self.config)
         self.armazenamento = ArmazenamentoCrypto()
         # self.preparador = PreparadorDadosCrypto()  # Removido pois não existe
@@ -152,7 +157,10 @@ class RoboTreinamento:
                 tempo_espera = max(0, self.frequencia_analise - tempo_execucao)
                 
                 if tempo_espera > 0:
-                    time.sleep(tempo_espera)
+                    self._dormir(tempo_espera)
+                if self.reprodutor and self.reprodutor.terminou():
+                    logger.info("📼 Fim da gravação reproduzida")
+                    break
                 
             except KeyboardInterrupt:
                 logger.info("🛑 Interrupção do usuário")
@@ -160,7 +168,14 @@ class RoboTreinamento:
             except Exception as e:
                 logger.error(f"❌ Erro no loop de treinamento: {e}")
                 self.estatisticas['erros'] += 1
-                time.sleep(5)  # Aguardar antes de continuar
+                self._dormir(5)  # Aguardar antes de continuar
+    
+    def _dormir(self, segundos: float):
+        """Espera entre ciclos (no relógio da gravação quando reproduzindo)"""
+        if self.reprodutor:
+            self.reprodutor.dormir(segundos)
+        else:
+            time.sleep(segundos)
     
     def _executar_ciclo_treinamento(self):
         """Executa um ciclo completo de treinamento"""
@@ -373,6 +388,8 @@ class RoboTreinamento:
         # Parar coletor
         # if hasattr(self.coletor, 'parar_websocket'):
         #     self.coletor.parar_websocket()  # Método não existe
+        if self.gravador:
+            self.gravador.parar()
         
         # Exibir estatísticas finais
         self._exibir_estatisticas_finais()
@@ -0,0 +1,758 @@
+"""
+Servidor local que imita a API pública de mercado da Bybit (v5, linear)
+
+Permite rodar stream_bybit.py, os coletores e o robô sem rede: aceita conexões WebSocket,
+responde subscribe/unsubscribe/ping no formato da Bybit e publica tickers
+(snapshot + deltas), publicTrade, kline e orderbook (snapshot na inscrição +
+deltas com `u` sequencial) com preços sintéticos (passeio aleatório). Os
+candles andam num relógio sintético (ticks_por_kline ticks por candle), então
+um kline.1 fecha em frações de segundo. O livro sintético tem NIVEIS_LIVRO
+níveis por lado espaçados ~1 bp, qualquer que seja a profundidade assinada.
+
+Numa segunda porta (url_rest) atende GET /v5/market/tickers, /v5/market/kline
+e /v5/market/orderbook no envelope da Bybit (retCode/retMsg/result/time), a
+partir do mesmo mercado sintético: o lastPrice do REST é o preço do stream, os
+candles do REST são os mesmos do tópico kline (com histórico gerado para trás
+na primeira consulta) e o livro é o mesmo dos deltas. Para apontar o robô para
+cá: exchange.base_url = url_rest e exchange.websocket_url = url no config.yaml
+(ou ColetorBybit(base_url=...) e StreamBybit(url=...)).
+
+Falhas controláveis para testes: derrubar_conexoes(), pular_klines(),
+pular_update_livro(), silenciar() e enviar_bruto() (payload arbitrário,
+inclusive malformado) no WebSocket; definir_latencia() (distribuição da
+latência do REST), limitar_taxa() e rajada_429() (HTTP 429 com Retry-After) e
+injetar_falhas() (probabilidades de resposta malformada, erro 5xx e queda de
+conexão no REST, e de mensagem malformada e queda no WebSocket).
+"""
+
+import json
+import math
+import time
+import random
+import socket
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from loguru import logger
+
+from websocket_leve import ConexaoWebSocket, ConexaoFechada
+from stream_bybit import intervalo_kline_ms
+
+PRECOS_PADRAO = {'BTCUSDT': 117000.0, 'ETHUSDT': 3700.0}
+CAMINHO_WS = '/v5/public/linear'
+NIVEIS_LIVRO = 50
+PROFUNDIDADES_LIVRO = ('1', '50', '200', '500')
+CATEGORIAS = ('linear', 'spot', 'inverse')
+HISTORICO_KLINES = 1000          # candles gerados para trás na primeira consulta REST da série
+MAX_KLINES_POR_REQUISICAO = 1000
+DISTRIBUICOES_LATENCIA = ('fixa', 'uniforme', 'normal', 'lognormal', 'exponencial')
+
+
+class _Cliente:
+    """Conexão aceita e os tópicos que ela assinou"""
+
+    def __init__(self, conn: ConexaoWebSocket, conn_id: str):
+        self.conn = conn
+        self.conn_id = conn_id
+        self.topicos: Set[str] = set()
+
+
+class _ManipuladorRest(BaseHTTPRequestHandler):
+    """GET da API REST de mercado; a resposta (ou a falha) vem de ServidorBybitLocal._responder_rest"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados: sem isso, +40ms de ACK atrasado
+    servidor: 'ServidorBybitLocal' = None
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        status, corpo, cabecalhos = self.servidor._responder_rest(partes.path, dict(parse_qsl(partes.query)))
+        if status is None:
+            # Queda no meio da requisição: fecha sem resposta
+            self.close_connection = True
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(corpo)))
+            for nome, valor in cabecalhos.items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(corpo)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class _ServidorRest(ThreadingHTTPServer):
+    """Uma thread por conexão keep-alive; fila de accept maior para rajadas de conexões"""
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class ServidorBybitLocal:
+    """Stand-in da API pública de mercado da Bybit (WebSocket + REST) para testes offline"""
+
+    def __init__(self, precos: Optional[Dict[str, float]] = None, host: str = '127.0.0.1', porta: int = 0,
+                 intervalo_ms: float = 50, ticks_por_kline: int = 5, semente: Optional[int] = None,
+                 porta_rest: Optional[int] = 0, latencia: Optional[Dict[str, Any]] = None):
+        """
+        Inicializa o servidor (escuta só após iniciar())
+
+        Args:
+            precos: Preço inicial por símbolo
+            host: Interface de escuta
+            porta: Porta TCP do WebSocket (0 = qualquer livre)
+            intervalo_ms: Intervalo entre publicações
+            ticks_por_kline: Publicações por candle no relógio sintético
+            semente: Semente do gerador de preços
+            porta_rest: Porta da API REST (0 = qualquer livre, None = sem REST)
+            latencia: Argumentos de definir_latencia() para o REST
+        """
+        self.host = host
+        self.porta = porta
+        self.porta_rest = porta_rest
+        self.intervalo = intervalo_ms / 1000
+        self.ticks_por_kline = max(1, ticks_por_kline)
+        self.semente = semente
+        self._rng = random.Random(semente)
+        # Falhas e latência sorteiam à parte: o passeio de preços com a mesma semente não muda
+        self._rng_falhas = random.Random(None if semente is None else f"falhas-{semente}")
+        self._mercado: Dict[str, Dict[str, Any]] = {
+            s: {'preco': p, 'cs': 1000, 'seq': 5000, 'volume': 0.0, 'alta': p, 'baixa': p, 'abertura': p}
+            for s, p in (precos or PRECOS_PADRAO).items()
+        }
+        self._klines: Dict[tuple, Dict[str, Any]] = {}
+        self._historico_klines: Dict[tuple, deque] = {}
+        self._klines_rest: Set[tuple] = set()
+        self._historicos_gerados: Set[tuple] = set()
+        self._livros: Dict[str, Dict[str, Any]] = {s: self._novo_livro(p) for s, p in
+                                                   ((s, m['preco']) for s, m in self._mercado.items())}
+        self._pular: Dict[str, int] = {}
+        self._silencio_ate = 0.0
+        self._clientes: List[_Cliente] = []
+        self._lock = threading.RLock()
+        self._parar = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._sock: Optional[socket.socket] = None
+        self.inscricoes: List[str] = []
+        self.conexoes_aceitas = 0
+        self._http: Optional[ThreadingHTTPServer] = None
+        self._latencia: Dict[str, Any] = {'distribuicao': 'fixa', 'media_ms': 0.0}
+        self._falhas = {'malformado': 0.0, 'erro_5xx': 0.0, 'desconexao': 0.0,
+                        'malformado_ws': 0.0, 'desconexao_ws': 0.0}
+        self._limite: Optional[Dict[str, float]] = None
+        self._rajada_429 = {'restantes': 0, 'ate': 0.0, 'retry_after': 1}
+        self.estatisticas = {'requisicoes_rest': 0, 'respostas_429': 0, 'malformados': 0, 'erros_5xx': 0,
+                             'desconexoes': 0, 'malformados_ws': 0, 'desconexoes_ws': 0}
+        if latencia:
+            self.definir_latencia(**latencia)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def iniciar(self) -> 'ServidorBybitLocal':
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.porta))
+        self._sock.listen(16)
+        self._sock.settimeout(0.2)
+        self.porta = self._sock.getsockname()[1]
+        self._parar.clear()
+        alvos = [(self._aceitar, 'aceitar'), (self._publicar, 'publicar')]
+        if self.porta_rest is not None:
+            manipulador = type('ManipuladorRest', (_ManipuladorRest,), {'servidor': self})
+            self._http = _ServidorRest((self.host, self.porta_rest), manipulador)
+            self.porta_rest = self._http.server_address[1]
+            alvos.append((self._http.serve_forever, 'rest'))
+        for alvo, nome in alvos:
+            thread = threading.Thread(target=alvo, name=f"bybit-local-{nome}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"🧪 Servidor Bybit local em {self.url}" + (f" (REST {self.url_rest})" if self._http else ""))
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self.derrubar_conexoes()
+        if self._http:
+            self._http.shutdown()
+            self._http.server_close()
+            self._http = None
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads.clear()
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.porta}{CAMINHO_WS}"
+
+    @property
+    def url_rest(self) -> str:
+        """Base da API REST (para ColetorBybit.base_url / exchange.base_url)"""
+        return f"http://{self.host}:{self.porta_rest}"
+
+    # ------------------------------------------------------------------
+    # Falhas controladas
+    # ------------------------------------------------------------------
+    def derrubar_conexoes(self) -> int:
+        """Fecha todas as conexões sem close frame (queda de rede)"""
+        with self._lock:
+            clientes, self._clientes = self._clientes, []
+        for cliente in clientes:
+            cliente.conn.abortar()
+        return len(clientes)
+
+    def pular_klines(self, simbolo: str, quantidade: int = 1):
+        """O próximo candle do símbolo começa `quantidade` intervalos depois do esperado"""
+        with self._lock:
+            self._pular[simbolo] = self._pular.get(simbolo, 0) + quantidade
+
+    def pular_update_livro(self, simbolo: str, quantidade: int = 1):
+        """O próximo delta do livro do símbolo salta `quantidade` ids de atualização"""
+        with self._lock:
+            self._livros[simbolo]['pular'] += quantidade
+
+    def silenciar(self, segundos: float):
+        """Para de publicar (mantém as conexões abertas)"""
+        self._silencio_ate = time.monotonic() + segundos
+
+    def enviar_bruto(self, texto: str):
+        """Envia um payload qualquer a todos os clientes"""
+        for cliente in self._copiar_clientes():
+            try:
+                cliente.conn.enviar_texto(texto)
+            except Exception:
+                self._remover(cliente)
+
+    def definir_latencia(self, distribuicao: str = 'lognormal', media_ms: float = 0.0, desvio_ms: float = 0.0,
+                         p_cauda: float = 0.0, cauda_ms: float = 0.0):
+        """
+        Latência de cada resposta REST
+
+        Args:
+            distribuicao: fixa | uniforme (media ± desvio) | normal | lognormal | exponencial
+            media_ms: Média da distribuição
+            desvio_ms: Desvio padrão (meia largura na uniforme)
+            p_cauda: Probabilidade de somar cauda_ms (respostas lentas raras)
+            cauda_ms: Atraso extra da cauda
+        """
+        if distribuicao not in DISTRIBUICOES_LATENCIA:
+            raise ValueError(f"Distribuição de latência desconhecida: {distribuicao}")
+        self._latencia = {'distribuicao': distribuicao, 'media_ms': media_ms, 'desvio_ms': desvio_ms,
+                          'p_cauda': p_cauda, 'cauda_ms': cauda_ms}
+
+    def limitar_taxa(self, req_segundo: Optional[float], rajada: Optional[float] = None):
+        """Balde de fichas do REST: acima da taxa responde 429 (None = sem limite)"""
+        with self._lock:
+            if req_segundo is None:
+                self._limite = None
+            else:
+                rajada = rajada or req_segundo
+                self._limite = {'taxa': req_segundo, 'rajada': rajada, 'fichas': rajada, 'em': time.monotonic()}
+
+    def rajada_429(self, quantidade: Optional[int] = None, segundos: Optional[float] = None, retry_after: int = 1):
+        """As próximas `quantidade` requisições REST (ou todas por `segundos`) recebem 429"""
+        with self._lock:
+            self._rajada_429 = {'restantes': quantidade or 0,
+                                'ate': time.monotonic() + segundos if segundos else 0.0,
+                                'retry_after': retry_after}
+
+    def injetar_falhas(self, **probabilidades: float):
+        """
+        Probabilidades de falha (0 a 1)
+
+        Args:
+            malformado: Resposta REST 200 com JSON cortado
+            erro_5xx: Resposta REST 503
+            desconexao: Conexão REST fechada sem resposta
+            malformado_ws: Mensagem WebSocket malformada por publicação
+            desconexao_ws: Queda de um cliente WebSocket por publicação
+        """
+        desconhecidas = set(probabilidades) - set(self._falhas)
+        if desconhecidas:
+            raise ValueError(f"Falhas desconhecidas: {sorted(desconhecidas)}")
+        self._falhas.update(probabilidades)
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Requisições REST e falhas entregues"""
+        stats = dict(self.estatisticas)
+        stats['clientes_ws'] = len(self._clientes)
+        stats['conexoes_aceitas'] = self.conexoes_aceitas
+        return stats
+
+    @property
+    def clientes_conectados(self) -> int:
+        return len(self._clientes)
+
+    def preco(self, simbolo: str) -> float:
+        return self._mercado[simbolo]['preco']
+
+    # ------------------------------------------------------------------
+    # Conexões
+    # ------------------------------------------------------------------
+    def _aceitar(self):
+        while not self._parar.is_set():
+            try:
+                sock, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._atender, args=(sock,), daemon=True).start()
+
+    def _atender(self, sock: socket.socket):
+        sock.settimeout(5)
+        try:
+            conn, _ = ConexaoWebSocket.aceitar(sock)
+        except Exception as e:
+            logger.debug(f"Handshake local recusado: {e}")
+            sock.close()
+            return
+        with self._lock:
+            self.conexoes_aceitas += 1
+            cliente = _Cliente(conn, f"local-{self.conexoes_aceitas}")
+            self._clientes.append(cliente)
+        try:
+            while not self._parar.is_set():
+                texto = conn.receber(timeout=0.5)
+                if texto is not None:
+                    self._responder(cliente, texto)
+        except (ConexaoFechada, OSError):
+            pass
+        finally:
+            self._remover(cliente)
+            conn.abortar()
+
+    def _remover(self, cliente: _Cliente):
+        with self._lock:
+            if cliente in self._clientes:
+                self._clientes.remove(cliente)
+
+    def _copiar_clientes(self) -> List[_Cliente]:
+        with self._lock:
+            return list(self._clientes)
+
+    def _responder(self, cliente: _Cliente, texto: str):
+        try:
+            pedido = json.loads(texto)
+        except ValueError:
+            return
+        op = pedido.get('op')
+        resposta = {'success': True, 'ret_msg': '', 'conn_id': cliente.conn_id,
+                    'req_id': pedido.get('req_id', ''), 'op': op}
+        if op == 'ping':
+            resposta['ret_msg'] = 'pong'
+            cliente.conn.enviar_texto(json.dumps(resposta))
+            return
+        if op not in ('subscribe', 'unsubscribe'):
+            return
+
+        invalidos = [t for t in pedido.get('args', []) if self._simbolo_do_topico(t) is None]
+        if invalidos:
+            resposta.update(success=False, ret_msg=f"error:handler not found,topic:{invalidos[0]}")
+        cliente.conn.enviar_texto(json.dumps(resposta))
+        for topico in pedido.get('args', []):
+            if topico in invalidos:
+                continue
+            if op == 'unsubscribe':
+                cliente.topicos.discard(topico)
+                continue
+            self.inscricoes.append(topico)
+            if topico.startswith(('tickers.', 'orderbook.')):
+                # Snapshot antes de entrar na lista: os deltas seguintes sempre têm base
+                simbolo = self._simbolo_do_topico(topico)
+                with self._lock:
+                    snapshot = (self._ticker(simbolo, True) if topico.startswith('tickers.')
+                                else self._snapshot_livro(topico, simbolo))
+                    cliente.conn.enviar_texto(json.dumps(snapshot))
+                    cliente.topicos.add(topico)
+            else:
+                cliente.topicos.add(topico)
+
+    def _simbolo_do_topico(self, topico: str) -> Optional[str]:
+        partes = topico.split('.')
+        if partes[0] in ('tickers', 'publicTrade') and len(partes) == 2:
+            simbolo = partes[1]
+        elif partes[0] == 'kline' and len(partes) == 3 and intervalo_kline_ms(partes[1]):
+            simbolo = partes[2]
+        elif partes[0] == 'orderbook' and len(partes) == 3 and partes[1] in PROFUNDIDADES_LIVRO:
+            simbolo = partes[2]
+        else:
+            return None
+        return simbolo if simbolo in self._mercado else None
+
+    # ------------------------------------------------------------------
+    # Mercado sintético
+    # ------------------------------------------------------------------
+    def _publicar(self):
+        while not self._parar.wait(self.intervalo):
+            if time.monotonic() < self._silencio_ate:
+                continue
+            with self._lock:
+                mensagens = []
+                for simbolo in self._mercado:
+                    trade = self._passo(simbolo)
+                    mensagens.append((f"tickers.{simbolo}", self._ticker(simbolo, False)))
+                    mensagens.append((f"publicTrade.{simbolo}", trade))
+                    delta = self._delta_livro(simbolo)
+                    for topico in self._topicos_livro(simbolo):
+                        mensagens.append((topico, dict(delta, topic=topico)))
+                topicos_kline = {t for c in self._clientes for t in c.topicos if t.startswith('kline.')}
+                topicos_kline |= {f"kline.{i}.{s}" for s, i in self._klines_rest}
+                for topico in sorted(topicos_kline):
+                    mensagens.append((topico, self._kline(topico)))
+                # Cópia dos tópicos: quem assinar depois daqui já recebeu o snapshot com este estado
+                clientes = [(c, set(c.topicos)) for c in self._clientes]
+
+            for cliente, topicos in clientes:
+                try:
+                    for topico, mensagem in mensagens:
+                        if topico in topicos:
+                            cliente.conn.enviar_texto(json.dumps(mensagem))
+                except Exception:
+                    self._remover(cliente)
+            self._falhas_ws()
+
+    def _falhas_ws(self):
+        if self._falhas['malformado_ws'] and self._rng_falhas.random() < self._falhas['malformado_ws']:
+            self.estatisticas['malformados_ws'] += 1
+            self.enviar_bruto(self._rng_falhas.choice(['{"topic": "tickers.', 'null', '{"data": []', '\x00']))
+        clientes = self._copiar_clientes()
+        if clientes and self._falhas['desconexao_ws'] and self._rng_falhas.random() < self._falhas['desconexao_ws']:
+            cliente = self._rng_falhas.choice(clientes)
+            self._remover(cliente)
+            cliente.conn.abortar()
+            self.estatisticas['desconexoes_ws'] += 1
+
+    def _passo(self, simbolo: str) -> Dict[str, Any]:
+        mercado = self._mercado[simbolo]
+        mercado['preco'] = round(mercado['preco'] * (1 + self._rng.gauss(0, 0.0005)), 2)
+        quantidade = round(self._rng.uniform(0.001, 0.5), 3)
+        mercado['volume'] += quantidade
+        mercado['alta'] = max(mercado['alta'], mercado['preco'])
+        mercado['baixa'] = min(mercado['baixa'], mercado['preco'])
+        mercado['cs'] += self._rng.randint(1, 5)
+        mercado['seq'] += self._rng.randint(1, 3)
+        agora = int(time.time() * 1000)
+        return {
+            'topic': f"publicTrade.{simbolo}",
+            'type': 'snapshot',
+            'ts': agora,
+            'data': [{
+                'T': agora, 's': simbolo, 'S': self._rng.choice(['Buy', 'Sell']),
+                'v': f"{quantidade}", 'p': f"{mercado['preco']:.2f}", 'L': 'PlusTick',
+                'i': f"{simbolo}-{mercado['seq']}", 'BT': False, 'seq': mercado['seq'],
+            }],
+        }
+
+    def _ticker(self, simbolo: str, snapshot: bool) -> Dict[str, Any]:
+        mercado = self._mercado[simbolo]
+        preco = mercado['preco']
+        dados = {
+            'symbol': simbolo,
+            'lastPrice': f"{preco:.2f}",
+            'bid1Price': f"{preco - 0.1:.2f}",
+            'ask1Price': f"{preco + 0.1:.2f}",
+            'markPrice': f"{preco:.2f}",
+        }
+        if snapshot:
+            dados.update({
+                'indexPrice': f"{preco:.2f}",
+                'prevPrice24h': f"{mercado['abertura']:.2f}",
+                'price24hPcnt': f"{(preco / mercado['abertura'] - 1):.6f}",
+                'highPrice24h': f"{mercado['alta']:.2f}",
+                'lowPrice24h': f"{mercado['baixa']:.2f}",
+                'volume24h': f"{mercado['volume']:.3f}",
+                'turnover24h': f"{mercado['volume'] * preco:.2f}",
+                'bid1Size': '1.000',
+                'ask1Size': '1.000',
+            })
+        else:
+            dados.update({
+                'price24hPcnt': f"{(preco / mercado['abertura'] - 1):.6f}",
+                'volume24h': f"{mercado['volume']:.3f}",
+            })
+        return {'topic': f"tickers.{simbolo}", 'type': 'snapshot' if snapshot else 'delta',
+                'data': dados, 'cs': mercado['cs'], 'ts': int(time.time() * 1000)}
+
+    # ------------------------------------------------------------------
+    # Livro sintético (níveis indexados por inteiros: preço = índice × passo)
+    # ------------------------------------------------------------------
+    def _novo_livro(self, preco: float) -> Dict[str, Any]:
+        passo = 10 ** math.floor(math.log10(preco * 1e-4))
+        livro = {'passo': passo, 'casas': max(0, -int(math.floor(math.log10(passo)))),
+                 'b': {}, 'a': {}, 'u': 1, 'seq': 70000, 'pular': 0}
+        centro = round(preco / passo)
+        for k in range(1, NIVEIS_LIVRO + 1):
+            livro['b'][centro - k] = self._tamanho_nivel()
+            livro['a'][centro + k] = self._tamanho_nivel()
+        return livro
+
+    def _tamanho_nivel(self) -> float:
+        tamanho = self._rng.uniform(0.01, 2.0)
+        if self._rng.random() < 0.05:
+            tamanho *= 10  # "paredes" de liquidez para os clusters
+        return round(tamanho, 3)
+
+    def _topicos_livro(self, simbolo: str) -> Set[str]:
+        return {t for c in self._clientes for t in c.topicos
+                if t.startswith('orderbook.') and t.endswith(f".{simbolo}")}
+
+    def _niveis(self, livro: Dict[str, Any], lado: str, niveis: Dict[int, float]) -> List[List[str]]:
+        ordem = sorted(niveis, reverse=(lado == 'b'))
+        return [[f"{i * livro['passo']:.{livro['casas']}f}", f"{niveis[i]:.3f}"] for i in ordem]
+
+    def _snapshot_livro(self, topico: str, simbolo: str) -> Dict[str, Any]:
+        livro = self._livros[simbolo]
+        agora = int(time.time() * 1000)
+        return {'topic': topico, 'type': 'snapshot', 'ts': agora, 'cts': agora,
+                'data': {'s': simbolo, 'b': self._niveis(livro, 'b', livro['b']),
+                         'a': self._niveis(livro, 'a', livro['a']), 'u': livro['u'], 'seq': livro['seq']}}
+
+    def _delta_livro(self, simbolo: str) -> Dict[str, Any]:
+        """Acompanha o preço: remove níveis cruzados, completa o topo, corta a cauda e mexe em alguns níveis"""
+        livro = self._livros[simbolo]
+        centro = round(self._mercado[simbolo]['preco'] / livro['passo'])
+        mudancas = {'b': {}, 'a': {}}
+        for lado, sinal in (('b', -1), ('a', 1)):
+            niveis = livro[lado]
+            for i in [i for i in niveis if (i - centro) * sinal <= 0]:
+                del niveis[i]
+                mudancas[lado][i] = 0.0
+            for k in range(1, NIVEIS_LIVRO + 1):
+                i = centro + sinal * k
+                if i not in niveis:
+                    niveis[i] = mudancas[lado][i] = self._tamanho_nivel()
+            excedentes = sorted(niveis, key=lambda j: (j - centro) * sinal)[NIVEIS_LIVRO:]
+            for i in excedentes:
+                del niveis[i]
+                mudancas[lado][i] = 0.0
+            for i in self._rng.sample(sorted(niveis), min(3, len(niveis))):
+                niveis[i] = mudancas[lado][i] = self._tamanho_nivel()
+
+        livro['u'] += 1 + livro['pular']
+        livro['pular'] = 0
+        livro['seq'] += self._rng.randint(1, 5)
+        agora = int(time.time() * 1000)
+        return {'topic': '', 'type': 'delta', 'ts': agora, 'cts': agora,
+                'data': {'s': simbolo, 'b': self._niveis(livro, 'b', mudancas['b']),
+                         'a': self._niveis(livro, 'a', mudancas['a']), 'u': livro['u'], 'seq': livro['seq']}}
+
+    def _kline(self, topico: str) -> Dict[str, Any]:
+        _, intervalo, simbolo = topico.split('.')
+        duracao = intervalo_kline_ms(intervalo)
+        preco = self._mercado[simbolo]['preco']
+        candle = self._klines.get((simbolo, intervalo))
+        if candle is None or candle['ticks'] >= self.ticks_por_kline:
+            if candle is None:
+                inicio = int(time.time() * 1000) // duracao * duracao
+            else:
+                self._historico_klines.setdefault((simbolo, intervalo), deque(maxlen=HISTORICO_KLINES * 2)).append(
+                    self._linha_kline(candle, candle['close']))
+                inicio = candle['start'] + duracao * (1 + self._pular.pop(simbolo, 0))
+            candle = {'start': inicio, 'open': preco, 'high': preco, 'low': preco, 'volume': 0.0, 'ticks': 0}
+            self._klines[(simbolo, intervalo)] = candle
+        candle['ticks'] += 1
+        candle['close'] = preco
+        candle['high'] = max(candle['high'], preco)
+        candle['low'] = min(candle['low'], preco)
+        candle['volume'] += self._rng.uniform(0.1, 2.0)
+        return {
+            'topic': topico,
+            'type': 'snapshot',
+            'ts': int(time.time() * 1000),
+            'data': [{
+                'start': candle['start'], 'end': candle['start'] + duracao - 1, 'interval': intervalo,
+                'open': f"{candle['open']:.2f}", 'close': f"{preco:.2f}",
+                'high': f"{candle['high']:.2f}", 'low': f"{candle['low']:.2f}",
+                'volume': f"{candle['volume']:.3f}", 'turnover': f"{candle['volume'] * preco:.2f}",
+                'confirm': candle['ticks'] >= self.ticks_por_kline,
+                'timestamp': int(time.time() * 1000),
+            }],
+        }
+
+
+    def _linha_kline(self, candle: Dict[str, Any], fechamento: float) -> List[str]:
+        """Candle no formato de /v5/market/kline: [start, open, high, low, close, volume, turnover]"""
+        return [str(candle['start']), f"{candle['open']:.2f}", f"{candle['high']:.2f}", f"{candle['low']:.2f}",
+                f"{fechamento:.2f}", f"{candle['volume']:.3f}", f"{candle['volume'] * fechamento:.2f}"]
+
+    # ------------------------------------------------------------------
+    # API REST
+    # ------------------------------------------------------------------
+    def _responder_rest(self, caminho: str, params: Dict[str, str]) -> Tuple[Optional[int], bytes, Dict[str, str]]:
+        """(status, corpo, cabecalhos) da requisição; status None = derrubar a conexão sem resposta"""
+        with self._lock:
+            self.estatisticas['requisicoes_rest'] += 1
+        espera = self._sortear_latencia()
+        if espera:
+            time.sleep(espera)
+
+        cabecalhos: Dict[str, str] = {}
+        retry_after = self._consumir_limite(cabecalhos)
+        if retry_after is not None:
+            with self._lock:
+                self.estatisticas['respostas_429'] += 1
+            cabecalhos['Retry-After'] = str(retry_after)
+            return 429, self._envelope(10006, 'Too many visits!'), cabecalhos
+
+        falha = self._sortear_falha()
+        if falha == 'desconexao':
+            return None, b'', {}
+        if falha == 'erro_5xx':
+            return 503, self._envelope(10016, 'Service Unavailable'), cabecalhos
+
+        with self._lock:
+            status, corpo = self._atender_rest(caminho, params)
+        if falha == 'malformado':
+            corpo = corpo[:max(1, len(corpo) // 2)]
+        return status, corpo, cabecalhos
+
+    def _envelope(self, codigo: int, mensagem: str, resultado: Any = None) -> bytes:
+        return json.dumps({'retCode': codigo, 'retMsg': mensagem, 'result': resultado if resultado is not None else {},
+                           'retExtInfo': {}, 'time': int(time.time() * 1000)}).encode()
+
+    def _atender_rest(self, caminho: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        categoria = params.get('category')
+        if caminho not in ('/v5/market/tickers', '/v5/market/kline', '/v5/market/orderbook'):
+            return 404, self._envelope(404, 'Not Found')
+        if categoria not in CATEGORIAS:
+            return 200, self._envelope(10001, 'params error: category is invalid')
+        simbolo = params.get('symbol')
+        if simbolo is not None and simbolo not in self._mercado:
+            return 200, self._envelope(10001, 'Not supported symbols')
+
+        if caminho == '/v5/market/tickers':
+            lista = [self._ticker(s, True)['data'] for s in ([simbolo] if simbolo else self._mercado)]
+            return 200, self._envelope(0, 'OK', {'category': categoria, 'list': lista})
+        if simbolo is None:
+            return 200, self._envelope(10001, 'params error: symbol is required')
+        if caminho == '/v5/market/kline':
+            intervalo = params.get('interval', '')
+            if not intervalo_kline_ms(intervalo):
+                return 200, self._envelope(10001, 'params error: interval is invalid')
+            linhas = self._klines_rest_linhas(simbolo, intervalo, params)
+            return 200, self._envelope(0, 'OK', {'category': categoria, 'symbol': simbolo, 'list': linhas})
+
+        livro = self._livros[simbolo]
+        limite = min(int(params.get('limit', 1 if categoria == 'spot' else 25)), 200 if categoria == 'spot' else 500)
+        agora = int(time.time() * 1000)
+        return 200, self._envelope(0, 'OK', {
+            's': simbolo, 'b': self._niveis(livro, 'b', livro['b'])[:limite],
+            'a': self._niveis(livro, 'a', livro['a'])[:limite], 'ts': agora, 'u': livro['u'],
+            'seq': livro['seq'], 'cts': agora})
+
+    def _klines_rest_linhas(self, simbolo: str, intervalo: str, params: Dict[str, str]) -> List[List[str]]:
+        """Mais recentes primeiro, entre start e end, no máximo limit (como a Bybit)"""
+        chave = (simbolo, intervalo)
+        if chave not in self._klines:
+            self._kline(f"kline.{intervalo}.{simbolo}")
+        self._klines_rest.add(chave)
+        historico = self._historico_klines.setdefault(chave, deque(maxlen=HISTORICO_KLINES * 2))
+        if chave not in self._historicos_gerados:
+            self._gerar_historico(simbolo, intervalo, historico)
+            self._historicos_gerados.add(chave)
+
+        candle = self._klines[chave]
+        linhas = list(historico) + [self._linha_kline(candle, candle['close'])]
+        inicio = int(params.get('start', 0))
+        fim = int(params.get('end', 2 ** 62))
+        limite = min(int(params.get('limit', 200)), MAX_KLINES_POR_REQUISICAO)
+        return [l for l in reversed(linhas) if inicio <= int(l[0]) <= fim][:limite]
+
+    def _gerar_historico(self, simbolo: str, intervalo: str, historico: deque):
+        """Passeio aleatório para trás a partir do candle mais antigo: o passado encaixa no preço atual"""
+        duracao = intervalo_kline_ms(intervalo)
+        rng = random.Random(None if self.semente is None else f"{self.semente}-{simbolo}-{intervalo}")
+        if historico:
+            inicio, abertura = int(historico[0][0]), float(historico[0][1])
+        else:
+            candle = self._klines[(simbolo, intervalo)]
+            inicio, abertura = candle['start'], candle['open']
+        for _ in range(min(HISTORICO_KLINES, historico.maxlen - len(historico))):
+            fechamento = abertura
+            abertura = round(fechamento / (1 + rng.gauss(0, 0.001)), 2)
+            inicio -= duracao
+            volume = rng.uniform(1.0, 20.0)
+            candle = {'start': inicio, 'open': abertura, 'volume': volume,
+                      'high': max(abertura, fechamento) * (1 + abs(rng.gauss(0, 0.0003))),
+                      'low': min(abertura, fechamento) * (1 - abs(rng.gauss(0, 0.0003)))}
+            historico.appendleft(self._linha_kline(candle, fechamento))
+
+    def _sortear_latencia(self) -> float:
+        """Segundos de espera da resposta conforme definir_latencia()"""
+        cfg = self._latencia
+        media, desvio = cfg.get('media_ms', 0.0), cfg.get('desvio_ms', 0.0)
+        rng = self._rng_falhas
+        ms = 0.0
+        if media > 0:
+            distribuicao = cfg['distribuicao']
+            if distribuicao == 'fixa':
+                ms = media
+            elif distribuicao == 'uniforme':
+                ms = rng.uniform(media - desvio, media + desvio)
+            elif distribuicao == 'normal':
+                ms = rng.gauss(media, desvio)
+            elif distribuicao == 'lognormal':
+                sigma2 = math.log(1 + (desvio / media) ** 2)
+                ms = rng.lognormvariate(math.log(media) - sigma2 / 2, math.sqrt(sigma2))
+            else:
+                ms = rng.expovariate(1 / media)
+        if cfg.get('p_cauda') and rng.random() < cfg['p_cauda']:
+            ms += cfg.get('cauda_ms', 0.0)
+        return max(0.0, ms) / 1000
+
+    def _consumir_limite(self, cabecalhos: Dict[str, str]) -> Optional[int]:
+        """Retry-After em segundos se a requisição deve levar 429; senão consome uma ficha"""
+        with self._lock:
+            agora = time.monotonic()
+            rajada = self._rajada_429
+            if rajada['restantes'] > 0:
+                rajada['restantes'] -= 1
+                return rajada['retry_after']
+            if rajada['ate'] > agora:
+                return max(rajada['retry_after'], math.ceil(rajada['ate'] - agora))
+            limite = self._limite
+            if limite is None:
+                return None
+            limite['fichas'] = min(limite['rajada'], limite['fichas'] + (agora - limite['em']) * limite['taxa'])
+            limite['em'] = agora
+            cabecalhos['X-Bapi-Limit'] = str(int(limite['rajada']))
+            if limite['fichas'] < 1:
+                cabecalhos['X-Bapi-Limit-Status'] = '0'
+                return max(1, math.ceil((1 - limite['fichas']) / limite['taxa']))
+            limite['fichas'] -= 1
+            cabecalhos['X-Bapi-Limit-Status'] = str(int(limite['fichas']))
+            return None
+
+    def _sortear_falha(self) -> Optional[str]:
+        sorteio = self._rng_falhas.random()
+        for falha, contador in (('desconexao', 'desconexoes'), ('erro_5xx', 'erros_5xx'),
+                                ('malformado', 'malformados')):
+            if sorteio < self._falhas[falha]:
+                with self._lock:
+                    self.estatisticas[contador] += 1
+                return falha
+            sorteio -= self._falhas[falha]
+        return None
+
+if __name__ == "__main__":
+    servidor = ServidorBybitLocal().iniciar()
+    logger.info(f"Aponte exchange.websocket_url para {servidor.url} e exchange.base_url para {servidor.url_rest}")
+    logger.info("Pressione Ctrl+C para parar")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.parar()
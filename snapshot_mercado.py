@@ -0,0 +1,194 @@
+"""
+Snapshot de mercado compartilhado por ciclo
+
+Um único GET /v5/market/tickers?category=<categoria> (sem symbol) devolve todos
+os pares de uma vez. O serviço faz essa chamada no máximo uma vez por ciclo
+(ttl_segundos) e entrega a todos os consumidores o mesmo snapshot imutável
+{símbolo: ticker}: coletor, gestor de ordens, atualização de PnL e monitores.
+Chamadas concorrentes no mesmo ciclo esperam a mesma requisição (single-flight).
+
+Com um StreamBybit anexado e atualizado para os símbolos pedidos, o snapshot é
+montado do estado do stream, sem HTTP. O número de requisições passa a crescer
+com os ciclos, não com pares × ordens.
+"""
+
+import time
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional
+import requests
+from loguru import logger
+
+from stream_bybit import normalizar_ticker
+
+BASE_URL_PADRAO = "https://api.bybit.com"
+
+
+@dataclass(frozen=True)
+class SnapshotMercado:
+    """Tickers de todos os símbolos num mesmo instante (somente leitura)"""
+    tickers: Mapping[str, Mapping[str, Any]]
+    ts_ms: int
+    fonte: str
+    criado_em: float = field(default_factory=time.monotonic, compare=False)
+
+    def ticker(self, symbol: str) -> Optional[Mapping[str, Any]]:
+        return self.tickers.get(symbol)
+
+    def preco(self, symbol: str) -> Optional[float]:
+        ticker = self.tickers.get(symbol)
+        return ticker.get('preco_atual') if ticker else None
+
+    def precos(self) -> Dict[str, float]:
+        """{símbolo: último preço} (cópia mutável, formato de monitor_simulador)"""
+        return {s: t['preco_atual'] for s, t in self.tickers.items() if t.get('preco_atual')}
+
+    def idade(self) -> float:
+        """Segundos desde que o snapshot foi montado"""
+        return time.monotonic() - self.criado_em
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.tickers
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+
+def _congelar(tickers: Dict[str, Dict[str, Any]], ts_ms: int, fonte: str) -> SnapshotMercado:
+    return SnapshotMercado(MappingProxyType({s: MappingProxyType(t) for s, t in tickers.items()}), ts_ms, fonte)
+
+
+class ServicoSnapshotMercado:
+    """Busca em lote (ou lê do stream) e mantém o snapshot do ciclo"""
+
+    def __init__(self, session: Optional[requests.Session] = None, base_url: Optional[str] = None,
+                 categoria: Optional[str] = None, ttl_segundos: Optional[float] = None,
+                 stream=None, simbolos: Optional[Iterable[str]] = None):
+        """
+        Inicializa o serviço
+
+        Args:
+            session: Sessão HTTP reaproveitada (padrão: nova sessão)
+            base_url: URL da API REST (padrão: exchange.base_url)
+            categoria: Categoria da Bybit ('linear', 'spot')
+            ttl_segundos: Idade máxima do snapshot antes de buscar outro (um ciclo)
+            stream: StreamBybit opcional usado no lugar do HTTP quando atualizado
+            simbolos: Símbolos que o stream precisa cobrir (padrão: trading.pares)
+        """
+        try:
+            import config
+            cfg = config.load_config() or {}
+        except Exception:
+            cfg = {}
+        cfg_snapshot = (cfg.get('coleta', {}) or {}).get('snapshot', {}) or {}
+        self.session = session or requests.Session()
+        self.base_url = base_url or (cfg.get('exchange', {}) or {}).get('base_url') or BASE_URL_PADRAO
+        self.categoria = categoria or cfg_snapshot.get('categoria', 'linear')
+        self.ttl = ttl_segundos if ttl_segundos is not None else cfg_snapshot.get(
+            'ttl_segundos', (cfg.get('coleta', {}) or {}).get('frequencia', 5))
+        self.timeout = cfg_snapshot.get('timeout_segundos', 10)
+        self.max_idade_stream = cfg_snapshot.get('max_idade_stream_segundos', 10)
+        self.stream = stream
+        self.simbolos = list(simbolos or (cfg.get('trading', {}) or {}).get('pares', []))
+
+        self._atual: Optional[SnapshotMercado] = None
+        self._lock = threading.Lock()
+        self.estatisticas = {
+            'requisicoes': 0,
+            'snapshots_stream': 0,
+            'acertos_cache': 0,
+            'erros': 0,
+            'servidos_vencidos': 0,
+            'ultima_latencia_ms': 0.0,
+        }
+
+    def obter(self, max_idade: Optional[float] = None) -> Optional[SnapshotMercado]:
+        """
+        Snapshot do ciclo atual
+
+        Args:
+            max_idade: Sobrepõe o ttl (0 força nova busca)
+
+        Returns:
+            Snapshot (o último válido se a busca falhar) ou None se nunca houve um
+        """
+        limite = self.ttl if max_idade is None else max_idade
+        atual = self._atual
+        if atual is not None and atual.idade() <= limite:
+            self.estatisticas['acertos_cache'] += 1
+            return atual
+        with self._lock:
+            # Outra thread pode ter buscado enquanto esperávamos o lock
+            atual = self._atual
+            if atual is not None and atual.idade() <= limite:
+                self.estatisticas['acertos_cache'] += 1
+                return atual
+            novo = self._do_stream() or self._buscar()
+            if novo is not None:
+                self._atual = novo
+                return novo
+            if atual is not None:
+                self.estatisticas['servidos_vencidos'] += 1
+            return atual
+
+    def _do_stream(self) -> Optional[SnapshotMercado]:
+        if not self.stream:
+            return None
+        tickers = {}
+        for symbol in self.simbolos or self.stream.simbolos:
+            ticker = self.stream.ultimo_ticker(symbol, self.max_idade_stream)
+            if not ticker or not ticker.get('preco_atual'):
+                return None
+            tickers[symbol] = ticker
+        if not tickers:
+            return None
+        self.estatisticas['snapshots_stream'] += 1
+        return _congelar(tickers, max(t['ts_ms'] for t in tickers.values()), 'Bybit_WS')
+
+    def _buscar(self) -> Optional[SnapshotMercado]:
+        inicio = time.perf_counter()
+        try:
+            self.estatisticas['requisicoes'] += 1
+            response = self.session.get(f"{self.base_url}/v5/market/tickers",
+                                        params={"category": self.categoria}, timeout=self.timeout)
+            response.raise_for_status()
+            dados = response.json()
+            if dados.get('retCode') != 0 or not dados.get('result', {}).get('list'):
+                raise ValueError(dados.get('retMsg', 'lista de tickers vazia'))
+            ts_ms = int(dados.get('time') or time.time() * 1000)
+            tickers = {}
+            for bruto in dados['result']['list']:
+                ticker = normalizar_ticker(bruto['symbol'], bruto, ts_ms)
+                ticker['fonte'] = 'Bybit_API'
+                tickers[bruto['symbol']] = ticker
+            return _congelar(tickers, ts_ms, 'Bybit_API')
+        except Exception as e:
+            self.estatisticas['erros'] += 1
+            logger.error(f"❌ Erro ao buscar snapshot de tickers da Bybit: {e}")
+            return None
+        finally:
+            self.estatisticas['ultima_latencia_ms'] = (time.perf_counter() - inicio) * 1000
+
+    def invalidar(self):
+        """Descarta o snapshot atual (a próxima leitura busca de novo)"""
+        self._atual = None
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Requisições feitas, snapshots do stream e leituras servidas do cache"""
+        stats = dict(self.estatisticas)
+        stats['simbolos_no_snapshot'] = len(self._atual) if self._atual else 0
+        return stats
+
+
+_servico: Optional[ServicoSnapshotMercado] = None
+_lock_servico = threading.Lock()
+
+
+def obter_servico_snapshot() -> ServicoSnapshotMercado:
+    """Serviço compartilhado do processo (monitores e scripts avulsos)"""
+    global _servico
+    with _lock_servico:
+        if _servico is None:
+            _servico = ServicoSnapshotMercado()
+        return _servico
@@ -0,0 +1,619 @@
+"""
+Stream público da Bybit (v5, linear) por WebSocket
+
+Assina tickers.<símbolo>, publicTrade.<símbolo>, kline.<intervalo>.<símbolo> e
+(opcionalmente) orderbook.<profundidade>.<símbolo> numa única conexão, mantém o
+estado de cada símbolo (ticker completo = snapshot + deltas, livro L2 em
+livro_ordens.py) e publica ticks normalizados num BufferCircularPrecos em
+memória por símbolo. RoboCompleto (via ColetorBybit.obter_preco_atual) e o
+GestorOrdensDinamico leem daqui em vez de fazer uma requisição REST por ordem.
+
+A conexão é refeita sozinha (backoff exponencial com jitter) e todos os tópicos
+são reassinados. Lacunas no feed são detectadas e registradas:
+  - reconexao: mensagens perdidas entre a queda e a volta da conexão
+  - silencio: símbolo ficou mais de max_silencio_segundos sem mensagens
+  - kline: o candle novo não começa logo após o anterior (candles faltando)
+  - sem_snapshot: delta de ticker chegou sem snapshot anterior
+  - livro: salto no id de atualização do orderbook (o tópico é reassinado)
+Mensagens com cs/seq menor que o último visto são descartadas (fora de ordem).
+"""
+
+import json
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+from loguru import logger
+
+from buffer_precos import BufferCircularPrecos
+from livro_ordens import LivroOrdens, obter_livro
+from websocket_leve import ConexaoWebSocket, ConexaoFechada
+
+URL_PADRAO = "wss://stream.bybit.com/v5/public/linear"
+TOPICOS_PADRAO = ('tickers', 'publicTrade', 'kline')
+MAX_ARGS_POR_INSCRICAO = 10
+
+_INTERVALOS_KLINE_MS = {
+    'D': 86_400_000,
+    'W': 7 * 86_400_000,
+}
+
+
+def intervalo_kline_ms(intervalo: str) -> Optional[int]:
+    """Duração de um candle da Bybit em ms ('1', '5', '60', 'D'...); None para 'M'"""
+    if intervalo in _INTERVALOS_KLINE_MS:
+        return _INTERVALOS_KLINE_MS[intervalo]
+    return int(intervalo) * 60_000 if str(intervalo).isdigit() else None
+
+
+def _float(valor: Any) -> Optional[float]:
+    try:
+        return float(valor) if valor not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _agora_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def normalizar_ticker(symbol: str, bruto: Dict[str, Any], ts_ms: int) -> Dict[str, Any]:
+    """Converte o ticker da Bybit para o formato usado por ColetorBybit.coletar_dados_bybit"""
+    variacao = _float(bruto.get('price24hPcnt'))
+    return {
+        'symbol': symbol,
+        'preco_atual': _float(bruto.get('lastPrice')),
+        'bid': _float(bruto.get('bid1Price')),
+        'ask': _float(bruto.get('ask1Price')),
+        'preco_marca': _float(bruto.get('markPrice')),
+        'preco_abertura': _float(bruto.get('prevPrice24h')),
+        'preco_minimo': _float(bruto.get('lowPrice24h')),
+        'preco_maximo': _float(bruto.get('highPrice24h')),
+        'volume': _float(bruto.get('volume24h')),
+        'variacao': variacao * 100 if variacao is not None else None,
+        'ts_ms': ts_ms,
+        'fonte': 'Bybit_WS',
+    }
+
+
+class StreamBybit:
+    """Cliente do stream público com reconexão, reassinatura e detecção de lacunas"""
+
+    def __init__(self, simbolos: Optional[Iterable[str]] = None, url: Optional[str] = None,
+                 intervalo_kline: Optional[str] = None, topicos: Optional[Iterable[str]] = None,
+                 capacidade_buffer: Optional[int] = None, reconexao_automatica: Optional[bool] = None,
+                 ping_segundos: Optional[float] = None, max_silencio_segundos: Optional[float] = None,
+                 backoff_max_segundos: Optional[float] = None):
+        """
+        Inicializa o stream (a conexão só abre em iniciar())
+
+        Args:
+            simbolos: Símbolos assinados (padrão: trading.pares)
+            url: Endpoint WebSocket (padrão: exchange.websocket_url)
+            intervalo_kline: Intervalo dos candles assinados ('1', '5', '60'...)
+            topicos: Subconjunto de 'tickers', 'publicTrade', 'kline', 'orderbook'
+            capacidade_buffer: Ticks mantidos por símbolo
+            reconexao_automatica: Reconectar após queda
+            ping_segundos: Intervalo do ping de aplicação ({"op": "ping"})
+            max_silencio_segundos: Sem mensagens por mais que isso = lacuna/reconexão
+            backoff_max_segundos: Espera máxima entre tentativas de conexão
+        """
+        try:
+            import config
+            cfg = config.load_config() or {}
+        except Exception:
+            cfg = {}
+        cfg_coleta = cfg.get('coleta', {}) or {}
+        cfg_stream = cfg_coleta.get('stream', {}) or {}
+
+        self.url = url or (cfg.get('exchange', {}) or {}).get('websocket_url') or URL_PADRAO
+        self.intervalo_kline = str(intervalo_kline or cfg_stream.get('intervalo_kline', '1'))
+        self.profundidade_livro = cfg_stream.get('profundidade_livro', 50)
+        self.topicos = tuple(topicos or cfg_stream.get('topicos') or TOPICOS_PADRAO)
+        self.capacidade_buffer = capacidade_buffer or cfg_stream.get('capacidade_buffer', 4096)
+        self.reconexao_automatica = (reconexao_automatica if reconexao_automatica is not None
+                                     else cfg_coleta.get('reconexao_automatica', True))
+        self.ping_segundos = ping_segundos or cfg_stream.get('ping_segundos', 20)
+        self.max_silencio = max_silencio_segundos or cfg_stream.get('max_silencio_segundos', 30)
+        self.backoff_inicial = cfg_stream.get('backoff_inicial_segundos', 0.5)
+        self.backoff_max = backoff_max_segundos or cfg_stream.get('backoff_max_segundos', 30)
+        self.timeout_conexao = cfg_coleta.get('timeout', 10)
+
+        self._simbolos: List[str] = []
+        self._estado: Dict[str, Dict[str, Any]] = {}
+        self._buffers: Dict[str, BufferCircularPrecos] = {}
+        self._lock = threading.RLock()
+        self._ouvintes: Dict[str, List[Callable]] = {'tick': [], 'ticker': [], 'kline': [], 'livro': [], 'lacuna': [],
+                                                     'bruto': []}
+        self._ressincronizado_em: Dict[str, float] = {}
+        self.lacunas: Deque[Dict[str, Any]] = deque(maxlen=1000)
+
+        self._conn: Optional[ConexaoWebSocket] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tentativas = 0
+        self._req_id = 0
+        self.conectado = False
+
+        self.estatisticas = {
+            'conexoes': 0,
+            'reconexoes': 0,
+            'falhas_conexao': 0,
+            'mensagens': 0,
+            'mensagens_invalidas': 0,
+            'tickers': 0,
+            'trades': 0,
+            'klines': 0,
+            'livros': 0,
+            'ressincronizacoes_livro': 0,
+            'ticks': 0,
+            'lacunas': 0,
+            'fora_de_ordem': 0,
+            'inscricoes_recusadas': 0,
+            'pongs': 0,
+            'ultimo_erro': None,
+        }
+
+        for simbolo in (simbolos or (cfg.get('trading', {}) or {}).get('pares', [])):
+            self._registrar_simbolo(simbolo)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def iniciar(self):
+        """Abre a conexão numa thread em segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="stream-bybit", daemon=True)
+        self._thread.start()
+        logger.info(f"📡 Stream Bybit iniciado: {len(self._simbolos)} símbolos, "
+                    f"tópicos {', '.join(self.topicos)} em {self.url}")
+
+    def parar(self, timeout: float = 5.0):
+        """Fecha a conexão e encerra a thread"""
+        self._parar.set()
+        conn = self._conn
+        if conn:
+            conn.fechar()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info("📡 Stream Bybit parado")
+
+    def aguardar_dados(self, simbolos: Optional[Iterable[str]] = None, timeout: float = 10.0) -> bool:
+        """Espera até todos os símbolos terem preço (True) ou o tempo acabar (False)"""
+        simbolos = list(simbolos or self._simbolos)
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if all(self.preco_atual(s) is not None for s in simbolos):
+                return True
+            if self._parar.wait(0.05):
+                break
+        return False
+
+    # ------------------------------------------------------------------
+    # Assinaturas
+    # ------------------------------------------------------------------
+    def _registrar_simbolo(self, simbolo: str):
+        if simbolo in self._estado:
+            return
+        self._simbolos.append(simbolo)
+        self._estado[simbolo] = {
+            'bruto': {},
+            'ticker': None,
+            'cs': None,
+            'seq_trade': None,
+            'preco': None,
+            'bid': None,
+            'ask': None,
+            'atualizado_em': None,      # time.monotonic() da última mensagem
+            'ultimo_ts_ms': None,       # ts da última mensagem (relógio da exchange)
+            'aguardando_reconexao': False,
+            'klines': {},
+        }
+        self._buffers[simbolo] = BufferCircularPrecos(simbolo, self.capacidade_buffer)
+
+    def _topicos_de(self, simbolo: str) -> List[str]:
+        topicos = []
+        for topico in self.topicos:
+            if topico == 'kline':
+                topicos.append(f"kline.{self.intervalo_kline}.{simbolo}")
+            elif topico == 'orderbook':
+                topicos.append(f"orderbook.{self.profundidade_livro}.{simbolo}")
+            else:
+                topicos.append(f"{topico}.{simbolo}")
+        return topicos
+
+    def _enviar_operacao(self, op: str, args: List[str]):
+        conn = self._conn
+        if not conn or not args:
+            return
+        for i in range(0, len(args), MAX_ARGS_POR_INSCRICAO):
+            self._req_id += 1
+            conn.enviar_texto(json.dumps({'op': op, 'req_id': str(self._req_id),
+                                          'args': args[i:i + MAX_ARGS_POR_INSCRICAO]}))
+
+    def inscrever(self, simbolos: Iterable[str]):
+        """Adiciona símbolos (assinados já, se conectado, e após cada reconexão)"""
+        novos = []
+        with self._lock:
+            for simbolo in simbolos:
+                if simbolo not in self._estado:
+                    self._registrar_simbolo(simbolo)
+                    novos.append(simbolo)
+        if novos and self.conectado:
+            try:
+                self._enviar_operacao('subscribe', [t for s in novos for t in self._topicos_de(s)])
+            except Exception as e:
+                logger.warning(f"⚠️ Assinatura de {novos} fica para a próxima conexão: {e}")
+
+    def cancelar(self, simbolos: Iterable[str]):
+        """Remove símbolos do stream"""
+        removidos = []
+        with self._lock:
+            for simbolo in simbolos:
+                if simbolo in self._estado:
+                    self._simbolos.remove(simbolo)
+                    del self._estado[simbolo]
+                    del self._buffers[simbolo]
+                    removidos.append(simbolo)
+        if removidos and self.conectado:
+            try:
+                self._enviar_operacao('unsubscribe', [t for s in removidos for t in self._topicos_de(s)])
+            except Exception as e:
+                logger.debug(f"Cancelamento de {removidos} não enviado: {e}")
+
+    def ao_receber(self, evento: str, funcao: Callable[[Dict[str, Any]], None]):
+        """
+        Registra um ouvinte chamado na thread do stream
+
+        Args:
+            evento: 'tick', 'ticker', 'kline', 'livro', 'lacuna' ou 'bruto'
+                ('bruto' recebe {'url', 'texto', 'ts_ms'} de cada mensagem antes de processar)
+            funcao: Recebe o dicionário normalizado do evento
+        """
+        self._ouvintes[evento].append(funcao)
+
+    def _emitir(self, evento: str, dados: Dict[str, Any]):
+        for funcao in self._ouvintes[evento]:
+            try:
+                funcao(dados)
+            except Exception as e:
+                logger.error(f"❌ Erro em ouvinte de {evento} do stream: {e}")
+
+    # ------------------------------------------------------------------
+    # Conexão
+    # ------------------------------------------------------------------
+    def _loop(self):
+        while not self._parar.is_set():
+            try:
+                conn = ConexaoWebSocket.conectar(self.url, timeout=self.timeout_conexao)
+                self._conn = conn
+                self.conectado = True
+                self.estatisticas['conexoes'] += 1
+                if self.estatisticas['conexoes'] > 1:
+                    self.estatisticas['reconexoes'] += 1
+                with self._lock:
+                    topicos = [t for s in self._simbolos for t in self._topicos_de(s)]
+                self._enviar_operacao('subscribe', topicos)
+                logger.info(f"🔌 Stream Bybit conectado ({len(topicos)} tópicos assinados)")
+                self._sessao(conn)
+            except ConexaoFechada as e:
+                if not self._parar.is_set():
+                    self.estatisticas['ultimo_erro'] = str(e)
+                    logger.warning(f"⚠️ Stream Bybit desconectado: {e}")
+            except Exception as e:
+                self.estatisticas['falhas_conexao'] += 1
+                self.estatisticas['ultimo_erro'] = str(e)
+                logger.error(f"❌ Erro no stream Bybit: {e}")
+            finally:
+                self._desconectar()
+
+            if self._parar.is_set() or not self.reconexao_automatica:
+                break
+            espera = min(self.backoff_max, self.backoff_inicial * 2 ** self._tentativas)
+            espera *= random.uniform(0.8, 1.2)
+            self._tentativas += 1
+            logger.info(f"🔄 Reconectando stream Bybit em {espera:.1f}s (tentativa {self._tentativas})")
+            self._parar.wait(espera)
+
+    def _sessao(self, conn: ConexaoWebSocket):
+        ultima_mensagem = ultimo_ping = time.monotonic()
+        while not self._parar.is_set():
+            texto = conn.receber(timeout=0.5)
+            agora = time.monotonic()
+            if texto is not None:
+                ultima_mensagem = agora
+                if self._ouvintes['bruto']:
+                    self._emitir('bruto', {'url': self.url, 'texto': texto, 'ts_ms': _agora_ms()})
+                self._processar(texto)
+            elif agora - ultima_mensagem > self.max_silencio:
+                raise ConexaoFechada(f"sem mensagens há {agora - ultima_mensagem:.0f}s")
+            if agora - ultimo_ping >= self.ping_segundos:
+                conn.enviar_texto(json.dumps({'op': 'ping'}))
+                ultimo_ping = agora
+
+    def _desconectar(self):
+        conn, self._conn = self._conn, None
+        self.conectado = False
+        if conn:
+            conn.abortar()
+        with self._lock:
+            for estado in self._estado.values():
+                if estado['atualizado_em'] is not None:
+                    estado['aguardando_reconexao'] = True
+                # Depois da reconexão chega um snapshot novo; cs/seq recomeçam a ser comparados
+                estado['cs'] = None
+                estado['seq_trade'] = None
+            if 'orderbook' in self.topicos:
+                for simbolo in self._simbolos:
+                    livro = obter_livro(simbolo)
+                    if livro:
+                        livro.invalidar()
+
+    # ------------------------------------------------------------------
+    # Mensagens
+    # ------------------------------------------------------------------
+    def _processar(self, texto: str):
+        self.estatisticas['mensagens'] += 1
+        try:
+            mensagem = json.loads(texto)
+            if not isinstance(mensagem, dict):
+                raise ValueError("mensagem não é objeto")
+            if 'op' in mensagem:
+                self._processar_operacao(mensagem)
+                return
+            topico = mensagem.get('topic', '')
+            partes = topico.split('.')
+            if partes[0] == 'tickers':
+                self._processar_ticker(partes[-1], mensagem)
+            elif partes[0] == 'publicTrade':
+                self._processar_trades(partes[-1], mensagem)
+            elif partes[0] == 'kline' and len(partes) == 3:
+                self._processar_klines(partes[2], partes[1], mensagem)
+            elif partes[0] == 'orderbook' and len(partes) == 3:
+                self._processar_livro(partes[2], mensagem)
+            else:
+                raise ValueError(f"tópico desconhecido '{topico}'")
+        except Exception as e:
+            self.estatisticas['mensagens_invalidas'] += 1
+            logger.debug(f"Mensagem do stream ignorada ({e}): {texto[:200]}")
+
+    def _processar_operacao(self, mensagem: Dict[str, Any]):
+        op = mensagem.get('op')
+        if op in ('ping', 'pong'):
+            self.estatisticas['pongs'] += 1
+        elif op in ('subscribe', 'unsubscribe') and not mensagem.get('success', True):
+            self.estatisticas['inscricoes_recusadas'] += 1
+            logger.warning(f"⚠️ Bybit recusou {op}: {mensagem.get('ret_msg')}")
+        elif op == 'subscribe':
+            # Só depois de uma sessão aceita a próxima queda volta ao backoff inicial
+            self._tentativas = 0
+
+    def _marcar_recebimento(self, simbolo: str, estado: Dict[str, Any], ts_ms: int, topico: str):
+        """Atualiza o relógio do símbolo e registra lacuna de reconexão ou silêncio"""
+        agora = time.monotonic()
+        anterior_ts = estado['ultimo_ts_ms']
+        if estado['aguardando_reconexao']:
+            estado['aguardando_reconexao'] = False
+            self._registrar_lacuna(simbolo, 'reconexao', topico, anterior_ts, ts_ms)
+        elif estado['atualizado_em'] is not None and agora - estado['atualizado_em'] > self.max_silencio:
+            self._registrar_lacuna(simbolo, 'silencio', topico, anterior_ts, ts_ms,
+                                   f"{agora - estado['atualizado_em']:.1f}s sem mensagens")
+        estado['atualizado_em'] = agora
+        estado['ultimo_ts_ms'] = ts_ms
+
+    def _registrar_lacuna(self, simbolo: str, tipo: str, topico: str, inicio_ms: Optional[int],
+                          fim_ms: Optional[int], detalhe: str = ''):
+        lacuna = {
+            'symbol': simbolo,
+            'tipo': tipo,
+            'topico': topico,
+            'inicio_ms': inicio_ms,
+            'fim_ms': fim_ms,
+            'detalhe': detalhe,
+        }
+        self.lacunas.append(lacuna)
+        self.estatisticas['lacunas'] += 1
+        logger.warning(f"⚠️ Lacuna no stream {simbolo} ({tipo}, {topico}) {detalhe}".rstrip())
+        self._emitir('lacuna', lacuna)
+
+    def _publicar_tick(self, simbolo: str, estado: Dict[str, Any], ts_ms: int, preco: float, volume: float):
+        self._buffers[simbolo].adicionar(ts_ms, preco, volume, estado['bid'], estado['ask'])
+        estado['preco'] = preco
+        self.estatisticas['ticks'] += 1
+        if self._ouvintes['tick']:
+            self._emitir('tick', {'symbol': simbolo, 'ts_ms': ts_ms, 'preco': preco, 'volume': volume,
+                                  'bid': estado['bid'], 'ask': estado['ask']})
+
+    def _processar_ticker(self, simbolo: str, mensagem: Dict[str, Any]):
+        ts_ms = int(mensagem.get('ts') or _agora_ms())
+        dados = mensagem.get('data') or {}
+        cs = mensagem.get('cs')
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if estado is None:
+                return
+            if cs is not None and estado['cs'] is not None and cs <= estado['cs']:
+                self.estatisticas['fora_de_ordem'] += 1
+                return
+            if mensagem.get('type') == 'snapshot':
+                estado['bruto'] = dict(dados)
+            elif not estado['bruto']:
+                self._registrar_lacuna(simbolo, 'sem_snapshot', mensagem['topic'], estado['ultimo_ts_ms'], ts_ms)
+                return
+            else:
+                estado['bruto'].update(dados)
+            estado['cs'] = cs
+            self._marcar_recebimento(simbolo, estado, ts_ms, mensagem['topic'])
+
+            ticker = normalizar_ticker(simbolo, estado['bruto'], ts_ms)
+            estado['ticker'] = ticker
+            estado['bid'] = ticker['bid']
+            estado['ask'] = ticker['ask']
+            self.estatisticas['tickers'] += 1
+            # Sem o tópico de trades o último preço do ticker vira o tick do buffer
+            if 'publicTrade' not in self.topicos and ticker['preco_atual'] and 'lastPrice' in dados:
+                self._publicar_tick(simbolo, estado, ts_ms, ticker['preco_atual'], 0.0)
+        self._emitir('ticker', ticker)
+
+    def _processar_trades(self, simbolo: str, mensagem: Dict[str, Any]):
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if estado is None:
+                return
+            self._marcar_recebimento(simbolo, estado, int(mensagem.get('ts') or _agora_ms()), mensagem['topic'])
+            for trade in mensagem.get('data') or []:
+                seq = trade.get('seq')
+                if seq is not None and estado['seq_trade'] is not None and seq < estado['seq_trade']:
+                    self.estatisticas['fora_de_ordem'] += 1
+                    continue
+                if seq is not None:
+                    estado['seq_trade'] = seq
+                preco = _float(trade.get('p'))
+                if not preco:
+                    continue
+                self.estatisticas['trades'] += 1
+                self._publicar_tick(simbolo, estado, int(trade.get('T') or mensagem.get('ts') or _agora_ms()),
+                                    preco, _float(trade.get('v')) or 0.0)
+
+    def _processar_klines(self, simbolo: str, intervalo: str, mensagem: Dict[str, Any]):
+        duracao = intervalo_kline_ms(intervalo)
+        emitidos = []
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if estado is None:
+                return
+            self._marcar_recebimento(simbolo, estado, int(mensagem.get('ts') or _agora_ms()), mensagem['topic'])
+            for bruto in mensagem.get('data') or []:
+                candle = {
+                    'symbol': simbolo,
+                    'intervalo': intervalo,
+                    'inicio_ms': int(bruto['start']),
+                    'fim_ms': int(bruto.get('end') or 0),
+                    'open': _float(bruto.get('open')),
+                    'high': _float(bruto.get('high')),
+                    'low': _float(bruto.get('low')),
+                    'close': _float(bruto.get('close')),
+                    'volume': _float(bruto.get('volume')) or 0.0,
+                    'fechado': bool(bruto.get('confirm')),
+                }
+                anterior = estado['klines'].get(intervalo)
+                if anterior and candle['inicio_ms'] < anterior['inicio_ms']:
+                    self.estatisticas['fora_de_ordem'] += 1
+                    continue
+                if (anterior and duracao and candle['inicio_ms'] > anterior['inicio_ms'] + duracao):
+                    faltando = (candle['inicio_ms'] - anterior['inicio_ms']) // duracao - 1
+                    self._registrar_lacuna(simbolo, 'kline', mensagem['topic'],
+                                           anterior['inicio_ms'] + duracao, candle['inicio_ms'],
+                                           f"{faltando} candle(s) faltando")
+                estado['klines'][intervalo] = candle
+                self.estatisticas['klines'] += 1
+                emitidos.append(candle)
+        for candle in emitidos:
+            self._emitir('kline', candle)
+
+    def _processar_livro(self, simbolo: str, mensagem: Dict[str, Any]):
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if estado is None:
+                return
+            self._marcar_recebimento(simbolo, estado, int(mensagem.get('ts') or _agora_ms()), mensagem['topic'])
+        livro = obter_livro(simbolo, criar=True)
+        self.estatisticas['livros'] += 1
+        if livro.aplicar_mensagem(mensagem):
+            if self._ouvintes['livro']:
+                self._emitir('livro', livro.features)
+            return
+        # Livro sem base (salto de `u` ou delta antes do snapshot): reassinar devolve um snapshot
+        agora = time.monotonic()
+        if agora - self._ressincronizado_em.get(simbolo, 0.0) < 1.0:
+            return
+        self._ressincronizado_em[simbolo] = agora
+        self.estatisticas['ressincronizacoes_livro'] += 1
+        self._registrar_lacuna(simbolo, 'livro', mensagem['topic'], estado['ultimo_ts_ms'], None,
+                               f"update {(mensagem.get('data') or {}).get('u')} após {livro.ultimo_u}")
+        try:
+            self._enviar_operacao('unsubscribe', [mensagem['topic']])
+            self._enviar_operacao('subscribe', [mensagem['topic']])
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao reassinar {mensagem['topic']}: {e}")
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    @property
+    def simbolos(self) -> List[str]:
+        return list(self._simbolos)
+
+    def livro(self, simbolo: str) -> Optional[LivroOrdens]:
+        """Livro L2 do símbolo (None sem o tópico orderbook)"""
+        return obter_livro(simbolo) if 'orderbook' in self.topicos else None
+
+    def buffer(self, simbolo: str) -> Optional[BufferCircularPrecos]:
+        """Buffer de ticks do símbolo (None se não assinado)"""
+        return self._buffers.get(simbolo)
+
+    def idade(self, simbolo: str) -> Optional[float]:
+        """Segundos desde a última mensagem do símbolo (None se nunca recebeu)"""
+        estado = self._estado.get(simbolo)
+        if not estado or estado['atualizado_em'] is None:
+            return None
+        return time.monotonic() - estado['atualizado_em']
+
+    def preco_atual(self, simbolo: str, max_idade: Optional[float] = None) -> Optional[float]:
+        """
+        Último preço (trade ou ticker) do símbolo
+
+        Args:
+            simbolo: Símbolo assinado
+            max_idade: Descarta preços com mais de max_idade segundos
+
+        Returns:
+            Preço ou None (sem dados, dados velhos ou conexão caída)
+        """
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            if not estado:
+                return None
+            preco = estado['preco'] or (estado['ticker'] or {}).get('preco_atual')
+        if preco is None or estado['aguardando_reconexao']:
+            return None
+        if max_idade is not None and (self.idade(simbolo) or 0) > max_idade:
+            return None
+        return preco
+
+    def ultimo_ticker(self, simbolo: str, max_idade: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Ticker normalizado mais recente (cópia) ou None"""
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            ticker = dict(estado['ticker']) if estado and estado['ticker'] else None
+        if ticker is None or estado['aguardando_reconexao']:
+            return None
+        if max_idade is not None and (self.idade(simbolo) or 0) > max_idade:
+            return None
+        if estado['preco']:
+            ticker['preco_atual'] = estado['preco']
+        return ticker
+
+    def ultimo_kline(self, simbolo: str, intervalo: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Candle mais recente do intervalo (pode estar em formação: 'fechado' False)"""
+        with self._lock:
+            estado = self._estado.get(simbolo)
+            candle = estado['klines'].get(str(intervalo or self.intervalo_kline)) if estado else None
+            return dict(candle) if candle else None
+
+    def simbolos_atrasados(self, max_idade: Optional[float] = None) -> List[str]:
+        """Símbolos sem mensagens há mais de max_idade segundos (ou que nunca receberam)"""
+        limite = self.max_silencio if max_idade is None else max_idade
+        return [s for s in self.simbolos if (self.idade(s) is None or self.idade(s) > limite)]
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Contadores de conexão, mensagens, ticks e lacunas"""
+        stats = dict(self.estatisticas)
+        stats['conectado'] = self.conectado
+        stats['simbolos'] = len(self._simbolos)
+        stats['simbolos_atrasados'] = len(self.simbolos_atrasados())
+        return stats
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from loguru import logger
 import requests
 from coletor import Coletor
+from agendador_coleta import AgendadorAdaptativo, espera_sugerida
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
@@ -19,6 +20,24 @@ class TestadorFrequencia:
             'simbolos_teste': ['IBOV', 'WINZ25'],
             'timeout': 10
         }
+        # 429 e timeouts chegam pelo cliente HTTP (o coletor devolve None em vez de levantar)
+        self._resultado_atual = None
+        self._agendador = None
+        self.coletor.http.ao_responder(self._ao_responder)
+    
+    def _ao_responder(self, host, status, latencia_ms, cabecalhos):
+        """
+        Conta 429/timeouts no teste em andamento e realimenta o agendador adaptativo
+        """
+        resultados = self._resultado_atual
+        if resultados is None:
+            return
+        if status == 429:
+            resultados['erros_429'] += 1
+        elif status is None:
+            resultados['timeouts'] += 1
+        if self._agendador:
+            self._agendador.registrar_resposta(status, espera_sugerida(cabecalhos))
         
     def testar_frequencia(self, frequencia_segundos):
         """
@@ -37,6 +56,7 @@ class TestadorFrequencia:
             'latencias': [],
             'dados_coletados': []
         }
+        self._resultado_atual = resultados
         
         fim_teste = datetime.now() + timedelta(seconds=self.config['duracao_teste'])
         
@@ -83,6 +103,73 @@ class TestadorFrequencia:
             if datetime.now() < fim_teste:
                 time.sleep(frequencia_segundos)
         
+        return self._finalizar_resultados(resultados)
+    
+    def testar_adaptativo(self):
+        """
+        Testa o agendador adaptativo: intervalo de cada símbolo escolhido em tempo de execução
+        (volatilidade, falhas e 429), no lugar de uma frequência fixa
+        """
+        logger.info("Iniciando teste do agendador adaptativo")
+        
+        agendador = AgendadorAdaptativo(self.config['simbolos_teste'],
+                                        intervalo_min=min(self.config['frequencias_teste']))
+        resultados = {
+            'frequencia': 'adaptativa',
+            'inicio': datetime.now(),
+            'tentativas': 0,
+            'sucessos': 0,
+            'falhas': 0,
+            'erros_429': 0,
+            'timeouts': 0,
+            'latencias': [],
+            'dados_coletados': [],
+            'intervalos': []
+        }
+        self._resultado_atual, self._agendador = resultados, agendador
+        
+        fim_teste = datetime.now() + timedelta(seconds=self.config['duracao_teste'])
+        
+        while datetime.now() < fim_teste:
+            simbolos = agendador.vencidos()
+            if simbolos:
+                inicio_request = time.time()
+                lote = self.coletor.coletar_simbolos(simbolos)
+                for simbolo, dados in lote.items():
+                    if dados and dados.get('preco_atual'):
+                        resultados['sucessos'] += 1
+                        agendador.registrar_preco(simbolo, float(dados['preco_atual']))
+                        resultados['dados_coletados'].append({
+                            'timestamp': datetime.now().isoformat(),
+                            'simbolo': simbolo,
+                            'preco': dados['preco_atual'],
+                            'fonte': dados['fonte']
+                        })
+                    else:
+                        resultados['falhas'] += 1
+                        agendador.registrar_falha(simbolo)
+                
+                latencia = time.time() - inicio_request
+                resultados['latencias'].append(latencia)
+                resultados['tentativas'] += 1
+                resultados['intervalos'].append({'timestamp': datetime.now().isoformat(), **agendador.intervalos()})
+                
+                logger.debug(f"Adaptativo - Tentativa {resultados['tentativas']} - Intervalos: {agendador.intervalos()}")
+            
+            restante = (fim_teste - datetime.now()).total_seconds()
+            if restante > 0:
+                time.sleep(min(max(agendador.tempo_ate_proximo(), 0.05), restante))
+        
+        self._agendador = None
+        resultados['intervalos_finais'] = agendador.intervalos()
+        return self._finalizar_resultados(resultados)
+    
+    def _finalizar_resultados(self, resultados):
+        """
+        Fecha o teste e calcula as estatísticas
+        """
+        self._resultado_atual = None
+        frequencia_segundos = resultados['frequencia']
         resultados['fim'] = datetime.now()
         resultados['duracao_real'] = (resultados['fim'] - resultados['inicio']).total_seconds()
         
@@ -116,9 +203,11 @@ class TestadorFrequencia:
             self.resultados[frequencia] = resultado
             
             # Pausa entre testes para não sobrecarregar
-            if frequencia != self.config['frequencias_teste'][-1]:
-                logger.info("Pausa de 1 minuto entre testes...")
-                time.sleep(60)
+            logger.info("Pausa de 1 minuto entre testes...")
+            time.sleep(60)
+        
+        logger.info("=== TESTANDO AGENDADOR ADAPTATIVO ===")
+        self.resultados['adaptativa'] = self.testar_adaptativo()
         
         self.gerar_relatorio()
     
@@ -207,6 +296,7 @@ class TestadorFrequencia:
             os.makedirs(pasta_graficos, exist_ok=True)
             
             frequencias = list(self.resultados.keys())
+            rotulos = [str(f) for f in frequencias]  # inclui 'adaptativa'
             taxas_sucesso = [self.resultados[f]['taxa_sucesso'] for f in frequencias]
             latencias_medias = [self.resultados[f]['latencia_media'] for f in frequencias]
             erros_429 = [self.resultados[f]['erros_429'] for f in frequencias]
@@ -214,7 +304,7 @@ class TestadorFrequencia:
             # Gráfico 1: Taxa de Sucesso
             plt.figure(figsize=(12, 8))
             plt.subplot(2, 2, 1)
-            plt.bar(frequencias, taxas_sucesso, color='green', alpha=0.7)
+            plt.bar(rotulos, taxas_sucesso, color='green', alpha=0.7)
             plt.title('Taxa de Sucesso por Frequência')
             plt.xlabel('Frequência (segundos)')
             plt.ylabel('Taxa de Sucesso (%)')
@@ -222,7 +312,7 @@ class TestadorFrequencia:
             
             # Gráfico 2: Latência Média
             plt.subplot(2, 2, 2)
-            plt.bar(frequencias, latencias_medias, color='blue', alpha=0.7)
+            plt.bar(rotulos, latencias_medias, color='blue', alpha=0.7)
             plt.title('Latência Média por Frequência')
             plt.xlabel('Frequência (segundos)')
             plt.ylabel('Latência (segundos)')
@@ -230,7 +320,7 @@ class TestadorFrequencia:
             
             # Gráfico 3: Erros 429 (Rate Limiting)
             plt.subplot(2, 2, 3)
-            plt.bar(frequencias, erros_429, color='red', alpha=0.7)
+            plt.bar(rotulos, erros_429, color='red', alpha=0.7)
             plt.title('Erros 429 (Rate Limiting) por Frequência')
             plt.xlabel('Frequência (segundos)')
             plt.ylabel('Quantidade de Erros 429')
@@ -247,7 +337,7 @@ class TestadorFrequencia:
             plt.title('Comparação Geral')
             plt.xlabel('Frequências')
             plt.ylabel('Valores')
-            plt.xticks(x, frequencias)
+            plt.xticks(x, rotulos)
             plt.legend()
             plt.grid(True, alpha=0.3)
             
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Teste do Agendador Adaptativo de Coleta
+Verifica intervalos por volatilidade e ordens abertas, orçamento de requisições, 429 e a coleta contínua da B3
+"""
+
+import os
+import json
+import math
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from agendador_coleta import AgendadorAdaptativo
+from buffer_precos import obter_buffer_precos
+from coletor import get_win_contract_code
+from main_continuo import ColetaContinua
+
+def _simular(agendador, precos, inicio, fim):
+    """Roda o agendador num relógio simulado; precos(símbolo, t) dá o preço de cada consulta"""
+    consultas = {}
+    t = inicio
+    while t < fim:
+        for simbolo in agendador.vencidos(t):
+            consultas[simbolo] = consultas.get(simbolo, 0) + 1
+            agendador.registrar_preco(simbolo, precos(simbolo, t), t)
+        t += 0.25
+    return consultas
+
+def _preco(simbolo, t):
+    # AGITADO oscila ~0.3% em poucos segundos; CALMO anda 0.001% por minuto
+    if simbolo == 'AGITADO':
+        return 100 * (1 + 0.003 * math.sin(t * 1.3) + 0.002 * math.sin(t * 3.7))
+    return 100 * (1 + 0.00001 * t / 60)
+
+def testar_volatilidade_e_ordens():
+    """Símbolo agitado é consultado mais vezes; ordem aberta encurta o intervalo"""
+    logger.info("🧪 Testando intervalos por volatilidade e ordens abertas...")
+
+    com_ordem = set()
+    agendador = AgendadorAdaptativo(['AGITADO', 'CALMO'], orcamento_req_segundo=10, intervalo_min=1,
+                                    intervalo_max=60, intervalo_inicial=5, alvo_movimento_bps=5,
+                                    meia_vida_segundos=60, fonte_ordens=lambda: com_ordem)
+    consultas = _simular(agendador, _preco, 0, 600)
+    intervalos = agendador.intervalos()
+
+    com_ordem.add('CALMO')
+    agendador.vencidos(600)
+    intervalo_com_ordem = agendador.intervalos()['CALMO']
+
+    assert intervalos['AGITADO'] <= 2 and intervalos['CALMO'] == 60, f"Intervalos: {intervalos}"
+    assert consultas['AGITADO'] > 10 * consultas['CALMO'], f"Consultas: {consultas}"
+    assert intervalo_com_ordem == 15, f"Com ordem aberta: {intervalo_com_ordem}"
+    logger.info(f"✅ Intervalos {intervalos}; CALMO com ordem aberta: {intervalo_com_ordem}s")
+
+def testar_orcamento_e_429():
+    """Taxa planejada fica no orçamento; 429 corta pela metade, pausa e sucessos recuperam"""
+    logger.info("🧪 Testando orçamento de requisições e 429...")
+
+    simbolos = [f"S{i}" for i in range(10)]
+    agendador = AgendadorAdaptativo(simbolos, orcamento_req_segundo=4, intervalo_min=1, intervalo_max=60,
+                                    alvo_movimento_bps=5, meia_vida_segundos=60)
+    consultas = _simular(agendador, lambda s, t: _preco('AGITADO', t + int(s[1:])), 0, 300)
+    stats = agendador.obter_estatisticas()
+
+    agendador.registrar_resposta(429, espera=0.3)
+    pausado = agendador.vencidos() == []
+    depois_429 = agendador.obter_estatisticas()
+    time.sleep(0.35)
+    for _ in range(100):
+        agendador.registrar_resposta(200)
+    recuperado = agendador.obter_estatisticas()
+
+    assert stats['taxa_planejada'] <= 4.001 and sum(consultas.values()) <= 4 * 300 + 10, f"Estatísticas: {stats}"
+    assert pausado and depois_429['orcamento_efetivo'] == 2 and depois_429['taxa_planejada'] <= 2.001
+    assert recuperado['orcamento_efetivo'] == 4 and not recuperado['pausado'], f"Estatísticas: {recuperado}"
+    logger.info(f"✅ {sum(consultas.values())} consultas em 300s para 10 símbolos (orçamento 4/s); 429 -> 2/s -> 4/s")
+
+def testar_backoff_por_falhas():
+    """Falhas seguidas dobram o intervalo só do símbolo que falhou"""
+    logger.info("🧪 Testando backoff por símbolo...")
+
+    agendador = AgendadorAdaptativo(['A', 'B'], intervalo_inicial=5, backoff_max=300, orcamento_req_segundo=10)
+    for _ in range(3):
+        agendador.registrar_falha('A')
+    intervalos = agendador.intervalos()
+    for _ in range(10):
+        agendador.registrar_falha('A')
+    maximo = agendador.intervalos()['A']
+    agendador.registrar_preco('A', 100.0)
+
+    assert intervalos == {'A': 40, 'B': 5} and maximo == 300, f"Intervalos: {intervalos}, máximo {maximo}"
+    assert agendador.intervalos()['A'] == 5, "Sucesso deveria zerar o backoff"
+    logger.info(f"✅ Backoff por símbolo: {intervalos}, teto {maximo}s")
+
+class _ApiB3(BaseHTTPRequestHandler):
+    """Responde 429 (Retry-After: 1) enquanto `recusar`, depois cotações normais"""
+    protocol_version = 'HTTP/1.1'
+    recusar = False
+    requisicoes = []
+
+    def do_GET(self):
+        type(self).requisicoes.append(time.monotonic())
+        if type(self).recusar:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        corpo = json.dumps({'BizSts': {'cd': 'OK'}, 'Trad': [{'scty': {'SctyQtn': {
+            'curPrc': 130000.0 + len(type(self).requisicoes), 'opngPric': 129000.0}}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+def testar_coleta_continua_com_429():
+    """ColetaContinua coleta só os vencidos, conta o 429 e respeita a pausa pedida"""
+    logger.info("🧪 Testando coleta contínua com 429...")
+
+    _ApiB3.recusar, _ApiB3.requisicoes = True, []
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ApiB3)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as pasta:
+        try:
+            for simbolo in ('IBOV', get_win_contract_code()):
+                obter_buffer_precos(simbolo, diretorio=pasta)  # anéis dos preços salvos fora de dados/buffers
+            coleta = ColetaContinua(os.path.join(pasta, 'teste.db'))
+            coleta.coletor.base_url_b3 = f"http://127.0.0.1:{servidor.server_address[1]}/b3"
+            coleta.host_b3 = '127.0.0.1'
+            coleta.coletar_dados_ciclo()
+            primeira_rodada = len(_ApiB3.requisicoes)
+            coleta.coletar_dados_ciclo()
+            durante_pausa = len(_ApiB3.requisicoes)
+            _ApiB3.recusar = False
+            time.sleep(1.1)
+            for simbolo in ('IBOV', 'WIN'):
+                coleta.agendador._estado[simbolo]['proximo_em'] = 0  # vence de novo sem esperar o backoff
+            coleta.coletar_dados_ciclo()
+            stats = coleta.agendador.obter_estatisticas()
+            metricas = dict(coleta.metricas)
+            coleta.armazenamento.banco.fechar()
+        finally:
+            servidor.shutdown()
+
+    assert durante_pausa == primeira_rodada, "Nenhuma requisição deveria sair durante a pausa do 429"
+    assert metricas['erros_429'] == primeira_rodada and metricas['sucessos'] == 1, f"Métricas: {metricas}"
+    assert stats['erros_429'] == primeira_rodada and stats['orcamento_efetivo'] < 4, f"Estatísticas: {stats}"
+    logger.info(f"✅ 429 contado ({metricas['erros_429']}), pausa respeitada, intervalos {stats['intervalos']}")
+
+if __name__ == "__main__":
+    try:
+        testar_volatilidade_e_ordens()
+        testar_orcamento_e_429()
+        testar_backoff_por_falhas()
+        testar_coleta_continua_com_429()
+        logger.info("🎉 Testes do agendador de coleta concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
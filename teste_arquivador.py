@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Teste do Arquivador de Histórico
+Verifica movimentação para Parquet em lotes, leitura unificada banco + Parquet e lote regravado após queda
+"""
+
+import os
+import glob
+import tempfile
+from datetime import datetime, timedelta
+from loguru import logger
+
+from banco_dados import GerenciadorBanco, para_epoch_ms
+from migracoes import aplicar_migracoes
+from arquivador import ArquivadorHistorico
+from leitura_monitor import conectar_somente_leitura
+
+def _popular(banco, dias_atras, quantidade, simbolo):
+    base = datetime.now() - timedelta(days=dias_atras)
+    banco.executar_muitos(
+        "INSERT INTO crypto_dados (timestamp, ts_ms, symbol, preco_atual) VALUES (?, ?, ?, ?)",
+        [(base, para_epoch_ms(base + timedelta(seconds=i)), simbolo, 100.0 + i) for i in range(quantidade)]
+    )
+
+def testar_arquivamento_e_leitura():
+    """Linhas antigas saem do banco, vão para Parquet e continuam legíveis"""
+    logger.info("🧪 Testando arquivamento em Parquet...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        aplicar_migracoes(banco)
+        _popular(banco, 45, 120, 'BTCUSDT')
+        _popular(banco, 40, 80, 'ETHUSDT')
+        _popular(banco, 1, 50, 'BTCUSDT')
+
+        arquivador = ArquivadorHistorico(banco, diretorio=os.path.join(tmp, 'historico'),
+                                         max_dias=30, tamanho_lote=50, pausa_lote_ms=0)
+        resultado = arquivador.arquivar()
+        quentes = banco.consultar_um("SELECT COUNT(*) FROM crypto_dados")[0]
+        arquivos = glob.glob(os.path.join(tmp, 'historico', 'crypto_dados', 'data=*', 'par=*', '*.parquet'))
+
+        btc = arquivador.ler_historico('crypto_dados', simbolo='BTCUSDT')
+        recente = arquivador.ler_historico('crypto_dados', inicio=datetime.now() - timedelta(days=42))
+        repetido = arquivador.arquivar()
+        estatisticas = arquivador.obter_estatisticas()
+
+        # Processo que só lê (ajuste do GARCH): conexão mode=ro, sem GerenciadorBanco
+        conn = conectar_somente_leitura(os.path.join(tmp, 'teste.db'))
+        leitor = ArquivadorHistorico(diretorio=os.path.join(tmp, 'historico'), max_dias=30, conexao_leitura=conn)
+        btc_leitor = leitor.ler_historico('crypto_dados', simbolo='BTCUSDT')
+        arquivado_leitor = leitor.arquivar()
+        conn.close()
+        banco.fechar()
+
+    assert resultado['crypto_dados'] == 200, f"Esperado 200 linhas arquivadas, obtido {resultado}"
+    assert quentes == 50, f"Banco deveria manter só as 50 linhas recentes, tem {quentes}"
+    assert arquivos, "Nenhum arquivo Parquet gravado"
+    assert len(btc) == 170 and btc['ts_ms'].is_monotonic_increasing, f"Leitura unificada BTC: {len(btc)} linhas"
+    assert len(recente) == 130, f"Filtro por início deveria retornar 130 linhas, obtido {len(recente)}"
+    assert sum(repetido.values()) == 0, "Segunda passada não deveria arquivar nada"
+    assert leitor.banco is None and arquivado_leitor == {}, "Leitor somente leitura abriu o banco ou arquivou"
+    assert btc_leitor.equals(btc), f"Leitura mode=ro difere: {len(btc_leitor)} linhas"
+    logger.info(f"✅ {resultado['crypto_dados']} linhas em {len(arquivos)} arquivos, "
+                f"{estatisticas['lotes']} lotes | leitura unificada: {len(btc)} linhas BTC")
+
+def testar_lote_regravado_apos_queda():
+    """Queda entre a gravação e o DELETE: o lote sai de novo em outro arquivo e a leitura remove as cópias"""
+    logger.info("🧪 Testando lote regravado após queda...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        aplicar_migracoes(banco)
+        _popular(banco, 45, 30, 'BTCUSDT')
+        arquivador = ArquivadorHistorico(banco, diretorio=os.path.join(tmp, 'historico'),
+                                         max_dias=30, tamanho_lote=50, pausa_lote_ms=0)
+        colunas, esquema = arquivador._esquema('crypto_dados')
+        linhas = banco.consultar(f"SELECT {', '.join(colunas)} FROM crypto_dados ORDER BY id")
+        arquivador._gravar_lote('crypto_dados', colunas, esquema, linhas, linhas[0][0], linhas[-1][0])
+        _popular(banco, 45, 20, 'BTCUSDT')  # antes da nova passada entram mais linhas antigas
+
+        arquivador.arquivar()
+        arquivos = glob.glob(os.path.join(tmp, 'historico', 'crypto_dados', '*', '*', '*.parquet'))
+        completo = arquivador.ler_historico('crypto_dados', simbolo='BTCUSDT')
+        precos = arquivador.ler_historico('crypto_dados', simbolo='BTCUSDT', colunas=['ts_ms', 'preco_atual'])
+        banco.fechar()
+
+    nomes = sorted({os.path.basename(arquivo) for arquivo in arquivos})
+    assert nomes == ['lote-1-30.parquet', 'lote-1-50.parquet'], f"Esperados o arquivo da queda e o da nova passada: {nomes}"
+    assert len(completo) == 50 and completo['id'].is_unique, f"Leitura com cópias: {len(completo)} linhas"
+    assert len(precos) == 50 and list(precos.columns) == ['ts_ms', 'preco_atual'], f"{precos.columns}"
+    logger.info(f"✅ {len(nomes)} lotes com 30 linhas repetidas; leitura devolve {len(precos)} linhas")
+
+if __name__ == "__main__":
+    try:
+        testar_arquivamento_e_leitura()
+        testar_lote_regravado_apos_queda()
+        logger.info("🎉 Teste do arquivador concluído com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Teste do Gerenciador de Banco de Dados
+Verifica escritor único, pool de leitura e métricas de fila/lock
+"""
+
+import os
+import tempfile
+import threading
+from loguru import logger
+
+from banco_dados import GerenciadorBanco, BufferEscrita, para_epoch_ms
+from migracoes import aplicar_migracoes, VERSAO_ATUAL
+from armazenamento import Armazenamento
+
+def testar_escritas_concorrentes():
+    """Várias threads escrevendo ao mesmo tempo sem 'database is locked'"""
+    logger.info("🧪 Testando escritas concorrentes...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        banco.executar("CREATE TABLE precos (simbolo TEXT, preco REAL)")
+
+        def escrever(simbolo):
+            for i in range(200):
+                banco.executar("INSERT INTO precos VALUES (?, ?)", (simbolo, float(i)))
+
+        threads = [threading.Thread(target=escrever, args=(f"PAR{n}",)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        total = banco.consultar_um("SELECT COUNT(*) FROM precos")[0]
+        metricas = banco.obter_metricas()
+        banco.fechar()
+
+    assert total == 1600, f"Esperado 1600 linhas, obtido {total}"
+    assert metricas['erros_escrita'] == 0
+    logger.info(f"✅ {total} linhas gravadas | fila máx: {metricas['profundidade_fila_max']} | "
+                f"espera lock média: {metricas['espera_lock_media_ms']:.3f}ms")
+
+def testar_transacao_e_rollback():
+    """Transação é atômica e erros voltam para quem chamou"""
+    logger.info("🧪 Testando transação e rollback...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        banco.executar_script("""
+            CREATE TABLE ordens (order_id TEXT UNIQUE, status TEXT);
+            CREATE TABLE ajustes (order_id TEXT, valor REAL)
+        """)
+
+        def abrir_com_ajuste(conn):
+            conn.execute("INSERT INTO ordens VALUES ('A1', 'aberta')")
+            conn.execute("INSERT INTO ajustes VALUES ('A1', 1.0)")
+
+        banco.transacao(abrir_com_ajuste)
+
+        try:
+            banco.transacao(abrir_com_ajuste)  # viola UNIQUE -> rollback completo
+            falhou = False
+        except Exception:
+            falhou = True
+
+        ajustes = banco.consultar_um("SELECT COUNT(*) FROM ajustes")[0]
+        banco.fechar()
+
+    assert falhou, "Erro de integridade deveria ser propagado"
+    assert ajustes == 1, f"Rollback deveria descartar o segundo ajuste (obtido {ajustes})"
+    logger.info("✅ Transação atômica e rollback OK")
+
+def testar_leitura_somente_leitura():
+    """Conexões do pool não aceitam escrita"""
+    logger.info("🧪 Testando pool somente leitura...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'), tamanho_pool_leitura=2)
+        banco.executar("CREATE TABLE t (x INTEGER)")
+        try:
+            with banco.conexao_leitura() as conn:
+                conn.execute("INSERT INTO t VALUES (1)")
+            bloqueado = False
+        except Exception:
+            bloqueado = True
+        banco.fechar()
+
+    assert bloqueado, "Conexão de leitura não deveria permitir escrita"
+    logger.info("✅ Pool de leitura é somente leitura")
+
+def testar_buffer_write_behind():
+    """Linhas agrupadas em lotes, gravadas no fechamento e overflow explícito"""
+    logger.info("🧪 Testando buffer write-behind...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        banco.executar("CREATE TABLE crypto_dados (symbol TEXT, preco REAL)")
+        sql = "INSERT INTO crypto_dados VALUES (?, ?)"
+
+        buffer = BufferEscrita(banco, tamanho_lote=100, intervalo_ms=60000)
+        for i in range(250):
+            buffer.adicionar(sql, ('BTCUSDT', float(i)))
+        buffer.fechar()
+        gravadas = banco.consultar_um("SELECT COUNT(*) FROM crypto_dados")[0]
+        lotes = buffer.obter_metricas()['lotes_gravados']
+
+        limitado = BufferEscrita(banco, tamanho_lote=1000, intervalo_ms=60000, capacidade=10,
+                                 politica_overflow='descartar_novos')
+        aceitos = sum(limitado.adicionar(sql, ('ETHUSDT', float(i))) for i in range(15))
+        descartadas = limitado.obter_metricas()['linhas_descartadas']
+        limitado.fechar()
+        banco.fechar()
+
+    assert gravadas == 250, f"Esperado 250 linhas após fechar, obtido {gravadas}"
+    assert lotes < 250, "Linhas deveriam ser agrupadas em lotes"
+    assert aceitos == 10 and descartadas == 5, f"Overflow: {aceitos} aceitos, {descartadas} descartadas"
+    logger.info(f"✅ {gravadas} linhas em {lotes} lotes | overflow descartou {descartadas}")
+
+def testar_preco_descartado_avisa():
+    """salvar_precos só registra 'Preço salvo' quando o buffer aceitou a linha; descarte vira aviso"""
+    logger.info("🧪 Testando log de preço descartado pelo buffer...")
+
+    mensagens = []
+    sink = logger.add(lambda m: mensagens.append((m.record['level'].name, m.record['message'])), level='INFO')
+    with tempfile.TemporaryDirectory() as tmp:
+        armazenamento = Armazenamento(os.path.join(tmp, 'teste.db'))
+        armazenamento.buffer = BufferEscrita(armazenamento.banco, intervalo_ms=60000, capacidade=1,
+                                             politica_overflow='descartar_novos')
+        resultados = [armazenamento.salvar_precos('2025-01-01T10:00:00', preco) for preco in (100.0, 101.0)]
+        armazenamento.buffer.fechar()
+        armazenamento.banco.fechar()
+    logger.remove(sink)
+
+    salvos = [texto for nivel, texto in mensagens if texto.startswith('Preço salvo')]
+    avisos = [texto for nivel, texto in mensagens if nivel == 'WARNING' and '101.0' in texto]
+    assert resultados == [True, False] and len(salvos) == 1 and len(avisos) == 1, f"{resultados} {mensagens}"
+    logger.info(f"✅ {len(salvos)} preço salvo, {len(avisos)} aviso de descarte")
+
+def testar_migracoes():
+    """Banco legado é migrado uma vez, com timestamps epoch-ms e índices"""
+    logger.info("🧪 Testando migrações versionadas...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        # Esquema reduzido que o aprendizado autônomo criava antigamente
+        banco.executar_script("""
+            CREATE TABLE ordens_dinamicas (order_id TEXT PRIMARY KEY, symbol TEXT NOT NULL,
+                                           status TEXT NOT NULL, timestamp TEXT NOT NULL);
+            INSERT INTO ordens_dinamicas VALUES ('L1', 'BTCUSDT', 'fechada', '2025-01-02 03:04:05')
+        """)
+
+        versao = aplicar_migracoes(banco)
+        escritas = banco.obter_metricas()['escritas']
+        aplicar_migracoes(banco)  # segunda inicialização não deve executar DDL
+        escritas_repetidas = banco.obter_metricas()['escritas'] - escritas
+
+        banco.executar("INSERT INTO precos (timestamp, preco_atual, simbolo) VALUES (?, ?, ?)",
+                       ('2025-01-02 03:04:05.250', 10.0, 'BTCUSDT'))
+        ts_ms = banco.consultar_um("SELECT ts_ms FROM precos")[0]
+        abertura_ms = banco.consultar_um("SELECT abertura_ms FROM ordens_dinamicas WHERE order_id = 'L1'")[0]
+        banco.executar("INSERT INTO ordens_crypto (timestamp, symbol, tipo, status) VALUES (?, ?, ?, ?)",
+                       ('2025-01-02 03:04:05', 'BTCUSDT', 'compra', 'aberta'))
+        ordem_ms = banco.consultar_um("SELECT ts_ms FROM ordens_crypto")[0]
+        plano = banco.consultar("EXPLAIN QUERY PLAN SELECT preco_atual FROM precos "
+                                "WHERE simbolo = ? ORDER BY ts_ms DESC LIMIT 10", ('BTCUSDT',))
+        banco.fechar()
+
+    assert versao == VERSAO_ATUAL, f"Versão {versao} != {VERSAO_ATUAL}"
+    assert escritas_repetidas == 0, f"Segunda inicialização executou {escritas_repetidas} escritas"
+    assert ts_ms == para_epoch_ms('2025-01-02 03:04:05.250'), f"ts_ms incorreto: {ts_ms}"
+    assert abertura_ms == para_epoch_ms('2025-01-02 03:04:05'), f"abertura_ms incorreto: {abertura_ms}"
+    assert ordem_ms == para_epoch_ms('2025-01-02 03:04:05'), f"ts_ms de ordens_crypto incorreto: {ordem_ms}"
+    assert 'idx_precos_simbolo_ts' in str(plano), f"Consulta não usa o índice: {plano}"
+    logger.info(f"✅ Esquema na versão {versao}, timestamps epoch-ms preenchidos e índice usado")
+
+if __name__ == "__main__":
+    try:
+        testar_escritas_concorrentes()
+        testar_transacao_e_rollback()
+        testar_leitura_somente_leitura()
+        testar_buffer_write_behind()
+        testar_preco_descartado_avisa()
+        testar_migracoes()
+        logger.info("🎉 Todos os testes do banco concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Teste das Barras Multi-Timeframe
+Verifica as barras 1s/1m/5m/15m/1h contra pandas resample, o fechamento pelo relógio com eventos,
+a barra em formação e as barras montadas dos ticks do stream do servidor Bybit local
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from barras_tempo import AgregadorBarras
+from servidor_bybit_local import ServidorBybitLocal
+from stream_bybit import StreamBybit
+
+INICIO = 1_700_000_000_000 // 3_600_000 * 3_600_000
+
+def _ticks(quantidade, duracao_ms, semente=1):
+    rng = np.random.default_rng(semente)
+    ts = np.sort(INICIO + rng.integers(0, duracao_ms, quantidade))
+    precos = 100 * np.exp(np.cumsum(rng.normal(0, 1e-4, quantidade)))
+    return ts, precos, rng.uniform(0, 2, quantidade)
+
+def testar_barras_contra_pandas():
+    """Cada timeframe, derivado do anterior, é igual ao resample dos ticks em pandas"""
+    logger.info("🧪 Testando barras contra pandas resample...")
+
+    ts, precos, volumes = _ticks(60000, 3 * 3_600_000)
+    ts[20000:24000] = ts[19999]  # rajada de ticks no mesmo instante
+    agregador = AgregadorBarras(capacidade=20000, tolerancia_ms=0)
+    for i, (t, p, v) in enumerate(zip(ts.tolist(), precos.tolist(), volumes.tolist())):
+        agregador.adicionar_tick('BTCUSDT', t, p, v)
+        if i % 500 == 0:
+            agregador.fechar_ate(t)
+    agregador.fechar_ate(int(ts[-1]) + 2 * 3_600_000)
+
+    serie = pd.DataFrame({'preco': precos, 'volume': volumes}, index=pd.to_datetime(ts, unit='ms'))
+    for timeframe, regra in (('1s', '1s'), ('1m', '1min'), ('5m', '5min'), ('15m', '15min'), ('1h', '1h')):
+        esperado = serie['preco'].resample(regra).ohlc().dropna()
+        volume = serie['volume'].resample(regra).sum()[esperado.index]
+        barras = agregador.barras('BTCUSDT', timeframe)
+        assert np.array_equal(barras['ts_ms'], esperado.index.as_unit('ms').asi8), f"{timeframe}: inícios diferem"
+        for coluna in ('open', 'high', 'low', 'close'):
+            assert np.array_equal(barras[coluna], esperado[coluna].to_numpy()), f"{timeframe}: {coluna} difere"
+        assert np.allclose(barras['volume'], volume.to_numpy()), f"{timeframe}: volume difere"
+    stats = agregador.obter_estatisticas()
+    assert stats['ticks'] == len(ts) and stats['ticks_atrasados'] == 0, f"{stats}"
+    logger.info(f"✅ {stats['barras_fechadas']} barras em 5 timeframes iguais ao pandas")
+
+def testar_relogio_eventos_e_barra_atual():
+    """Relógio fecha sem tick novo, eventos saem do menor para o maior, barra atual junta os níveis"""
+    logger.info("🧪 Testando fechamento pelo relógio e barra em formação...")
+
+    agora = [INICIO]
+    agregador = AgregadorBarras(tolerancia_ms=250, intervalo_relogio_ms=20, relogio=lambda: agora[0])
+    eventos = []
+    agregador.ao_fechar(eventos.append)
+    precos = [100.0, 101.0, 99.5, 100.5]
+    for i, preco in enumerate(precos):
+        agregador.adicionar_tick('ETHUSDT', INICIO + 15_000 * i, preco, 1.0)
+    agregador.adicionar_tick('ETHUSDT', INICIO + 60_500, 102.0, 2.0)  # abre o segundo minuto
+
+    atual_5m = agregador.barra_atual('ETHUSDT', '5m')
+    assert (atual_5m['open'], atual_5m['high'], atual_5m['low'], atual_5m['close']) == (100.0, 102.0, 99.5, 102.0)
+    assert atual_5m['volume'] == 6.0 and atual_5m['inicio_ms'] == INICIO and not atual_5m['fechado']
+    assert [e['timeframe'] for e in eventos] == ['1s'] * 4 + ['1m'], f"{[e['timeframe'] for e in eventos]}"
+
+    agregador.iniciar()
+    try:
+        agora[0] = INICIO + 60_000 + 1000  # o segundo de 60.5s terminou, mas ainda dentro da tolerância
+        time.sleep(0.1)
+        fechados_antes = len(eventos)
+        agora[0] = INICIO + 3_600_000 + 300
+        time.sleep(0.1)
+    finally:
+        agregador.parar()
+    agregador.adicionar_tick('ETHUSDT', INICIO + 59_000, 99.0)  # atrasado: período já fechado
+
+    por_timeframe = {tf: [e for e in eventos if e['timeframe'] == tf] for tf in agregador.timeframes}
+    hora = por_timeframe['1h'][0]
+    assert fechados_antes == 5, f"Fechou antes da tolerância: {eventos[5:]}"
+    assert [len(por_timeframe[tf]) for tf in agregador.timeframes] == [5, 2, 1, 1, 1]
+    assert (hora['open'], hora['high'], hora['low'], hora['close'], hora['ticks']) == (100.0, 102.0, 99.5, 102.0, 5)
+    assert [e['timeframe'] for e in eventos[5:]] == ['1s', '1m', '5m', '15m', '1h'], "Ordem dos eventos"
+    assert agregador.obter_estatisticas()['ticks_atrasados'] == 1
+    assert agregador.barra_atual('ETHUSDT', '1m') is None and agregador.contexto('ETHUSDT') == {}
+    logger.info(f"✅ {len(eventos)} eventos; hora fechada pelo relógio O={hora['open']} H={hora['high']} "
+                f"L={hora['low']} C={hora['close']}")
+
+def testar_barras_do_stream():
+    """Barras de 1s montadas dos ticks do stream batem com os ticks guardados no buffer"""
+    logger.info("🧪 Testando barras montadas a partir do stream local...")
+
+    servidor = ServidorBybitLocal(intervalo_ms=20, semente=4).iniciar()
+    stream = StreamBybit(['BTCUSDT'], url=servidor.url, topicos=['tickers'])
+    agregador = AgregadorBarras(timeframes=['1s', '1m'], tolerancia_ms=0)
+    agregador.anexar_stream(stream)
+    try:
+        stream.iniciar()
+        stream.aguardar_dados(timeout=5)
+        time.sleep(3)
+        contexto = agregador.contexto('BTCUSDT', ['1s', '1m'])
+        servidor.silenciar(60)
+        time.sleep(0.1)
+        agregador.fechar_ate(int(time.time() * 1000) + 1000)
+        ticks = stream.buffer('BTCUSDT').copia()
+    finally:
+        stream.parar()
+        servidor.parar()
+
+    barras = agregador.barras('BTCUSDT', '1s')
+    segundos = ticks['ts_ms'] // 1000 * 1000
+    for i, inicio in enumerate(barras['ts_ms']):
+        precos = ticks['preco'][segundos == inicio]
+        assert (barras['open'][i], barras['high'][i], barras['low'][i], barras['close'][i]) == (
+            precos[0], precos.max(), precos.min(), precos[-1]), f"Barra {inicio} difere dos ticks"
+    assert len(barras['ts_ms']) >= 3 and set(contexto) == {'1s', '1m'}, f"{len(barras['ts_ms'])} barras, {contexto}"
+    logger.info(f"✅ {len(barras['ts_ms'])} barras de 1s de {len(ticks['preco'])} ticks; 1m {contexto['1m']['variacao']:+.3f}%")
+
+def testar_custo_por_tick():
+    """Tick em poucos microssegundos com os cinco timeframes"""
+    logger.info("🧪 Medindo custo por tick...")
+
+    ts, precos, volumes = _ticks(100000, 3_600_000, semente=2)
+    agregador = AgregadorBarras(tolerancia_ms=0)
+    inicio = time.perf_counter()
+    for t, p, v in zip(ts.tolist(), precos.tolist(), volumes.tolist()):
+        agregador.adicionar_tick('BTCUSDT', t, p, v)
+    custo_us = (time.perf_counter() - inicio) / len(ts) * 1e6
+    assert custo_us < 50, f"{custo_us:.1f}µs por tick"
+    logger.info(f"✅ {custo_us:.1f}µs por tick")
+
+if __name__ == "__main__":
+    try:
+        testar_barras_contra_pandas()
+        testar_relogio_eventos_e_barra_atual()
+        testar_barras_do_stream()
+        testar_custo_por_tick()
+        logger.info("🎉 Testes das barras multi-timeframe concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Teste dos Buffers Circulares de Preços
+Verifica janela contígua após a volta do anel e leitura por outro mapeamento
+"""
+
+import os
+import tempfile
+import numpy as np
+from loguru import logger
+
+from buffer_precos import BufferCircularPrecos
+
+def testar_janela_contigua():
+    """Últimos N ticks saem em ordem e como views, mesmo depois de dar a volta"""
+    logger.info("🧪 Testando janela contígua do anel...")
+
+    buffer = BufferCircularPrecos('BTCUSDT', capacidade=64)
+    for i in range(150):
+        buffer.adicionar(1_000 + i, 100.0 + i, volume=i, bid=99.0 + i, ask=101.0 + i)
+
+    janela = buffer.ultimos(50)
+    todos = buffer.ultimos()
+
+    assert len(buffer) == 64 and buffer.total == 150
+    assert np.array_equal(janela['preco'], 100.0 + np.arange(100, 150)), "Janela fora de ordem"
+    assert janela['preco'].base is not None and janela['preco'].flags['C_CONTIGUOUS'], "Janela deveria ser view contígua"
+    assert todos['ts_ms'][0] == 1_000 + 86 and todos['ts_ms'][-1] == 1_000 + 149
+    logger.info(f"✅ {len(buffer)} ticks mantidos de {buffer.total}, janela de {len(janela['preco'])} contígua")
+
+def testar_memoria_mapeada():
+    """Outro processo abre o arquivo somente leitura e enxerga os ticks novos"""
+    logger.info("🧪 Testando buffer em memória mapeada...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'ETHUSDT.anel')
+        escritor = BufferCircularPrecos('ETHUSDT', capacidade=32, caminho=caminho)
+        for i in range(10):
+            escritor.adicionar(i, 2000.0 + i)
+
+        leitor = BufferCircularPrecos('ETHUSDT', caminho=caminho, somente_leitura=True)
+        antes = len(leitor)
+        escritor.adicionar(10, 2010.0)
+        ultimo = leitor.copia(1)['preco'][0]
+
+        try:
+            leitor.adicionar(11, 1.0)
+            bloqueado = False
+        except RuntimeError:
+            bloqueado = True
+
+        escritor.flush()
+        reaberto = BufferCircularPrecos('ETHUSDT', capacidade=32, caminho=caminho)
+        persistidos = reaberto.total
+
+    assert antes == 10 and ultimo == 2010.0, f"Leitor não viu o tick novo ({antes}, {ultimo})"
+    assert bloqueado, "Leitor somente leitura não deveria gravar"
+    assert persistidos == 11, f"Reabertura deveria manter 11 ticks, tem {persistidos}"
+    logger.info(f"✅ Leitor mapeado viu {antes + 1} ticks, {persistidos} persistidos após reabrir")
+
+if __name__ == "__main__":
+    try:
+        testar_janela_contigua()
+        testar_memoria_mapeada()
+        logger.info("🎉 Testes do buffer de preços concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
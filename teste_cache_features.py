@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Teste do Cache de Features
+Verifica que o vetor só é recalculado com tick ou candle novo, que é somente leitura e versionado,
+e que preparador de dados e gestor de ordens recebem o mesmo vetor
+"""
+
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+from loguru import logger
+
+from buffer_precos import BufferCircularPrecos, obter_buffer_precos
+from cache_features import CacheFeatures, obter_cache_features
+from cache_klines import CacheKlines
+from indicadores_streaming import GerenciadorIndicadores
+from ia.gestor_ordens import GestorOrdensIA
+from ia.preparador_dados import FEATURES_PREPARADOR, PreparadorDadosIA
+from registro_features import RegistroConsumidores, declarar_consumidor, limpar_consumidores
+
+MINUTO = 60_000
+INICIO = 1_700_000_000_000 // MINUTO * MINUTO
+
+def _precos(n, semente=1):
+    rng = np.random.default_rng(semente)
+    return 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+
+def testar_buffer_versoes_e_leitura():
+    """Mesmo objeto até o próximo tick; tick novo gera versão nova igual ao cálculo direto"""
+    logger.info("🧪 Testando cache sobre o buffer de ticks...")
+
+    precos = _precos(300)
+    buffer = BufferCircularPrecos('BTCUSDT', capacidade=256)
+    for i in range(200):
+        buffer.adicionar(INICIO + i, precos[i], 1.0)
+    cache = CacheFeatures()
+    gerenciador = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+    primeiro = cache.de_buffer('BTCUSDT', buffer, gerenciador)
+    assert cache.de_buffer('BTCUSDT', buffer, gerenciador) is primeiro and primeiro.versao == 1
+
+    buffer.adicionar(INICIO + 200, precos[200], 1.0)
+    segundo = cache.de_buffer('BTCUSDT', buffer, gerenciador)
+    referencia = GerenciadorIndicadores(consumidores=RegistroConsumidores()).de_buffer('BTCUSDT', buffer)
+    assert segundo.versao == 2 and segundo.como_dict() == referencia, "Vetor difere do cálculo direto"
+
+    for escrita in (lambda: segundo.__setitem__('rsi', 1.0), lambda: setattr(segundo, 'versao', 9)):
+        try:
+            escrita()
+            raise AssertionError("Vetor aceitou escrita")
+        except (TypeError, AttributeError):
+            pass
+    json.dumps(segundo.como_dict())
+    assert isinstance(segundo['historico_precos'], tuple)
+
+    cache.invalidar('BTCUSDT')
+    assert cache.de_buffer('BTCUSDT', buffer, gerenciador).versao == 3
+    stats = cache.obter_estatisticas()
+    assert (stats['acertos'], stats['falhas'], stats['invalidacoes']) == (1, 3, 1), f"{stats}"
+    logger.info(f"✅ Versões 1→3, RSI {segundo['rsi']:.2f}; {stats}")
+
+def testar_klines_so_com_candle_novo_ou_alterado():
+    """Reescrever o candle em formação com os mesmos valores não invalida; valor novo ou candle novo sim"""
+    logger.info("🧪 Testando cache sobre klines...")
+
+    precos = _precos(120, semente=2)
+    klines = CacheKlines('ETHUSDT', '1', capacidade=200)
+    candles = [(INICIO + i * MINUTO, p, p, p, p, 1.0, p) for i, p in enumerate(precos)]
+    klines.mesclar(candles[:100])
+    cache = CacheFeatures()
+    gerenciador = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+
+    versoes = [cache.de_klines(klines, gerenciador).versao]
+    klines.mesclar([candles[99]])  # mesma coleta de novo
+    versoes.append(cache.de_klines(klines, gerenciador).versao)
+    klines.mesclar([candles[99][:4] + (precos[99] * 1.001,) + candles[99][5:]])
+    versoes.append(cache.de_klines(klines, gerenciador).versao)
+    klines.mesclar(candles[100:])
+    vetor = cache.de_klines(klines, gerenciador)
+    versoes.append(vetor.versao)
+
+    assert versoes == [1, 1, 2, 3], f"Versões {versoes}"
+    referencia = GerenciadorIndicadores(consumidores=RegistroConsumidores()).de_klines(klines)
+    assert vetor.chave == 'ETHUSDT/1' and vetor.como_dict() == referencia
+    logger.info(f"✅ Versões por leitura {versoes}")
+
+def testar_consumidores_compartilham_vetor():
+    """Gestor de ordens e preparador de dados no mesmo tick: um cálculo, uma leitura do cache; com um
+    consumidor estreito declarado antes, o preparador ainda recebe tudo o que lê"""
+    logger.info("🧪 Testando vetor compartilhado entre gestor de ordens e preparador...")
+
+    limpar_consumidores()
+    declarar_consumidor('coletor', ('rsi', 'volatilidade', 'tendencia'))
+    simbolo = 'WINTESTEFEAT'
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'teste.db')
+        gestor, preparador = GestorOrdensIA(caminho), PreparadorDadosIA(caminho)
+        # Criado aqui com a pasta temporária; os consumidores recebem o mesmo buffer do processo
+        buffer = obter_buffer_precos(simbolo, diretorio=tmp)
+        for i, preco in enumerate(_precos(120, semente=3)):
+            buffer.adicionar(INICIO + i, preco, 1.0)
+        dados = {'simbolo': simbolo, 'preco_atual': float(buffer.copia(1)['preco'][0])}
+        cache = obter_cache_features()
+        antes = cache.obter_estatisticas()
+
+        gestor.analisar_ordens_ativas(dados)
+        dados_ia = preparador.preparar_dados_analise(dados)
+        vetor = cache.atual(simbolo)
+        depois = cache.obter_estatisticas()
+        preparador.banco.fechar()
+
+    assert (depois['falhas'] - antes['falhas'], depois['acertos'] - antes['acertos']) == (1, 1), f"{depois}"
+    lidos = [nome for nome in FEATURES_PREPARADOR if nome != 'historico_precos']
+    assert all(dados_ia[nome] == vetor[nome] for nome in lidos), f"{dados_ia}"
+    assert dados_ia['historico_precos'] == list(vetor['historico_precos'])
+    logger.info(f"✅ Um cálculo para os dois consumidores (versão {vetor.versao}, RSI {vetor['rsi']:.2f})")
+
+def testar_leituras_concorrentes():
+    """Várias threads no mesmo marcador calculam uma vez e somam o tempo economizado"""
+    logger.info("🧪 Testando leituras concorrentes...")
+
+    buffer = BufferCircularPrecos('SOLUSDT', capacidade=4096)
+    for i, preco in enumerate(_precos(4000, semente=4)):
+        buffer.adicionar(INICIO + i, preco, 1.0)
+    cache = CacheFeatures()
+    gerenciador = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+    vetores = []
+    threads = [threading.Thread(target=lambda: vetores.extend(cache.de_buffer('SOLUSDT', buffer, gerenciador)
+                                                              for _ in range(50)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.obter_estatisticas()
+    assert len({id(v) for v in vetores}) == 1 and stats['falhas'] == 1 and stats['acertos'] == 399, f"{stats}"
+    assert stats['tempo_economizado_ms'] > 100 * stats['tempo_calculo_ms'], f"{stats}"
+    logger.info(f"✅ 400 leituras, 1 cálculo de {stats['tempo_calculo_ms']:.2f}ms; "
+                f"economizados {stats['tempo_economizado_ms']:.0f}ms (taxa {stats['taxa_acerto']:.1%})")
+
+if __name__ == "__main__":
+    try:
+        testar_buffer_versoes_e_leitura()
+        testar_klines_so_com_candle_novo_ou_alterado()
+        testar_consumidores_compartilham_vetor()
+        testar_leituras_concorrentes()
+        logger.info("🎉 Testes do cache de features concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Teste do Cache de Klines
+Verifica bootstrap único, busca incremental, backfill após lacuna e indicadores sobre a janela NumPy
+"""
+
+import json
+import threading
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from loguru import logger
+
+from cache_klines import GerenciadorKlines, calcular_rsi, calcular_volatilidade
+
+MINUTO = 60_000
+INICIO = 1_700_000_000_000 // MINUTO * MINUTO
+
+def _close(ts):
+    """Série determinística: cada candle tem o mesmo close em toda resposta"""
+    i = (ts - INICIO) // MINUTO
+    return 100 + 5 * np.sin(i / 7) + (i % 5) * 0.3
+
+class _ApiKlines(BaseHTTPRequestHandler):
+    """GET /v5/market/kline com start/end/limit, do mais recente para o mais antigo"""
+    agora = INICIO + 2000 * MINUTO
+    requisicoes = []
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        type(self).requisicoes.append(params)
+        ultimo = type(self).agora // MINUTO * MINUTO
+        fim = min(int(params.get('end', ultimo)) // MINUTO * MINUTO, ultimo)
+        inicio = max(int(params.get('start', INICIO)), INICIO)
+        limite = int(params.get('limit', 200))
+        lista = []
+        ts = fim
+        while ts >= inicio and len(lista) < limite:
+            c = _close(ts)
+            lista.append([str(ts), str(c - 0.1), str(c + 0.5), str(c - 0.5), str(c), '10', str(10 * c)])
+            ts -= MINUTO
+        corpo = json.dumps({'retCode': 0, 'retMsg': 'OK', 'result': {'symbol': params['symbol'], 'list': lista}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+def _api_local():
+    _ApiKlines.agora = INICIO + 2000 * MINUTO
+    _ApiKlines.requisicoes = []
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ApiKlines)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def _conferir_janela(cache):
+    janela = cache.janela()
+    esperado = np.array([_close(ts) for ts in janela['ts_ms']])
+    assert np.all(np.diff(janela['ts_ms']) == MINUTO), "Janela com candles faltando ou repetidos"
+    assert np.allclose(janela['close'], esperado), "Closes divergem da série"
+    return janela
+
+def testar_bootstrap_e_incremental():
+    """Histórico baixado uma vez; ciclos seguintes pedem só a partir do último candle"""
+    logger.info("🧪 Testando bootstrap e busca incremental...")
+
+    servidor, url = _api_local()
+    try:
+        klines = GerenciadorKlines(base_url=url, capacidade=1500, intervalo_minimo_segundos=0)
+        cache = klines.obter('BTCUSDT', '1')
+        requisicoes_bootstrap = len(_ApiKlines.requisicoes)
+        _conferir_janela(cache)
+
+        _ApiKlines.agora += 3 * MINUTO
+        klines.obter('BTCUSDT', '1')
+        incremental = _ApiKlines.requisicoes[-1]
+        janela = _conferir_janela(cache)
+        stats = klines.obter_estatisticas()
+    finally:
+        servidor.shutdown()
+
+    assert requisicoes_bootstrap == 2, f"Bootstrap de 1500 candles deveria usar 2 páginas: {requisicoes_bootstrap}"
+    assert len(cache) == 1500 and janela['ts_ms'][-1] == _ApiKlines.agora // MINUTO * MINUTO
+    assert int(incremental['start']) == janela['ts_ms'][-4], f"Busca incremental deveria começar no último candle: {incremental}"
+    assert stats['candles_baixados'] == 1500 + 4, f"Estatísticas: {stats}"
+    logger.info(f"✅ {len(cache)} candles em {requisicoes_bootstrap} requisições; ciclo seguinte baixou 4 candles")
+
+def testar_backfill_apos_lacuna():
+    """Candle do stream depois de uma queda marca backfill; a próxima leitura completa o intervalo"""
+    logger.info("🧪 Testando backfill após lacuna...")
+
+    servidor, url = _api_local()
+    try:
+        klines = GerenciadorKlines(base_url=url, capacidade=200, intervalo_minimo_segundos=60)
+        cache = klines.obter('ETHUSDT', '1')
+        requisicoes = len(_ApiKlines.requisicoes)
+        klines.obter('ETHUSDT', '1')
+        sem_requisicao = len(_ApiKlines.requisicoes) == requisicoes
+
+        # Stream volta após 10 minutos fora: candle novo não encosta no último guardado
+        _ApiKlines.agora += 10 * MINUTO
+        ts = _ApiKlines.agora // MINUTO * MINUTO
+        c = _close(ts)
+        klines._candle_do_stream({'symbol': 'ETHUSDT', 'intervalo': '1', 'inicio_ms': ts, 'open': c - 0.1,
+                                  'high': c + 0.5, 'low': c - 0.5, 'close': c, 'volume': 10.0})
+        marcado = cache.precisa_backfill
+        klines.obter('ETHUSDT', '1')
+        stats = klines.obter_estatisticas()
+    finally:
+        servidor.shutdown()
+
+    assert sem_requisicao, "Leitura dentro do intervalo mínimo não deveria ir à API"
+    assert marcado and not cache.precisa_backfill and stats['backfills'] == 1, f"Estatísticas: {stats}"
+    janela = cache.janela()
+    assert np.all(np.diff(janela['ts_ms']) == MINUTO), "Backfill deixou buracos na janela"
+    assert np.allclose(janela['close'], [_close(t) for t in janela['ts_ms']])
+    logger.info(f"✅ Lacuna de 10 candles preenchida com {stats['requisicoes'] - requisicoes} requisição")
+
+def testar_indicadores_como_pandas():
+    """RSI e volatilidade da janela batem com as fórmulas em pandas usadas antes"""
+    logger.info("🧪 Testando indicadores sobre a janela...")
+
+    fechamentos = np.array([_close(INICIO + i * MINUTO) for i in range(100)])
+    df = pd.DataFrame({'close': fechamentos})
+    delta = df['close'].diff()
+    ganho = delta.where(delta > 0, 0).rolling(window=14).mean()
+    perda = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rsi_pandas = float((100 - 100 / (1 + ganho / perda)).iloc[-1])
+    vol_pandas = float(df['close'].pct_change().rolling(window=20).std().iloc[-1])
+
+    assert abs(calcular_rsi(fechamentos) - rsi_pandas) < 1e-9, f"RSI {calcular_rsi(fechamentos)} != {rsi_pandas}"
+    assert abs(calcular_volatilidade(fechamentos) - vol_pandas) < 1e-12
+    logger.info(f"✅ RSI {rsi_pandas:.2f}, volatilidade {vol_pandas:.5f} idênticos ao pandas")
+
+if __name__ == "__main__":
+    try:
+        testar_bootstrap_e_incremental()
+        testar_backfill_apos_lacuna()
+        testar_indicadores_como_pandas()
+        logger.info("🎉 Testes do cache de klines concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Teste do Cliente HTTP Assíncrono
+Verifica requisições concorrentes com keep-alive, limite de taxa por host, respostas chunked/gzip,
+latência por endpoint e os coletores B3/Bybit buscando em lote
+"""
+
+import gzip
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from loguru import logger
+
+from cliente_http import ClienteHTTP, ErroHTTP
+from coletor import Coletor, ColetorBybit, get_win_contract_code
+
+ATRASO = 0.3
+
+class _ApiLocal(BaseHTTPRequestHandler):
+    """HTTP/1.1 keep-alive; cada resposta demora ATRASO segundos"""
+    protocol_version = 'HTTP/1.1'
+    portas = set()
+    lock = threading.Lock()
+
+    def _responder(self, corpo: bytes, extras=None, chunked=False):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        for nome, valor in (extras or {}).items():
+            self.send_header(nome, valor)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(corpo), 7):
+                pedaco = corpo[i:i + 7]
+                self.wfile.write(f"{len(pedaco):x}\r\n".encode() + pedaco + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    def do_GET(self):
+        try:
+            self._atender()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # cliente desistiu (teste de timeout)
+
+    def _atender(self):
+        with type(self).lock:
+            type(self).portas.add(self.client_address[1])
+        partes = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(partes.query).items()}
+        time.sleep(ATRASO)
+        if partes.path == '/chunked':
+            self._responder(json.dumps({'itens': list(range(50))}).encode(), chunked=True)
+        elif partes.path == '/gzip':
+            self._responder(gzip.compress(json.dumps({'ok': True}).encode()), {'Content-Encoding': 'gzip'})
+        elif partes.path.startswith('/b3/'):
+            simbolo = partes.path.rsplit('/', 1)[-1]
+            corpo = {'BizSts': {'cd': 'OK'}, 'Trad': [{'scty': {'SctyQtn': {
+                'curPrc': 130000.0 if simbolo == 'IBOV' else 131500.0, 'opngPric': 129000.0,
+                'minPric': 128500.0, 'maxPric': 131000.0, 'avrgPric': 130100.0, 'prcFlcn': 0.8}}}]}
+            self._responder(json.dumps(corpo).encode())
+        elif partes.path == '/v5/market/tickers' and 'symbol' in params:
+            preco = {'BTCUSDT': 100000.0, 'ETHUSDT': 3000.0}.get(params['symbol'], 1.0)
+            corpo = {'retCode': 0, 'retMsg': 'OK', 'result': {'list': [{
+                'symbol': params['symbol'], 'lastPrice': str(preco), 'openPrice': str(preco),
+                'lowPrice24h': str(preco - 1), 'highPrice24h': str(preco + 1), 'volume24h': '5', 'price24hPcnt': '0.01'}]}}
+            self._responder(json.dumps(corpo).encode())
+        else:
+            self._responder(json.dumps({'caminho': partes.path}).encode())
+
+    def log_message(self, *args):
+        pass
+
+class _Servidor(ThreadingHTTPServer):
+    """Fila de conexões maior que a padrão (5): conexões simultâneas não esperam a retransmissão do SYN"""
+    request_queue_size = 64
+    daemon_threads = True
+
+def _api_local():
+    _ApiLocal.portas = set()
+    servidor = _Servidor(('127.0.0.1', 0), _ApiLocal)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def testar_concorrencia_e_keep_alive():
+    """10 requisições lentas saem juntas; o lote seguinte reaproveita as mesmas conexões"""
+    logger.info("🧪 Testando requisições concorrentes com keep-alive...")
+
+    servidor, url = _api_local()
+    cliente = ClienteHTTP(max_conexoes_por_host=10)
+    try:
+        inicio = time.perf_counter()
+        primeiro = cliente.em_lote({'url': f"{url}/lento/{i}"} for i in range(10))
+        duracao = time.perf_counter() - inicio
+        segundo = cliente.em_lote({'url': f"{url}/lento/{i}"} for i in range(10))
+        stats = cliente.obter_estatisticas()
+    finally:
+        cliente.fechar()
+        servidor.shutdown()
+
+    assert all(r.ok for r in primeiro + segundo), "Alguma requisição falhou"
+    assert [r.json()['caminho'] for r in primeiro] == [f"/lento/{i}" for i in range(10)], "Ordem das respostas"
+    assert duracao < 10 * ATRASO / 2, f"Lote levou {duracao:.2f}s (sequencial levaria {10 * ATRASO:.1f}s)"
+    assert stats['conexoes_abertas'] == 10 and stats['conexoes_reutilizadas'] == 10, f"Estatísticas: {stats}"
+    assert len(_ApiLocal.portas) == 10, f"Conexões TCP usadas: {len(_ApiLocal.portas)}"
+    logger.info(f"✅ 10 requisições em {duracao:.2f}s; segundo lote nas mesmas {len(_ApiLocal.portas)} conexões")
+
+def testar_limite_de_taxa():
+    """Balde de 10 fichas/s com rajada 2: 12 requisições levam pelo menos 1s"""
+    logger.info("🧪 Testando limite de taxa por host...")
+
+    global ATRASO
+    servidor, url = _api_local()
+    cliente = ClienteHTTP(limites={'127.0.0.1': {'taxa_por_segundo': 10, 'rajada': 2}})
+    atraso, ATRASO = ATRASO, 0
+    try:
+        inicio = time.perf_counter()
+        respostas = cliente.em_lote({'url': f"{url}/rapido"} for _ in range(12))
+        duracao = time.perf_counter() - inicio
+        stats = cliente.obter_estatisticas()
+    finally:
+        ATRASO = atraso
+        cliente.fechar()
+        servidor.shutdown()
+
+    assert all(r.ok for r in respostas)
+    assert 0.95 <= duracao < 2.0, f"12 requisições a 10/s (rajada 2) levaram {duracao:.2f}s"
+    assert stats['esperas_limite'] == 10, f"Estatísticas: {stats}"
+    logger.info(f"✅ 12 requisições respeitaram o limite em {duracao:.2f}s")
+
+def testar_chunked_gzip_e_latencias():
+    """Corpo chunked e gzip decodificados; latência e erros registrados por endpoint"""
+    logger.info("🧪 Testando chunked, gzip e latência por endpoint...")
+
+    servidor, url = _api_local()
+    cliente = ClienteHTTP()
+    try:
+        itens = cliente.get_json(f"{url}/chunked")['itens']
+        ok = cliente.get_json(f"{url}/gzip")['ok']
+        try:
+            cliente.get(f"{url}/lento", timeout=ATRASO / 3)
+            estourou = False
+        except ErroHTTP:
+            estourou = True
+        latencias = cliente.obter_latencias()
+    finally:
+        cliente.fechar()
+        servidor.shutdown()
+
+    assert itens == list(range(50)) and ok and estourou
+    assert latencias['127.0.0.1/chunked']['media_ms'] >= ATRASO * 1000
+    assert latencias['127.0.0.1/lento']['erros'] == 1, f"Latências: {latencias}"
+    logger.info(f"✅ Latência /chunked p50 {latencias['127.0.0.1/chunked']['p50_ms']:.0f}ms, timeout contado como erro")
+
+def testar_coletores_em_lote():
+    """B3 (IBOV + WIN) e pares da Bybit sem snapshot saem numa rodada só"""
+    logger.info("🧪 Testando coletores com requisições em lote...")
+
+    servidor, url = _api_local()
+    # Cliente próprio: pool, loop e limites do cliente do processo ficam de fora da medição
+    cliente = ClienteHTTP()
+    try:
+        coletor = Coletor(http=cliente)
+        coletor.base_url_b3 = f"{url}/b3"
+        inicio = time.perf_counter()
+        dados_b3 = coletor.coletar_dados()
+        duracao_b3 = time.perf_counter() - inicio
+
+        bybit = ColetorBybit(base_url=url, http=cliente)
+        bybit.snapshot.base_url = 'http://127.0.0.1:9'  # snapshot indisponível: fallback por par
+        inicio = time.perf_counter()
+        dados_bybit = bybit.coletar_dados()
+        duracao_bybit = time.perf_counter() - inicio
+        preco = bybit.obter_preco_atual('ETHUSDT')
+    finally:
+        cliente.fechar()
+        servidor.shutdown()
+
+    assert [d['simbolo'] for d in dados_b3] == ['IBOV', get_win_contract_code()]
+    assert duracao_b3 < 2 * ATRASO, f"IBOV + WIN levaram {duracao_b3:.2f}s"
+    assert sorted(d['preco_atual'] for d in dados_bybit) == [3000.0, 100000.0] and preco == 3000.0
+    assert duracao_bybit < 2 * ATRASO, f"Pares da Bybit levaram {duracao_bybit:.2f}s"
+    logger.info(f"✅ B3 em {duracao_b3:.2f}s e Bybit em {duracao_bybit:.2f}s (uma rodada de {ATRASO}s cada)")
+
+if __name__ == "__main__":
+    try:
+        testar_concorrencia_e_keep_alive()
+        testar_limite_de_taxa()
+        testar_chunked_gzip_e_latencias()
+        testar_coletores_em_lote()
+        logger.info("🎉 Testes do cliente HTTP concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
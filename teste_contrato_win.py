@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Teste da Resolução do Contrato WIN
+Verifica a sondagem paralela dos contratos candidatos, o cache até o vencimento e o cache negativo
+"""
+
+import json
+import time
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from coletor import Coletor, contratos_win_candidatos, fim_contrato_win, get_win_contract_code
+
+TIMEOUT = 0.5
+
+class _ApiB3(BaseHTTPRequestHandler):
+    """Cota IBOV e os contratos em `disponiveis`; os de `lentos` passam do timeout, os demais dão erro"""
+    protocol_version = 'HTTP/1.1'
+    disponiveis = set()
+    lentos = set()
+    pedidos = []
+
+    def do_GET(self):
+        simbolo = self.path.rsplit('/', 1)[-1]
+        type(self).pedidos.append(simbolo)
+        if simbolo in type(self).lentos:
+            time.sleep(TIMEOUT * 4)
+        if simbolo == 'IBOV' or simbolo in type(self).disponiveis:
+            corpo = {'BizSts': {'cd': 'OK'}, 'Trad': [{'scty': {'SctyQtn': {'curPrc': 130000.0, 'opngPric': 129000.0}}}]}
+        else:
+            corpo = {'BizSts': {'cd': 'NOK', 'desc': 'Instrumento não encontrado'}}
+        dados = json.dumps(corpo).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+def _coletor(url, agora):
+    coletor = Coletor()
+    coletor.base_url_b3 = f"{url}/b3"
+    coletor.timeout_b3 = TIMEOUT
+    coletor._agora = lambda: agora[0]
+    return coletor
+
+def _rodar(teste):
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ApiB3)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        return teste(f"http://127.0.0.1:{servidor.server_address[1]}")
+    finally:
+        servidor.shutdown()
+
+def testar_sondagem_paralela_e_cache():
+    """Vigente fora do ar: candidatos lentos custam um timeout só e o fallback fica em cache"""
+    logger.info("🧪 Testando sondagem paralela dos contratos WIN...")
+
+    agora = [datetime(2025, 9, 15, 10, 0)]
+    candidatos = contratos_win_candidatos(agora[0])
+    _ApiB3.disponiveis = {candidatos[2]}
+    _ApiB3.lentos = set(candidatos[3:])
+    _ApiB3.pedidos = []
+
+    def _teste(url):
+        coletor = _coletor(url, agora)
+        inicio = time.perf_counter()
+        primeira = coletor.coletar_simbolos(['IBOV', 'WIN'])
+        duracao = time.perf_counter() - inicio
+        pedidos_sondagem = list(_ApiB3.pedidos)
+        _ApiB3.pedidos = []
+        agora[0] += timedelta(days=20)
+        inicio = time.perf_counter()
+        segunda = coletor.coletar_simbolos(['IBOV', 'WIN'])
+        return primeira, duracao, pedidos_sondagem, segunda, time.perf_counter() - inicio, list(_ApiB3.pedidos)
+
+    primeira, duracao, sondagem, segunda, duracao_cache, pedidos_cache = _rodar(_teste)
+
+    assert primeira['WIN']['simbolo'] == candidatos[2] and primeira['IBOV'], f"Resultado: {primeira}"
+    assert sorted(sondagem) == sorted(['IBOV'] + candidatos), f"Pedidos: {sondagem}"
+    assert TIMEOUT <= duracao < 2 * TIMEOUT, f"Sondagem levou {duracao:.2f}s (timeout {TIMEOUT}s)"
+    assert segunda['WIN']['simbolo'] == candidatos[2] and sorted(pedidos_cache) == sorted(['IBOV', candidatos[2]])
+    assert duracao_cache < TIMEOUT, f"Com cache levou {duracao_cache:.2f}s"
+    logger.info(f"✅ {len(candidatos)} candidatos em {duracao:.2f}s (um timeout); depois só {candidatos[2]} "
+                f"em {duracao_cache:.2f}s")
+
+def testar_cache_negativo_e_vencimento():
+    """Contratos sem cotação ficam fora por pouco tempo; o cache vale até o próximo vencimento"""
+    logger.info("🧪 Testando cache negativo e troca no vencimento...")
+
+    agora = [datetime(2025, 10, 31, 17, 0)]
+    vigente = get_win_contract_code(agora[0])
+    _ApiB3.disponiveis, _ApiB3.lentos, _ApiB3.pedidos = set(), set(), []
+
+    def _teste(url):
+        coletor = _coletor(url, agora)
+        sem_win = coletor.coletar_simbolos(['WIN', 'IBOV'])
+        _ApiB3.pedidos = []
+        agora[0] += timedelta(seconds=30)
+        coletor.coletar_simbolos(['WIN', 'IBOV'])
+        durante_negativo = list(_ApiB3.pedidos)
+
+        _ApiB3.disponiveis = {vigente, get_win_contract_code(fim_contrato_win(agora[0]))}
+        agora[0] += coletor.cache_negativo
+        resolvido = coletor.coletar_simbolos(['WIN'])['WIN']
+        _ApiB3.pedidos = []
+        agora[0] = fim_contrato_win(agora[0])
+        depois_vencimento = coletor.coletar_simbolos(['WIN'])['WIN']
+        return sem_win, durante_negativo, resolvido, depois_vencimento, list(_ApiB3.pedidos), coletor.estatisticas_win
+
+    sem_win, durante_negativo, resolvido, novo, pedidos_vencimento, stats = _rodar(_teste)
+
+    assert list(sem_win) == ['WIN', 'IBOV'] and sem_win['WIN'] is None and sem_win['IBOV']
+    assert durante_negativo == ['IBOV'], f"Durante o cache negativo: {durante_negativo}"
+    assert resolvido['simbolo'] == vigente, f"Resolvido: {resolvido}"
+    assert novo['simbolo'] == get_win_contract_code(agora[0]) != vigente and len(pedidos_vencimento) > 1
+    assert stats['sondagens'] == 3 and stats['cache_negativo'] >= 6, f"Estatísticas: {stats}"
+    logger.info(f"✅ Cache negativo segurou {len(contratos_win_candidatos())} candidatos; "
+                f"{vigente} -> {novo['simbolo']} no vencimento")
+
+if __name__ == "__main__":
+    try:
+        testar_sondagem_paralela_e_cache()
+        testar_cache_negativo_e_vencimento()
+        logger.info("🎉 Testes do contrato WIN concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Teste da Correlação entre Pares
+Verifica a covariância EWMA contra pandas, as barras fora de ordem e com lacunas, a partida pelos klines,
+os grupos correlacionados no filtro de ordens e no aprendizado, e o custo por período
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from barras_tempo import AgregadorBarras
+from cache_klines import CacheKlines
+from correlacao_streaming import MatrizCorrelacao
+from ia.filtros_qualidade import FiltrosQualidade
+from ia.sistema_aprendizado_autonomo import ResultadoTrade, SistemaAprendizadoAutonomo
+
+MINUTO = 60_000
+INICIO = 1_700_000_000_000 // 3_600_000 * 3_600_000
+SIMBOLOS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT']
+
+def _precos(n, semente=1):
+    """BTC, ETH (ρ≈0.9 com BTC), SOL independente e XRP (ρ≈-0.8 com BTC)"""
+    rng = np.random.default_rng(semente)
+    choques = rng.normal(0, 0.001, (n, 4))
+    retornos = np.column_stack([
+        choques[:, 0],
+        1.2 * (0.9 * choques[:, 0] + 0.436 * choques[:, 1]),
+        choques[:, 2],
+        -0.8 * choques[:, 0] + 0.6 * choques[:, 3],
+    ])
+    return 100 * np.exp(np.cumsum(retornos, axis=0))
+
+def testar_contra_pandas():
+    """Barras de cada período em qualquer ordem dão a mesma covariância e correlação do pandas ewm"""
+    logger.info("🧪 Testando covariância EWMA contra pandas...")
+
+    precos = _precos(2000)
+    matriz = MatrizCorrelacao(simbolos=[], meia_vida_barras=60, min_barras=30)
+    rng = np.random.default_rng(2)
+    for t in range(len(precos)):
+        for j in rng.permutation(4):
+            matriz.adicionar_barra(SIMBOLOS[j], INICIO + t * MINUTO, float(precos[t, j]))
+    matriz.fechar_ate()
+
+    retornos = pd.DataFrame(np.diff(np.log(precos), axis=0), columns=SIMBOLOS)
+    ewm = retornos.ewm(alpha=matriz.alfa, adjust=False)
+    esperado_cov = ewm.cov(bias=True).loc[len(retornos) - 1].loc[SIMBOLOS, SIMBOLOS].to_numpy()
+    esperado_corr = ewm.corr().loc[len(retornos) - 1].loc[SIMBOLOS, SIMBOLOS].to_numpy()
+    simbolos, cov = matriz.covariancia()
+    ordem = [simbolos.index(s) for s in SIMBOLOS]
+    assert np.allclose(cov[np.ix_(ordem, ordem)], esperado_cov, rtol=1e-9, atol=0), "Covariância difere do pandas"
+    assert np.allclose(matriz.correlacao()[1][np.ix_(ordem, ordem)], esperado_corr, rtol=1e-9), "Correlação difere"
+    beta = esperado_cov[1, 0] / esperado_cov[0, 0]
+    assert abs(matriz.beta('ETHUSDT') - beta) < 1e-9 and abs(matriz.beta('BTCUSDT') - 1.0) < 1e-12
+    assert matriz.obter_estatisticas()['periodos'] == len(precos)
+    logger.info(f"✅ {len(precos)} barras × 4 pares iguais ao pandas; ρ(ETH,BTC)={esperado_corr[1, 0]:.3f} "
+                f"β={beta:.3f}")
+
+def testar_lacunas_grupos_e_partida():
+    """Par sem barra fica fora do período; grupos por ρ; klines na partida e barras do agregador continuam"""
+    logger.info("🧪 Testando lacunas, grupos e partida pelos klines...")
+
+    precos = _precos(400, semente=3)
+    matriz = MatrizCorrelacao(simbolos=[], meia_vida_barras=50, min_barras=30, limiar_cluster=0.7)
+    for t in range(120):
+        for j, simbolo in enumerate(SIMBOLOS):
+            if simbolo != 'SOLUSDT' or t % 3:
+                matriz.adicionar_barra(simbolo, INICIO + t * MINUTO, float(precos[t, j]))
+    matriz.fechar_ate()
+    assert matriz.adicionar_barra('BTCUSDT', INICIO, 1.0) == 0 and matriz.obter_estatisticas()['barras_atrasadas'] == 1
+    n = matriz._n
+    sol, btc = matriz._indices['SOLUSDT'], matriz._indices['BTCUSDT']
+    assert n[btc, btc] == 119 and n[sol, sol] == n[sol, btc] == 79, f"Retornos em comum {n[sol, sol]}, {n[sol, btc]}"
+
+    assert matriz.agrupar() == [['BTCUSDT', 'ETHUSDT'], ['SOLUSDT'], ['XRPUSDT']], f"{matriz.agrupar()}"
+    correlacionados = matriz.correlacionados('BTCUSDT')
+    assert set(correlacionados) == {'ETHUSDT', 'XRPUSDT'} and correlacionados['XRPUSDT'] < -0.7
+    assert matriz.agrupar(['ETHUSDT', 'BTCUSDT', 'DOGEUSDT']) == [['BTCUSDT', 'ETHUSDT'], ['DOGEUSDT']]
+    resumo = matriz.resumo('ETHUSDT')
+    assert resumo['grupo'] == ['BTCUSDT', 'ETHUSDT'] and resumo['beta_referencia'] > 1.0, f"{resumo}"
+
+    # Partida: histórico dos klines (último candle em formação fica de fora), depois as barras dos ticks
+    agora = [INICIO + 300 * MINUTO]
+    partida = MatrizCorrelacao(simbolos=[], meia_vida_barras=50, min_barras=30)
+    caches = []
+    for j, simbolo in enumerate(SIMBOLOS[:2]):
+        cache = CacheKlines(simbolo, '1', capacidade=400)
+        cache.mesclar([(INICIO + t * MINUTO, p, p, p, p, 1.0, p) for t, p in enumerate(precos[:301, j].tolist())])
+        caches.append(cache)
+    assert partida.alimentar_klines(caches) == 300 and partida.alimentar_klines(caches) == 0
+    agregador = AgregadorBarras(timeframes=['1s', '1m'], tolerancia_ms=0, relogio=lambda: agora[0])
+    partida.anexar_barras(agregador)
+    for t in range(300, 400):
+        for j, simbolo in enumerate(SIMBOLOS[:2]):
+            agregador.adicionar_tick(simbolo, INICIO + t * MINUTO + 500, float(precos[t, j]))
+    agregador.fechar_ate(INICIO + 400 * MINUTO)
+    partida.fechar_ate()
+
+    direto = MatrizCorrelacao(simbolos=[], meia_vida_barras=50, min_barras=30)
+    for t in range(400):
+        for j, simbolo in enumerate(SIMBOLOS[:2]):
+            direto.adicionar_barra(simbolo, INICIO + t * MINUTO, float(precos[t, j]))
+    direto.fechar_ate()
+    assert np.allclose(partida.covariancia()[1], direto.covariancia()[1], rtol=1e-12), "Partida difere do direto"
+    logger.info(f"✅ Grupos {matriz.agrupar()}; ρ(BTC,XRP)={correlacionados['XRPUSDT']:.2f}; "
+                f"partida por klines + barras igual ao direto")
+
+def _matriz_treinada():
+    precos = _precos(300, semente=4)
+    matriz = MatrizCorrelacao(simbolos=[], meia_vida_barras=60, min_barras=30, limiar_cluster=0.7)
+    for t in range(300):
+        for j, simbolo in enumerate(SIMBOLOS):
+            matriz.adicionar_barra(simbolo, INICIO + t * MINUTO, float(precos[t, j]))
+    matriz.fechar_ate()
+    return matriz
+
+def testar_filtro_ordens_correlacionadas():
+    """Compra de ETH com compra de BTC aberta é a mesma exposição; venda de XRP (ρ<0) também; SOL passa"""
+    logger.info("🧪 Testando filtro de exposição correlacionada...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filtros = FiltrosQualidade(os.path.join(tmp, 'teste.db'), correlacao=_matriz_treinada())
+        filtros.banco.executar(
+            "INSERT INTO ordens_dinamicas (order_id, symbol, tipo_ordem, preco_entrada, quantidade, status) "
+            "VALUES ('o1', 'BTCUSDT', 'compra', 100.0, 1.0, 'aberta')")
+        dados = {'rsi': 45.0, 'volatilidade': 0.01, 'volume': 1000.0, 'variacao': 0.5}
+
+        casos = {}
+        for symbol, decisao in (('ETHUSDT', 'comprar'), ('ETHUSDT', 'vender'), ('XRPUSDT', 'vender'),
+                                ('XRPUSDT', 'comprar'), ('SOLUSDT', 'comprar')):
+            casos[(symbol, decisao)] = filtros._ordens_correlacionadas_abertas(symbol, decisao)
+        aprovado, motivo = filtros.verificar_qualidade_entrada({'decisao': 'comprar', 'confianca': 0.8},
+                                                                dict(dados, symbol='ETHUSDT'))
+        filtros.banco.fechar()
+
+    bloqueados = sorted(caso for caso, ordens in casos.items() if ordens)
+    assert bloqueados == [('ETHUSDT', 'comprar'), ('XRPUSDT', 'vender')], f"{casos}"
+    assert not aprovado and 'BTCUSDT' in motivo, motivo
+    logger.info(f"✅ Bloqueados {bloqueados}: {motivo}")
+
+def testar_aprendizado_por_grupo():
+    """Trades de BTC e ETH entram juntos no ajuste; SOL com poucos trades fica de fora"""
+    logger.info("🧪 Testando ajuste do aprendizado por grupo correlacionado...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sistema = SistemaAprendizadoAutonomo(os.path.join(tmp, 'teste.db'), correlacao=_matriz_treinada())
+        sistema.banco.fechar()
+    sistema.parametros.adaptacao_ativa = True
+    for i, symbol in enumerate(['BTCUSDT', 'ETHUSDT'] * 2 + ['SOLUSDT', 'SOLUSDT', 'DOGEUSDT']):
+        sistema.resultados.append(ResultadoTrade(
+            timestamp='2024-01-01T00:00:00', symbol=symbol, direcao='compra', preco_entrada=100.0,
+            preco_saida=101.0, quantidade=1.0, pnl=1.0, pnl_percentual=1.0, duracao=120.0, rsi_entrada=40.0 + i,
+            volatilidade_entrada=0.01, tendencia_entrada='alta', confianca_entrada=0.6, stop_loss=99.0,
+            take_profit=102.0, motivo_saida='take_profit', indicadores_entrada={}, sucesso=bool(i % 2)))
+    grupos = []
+    sistema.ajustar_parametros_par = lambda par, resultados: grupos.append((par, len(resultados)))
+    sistema.analisar_e_ajustar()
+    assert grupos == [('BTCUSDT/ETHUSDT', 4)], f"{grupos}"
+    logger.info(f"✅ Ajustes por grupo: {grupos}")
+
+def testar_custo_por_periodo():
+    """Atualização O(N²) por período: 100 pares em poucos microssegundos por par"""
+    logger.info("🧪 Medindo custo por período com 100 pares...")
+
+    n, periodos = 100, 500
+    retornos = np.random.default_rng(5).normal(0, 0.001, (periodos, n))
+    matriz = MatrizCorrelacao(simbolos=[f"P{i}USDT" for i in range(n)], meia_vida_barras=60, min_barras=30)
+    inicio = time.perf_counter()
+    for r in retornos:
+        matriz.atualizar(r)
+    custo_us = (time.perf_counter() - inicio) / periodos * 1e6
+    esperado = pd.DataFrame(retornos).ewm(alpha=matriz.alfa, adjust=False).cov(bias=True).loc[periodos - 1]
+    assert np.allclose(matriz.covariancia()[1], esperado.to_numpy(), rtol=1e-9)
+    assert custo_us < 2000, f"{custo_us:.0f}µs por período"
+    logger.info(f"✅ {custo_us:.0f}µs por período com {n} pares ({n * n} covariâncias)")
+
+if __name__ == "__main__":
+    try:
+        testar_contra_pandas()
+        testar_lacunas_grupos_e_partida()
+        testar_filtro_ordens_correlacionadas()
+        testar_aprendizado_por_grupo()
+        testar_custo_por_periodo()
+        logger.info("🎉 Testes da correlação entre pares concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Teste das Estatísticas Incrementais
+Verifica que os agregados mantidos por trigger batem com COUNT/SUM nas tabelas
+"""
+
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from loguru import logger
+
+from banco_dados import GerenciadorBanco, para_epoch_ms
+from migracoes import MIGRACOES, aplicar_migracoes
+from estatisticas import obter_estatisticas_ordens, obter_estatisticas_decisoes, contar_linhas
+
+def _abrir_ordem(banco, order_id, symbol):
+    banco.executar(
+        "INSERT INTO ordens_dinamicas (order_id, symbol, tipo_ordem, preco_entrada, quantidade, status) "
+        "VALUES (?, ?, 'compra', 100.0, 1.0, 'aberta')", (order_id, symbol))
+
+def _fechar_ordem(banco, order_id, lucro, quando):
+    banco.executar(
+        "UPDATE ordens_dinamicas SET status = 'fechada', lucro_prejuizo = ?, tempo_aberta_segundos = ?, "
+        "timestamp_fechamento = ?, fechamento_ms = ? WHERE order_id = ?",
+        (lucro, random.randint(10, 600), quando, para_epoch_ms(quando), order_id))
+
+def _conferir(banco, symbol='*', granularidade='total', referencia=None):
+    """Compara o agregado com a agregação direta sobre ordens_dinamicas"""
+    filtros, params = ["status = 'fechada'"], []
+    if symbol != '*':
+        filtros.append("symbol = ?")
+        params.append(symbol)
+    if granularidade == 'dia':
+        inicio = datetime.combine(referencia, datetime.min.time())
+        filtros.append("fechamento_ms >= ? AND fechamento_ms < ?")
+        params += [para_epoch_ms(inicio), para_epoch_ms(inicio + timedelta(days=1))]
+    esperado = banco.consultar_um(
+        "SELECT COUNT(*), COALESCE(SUM(lucro_prejuizo > 0), 0), COALESCE(SUM(lucro_prejuizo < 0), 0), "
+        f"COALESCE(SUM(lucro_prejuizo), 0), AVG(tempo_aberta_segundos) FROM ordens_dinamicas WHERE {' AND '.join(filtros)}",
+        tuple(params))
+    with banco.conexao_leitura() as conn:
+        stats = obter_estatisticas_ordens(conn, 'dinamicas', granularidade, symbol, referencia)
+    obtido = (stats['total'], stats['wins'], stats['losses'], round(stats['pnl_total'], 6),
+              round(stats['tempo_medio_segundos'], 6))
+    esperado = (esperado[0], esperado[1], esperado[2], round(esperado[3], 6), round(esperado[4] or 0, 6))
+    assert obtido == esperado, f"Agregado {symbol}/{granularidade}: {obtido} != {esperado}"
+    return stats
+
+def testar_agregados_ordens():
+    """Abrir, fechar, corrigir e apagar ordens mantém os agregados exatos"""
+    logger.info("🧪 Testando agregados de ordens dinâmicas...")
+
+    random.seed(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        aplicar_migracoes(banco)
+        ontem = datetime.now() - timedelta(days=1)
+
+        for i in range(60):
+            symbol = random.choice(['BTCUSDT', 'ETHUSDT', 'SOLUSDT'])
+            _abrir_ordem(banco, f"o{i}", symbol)
+            if i % 5:
+                quando = ontem if i % 3 == 0 else datetime.now()
+                _fechar_ordem(banco, f"o{i}", random.choice([-2.5, 0.0, 1.25, 3.0]), quando)
+
+        # Correção de resultado de ordem já fechada e remoção de uma fechada e uma aberta
+        banco.executar("UPDATE ordens_dinamicas SET lucro_prejuizo = 9.0 WHERE order_id = 'o1'")
+        banco.executar("DELETE FROM ordens_dinamicas WHERE order_id IN ('o2', 'o5')")
+
+        total = _conferir(banco)
+        for symbol in ('BTCUSDT', 'ETHUSDT', 'SOLUSDT'):
+            _conferir(banco, symbol)
+        _conferir(banco, granularidade='dia', referencia=datetime.now().date())
+        _conferir(banco, 'BTCUSDT', 'dia', ontem.date())
+        with banco.conexao_leitura() as conn:
+            linhas = contar_linhas(conn, 'ordens_dinamicas')
+        banco.fechar()
+
+    assert linhas == 58, f"Contagem de linhas deveria ser 58, obtido {linhas}"
+    logger.info(f"✅ {total['total']} fechadas, {total['wins']} wins, PnL {total['pnl_total']:.2f} conferidos")
+
+def testar_backfill_e_decisoes():
+    """Dados gravados antes da migração entram no agregado; acertos acompanham UPDATE"""
+    logger.info("🧪 Testando backfill e agregados de decisões...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        # Esquema até a versão 5 com dados já existentes
+        banco.transacao(lambda conn: [funcao(conn) for numero, _, funcao in MIGRACOES if numero < 6])
+        for i in range(12):
+            banco.executar(
+                "INSERT INTO decisoes_ia (timestamp, symbol, decisao, confianca) VALUES (?, ?, ?, 0.7)",
+                (datetime.now(), 'BTCUSDT' if i % 2 else 'ETHUSDT', ['comprar', 'vender', 'aguardar'][i % 3]))
+        _abrir_ordem(banco, 'antiga', 'BTCUSDT')
+        _fechar_ordem(banco, 'antiga', 4.0, datetime.now())
+
+        aplicar_migracoes(banco)
+        _conferir(banco)
+        banco.executar("INSERT INTO decisoes_ia (timestamp, symbol, decisao) VALUES (?, 'BTCUSDT', 'comprar')",
+                       (datetime.now(),))
+        banco.executar("UPDATE decisoes_ia SET acerto = 1 WHERE decisao = 'comprar'")
+        banco.executar("UPDATE decisoes_ia SET acerto = 0 WHERE id = 1")
+        acertos = banco.consultar_um("SELECT COUNT(*) FROM decisoes_ia WHERE acerto = 1")[0]
+        with banco.conexao_leitura() as conn:
+            geral = obter_estatisticas_decisoes(conn)
+            btc_hoje = obter_estatisticas_decisoes(conn, 'dia', 'BTCUSDT')
+        banco.fechar()
+
+    assert geral['total'] == 13 and geral['comprar'] == 5, f"Decisões: {geral}"
+    assert geral['acertos'] == acertos, f"Acertos {geral['acertos']} != {acertos}"
+    assert btc_hoje['total'] == 7, f"Decisões BTC hoje: {btc_hoje}"
+    logger.info(f"✅ {geral['total']} decisões ({geral['acertos']} acertos) após backfill")
+
+if __name__ == "__main__":
+    try:
+        testar_agregados_ordens()
+        testar_backfill_e_decisoes()
+        logger.info("🎉 Testes de estatísticas incrementais concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
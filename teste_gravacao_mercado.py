@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Teste da Gravação e Reprodução de Mercado
+Grava uma sessão (WebSocket do servidor local + REST de uma API local), reproduz na
+velocidade máxima e a 10x pela interface dos coletores, e verifica segmentos cortados e rotação
+"""
+
+import os
+import json
+import time
+import random
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from loguru import logger
+
+from gravacao_mercado import (GravadorMercado, ReprodutorMercado, ColetorBybitReplay, ColetorB3Replay,
+                              ler_gravacao, listar_segmentos)
+from coletor import Coletor, ColetorBybit
+from stream_bybit import StreamBybit
+from servidor_bybit_local import ServidorBybitLocal
+
+PARES = ['BTCUSDT', 'ETHUSDT']
+TOPICOS = ['tickers', 'publicTrade', 'kline']
+
+class _ApiBybit(BaseHTTPRequestHandler):
+    """Tickers, klines e B3 sintéticos; cada resposta muda o preço (gravação precisa guardar qual foi)"""
+    protocol_version = 'HTTP/1.1'
+    servidor_ws = None
+    contador = 0
+
+    def do_GET(self):
+        try:
+            self._atender()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _atender(self):
+        partes = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(partes.query).items()}
+        type(self).contador += 1
+        ruido = random.uniform(-5, 5)
+        if partes.path == '/v5/market/tickers':
+            simbolos = [params['symbol']] if 'symbol' in params else PARES
+            lista = [{'symbol': s, 'lastPrice': f"{self.servidor_ws.preco(s) + ruido:.2f}", 'openPrice': '1',
+                      'prevPrice24h': '1', 'lowPrice24h': '1', 'highPrice24h': '2', 'volume24h': '10',
+                      'price24hPcnt': '0.01'} for s in simbolos]
+            corpo = {'retCode': 0, 'retMsg': 'OK', 'time': int(time.time() * 1000), 'result': {'list': lista}}
+        elif partes.path == '/v5/market/kline':
+            inicio = (int(time.time()) // 60) * 60_000
+            preco = self.servidor_ws.preco(params['symbol'])
+            linhas = [[str(inicio - i * 60_000), str(preco), str(preco + 1), str(preco - 1),
+                       f"{preco + ruido / (i + 1):.2f}", '1', '1'] for i in range(int(params.get('limit', 200)))]
+            corpo = {'retCode': 0, 'retMsg': 'OK', 'result': {'list': linhas}}
+        elif partes.path.startswith('/b3/'):
+            corpo = {'BizSts': {'cd': 'OK'}, 'Trad': [{'scty': {'SctyQtn': {
+                'curPrc': round(130000 + ruido * 10, 2), 'opngPric': 129000.0}}}]}
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        dados = json.dumps(corpo).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+def _precos_gravados(origem):
+    """Todo preço que a gravação contém (tickers e trades do WS, lastPrice/curPrc do REST)"""
+    precos = set()
+    for registro in ler_gravacao(origem):
+        corpo = json.loads(registro['b'])
+        if registro['c'] == 'ws':
+            dados = corpo.get('data')
+            for item in (dados if isinstance(dados, list) else [dados or {}]):
+                for campo in ('lastPrice', 'p', 'close'):
+                    if item.get(campo):
+                        precos.add(float(item[campo]))
+        else:
+            for item in (corpo.get('result', {}) or {}).get('list', []) or []:
+                if isinstance(item, dict):
+                    precos.add(float(item['lastPrice']))
+                else:
+                    precos.add(float(item[4]))
+            for trad in corpo.get('Trad', []) or []:
+                precos.add(float(trad['scty']['SctyQtn']['curPrc']))
+    return precos
+
+def _gravar_sessao(pasta, segundos=2.0):
+    """Roda coletores ao vivo contra os servidores locais com o gravador ligado"""
+    servidor = ServidorBybitLocal(intervalo_ms=20, semente=7).iniciar()
+    _ApiBybit.servidor_ws = servidor
+    api = ThreadingHTTPServer(('127.0.0.1', 0), _ApiBybit)
+    api.daemon_threads = True
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{api.server_address[1]}"
+
+    gravador = GravadorMercado(diretorio=pasta, intervalo_flush_segundos=0.1).iniciar()
+    stream = StreamBybit(PARES, url=servidor.url, topicos=TOPICOS)
+    try:
+        coletor = ColetorBybit()
+        coletor.base_url = coletor.snapshot.base_url = coletor.klines.base_url = url
+        stream.iniciar()
+        coletor.anexar_stream(stream)
+        b3 = Coletor()
+        b3.base_url_b3 = f"{url}/b3"
+        gravador.observar_coletor(coletor)
+        gravador.observar_cliente(b3.http, hosts=['127.0.0.1'])
+        stream.aguardar_dados(timeout=5)
+
+        inicio = time.monotonic()
+        while time.monotonic() - inicio < segundos:
+            coletor.coletar_dados()
+            coletor.obter_dados_rest('BTCUSDT')
+            coletor.coletar_lote_bybit(['ETHUSDT'])
+            b3.coletar_simbolos(['IBOV', 'WIN'])
+            time.sleep(0.2)
+    finally:
+        stream.parar()
+        gravador.parar()
+        api.shutdown()
+        servidor.parar()
+    return gravador.obter_estatisticas()
+
+def _reproduzir(pasta, velocidade, url):
+    """Mesma sequência de chamadas sobre a gravação; devolve o que os coletores entregaram"""
+    reprodutor = ReprodutorMercado(pasta, velocidade=velocidade, simbolos=PARES, topicos=TOPICOS)
+    coletor = ColetorBybitReplay(reprodutor)
+    coletor.base_url = coletor.snapshot.base_url = coletor.klines.base_url = url
+    b3 = ColetorB3Replay(reprodutor)
+    b3.base_url_b3 = f"{url}/b3"
+    resultados = []
+    while not reprodutor.terminou():
+        dados = coletor.coletar_dados() or []
+        rest = coletor.obter_dados_rest('BTCUSDT')
+        lote = coletor.coletar_lote_bybit(['ETHUSDT'])['ETHUSDT']
+        b3_dados = b3.coletar_simbolos(['IBOV', 'WIN'])
+        resultados.append((reprodutor.agora_ms(),
+                           tuple(d['preco_atual'] for d in dados),
+                           float(rest['dados_historicos']['close'][-1]) if rest else None,
+                           lote['preco_atual'] if lote else None,
+                           b3_dados['IBOV']['preco_atual'] if b3_dados['IBOV'] else None))
+        reprodutor.dormir(0.2)
+    return resultados, reprodutor.obter_estatisticas()
+
+def testar_gravacao_e_reproducao():
+    """Reprodução na velocidade máxima é determinística e só entrega preços que foram gravados"""
+    logger.info("🧪 Testando gravação e reprodução pela interface dos coletores...")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        stats = _gravar_sessao(pasta)
+        registros = list(ler_gravacao(pasta))
+        gravados = _precos_gravados(pasta)
+        duracao = (registros[-1]['t'] - registros[0]['t']) / 1000
+
+        # A reprodução pede os mesmos endpoints que o coletor ao vivo (a API local da gravação)
+        url = next(r['u'] for r in registros if r['c'] == 'rest').split('/v5/')[0].split('/b3/')[0]
+        primeira, stats_replay = _reproduzir(pasta, 0, url)
+        segunda, _ = _reproduzir(pasta, 0, url)
+        inicio = time.perf_counter()
+        _reproduzir(pasta, 10, url)
+        duracao_10x = time.perf_counter() - inicio
+
+    entregues = {p for r in primeira for p in (*r[1], *r[2:]) if p is not None}
+    assert stats['ws'] > 100 and stats['rest'] > 20 and stats['descartados'] == 0, f"Gravação: {stats}"
+    assert len(registros) == stats['registros'] and stats['taxa_compressao'] > 2, f"Gravação: {stats}"
+    assert primeira == segunda, "Reprodução na velocidade máxima deveria ser determinística"
+    assert len(primeira) >= duracao / 0.2 - 1 and all(r[1] and r[2] and r[3] and r[4] for r in primeira[2:])
+    assert entregues <= gravados, f"Preços que não estão na gravação: {sorted(entregues - gravados)[:5]}"
+    assert stats_replay['sem_resposta'] == 0 and stats_replay['registros'] == len(registros), f"{stats_replay}"
+    assert duracao / 10 * 0.8 <= duracao_10x <= duracao / 10 + 1.0, f"10x de {duracao:.1f}s levou {duracao_10x:.2f}s"
+    logger.info(f"✅ {len(registros)} respostas ({stats['taxa_compressao']:.1f}x compressão); "
+                f"{len(primeira)} ciclos reproduzidos iguais duas vezes; {duracao:.1f}s a 10x em {duracao_10x:.2f}s")
+
+def testar_segmentos_cortados_e_rotacao():
+    """Segmentos trocam pelo tamanho; um segmento cortado no meio é lido até o último lote íntegro"""
+    logger.info("🧪 Testando rotação e segmento cortado...")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        gravador = GravadorMercado(diretorio=pasta, max_mb_segmento=2 / 1024, intervalo_flush_segundos=0.01).iniciar()
+        for i in range(400):
+            texto = json.dumps({'topic': 'tickers.BTCUSDT', 'ts': 1_000 + i, 'data': {'lastPrice': str(100 + i)}})
+            gravador.gravar_ws('wss://teste', texto, ts_ms=1_000 + i)
+            if i % 20 == 19:
+                time.sleep(0.03)
+        gravador.parar()
+        stats = gravador.obter_estatisticas()
+
+        segmentos = listar_segmentos(pasta)
+        ultimo = segmentos[-1]
+        with open(ultimo, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        with open(ultimo, 'wb') as arquivo:
+            arquivo.write(conteudo[:-15])  # queda no meio da escrita do último lote
+        lidos = [r['t'] for r in ler_gravacao(pasta)]
+
+    assert stats['registros'] == 400 and len(segmentos) == stats['segmentos'] >= 3, f"Estatísticas: {stats}"
+    assert lidos == list(range(1_000, 1_000 + len(lidos))), "Registros fora de ordem ou repetidos"
+    assert 400 - 60 <= len(lidos) < 400, f"{len(lidos)} registros legíveis após o corte"
+    logger.info(f"✅ {len(segmentos)} segmentos; {len(lidos)}/400 registros legíveis após cortar o último")
+
+if __name__ == "__main__":
+    try:
+        testar_gravacao_e_reproducao()
+        testar_segmentos_cortados_e_rotacao()
+        logger.info("🎉 Testes de gravação e reprodução concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Teste dos Indicadores em Lote
+Confere a matriz símbolos × candles contra pandas (com históricos de tamanhos diferentes), contra o
+motor incremental, e a triagem de 100+ pares pelo coletor apontado para o servidor Bybit local
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from coletor import ColetorBybit
+from indicadores_lote import calcular_lote, montar_matriz, resumo_lote
+from indicadores_streaming import MotorIndicadores
+from servidor_bybit_local import ServidorBybitLocal
+
+def _series(quantidade, maximo, semente=1):
+    rng = np.random.default_rng(semente)
+    tamanhos = rng.integers(5, maximo + 1, quantidade)
+    precos = [100 * np.exp(np.cumsum(rng.normal(0, 0.003, n))) for n in tamanhos]
+    return precos, [rng.uniform(1, 50, n) for n in tamanhos]
+
+def testar_matriz_contra_pandas():
+    """Cada linha da matriz (alinhada à direita, NaN à esquerda) bate com pandas sobre a série sozinha"""
+    logger.info("🧪 Testando indicadores em lote contra pandas...")
+
+    precos, volumes = _series(40, 300)
+    close, mascara = montar_matriz(precos)
+    maximas, _ = montar_matriz([p * 1.002 for p in precos])
+    minimas, _ = montar_matriz([p * 0.997 for p in precos])
+    lote = calcular_lote(close, maximas, minimas, montar_matriz(volumes)[0], mascara)
+
+    maior_erro = 0.0
+    for i, serie in enumerate(precos):
+        s = pd.Series(serie)
+        delta = s.diff()
+        ganho = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        perda = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        linha = s.ewm(span=12).mean() - s.ewm(span=26).mean()
+        anterior = s.shift()
+        verdadeira = pd.concat([s * 1.002 - s * 0.997, (s * 1.002 - anterior).abs(), (s * 0.997 - anterior).abs()],
+                               axis=1).max(axis=1)
+        referencia = {
+            'rsi': (100 - 100 / (1 + ganho / perda)).where(np.arange(len(s)) >= 14),
+            'macd': linha.where(np.arange(len(s)) >= 25),
+            'macd_signal': linha.ewm(span=9).mean().where(np.arange(len(s)) >= 25),
+            'ma_50': s.rolling(50).mean(),
+            'bb_upper': s.rolling(20).mean() + 2 * s.rolling(20).std(),
+            'volatilidade': s.pct_change().rolling(20).std(),
+            'atr': verdadeira.ewm(alpha=1 / 14, adjust=False).mean().where(np.arange(len(s)) >= 13),
+        }
+        k = len(serie)
+        for chave, esperado in referencia.items():
+            obtido = lote[chave][i, -k:]
+            assert np.array_equal(np.isnan(obtido), esperado.isna().to_numpy()), f"{chave} linha {i}: NaN fora do lugar"
+            assert np.isnan(lote[chave][i, :-k]).all(), f"{chave} linha {i}: valor antes da série começar"
+            validos = ~np.isnan(obtido)
+            erro = np.abs(obtido[validos] - esperado.to_numpy()[validos]) / np.maximum(1, np.abs(esperado.to_numpy()[validos]))
+            maior_erro = max(maior_erro, float(erro.max(initial=0)))
+    assert maior_erro < 1e-9, f"Erro relativo {maior_erro}"
+    logger.info(f"✅ {len(precos)} séries de 5 a 300 candles numa matriz, erro máximo {maior_erro:.1e}")
+
+def testar_resumo_igual_ao_motor():
+    """O último candle de cada símbolo tem os mesmos valores e neutros do motor incremental"""
+    logger.info("🧪 Testando resumo do lote contra o motor incremental...")
+
+    precos, volumes = _series(60, 120, semente=2)
+    close, mascara = montar_matriz(precos)
+    simbolos = [f"PAR{i}USDT" for i in range(len(precos))]
+    resumo = resumo_lote(calcular_lote(close, volume=montar_matriz(volumes)[0], mascara=mascara), close, simbolos)
+
+    for simbolo, serie, volume in zip(simbolos, precos, volumes):
+        motor = MotorIndicadores()
+        motor.alimentar(serie, volume)
+        esperado, obtido = motor.valores(), resumo[simbolo]
+        for chave, valor in esperado.items():
+            if isinstance(valor, (str, list, int)):
+                assert obtido[chave] == valor, f"{simbolo} {chave}: {obtido[chave]} != {valor}"
+            else:
+                assert abs(obtido[chave] - valor) <= 1e-9 * max(1, abs(valor)), f"{simbolo} {chave}: {obtido[chave]} != {valor}"
+    curtos = sum(1 for s in precos if len(s) < 26)
+    logger.info(f"✅ {len(simbolos)} símbolos iguais ao motor ({curtos} com neutros de histórico curto)")
+
+def testar_triagem_de_100_pares():
+    """Coletor busca os klines de 120 pares num lote e calcula todos numa passada"""
+    logger.info("🧪 Testando triagem de 120 pares pelo servidor local...")
+
+    pares = {f"P{i:03d}USDT": 10.0 + i for i in range(120)}
+    servidor = ServidorBybitLocal(precos=pares, intervalo_ms=1000, semente=7).iniciar()
+    try:
+        coletor = ColetorBybit(base_url=servidor.url_rest)
+        servidor.silenciar(60)
+        inicio = time.perf_counter()
+        resultado = coletor.obter_indicadores_lote(list(pares) + ['SEMDADOSUSDT'])
+        duracao = time.perf_counter() - inicio
+        requisicoes = coletor.klines.obter_estatisticas()['requisicoes']
+        caches = [coletor.klines.obter(par) for par in pares]
+    finally:
+        servidor.parar()
+
+    assert set(resultado) == set(pares), f"Faltaram {set(pares) - set(resultado)}"
+    assert requisicoes == len(pares) + 1, f"{requisicoes} requisições"
+    for par, cache in zip(list(pares)[:10], caches):
+        motor = MotorIndicadores()
+        janela = cache.janela(coletor.janela_klines)
+        motor.alimentar(janela['close'], janela['volume'])
+        assert abs(motor.valores()['rsi'] - resultado[par]['rsi']) < 1e-9, f"{par}: RSI diverge"
+    logger.info(f"✅ 120 pares em {duracao * 1000:.0f}ms ({requisicoes} requisições num lote)")
+
+def testar_custo_contra_laco():
+    """Uma passada vetorizada custa menos que o laço por símbolo em pandas"""
+    logger.info("🧪 Medindo lote contra laço por símbolo...")
+
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, (150, 100)), axis=1))
+    calcular_lote(close)
+    inicio = time.perf_counter()
+    for _ in range(10):
+        calcular_lote(close, close * 1.001, close * 0.999, close)
+    lote_ms = (time.perf_counter() - inicio) / 10 * 1000
+
+    inicio = time.perf_counter()
+    for linha in close:
+        s = pd.Series(linha)
+        delta = s.diff()
+        delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        (s.ewm(span=12).mean() - s.ewm(span=26).mean()).ewm(span=9).mean()
+        s.rolling(20).mean(), s.rolling(20).std(), s.rolling(50).mean(), s.pct_change().rolling(20).std()
+    laco_ms = (time.perf_counter() - inicio) * 1000
+
+    assert lote_ms < laco_ms, f"Lote {lote_ms:.1f}ms x laço {laco_ms:.1f}ms"
+    logger.info(f"✅ 150 pares × 100 candles: lote {lote_ms:.1f}ms, laço em pandas {laco_ms:.1f}ms")
+
+if __name__ == "__main__":
+    try:
+        testar_matriz_contra_pandas()
+        testar_resumo_igual_ao_motor()
+        testar_triagem_de_100_pares()
+        testar_custo_contra_laco()
+        logger.info("🎉 Testes dos indicadores em lote concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Teste dos Indicadores Incrementais
+Confere o motor contra as fórmulas em pandas, a prévia sem efeito colateral, o estado salvo/restaurado,
+a alimentação incremental pelo buffer de ticks e pelo cache de klines, as duas definições de tendência
+e o custo por tick
+"""
+
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from buffer_precos import BufferCircularPrecos
+from cache_klines import CacheKlines, determinar_tendencia
+from indicadores_streaming import GerenciadorIndicadores, MotorIndicadores
+from registro_features import RegistroConsumidores
+
+MINUTO = 60_000
+INICIO = 1_700_000_000_000 // MINUTO * MINUTO
+
+def _serie(n, semente=1):
+    rng = np.random.default_rng(semente)
+    precos = 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    volumes = rng.uniform(1, 100, n)
+    return precos, volumes
+
+def _referencia_pandas(precos, volumes):
+    """Indicadores do último ponto calculados sobre a série inteira em pandas"""
+    s = pd.Series(precos)
+    delta = s.diff()
+    ganho = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    perda = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    macd = s.ewm(span=12).mean() - s.ewm(span=26).mean()
+    sinal = macd.ewm(span=9).mean()
+    media, desvio = s.rolling(20).mean(), s.rolling(20).std()
+    return {
+        'rsi': float(100 - 100 / (1 + ganho.iloc[-1] / perda.iloc[-1])),
+        'ma_20': float(media.iloc[-1]),
+        'ma_50': float(s.rolling(50).mean().iloc[-1]),
+        'bb_upper': float(media.iloc[-1] + 2 * desvio.iloc[-1]),
+        'bb_lower': float(media.iloc[-1] - 2 * desvio.iloc[-1]),
+        'macd': float(macd.iloc[-1]),
+        'macd_signal': float(sinal.iloc[-1]),
+        'volatilidade': float(s.pct_change().rolling(20).std().iloc[-1]),
+        'volume_medio': float(pd.Series(volumes).tail(20).mean()),
+        'tendencia': _tendencia_preparador(precos),
+    }
+
+def _tendencia_preparador(precos, periodo=20):
+    """Tendência como o preparador de dados calculava: preço contra o de `periodo` períodos atrás, ±1%"""
+    if len(precos) < periodo:
+        return 'lateral'
+    if precos[-1] > precos[-periodo] * 1.01:
+        return 'alta'
+    return 'baixa' if precos[-1] < precos[-periodo] * 0.99 else 'lateral'
+
+def _comparar(valores, referencia, tolerancia=1e-8):
+    for chave, esperado in referencia.items():
+        obtido = valores[chave]
+        if isinstance(esperado, str):
+            assert obtido == esperado, f"{chave}: {obtido} != {esperado}"
+        else:
+            assert abs(obtido - esperado) <= tolerancia * max(1.0, abs(esperado)), f"{chave}: {obtido} != {esperado}"
+
+def testar_equivalencia_pandas():
+    """Cada preço novo deixa o motor igual ao cálculo em pandas sobre o histórico inteiro"""
+    logger.info("🧪 Testando motor incremental contra pandas...")
+
+    precos, volumes = _serie(10000)
+    motor = MotorIndicadores()
+    for i, (preco, volume) in enumerate(zip(precos, volumes), 1):
+        valores = motor.atualizar(preco, volume)
+        if i in (60, 500, 5000, 10000):  # depois de passar por recálculos da janela
+            _comparar(valores, _referencia_pandas(precos[:i], volumes[:i]))
+
+    assert valores['amostras'] == 10000 and valores['historico_precos'] == list(precos[-5:])
+    curto = MotorIndicadores()
+    curto.alimentar(precos[:10])
+    neutros = curto.valores()
+    assert neutros['macd'] == 0.0 and neutros['volatilidade'] == 0.0 and neutros['tendencia'] == 'lateral'
+    assert neutros['ma_50'] == neutros['preco'] == precos[9]
+    logger.info(f"✅ RSI {valores['rsi']:.2f}, MACD {valores['macd']:.4f} batem com pandas em 10000 ticks")
+
+def testar_previa_e_estado():
+    """Prévia não altera o motor; estado restaurado (via JSON) continua idêntico"""
+    logger.info("🧪 Testando prévia e estado serializável...")
+
+    precos, volumes = _serie(3000, semente=2)
+    motor = MotorIndicadores()
+    motor.alimentar(precos[:2000], volumes[:2000])
+    antes = motor.valores()
+    previa = motor.previa(precos[2000], volumes[2000])
+    assert motor.valores() == antes, "Prévia alterou o estado"
+    assert previa == motor.atualizar(precos[2000], volumes[2000]), "Prévia difere da atualização"
+
+    restaurado = MotorIndicadores.restaurar(json.loads(json.dumps(motor.estado())))
+    motor.alimentar(precos[2001:], volumes[2001:])
+    restaurado.alimentar(precos[2001:], volumes[2001:])
+    assert restaurado.valores() == motor.valores(), "Motor restaurado divergiu"
+
+    gerenciador = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+    gerenciador.atualizar('BTCUSDT', precos[0])
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'indicadores.json')
+        gerenciador.salvar(caminho)
+        outro = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+        assert outro.carregar(caminho) and not outro.carregar(os.path.join(pasta, 'nao_existe.json'))
+    assert outro.motor('BTCUSDT').valores() == gerenciador.motor('BTCUSDT').valores()
+    logger.info(f"✅ Prévia sem efeito colateral; estado de {len(json.dumps(motor.estado()))} bytes restaurado")
+
+def testar_buffer_incremental():
+    """Só os ticks novos do buffer entram; anel sobrescrito além do visto recomeça da janela"""
+    logger.info("🧪 Testando alimentação pelo buffer de ticks...")
+
+    precos, volumes = _serie(1500, semente=3)
+    buffer = BufferCircularPrecos('BTCUSDT', capacidade=512)
+    gerenciador = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+    for i in range(300):
+        buffer.adicionar(INICIO + i, precos[i], volumes[i])
+    gerenciador.de_buffer('BTCUSDT', buffer)
+    for i in range(300, 400):
+        buffer.adicionar(INICIO + i, precos[i], volumes[i])
+    valores = gerenciador.de_buffer('BTCUSDT', buffer)
+    assert gerenciador.obter_estatisticas()['precos'] == 400, "Ticks reprocessados"
+    _comparar(valores, _referencia_pandas(precos[:400], volumes[:400]))
+
+    for i in range(400, 1500):
+        buffer.adicionar(INICIO + i, precos[i], volumes[i])
+    valores = gerenciador.de_buffer('BTCUSDT', buffer)
+    stats = gerenciador.obter_estatisticas()
+    assert stats['reconstrucoes'] == 1 and valores['amostras'] == 512, f"{stats}"
+    _comparar({'ma_20': valores['ma_20'], 'volume_medio': valores['volume_medio']},
+              {k: v for k, v in _referencia_pandas(precos, volumes).items() if k in ('ma_20', 'volume_medio')})
+    logger.info(f"✅ Buffer: {stats['precos']} ticks processados, {stats['reconstrucoes']} reconstrução")
+
+def testar_klines_com_candle_em_formacao():
+    """Candles confirmados entram uma vez; o último, reescrito a cada coleta, só na prévia"""
+    logger.info("🧪 Testando alimentação pelo cache de klines...")
+
+    precos, volumes = _serie(400, semente=4)
+    cache = CacheKlines('BTCUSDT', '1', capacidade=200)
+    candles = [(INICIO + i * MINUTO, p, p, p, p, v, p * v) for i, (p, v) in enumerate(zip(precos, volumes))]
+    gerenciador = GerenciadorIndicadores(consumidores=RegistroConsumidores())
+    cache.mesclar(candles[:150])
+    gerenciador.de_klines(cache)
+    for i in range(150, 400):
+        parcial = candles[i][:4] + (precos[i] * 0.999,) + candles[i][5:]
+        cache.mesclar([parcial])
+        gerenciador.de_klines(cache)
+        cache.mesclar([candles[i]])
+        valores = gerenciador.de_klines(cache)
+
+    stats = gerenciador.obter_estatisticas()
+    assert stats['precos'] == 399 and stats['reconstrucoes'] == 0, f"{stats}"
+    _comparar(valores, _referencia_pandas(precos, volumes))
+    logger.info(f"✅ Klines: {stats['precos']} candles confirmados, {stats['previas']} prévias")
+
+def testar_definicoes_de_tendencia():
+    """Padrão igual à tendência do preparador de dados; 'medias' igual à dos klines do coletor, também na prévia"""
+    logger.info("🧪 Testando as duas definições de tendência...")
+
+    precos, _ = _serie(3000, semente=6)
+    variacao, medias = MotorIndicadores(), MotorIndicadores(metodo_tendencia='medias', limiar_tendencia=0.005)
+    contagem = {}
+    for i, preco in enumerate(precos.tolist(), 1):
+        previa = variacao.previa(preco)['tendencia'], medias.previa(preco)['tendencia']
+        obtido = variacao.atualizar(preco)['tendencia'], medias.atualizar(preco)['tendencia']
+        esperado = _tendencia_preparador(precos[:i]), determinar_tendencia(precos[:i])
+        assert obtido == previa == esperado, f"Tick {i}: {obtido} / prévia {previa} != {esperado}"
+        contagem[obtido[0]] = contagem.get(obtido[0], 0) + 1
+    assert set(contagem) == {'alta', 'baixa', 'lateral'}, f"{contagem}"
+    try:
+        MotorIndicadores(metodo_tendencia='ichimoku')
+        raise AssertionError("Método de tendência desconhecido aceito")
+    except ValueError:
+        pass
+    logger.info(f"✅ {len(precos)} ticks iguais às definições originais: {contagem}")
+
+def testar_custo_por_tick():
+    """Atualização em microssegundos, independente do tamanho do histórico"""
+    logger.info("🧪 Medindo custo por tick...")
+
+    precos, volumes = _serie(50000, semente=5)
+    motor = MotorIndicadores()
+    inicio = time.perf_counter()
+    for preco, volume in zip(precos, volumes):
+        motor.atualizar(preco, volume)
+    custo_us = (time.perf_counter() - inicio) / len(precos) * 1e6
+
+    s = pd.Series(precos[:2000])
+    inicio = time.perf_counter()
+    for _ in range(20):
+        s.ewm(alpha=1 / 14, adjust=False).mean()
+        s.ewm(span=12).mean() - s.ewm(span=26).mean()
+        s.rolling(20).std()
+        s.pct_change().rolling(20).std()
+    custo_pandas_us = (time.perf_counter() - inicio) / 20 * 1e6
+
+    assert custo_us < 200, f"{custo_us:.1f}µs por tick"
+    logger.info(f"✅ {custo_us:.1f}µs por tick (recalcular em pandas sobre 2000 pontos: {custo_pandas_us:.0f}µs)")
+
+if __name__ == "__main__":
+    try:
+        testar_equivalencia_pandas()
+        testar_previa_e_estado()
+        testar_buffer_incremental()
+        testar_klines_com_candle_em_formacao()
+        testar_definicoes_de_tendencia()
+        testar_custo_por_tick()
+        logger.info("🎉 Testes dos indicadores incrementais concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Teste da Camada de Leitura dos Monitores
+Verifica snapshot somente leitura, cache por data_version e painéis dos monitores
+"""
+
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from loguru import logger
+
+from banco_dados import GerenciadorBanco, agora_ms
+from migracoes import aplicar_migracoes
+from leitura_monitor import LeitorMonitor, um
+import monitor_ordens
+
+def _ordem_simulada(banco, ordem_id, status='aberta', resultado=None, lucro=None):
+    banco.executar(
+        "INSERT INTO ordens_simuladas (ordem_id, timestamp, tipo, simbolo, quantidade, preco_entrada, preco_alvo, "
+        "preco_stop, status, resultado, lucro_percentual, duracao_segundos, confianca_ia, razao_fechamento, "
+        "timestamp_fechamento, fechamento_ms) VALUES (?, ?, 'compra', 'BTCUSDT', 1, 100, 101, 99, ?, ?, ?, 30, 0.7, 'alvo', ?, ?)",
+        (ordem_id, datetime.now().isoformat(), status, resultado, lucro,
+         datetime.now().isoformat() if status == 'fechada' else None, agora_ms() if status == 'fechada' else None))
+
+def testar_cache_por_data_version():
+    """Sem commit novo o painel não executa consultas; um commit invalida o cache"""
+    logger.info("🧪 Testando cache por data_version...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'trading.db')
+        banco = GerenciadorBanco(caminho)
+        aplicar_migracoes(banco)
+        _ordem_simulada(banco, 'A1')
+
+        leitor = LeitorMonitor(caminho)
+        consultas = {'abertas': um("SELECT COUNT(*) FROM ordens_simuladas WHERE status = 'aberta'")}
+        primeiro = leitor.instantaneo('teste', consultas)
+        for _ in range(5):
+            leitor.instantaneo('teste', consultas)
+        consultas_sem_mudanca = leitor.obter_estatisticas()['consultas']
+
+        _ordem_simulada(banco, 'A2')
+        depois = leitor.instantaneo('teste', consultas)
+        stats = leitor.obter_estatisticas()
+
+        try:
+            leitor._conn.execute("DELETE FROM ordens_simuladas")
+            bloqueado = False
+        except sqlite3.OperationalError:
+            bloqueado = True
+        leitor.fechar()
+        banco.fechar()
+
+    assert primeiro['abertas'][0] == 1 and depois['abertas'][0] == 2, f"Leituras: {primeiro}, {depois}"
+    assert consultas_sem_mudanca == 1 and stats['acertos_cache'] == 5, f"Cache não evitou consultas: {stats}"
+    assert stats['snapshots'] == 2, f"Commit deveria invalidar o cache: {stats}"
+    assert bloqueado, "Conexão do monitor deveria ser somente leitura"
+    logger.info(f"✅ {stats['snapshots']} snapshots, {stats['acertos_cache']} atualizações servidas do cache")
+
+def testar_painel_monitor_ordens():
+    """monitor_ordens lê ativas, fechadas e estatísticas do mesmo snapshot"""
+    logger.info("🧪 Testando painel do monitor de ordens...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'trading.db')
+        banco = GerenciadorBanco(caminho)
+        aplicar_migracoes(banco)
+        _ordem_simulada(banco, 'A1')
+        _ordem_simulada(banco, 'F1', 'fechada', 'win', 1.5)
+        _ordem_simulada(banco, 'F2', 'fechada', 'loss', -0.5)
+
+        original = monitor_ordens.DB_PATH
+        monitor_ordens.DB_PATH = caminho
+        try:
+            ativas = monitor_ordens.obter_ordens_ativas()
+            fechadas = monitor_ordens.obter_ultimas_ordens_fechadas(5)
+            stats = monitor_ordens.obter_estatisticas()
+        finally:
+            monitor_ordens.DB_PATH = original
+        banco.fechar()
+
+    assert len(ativas) == 1 and len(fechadas) == 2, f"Ativas {len(ativas)}, fechadas {len(fechadas)}"
+    assert stats['total_ordens'] == 2 and stats['wins'] == 1 and stats['ordens_ativas'] == 1, f"Estatísticas: {stats}"
+    assert abs(stats['lucro_total'] - 1.0) < 1e-9
+    logger.info(f"✅ Painel: {len(ativas)} ativa, {len(fechadas)} fechadas, taxa {stats['taxa_acerto']:.0f}%")
+
+if __name__ == "__main__":
+    try:
+        testar_cache_por_data_version()
+        testar_painel_monitor_ordens()
+        logger.info("🎉 Testes da leitura dos monitores concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
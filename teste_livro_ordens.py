@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Teste do Livro de Ordens L2
+Verifica o livro incremental contra um livro ingênuo na reprodução de mensagens gravadas,
+a recuperação após salto de `u` e a ressincronização pelo stream contra o servidor local
+
+fixtures/orderbook_BTCUSDT.jsonl: 300 mensagens orderbook.50.BTCUSDT gravadas do
+ServidorBybitLocal (semente 42), com um salto de `u` e a reassinatura que o segue.
+"""
+
+import os
+import time
+import numpy as np
+from loguru import logger
+
+from livro_ordens import LivroOrdens, reproduzir_arquivo
+from stream_bybit import StreamBybit
+from servidor_bybit_local import ServidorBybitLocal
+from ia.coletor import obter_dados_order_book
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'orderbook_BTCUSDT.jsonl')
+
+class _LivroIngenuo:
+    """Livro de referência: dicionários preço -> tamanho e features por força bruta"""
+
+    def __init__(self):
+        self.b, self.a = {}, {}
+        self.u = None
+        self.consistente = False
+
+    def aplicar(self, mensagem):
+        dados = mensagem['data']
+        if mensagem['type'] == 'snapshot':
+            self.b, self.a, self.consistente = {}, {}, True
+        elif not self.consistente or dados['u'] <= self.u:
+            return
+        elif dados['u'] != self.u + 1:
+            self.consistente = False
+            return
+        for lado, niveis in ((self.b, dados['b']), (self.a, dados['a'])):
+            for preco, tamanho in niveis:
+                if float(tamanho) == 0:
+                    lado.pop(float(preco), None)
+                else:
+                    lado[float(preco)] = float(tamanho)
+        self.u = dados['u']
+
+    def features(self, bps=(10, 25, 50), fator=3.0, minimo=5):
+        melhor_bid, melhor_ask = max(self.b), min(self.a)
+        mid = (melhor_bid + melhor_ask) / 2
+        qb, qa = self.b[melhor_bid], self.a[melhor_ask]
+        prof_bid = {x: sum(t for p, t in self.b.items() if p >= mid * (1 - x / 10_000)) for x in bps}
+        prof_ask = {x: sum(t for p, t in self.a.items() if p <= mid * (1 + x / 10_000)) for x in bps}
+        clusters = 0
+        for lado, limite, reverso in ((self.b, mid * (1 - bps[-1] / 10_000), True),
+                                      (self.a, mid * (1 + bps[-1] / 10_000), False)):
+            janela = [lado[p] for p in sorted(lado, reverse=reverso)
+                      if (p >= limite if reverso else p <= limite)]
+            if len(janela) >= minimo:
+                media = sum(janela) / len(janela)
+                grandes = [t > fator * media for t in janela]
+                clusters += sum(1 for i, g in enumerate(grandes) if g and (i == 0 or not grandes[i - 1]))
+            maior = max(janela) if janela else 0.0
+            if reverso:
+                max_bid = maior
+            else:
+                max_ask = maior
+        return {
+            'melhor_bid': melhor_bid,
+            'melhor_ask': melhor_ask,
+            'microprice': (melhor_bid * qa + melhor_ask * qb) / (qb + qa),
+            'profundidade_bid': prof_bid,
+            'profundidade_ask': prof_ask,
+            'bid_ask_imbalance': (prof_bid[bps[0]] - prof_ask[bps[0]]) / (prof_bid[bps[0]] + prof_ask[bps[0]]),
+            'max_bid_size': max_bid,
+            'max_ask_size': max_ask,
+            'liquidity_clusters': clusters,
+        }
+
+def _esperar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+def testar_reproducao_contra_livro_ingenuo():
+    """Cada mensagem gravada deixa o livro e as features iguais aos da referência ingênua"""
+    logger.info("🧪 Testando reprodução das mensagens gravadas...")
+
+    ingenuo = _LivroIngenuo()
+    comparadas = 0
+    for mensagem, livro in reproduzir_arquivo(FIXTURE):
+        ingenuo.aplicar(mensagem)
+        assert livro.consistente == ingenuo.consistente, f"Consistência diverge em u={mensagem['data']['u']}"
+        if not livro.consistente:
+            continue
+        assert livro.niveis('bid') == sorted(ingenuo.b.items(), reverse=True)
+        assert livro.niveis('ask') == sorted(ingenuo.a.items())
+        esperado = ingenuo.features()
+        features = livro.features
+        for chave in ('melhor_bid', 'melhor_ask', 'microprice', 'bid_ask_imbalance', 'max_bid_size', 'max_ask_size'):
+            assert np.isclose(features[chave], esperado[chave]), f"{chave}: {features[chave]} != {esperado[chave]}"
+        for lado in ('profundidade_bid', 'profundidade_ask'):
+            assert all(np.isclose(features[lado][x], esperado[lado][x]) for x in esperado[lado]), lado
+        assert features['liquidity_clusters'] == esperado['liquidity_clusters']
+        comparadas += 1
+
+    stats = livro.obter_estatisticas()
+    assert comparadas >= 290 and stats['snapshots'] == 2 and stats['lacunas'] == 1, f"Estatísticas: {stats}"
+    logger.info(f"✅ {comparadas} estados idênticos à referência, {stats['tempo_medio_us']:.0f} µs/mensagem")
+
+def testar_lacuna_e_recuperacao():
+    """Salto de `u` marca o livro inconsistente, zera as features e o snapshot seguinte recupera"""
+    logger.info("🧪 Testando lacuna no id de atualização...")
+
+    livro = LivroOrdens('ETHUSDT')
+    topico = 'orderbook.50.ETHUSDT'
+    delta_antes = livro.aplicar_mensagem({'topic': topico, 'type': 'delta', 'data': {'u': 7, 'b': [], 'a': []}})
+    livro.aplicar_mensagem({'topic': topico, 'type': 'snapshot', 'ts': 1,
+                            'data': {'u': 10, 'b': [['99.9', '2'], ['99.8', '1']], 'a': [['100.1', '1'], ['100.2', '3']]}})
+    livro.aplicar_mensagem({'topic': topico, 'type': 'delta', 'ts': 2,
+                            'data': {'u': 11, 'b': [['99.9', '0'], ['100.0', '4']], 'a': []}})
+    repetido = livro.aplicar_mensagem({'topic': topico, 'type': 'delta', 'ts': 3, 'data': {'u': 11, 'b': [], 'a': []}})
+    antes = livro.features
+    saltou = livro.aplicar_mensagem({'topic': topico, 'type': 'delta', 'ts': 4,
+                                     'data': {'u': 13, 'b': [['100.0', '0']], 'a': []}})
+    ignorado = livro.aplicar_mensagem({'topic': topico, 'type': 'delta', 'ts': 5, 'data': {'u': 14, 'b': [], 'a': []}})
+    inconsistente = not livro.consistente
+    livro.aplicar_mensagem({'topic': topico, 'type': 'snapshot', 'ts': 6,
+                            'data': {'u': 14, 'b': [['99.5', '1']], 'a': [['100.5', '1']]}})
+
+    assert not delta_antes and repetido, "Delta sem snapshot deveria falhar; delta repetido, ser descartado"
+    assert antes['melhor_bid'] == 100.0 and antes['microprice'] == (100.0 * 1 + 100.1 * 4) / 5
+    assert not saltou and not ignorado and inconsistente
+    assert livro.consistente and livro.features['mid'] == 100.0 and livro.niveis('bid') == [(99.5, 1.0)]
+    stats = livro.obter_estatisticas()
+    assert stats['lacunas'] == 1 and stats['ignoradas'] == 3, f"Estatísticas: {stats}"
+    logger.info("✅ Lacuna detectada, deltas ignorados até o snapshot seguinte")
+
+def testar_ressincronizacao_pelo_stream():
+    """Salto de `u` no servidor faz o stream reassinar o orderbook; ia.coletor lê as features reais"""
+    logger.info("🧪 Testando ressincronização do livro pelo stream...")
+
+    servidor = ServidorBybitLocal(intervalo_ms=20, semente=3).iniciar()
+    stream = StreamBybit(['BTCUSDT'], url=servidor.url, topicos=['tickers', 'orderbook'])
+    try:
+        stream.iniciar()
+        assert _esperar(lambda: stream.livro('BTCUSDT') is not None and stream.livro('BTCUSDT').consistente)
+        livro = stream.livro('BTCUSDT')
+        servidor.pular_update_livro('BTCUSDT', 2)
+        assert _esperar(lambda: stream.obter_estatisticas()['ressincronizacoes_livro'] == 1), "Stream não reassinou"
+        assert _esperar(lambda: livro.consistente and livro.obter_estatisticas()['snapshots'] >= 2)
+        time.sleep(0.2)
+
+        dados = obter_dados_order_book('BTC/USDT')
+        features = livro.features
+        lacunas = [l for l in stream.lacunas if l['tipo'] == 'livro']
+    finally:
+        stream.parar()
+        servidor.parar()
+    neutro = obter_dados_order_book('BTCUSDT')
+
+    assert abs(features['mid'] / servidor.preco('BTCUSDT') - 1) < 0.005, "Livro longe do preço do servidor"
+    assert dados['max_bid_size'] > 0 and dados['bid_ask_imbalance'] == round(features['bid_ask_imbalance'], 4)
+    assert len(lacunas) == 1, f"Lacunas: {lacunas}"
+    assert neutro['max_bid_size'] == 0.0 and neutro['liquidity_clusters'] == 0, "Livro sem conexão deveria ser neutro"
+    logger.info(f"✅ Livro ressincronizado, imbalance {dados['bid_ask_imbalance']:+.2f}, "
+                f"{dados['liquidity_clusters']} clusters")
+
+if __name__ == "__main__":
+    try:
+        testar_reproducao_contra_livro_ingenuo()
+        testar_lacuna_e_recuperacao()
+        testar_ressincronizacao_pelo_stream()
+        logger.info("🎉 Testes do livro de ordens concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Teste da Manutenção do Banco
+Verifica backup online em passos com escritas concorrentes, rotação e vacuum incremental
+"""
+
+import os
+import gzip
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from loguru import logger
+
+from banco_dados import GerenciadorBanco
+from migracoes import aplicar_migracoes
+from manutencao_banco import ManutencaoBanco
+
+def _popular(banco, quantidade, inicio=0):
+    banco.executar_muitos(
+        "INSERT INTO crypto_dados (timestamp, symbol, preco_atual, tendencia) VALUES (?, ?, ?, ?)",
+        [(datetime.now(), 'BTCUSDT', 100.0 + i, 'x' * 200) for i in range(inicio, inicio + quantidade)]
+    )
+
+def testar_backup_com_escritas():
+    """Backup em passos termina e é consistente enquanto outra thread grava"""
+    logger.info("🧪 Testando backup online com escritas concorrentes...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'trading.db'))
+        aplicar_migracoes(banco)
+        _popular(banco, 3000)
+        manutencao = ManutencaoBanco(banco, diretorio=os.path.join(tmp, 'backups'), manter=2,
+                                     paginas_por_passo=16, pausa_passo_ms=1)
+
+        parar = threading.Event()
+        escritas = []
+
+        def _escritor():
+            i = 3000
+            while not parar.is_set():
+                inicio = datetime.now()
+                _popular(banco, 5, i)
+                escritas.append((datetime.now() - inicio).total_seconds() * 1000)
+                i += 5
+
+        thread = threading.Thread(target=_escritor)
+        thread.start()
+        arquivos = [manutencao.fazer_backup() for _ in range(3)]
+        parar.set()
+        thread.join()
+
+        restaurado = os.path.join(tmp, 'restaurado.db')
+        with gzip.open(arquivos[-1], 'rb') as entrada, open(restaurado, 'wb') as saida:
+            shutil.copyfileobj(entrada, saida)
+        conn = sqlite3.connect(restaurado)
+        linhas = conn.execute("SELECT COUNT(*) FROM crypto_dados").fetchone()[0]
+        integridade = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        conn.close()
+        restantes = manutencao.listar_backups()
+        stats = manutencao.obter_estatisticas()
+        banco.fechar()
+
+    assert all(arquivos), f"Backups falharam: {arquivos}"
+    assert integridade == 'ok' and linhas >= 3000, f"Backup inválido ({integridade}, {linhas} linhas)"
+    assert len(restantes) == 2 and stats['backups_removidos'] == 1, f"Rotação deveria manter 2: {restantes}"
+    assert stats['passos_backup'] > 3, "Backup deveria ter sido feito em vários passos"
+    logger.info(f"✅ {stats['backups']} backups, {stats['passos_backup']} passos "
+                f"(maior {stats['passo_backup_max_ms']:.1f}ms, {stats['reinicios_backup']} reinícios), "
+                f"{len(escritas)} escritas concorrentes (maior {max(escritas, default=0):.1f}ms)")
+
+def testar_vacuum_incremental():
+    """Páginas livres após DELETE voltam ao sistema em passos; ANALYZE roda pelo escritor"""
+    logger.info("🧪 Testando incremental_vacuum e ANALYZE...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'trading.db'))
+        aplicar_migracoes(banco)
+        _popular(banco, 5000)
+        banco.executar("DELETE FROM crypto_dados")
+        livres_antes = banco.consultar_um("PRAGMA freelist_count")[0]
+
+        manutencao = ManutencaoBanco(banco, diretorio=os.path.join(tmp, 'backups'), pausa_passo_ms=0)
+        manutencao.paginas_vacuum = 50
+        liberadas = manutencao.compactar()
+        manutencao.analisar()
+        livres_depois = banco.consultar_um("PRAGMA freelist_count")[0]
+        estatisticas = banco.consultar_um("SELECT COUNT(*) FROM sqlite_stat1")[0]
+        stats = manutencao.obter_estatisticas()
+        banco.fechar()
+
+    assert livres_antes > 50 and livres_depois == 0, f"Freelist {livres_antes} -> {livres_depois}"
+    assert liberadas == livres_antes and stats['passos_vacuum'] > 1
+    assert estatisticas > 0, "ANALYZE deveria preencher sqlite_stat1"
+    logger.info(f"✅ {liberadas} páginas em {stats['passos_vacuum']} passos "
+                f"(maior {stats['passo_vacuum_max_ms']:.1f}ms), ANALYZE {stats['analyze_max_ms']:.1f}ms")
+
+if __name__ == "__main__":
+    try:
+        testar_backup_com_escritas()
+        testar_vacuum_incremental()
+        logger.info("🎉 Testes de manutenção do banco concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Teste do Armazém de Payloads
+Verifica deduplicação por conteúdo, compressão e colunas numéricas promovidas
+"""
+
+import os
+import json
+import tempfile
+from loguru import logger
+
+from banco_dados import BufferEscrita, GerenciadorBanco, fechar_bancos
+from migracoes import aplicar_migracoes
+from payloads import ArmazemPayloads, canonicalizar
+from armazenamento import ArmazenamentoCrypto
+
+def testar_deduplicacao_e_compressao():
+    """Mesmo conteúdo (em qualquer ordem de chaves) vira um único payload"""
+    logger.info("🧪 Testando deduplicação e compressão de payloads...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        aplicar_migracoes(banco)
+        armazem = ArmazemPayloads(banco, limite_compressao=256)
+
+        pequeno = {'rsi': 55.0, 'tendencia': 'alta'}
+        grande = {'historico': [100.0 + i for i in range(200)], 'symbol': 'BTCUSDT'}
+        id_a = armazem.gravar(pequeno)
+        id_b = armazem.gravar({'tendencia': 'alta', 'rsi': 55.0})
+        id_grande = armazem.gravar(grande)
+
+        linhas = banco.consultar_um("SELECT COUNT(*) FROM payloads")[0]
+        compressao = banco.consultar_um("SELECT compressao FROM payloads WHERE payload_id = ?", (id_grande,))[0]
+        rsi_sql = banco.consultar_um("SELECT json_extract(conteudo, '$.rsi') FROM payloads WHERE payload_id = ?", (id_a,))[0]
+        armazem._lidos.clear()
+        lido = armazem.ler(id_grande)
+        banco.fechar()
+
+    assert id_a == id_b, "Mesmo conteúdo deveria gerar o mesmo id"
+    assert linhas == 2, f"Esperado 2 payloads distintos, obtido {linhas}"
+    assert compressao == 1, "Payload grande deveria ser comprimido"
+    assert rsi_sql == 55.0, "Payload pequeno deveria ser consultável com json_extract"
+    assert canonicalizar(lido) == canonicalizar(grande), "Payload lido difere do original"
+    logger.info(f"✅ {linhas} payloads para 3 gravações, compressão OK")
+
+def testar_colunas_promovidas():
+    """Decisões guardam rsi/volatilidade/preco_atual em colunas e referenciam o payload"""
+    logger.info("🧪 Testando colunas promovidas em decisoes_ia...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        armazenamento = ArmazenamentoCrypto(os.path.join(tmp, 'trading.db'))
+        dados = {'preco_atual': 65000.5, 'indicadores': {'rsi': 28.4, 'volatilidade': 0.013}}
+        for _ in range(3):
+            armazenamento.salvar_decisao_ia('BTCUSDT', {'decisao': 'comprar', 'confianca': 0.8}, dados)
+        armazenamento.buffer.descarregar()
+
+        linhas = armazenamento.banco.consultar(
+            "SELECT payload_id, rsi, volatilidade, preco_atual FROM decisoes_ia WHERE rsi < 30")
+        payloads = armazenamento.banco.consultar_um("SELECT COUNT(*) FROM payloads")[0]
+        original = armazenamento.obter_payload(linhas[0][0])
+        fechar_bancos()
+
+    assert len(linhas) == 3 and linhas[0][1:] == (28.4, 0.013, 65000.5), f"Colunas promovidas: {linhas}"
+    assert payloads == 1, f"Três decisões iguais deveriam compartilhar 1 payload (obtido {payloads})"
+    assert json.dumps(original, sort_keys=True) == json.dumps(dados, sort_keys=True)
+    logger.info(f"✅ {len(linhas)} decisões filtradas por SQL, {payloads} payload compartilhado")
+
+def testar_payload_descartado_no_buffer():
+    """Payload só conta como gravado depois do commit: descartado pelo overflow, é reenviado"""
+    logger.info("🧪 Testando payload descartado antes do commit do buffer...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        banco = GerenciadorBanco(os.path.join(tmp, 'teste.db'))
+        aplicar_migracoes(banco)
+        armazem = ArmazemPayloads(banco)
+        buffer = BufferEscrita(banco, intervalo_ms=60000, capacidade=1, politica_overflow='descartar_antigos')
+
+        id_a = armazem.gravar({'rsi': 30.0}, buffer)
+        armazem.gravar({'rsi': 70.0}, buffer)  # overflow descarta o INSERT do primeiro
+        reenviado = armazem.gravar({'rsi': 30.0}, buffer)
+        buffer.descarregar()
+        gravados = banco.consultar_um("SELECT COUNT(*) FROM payloads WHERE payload_id = ?", (id_a,))[0]
+        armazem.gravar({'rsi': 30.0}, buffer)
+        pendentes = buffer.obter_metricas()['pendentes']
+        buffer.fechar()
+        banco.fechar()
+
+    assert reenviado == id_a and gravados == 1, f"Payload referenciado ausente do banco ({gravados})"
+    assert pendentes == 0 and armazem.obter_estatisticas()['payloads_repetidos'] == 1
+    logger.info("✅ INSERT descartado reenviado; após o commit o payload não é reenviado")
+
+if __name__ == "__main__":
+    try:
+        testar_deduplicacao_e_compressao()
+        testar_colunas_promovidas()
+        testar_payload_descartado_no_buffer()
+        logger.info("🎉 Testes de payloads concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Teste do Registro de Features
+Verifica o fecho das dependências, o motor que mantém só as features pedidas (mesmos valores do
+motor completo) e os motores que seguem as features declaradas pelos consumidores
+"""
+
+import json
+import time
+import numpy as np
+from loguru import logger
+
+from buffer_precos import BufferCircularPrecos
+from cache_features import CacheFeatures
+from indicadores_streaming import PARAMETROS_PADRAO, GerenciadorIndicadores, MotorIndicadores
+from registro_features import RegistroConsumidores, fecho, janela_necessaria, montar_registro
+
+INICIO = 1_700_000_000_000
+
+def _serie(n, semente=1):
+    rng = np.random.default_rng(semente)
+    return 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, n))), rng.uniform(1, 100, n)
+
+def testar_fecho_e_janelas():
+    """Dependências vêm antes de quem depende; nome desconhecido é erro"""
+    logger.info("🧪 Testando fecho das dependências...")
+
+    registro = montar_registro(PARAMETROS_PADRAO)
+    ordem = fecho(registro, ['macd_hist'])
+    assert set(ordem) == {'ema_rapida', 'ema_lenta', 'ema_sinal', 'macd', 'macd_signal', 'macd_hist'}, f"{ordem}"
+    assert ordem.index('ema_sinal') > ordem.index('ema_lenta') and ordem[-1] == 'macd_hist'
+    assert set(fecho(registro, ['tendencia'])) == {'janela_20', 'tendencia'}
+    medias = montar_registro(dict(PARAMETROS_PADRAO, metodo_tendencia='medias'))
+    assert set(fecho(medias, ['tendencia'])) == {'janela_5', 'janela_20', 'tendencia'}
+    assert janela_necessaria(registro, ['rsi', 'ma_50']) == 50 and janela_necessaria(registro, ['rsi']) == 15
+    try:
+        fecho(registro, ['rsi', 'ichimoku'])
+        raise AssertionError("Feature desconhecida aceita")
+    except ValueError:
+        pass
+    logger.info(f"✅ macd_hist → {ordem}")
+
+def testar_motor_parcial():
+    """Motor só com rsi/tendencia/volatilidade dá os mesmos valores do completo e não guarda o resto"""
+    logger.info("🧪 Testando motor com features pedidas...")
+
+    precos, volumes = _serie(5000)
+    pedidas = ['rsi', 'tendencia', 'volatilidade']
+    completo, parcial = MotorIndicadores(), MotorIndicadores(pedidas)
+    for i, (preco, volume) in enumerate(zip(precos, volumes)):
+        esperado = completo.atualizar(preco, volume)
+        obtido = parcial.atualizar(preco, volume)
+        if i % 500 == 0:
+            assert obtido == {k: esperado[k] for k in ['preco', 'amostras'] + pedidas}, f"Tick {i}: {obtido}"
+    assert parcial.previa(precos[0], 1.0) == {k: completo.previa(precos[0], 1.0)[k] for k in obtido}
+    assert parcial._ema_rapida is None and parcial._volumes is None and parcial._historico is None
+    assert sorted(parcial._precos) == [20], f"Janelas {sorted(parcial._precos)}"
+
+    restaurado = MotorIndicadores.restaurar(json.loads(json.dumps(parcial.estado())))
+    assert restaurado.atualizar(precos[1], 2.0) == parcial.atualizar(precos[1], 2.0)
+    so_macd = MotorIndicadores(['macd'])
+    so_macd.alimentar(precos, volumes)
+    assert set(so_macd.valores()) == {'preco', 'amostras', 'macd'} and so_macd._ema_sinal is None
+    logger.info(f"✅ Motor parcial igual ao completo em {len(precos)} ticks: {sorted(obtido)}")
+
+def testar_motores_seguem_consumidores():
+    """Sem declarações calcula tudo; a união declarada restringe; feature nova refaz motores e vetores"""
+    logger.info("🧪 Testando motores que seguem os consumidores declarados...")
+
+    precos, volumes = _serie(300, semente=2)
+    buffer = BufferCircularPrecos('BTCUSDT', capacidade=512)
+    for i in range(300):
+        buffer.adicionar(INICIO + i, precos[i], volumes[i])
+    registro = RegistroConsumidores()
+    gerenciador, cache = GerenciadorIndicadores(consumidores=registro), CacheFeatures()
+    assert registro.features_consumidas()[1] is None and 'macd_hist' in cache.de_buffer('BTCUSDT', buffer, gerenciador)
+
+    registro.declarar('teste_prompt', ('rsi', 'tendencia', 'volatilidade'))
+    vetor = cache.de_buffer('BTCUSDT', buffer, gerenciador)
+    assert set(vetor) == {'preco', 'amostras', 'rsi', 'tendencia', 'volatilidade'} and vetor.versao == 2
+    geracao = registro.features_consumidas()[0]
+    registro.declarar('teste_filtros', ('rsi', 'volatilidade'))
+    assert registro.features_consumidas()[0] == geracao, "Subconjunto já coberto mudou a geração"
+    assert cache.de_buffer('BTCUSDT', buffer, gerenciador) is vetor
+
+    registro.declarar('teste_gestor', ('rsi', 'ma_50'))
+    vetor = cache.de_buffer('BTCUSDT', buffer, gerenciador)
+    referencia = MotorIndicadores()
+    referencia.alimentar(precos, volumes)
+    assert vetor.versao == 3 and vetor['ma_50'] == referencia.valores()['ma_50'] and vetor['amostras'] == 300
+    stats = gerenciador.obter_estatisticas()
+    assert stats['reconstrucoes'] == 2 and stats['features'] == ['ma_50', 'rsi', 'tendencia', 'volatilidade']
+    assert gerenciador.janela_necessaria() == 50
+
+    registro.limpar()
+    assert 'macd_hist' in cache.de_buffer('BTCUSDT', buffer, gerenciador), "Sem declarações deveria calcular tudo"
+    logger.info(f"✅ Vetor v{vetor.versao} com {sorted(vetor)}; {stats['reconstrucoes']} reconstruções")
+
+def testar_custo_das_features_nao_consumidas():
+    """Feature que ninguém consome não custa nada por tick"""
+    logger.info("🧪 Medindo custo por tick com e sem as features não consumidas...")
+
+    precos, volumes = _serie(50000, semente=3)
+    custos = {}
+    for nome, features in (('todas', None), ('prompt', ['rsi', 'tendencia', 'volatilidade'])):
+        motor = MotorIndicadores(features)
+        inicio = time.perf_counter()
+        motor.alimentar(precos, volumes)
+        custos[nome] = (time.perf_counter() - inicio) / len(precos) * 1e6
+    assert custos['prompt'] < custos['todas'] * 0.8, f"{custos}"
+    logger.info(f"✅ {custos['todas']:.1f}µs por tick com todas, {custos['prompt']:.1f}µs só com as do prompt")
+
+if __name__ == "__main__":
+    try:
+        testar_fecho_e_janelas()
+        testar_motor_parcial()
+        testar_motores_seguem_consumidores()
+        testar_custo_das_features_nao_consumidas()
+        logger.info("🎉 Testes do registro de features concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Teste do Servidor Bybit Local (REST + WebSocket)
+Aponta ColetorBybit e StreamBybit para o servidor, verifica a consistência dos preços entre REST e
+stream, a latência e as falhas injetadas, e mede a vazão do caminho de coleta
+"""
+
+import json
+import time
+from loguru import logger
+
+from cliente_http import ClienteHTTP, ErroHTTP
+from coletor import ColetorBybit
+from stream_bybit import StreamBybit
+from servidor_bybit_local import ServidorBybitLocal
+
+PARES = ['BTCUSDT', 'ETHUSDT']
+
+def testar_coletor_apontado_para_o_servidor():
+    """Tickers, klines e livro do REST batem com o mercado sintético que o stream publica"""
+    logger.info("🧪 Testando coletor e stream apontados para o servidor local...")
+
+    servidor = ServidorBybitLocal(intervalo_ms=20, semente=11).iniciar()
+    stream = StreamBybit(PARES, url=servidor.url, topicos=['tickers', 'kline'])
+    try:
+        coletor = ColetorBybit(base_url=servidor.url_rest)
+        servidor.silenciar(60)  # mercado parado enquanto compara REST com o preço do servidor
+        rest = coletor.coletar_lote_bybit(PARES)
+        precos_servidor = {s: servidor.preco(s) for s in PARES}
+        historico = coletor.obter_dados_rest('BTCUSDT')
+        livro = coletor.http.get_json(f"{servidor.url_rest}/v5/market/orderbook",
+                                      params={'category': 'linear', 'symbol': 'BTCUSDT', 'limit': 5})
+        preco_livro = servidor.preco('BTCUSDT')
+        servidor.silenciar(0)
+
+        stream.iniciar()
+        coletor.anexar_stream(stream)
+        stream.aguardar_dados(timeout=5)
+        time.sleep(0.3)
+        servidor.silenciar(1)
+        time.sleep(0.1)
+        preco_stream = coletor.obter_preco_atual('ETHUSDT')
+        preco_servidor = servidor.preco('ETHUSDT')
+        candles = coletor.klines.obter('BTCUSDT', '1')
+    finally:
+        stream.parar()
+        servidor.parar()
+
+    inicios = [int(t) for t in candles.janela(len(candles))['ts_ms']] if candles else []
+    assert coletor.snapshot.base_url == coletor.klines.base_url == servidor.url_rest
+    assert {s: rest[s]['preco_atual'] for s in PARES} == precos_servidor, f"REST: {rest}"
+    assert len(historico['dados_historicos']['close']) >= 100, "Histórico de klines curto"
+    assert inicios == sorted(set(inicios)) and len(inicios) > 100, "Candles fora de ordem ou repetidos"
+    melhor_bid, melhor_ask = float(livro['result']['b'][0][0]), float(livro['result']['a'][0][0])
+    assert len(livro['result']['b']) == 5 and melhor_bid < melhor_ask
+    assert abs((melhor_bid + melhor_ask) / 2 / preco_livro - 1) < 0.002, f"Livro {melhor_bid}/{melhor_ask}"
+    assert preco_stream == preco_servidor, f"Stream {preco_stream} x servidor {preco_servidor}"
+    logger.info(f"✅ REST {precos_servidor}, {len(inicios)} candles contínuos, livro {melhor_bid}/{melhor_ask}")
+
+def testar_latencia_429_e_falhas():
+    """Latência segue a distribuição pedida; 429 e falhas saem nas proporções configuradas"""
+    logger.info("🧪 Testando latência, 429 e falhas injetadas...")
+
+    servidor = ServidorBybitLocal(semente=5).iniciar()
+    cliente = ClienteHTTP(max_conexoes_por_host=16, timeout=5)
+    url = f"{servidor.url_rest}/v5/market/tickers"
+    pedido = {'url': url, 'params': {'category': 'linear'}}
+    try:
+        servidor.definir_latencia('lognormal', media_ms=30, desvio_ms=10)
+        for _ in range(12):
+            cliente.em_lote([pedido] * 16)  # no máximo uma por conexão: mede o servidor, não a fila do pool
+        latencia = cliente.obter_latencias()['127.0.0.1/v5/market/tickers']
+
+        servidor.definir_latencia('fixa', media_ms=0)
+        servidor.rajada_429(quantidade=5, retry_after=2)
+        rajada = cliente.em_lote([pedido] * 10)
+
+        servidor.limitar_taxa(100, rajada=50)
+        limitadas = cliente.em_lote([pedido] * 200)
+        servidor.limitar_taxa(None)
+
+        servidor.injetar_falhas(malformado=0.1, erro_5xx=0.1, desconexao=0.1)
+        falhas = cliente.em_lote([pedido] * 500)
+        stats = servidor.obter_estatisticas()
+    finally:
+        cliente.fechar()
+        servidor.parar()
+
+    def _classificar(resposta):
+        if isinstance(resposta, ErroHTTP):
+            return 'queda'
+        if resposta.status != 200:
+            return resposta.status
+        try:
+            json.loads(resposta.corpo)
+            return 'ok'
+        except ValueError:
+            return 'malformado'
+
+    tipos = [_classificar(r) for r in falhas]
+    assert 25 <= latencia['p50_ms'] <= 60 and latencia['p95_ms'] < 150, f"Latência: {latencia}"
+    assert [r.status for r in rajada].count(429) == 5, "Rajada de 429 deveria recusar exatamente 5"
+    assert all(r.cabecalhos.get('retry-after') == '2' for r in rajada if r.status == 429)
+    assert 45 <= [r.status for r in limitadas].count(200) <= 80, "Limite de taxa não segurou a rajada"
+    for tipo in (503, 'malformado'):
+        assert 20 <= tipos.count(tipo) <= 85, f"{tipo}: {tipos.count(tipo)} em 500"
+    # Queda numa conexão reaproveitada o cliente repete numa nova: só as quedas em conexão nova viram erro
+    assert 20 <= stats['desconexoes'] <= 85 and tipos.count('queda') <= stats['desconexoes'], f"{stats}"
+    assert stats['respostas_429'] >= 5 + 120, f"{stats}"
+    logger.info(f"✅ p50 {latencia['p50_ms']:.0f}ms p95 {latencia['p95_ms']:.0f}ms; falhas em 500: "
+                f"{stats['desconexoes']} quedas ({tipos.count('queda')} sem repetição), {tipos.count(503)} 503, "
+                f"{tipos.count('malformado')} malformadas")
+
+def testar_falhas_no_stream():
+    """Mensagens malformadas e quedas no WebSocket: o stream descarta, reconecta e segue com preço"""
+    logger.info("🧪 Testando falhas injetadas no WebSocket...")
+
+    servidor = ServidorBybitLocal(intervalo_ms=10, semente=9).iniciar()
+    stream = StreamBybit(PARES, url=servidor.url, topicos=['tickers'], backoff_max_segundos=0.2)
+    try:
+        stream.iniciar()
+        stream.aguardar_dados(timeout=5)
+        servidor.injetar_falhas(malformado_ws=0.2, desconexao_ws=0.02)
+        time.sleep(3)
+        servidor.injetar_falhas(malformado_ws=0.0, desconexao_ws=0.0)
+        time.sleep(1)
+        preco = stream.preco_atual('BTCUSDT', max_idade=1)
+        stats = stream.obter_estatisticas()
+        stats_servidor = servidor.obter_estatisticas()
+    finally:
+        stream.parar()
+        servidor.parar()
+
+    assert stats_servidor['malformados_ws'] > 10 and stats_servidor['desconexoes_ws'] >= 1, f"{stats_servidor}"
+    assert stats['mensagens_invalidas'] > 0 and stats['reconexoes'] >= 1, f"Stream: {stats}"
+    assert preco is not None, "Stream deveria voltar a ter preço depois das falhas"
+    logger.info(f"✅ {stats['mensagens_invalidas']} mensagens inválidas descartadas, "
+                f"{stats['reconexoes']} reconexões, preço {preco}")
+
+def testar_vazao():
+    """Milhares de requisições por segundo pelo cliente compartilhado contra o servidor local"""
+    logger.info("🧪 Medindo vazão do caminho de coleta contra o servidor local...")
+
+    servidor = ServidorBybitLocal(semente=3).iniciar()
+    cliente = ClienteHTTP(max_conexoes_por_host=16, timeout=10)
+    pedidos = [{'url': f"{servidor.url_rest}/v5/market/tickers",
+                'params': {'category': 'spot', 'symbol': PARES[i % 2]}} for i in range(3000)]
+    try:
+        cliente.em_lote(pedidos[:100])
+        inicio = time.perf_counter()
+        respostas = cliente.em_lote(pedidos)
+        duracao = time.perf_counter() - inicio
+    finally:
+        cliente.fechar()
+        servidor.parar()
+
+    taxa = len(respostas) / duracao
+    assert all(not isinstance(r, Exception) and r.status == 200 for r in respostas)
+    assert taxa > 500, f"Vazão de {taxa:.0f} req/s"
+    logger.info(f"✅ {len(respostas)} requisições em {duracao:.2f}s ({taxa:.0f} req/s)")
+
+if __name__ == "__main__":
+    try:
+        testar_coletor_apontado_para_o_servidor()
+        testar_latencia_429_e_falhas()
+        testar_falhas_no_stream()
+        testar_vazao()
+        logger.info("🎉 Testes do servidor Bybit local concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
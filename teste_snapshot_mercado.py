@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Teste do Snapshot de Mercado
+Verifica uma requisição em lote por ciclo para pares × ordens, imutabilidade e leitura pelo stream
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from snapshot_mercado import ServicoSnapshotMercado
+from stream_bybit import StreamBybit
+from servidor_bybit_local import ServidorBybitLocal
+from coletor import ColetorBybit
+
+class _ApiTickers(BaseHTTPRequestHandler):
+    """GET /v5/market/tickers com todos os símbolos; conta as requisições"""
+    requisicoes = 0
+    falhar = False
+
+    def do_GET(self):
+        type(self).requisicoes += 1
+        if type(self).falhar:
+            self.send_response(503)
+            self.end_headers()
+            return
+        lista = [{'symbol': s, 'lastPrice': str(p), 'bid1Price': str(p - 1), 'ask1Price': str(p + 1),
+                  'price24hPcnt': '0.01', 'volume24h': '10', 'highPrice24h': str(p + 5), 'lowPrice24h': str(p - 5)}
+                 for s, p in (('BTCUSDT', 100000.0), ('ETHUSDT', 3000.0), ('SOLUSDT', 150.0))]
+        corpo = json.dumps({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'list': lista},
+                            'time': 1700000000000}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+def _api_local():
+    _ApiTickers.requisicoes = 0
+    _ApiTickers.falhar = False
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ApiTickers)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def testar_uma_requisicao_por_ciclo():
+    """10 ordens em 2 pares, consultadas em paralelo, custam uma única requisição"""
+    logger.info("🧪 Testando uma requisição por ciclo...")
+
+    servidor, url = _api_local()
+    try:
+        coletor = ColetorBybit()
+        coletor.base_url = url
+        coletor.snapshot.base_url = url
+        coletor.snapshot.ttl = 60
+
+        precos = []
+        threads = [threading.Thread(target=lambda s=s: precos.append(coletor.obter_preco_atual(s)))
+                   for s in ['BTCUSDT', 'ETHUSDT'] * 5]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        dados = coletor.coletar_dados()
+        snapshot = coletor.obter_snapshot()
+        requisicoes_ciclo = _ApiTickers.requisicoes
+
+        coletor.obter_snapshot(max_idade=0)
+        stats = coletor.snapshot.obter_estatisticas()
+    finally:
+        servidor.shutdown()
+
+    assert requisicoes_ciclo == 1, f"Esperada 1 requisição no ciclo, feitas {requisicoes_ciclo}"
+    assert sorted(set(precos)) == [3000.0, 100000.0] and len(dados) == 2, f"Preços: {precos}"
+    assert stats['requisicoes'] == 2 and stats['acertos_cache'] >= 11, f"Estatísticas: {stats}"
+    try:
+        snapshot.tickers['BTCUSDT']['preco_atual'] = 1.0
+        imutavel = False
+    except TypeError:
+        imutavel = True
+    assert imutavel, "Snapshot deveria ser somente leitura"
+    logger.info(f"✅ {len(threads)} consultas + coleta de {len(dados)} pares com {requisicoes_ciclo} requisição")
+
+def testar_falha_serve_ultimo_snapshot():
+    """Se a busca do novo ciclo falhar, os consumidores continuam com o último snapshot"""
+    logger.info("🧪 Testando fallback para o último snapshot...")
+
+    servidor, url = _api_local()
+    try:
+        servico = ServicoSnapshotMercado(base_url=url, ttl_segundos=0)
+        primeiro = servico.obter()
+        _ApiTickers.falhar = True
+        segundo = servico.obter()
+        stats = servico.obter_estatisticas()
+    finally:
+        servidor.shutdown()
+
+    assert primeiro is segundo and segundo.preco('SOLUSDT') == 150.0
+    assert stats['erros'] == 1 and stats['servidos_vencidos'] == 1, f"Estatísticas: {stats}"
+    logger.info(f"✅ Falha da API servida com snapshot anterior ({len(segundo)} símbolos)")
+
+def testar_snapshot_do_stream():
+    """Com o stream atualizado o snapshot é montado sem HTTP"""
+    logger.info("🧪 Testando snapshot a partir do stream...")
+
+    local = ServidorBybitLocal(intervalo_ms=20).iniciar()
+    stream = StreamBybit(['BTCUSDT', 'ETHUSDT'], url=local.url)
+    try:
+        stream.iniciar()
+        assert stream.aguardar_dados(timeout=5)
+        servico = ServicoSnapshotMercado(base_url='http://127.0.0.1:9', ttl_segundos=0,
+                                         stream=stream, simbolos=['BTCUSDT', 'ETHUSDT'])
+        snapshot = servico.obter()
+        stats = servico.obter_estatisticas()
+    finally:
+        stream.parar()
+        local.parar()
+
+    assert snapshot.fonte == 'Bybit_WS' and set(snapshot.precos()) == {'BTCUSDT', 'ETHUSDT'}
+    assert stats['requisicoes'] == 0 and stats['snapshots_stream'] == 1, f"Estatísticas: {stats}"
+    logger.info(f"✅ Snapshot do stream: BTC {snapshot.preco('BTCUSDT'):.2f}, ETH {snapshot.preco('ETHUSDT'):.2f}")
+
+if __name__ == "__main__":
+    try:
+        testar_uma_requisicao_por_ciclo()
+        testar_falha_serve_ultimo_snapshot()
+        testar_snapshot_do_stream()
+        logger.info("🎉 Testes do snapshot de mercado concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
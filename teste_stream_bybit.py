@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Teste do Stream Bybit
+Verifica ticks nos buffers, reconexão com reassinatura e detecção de lacunas contra o servidor local
+"""
+
+import os
+import time
+import tempfile
+from loguru import logger
+
+from stream_bybit import StreamBybit
+from servidor_bybit_local import ServidorBybitLocal
+from coletor import ColetorBybit
+from gestor_ordens_dinamico import GestorOrdensDinamico
+
+def _esperar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+def testar_ticks_e_buffers():
+    """Tickers, trades e klines chegam normalizados e os ticks vão para o buffer do símbolo"""
+    logger.info("🧪 Testando recepção de ticks...")
+
+    servidor = ServidorBybitLocal(intervalo_ms=20, semente=1).iniciar()
+    stream = StreamBybit(['BTCUSDT', 'ETHUSDT'], url=servidor.url, intervalo_kline='1')
+    try:
+        stream.iniciar()
+        assert stream.aguardar_dados(timeout=5), "Stream não recebeu preços"
+        assert _esperar(lambda: len(stream.buffer('ETHUSDT')) >= 20), "Buffer não acumulou ticks"
+        assert _esperar(lambda: (stream.ultimo_kline('BTCUSDT') or {}).get('fechado')), "Nenhum kline fechado"
+
+        ticker = stream.ultimo_ticker('BTCUSDT')
+        janela = stream.buffer('BTCUSDT').copia()
+        coletor = ColetorBybit()
+        coletor.anexar_stream(stream)
+        preco_coletor = coletor.obter_preco_atual('BTCUSDT')
+        with tempfile.TemporaryDirectory() as tmp:
+            gestor = GestorOrdensDinamico(db_path=os.path.join(tmp, 'trading.db'), stream=stream)
+            mercado = gestor._obter_dados_mercado('ETHUSDT')
+            gestor.banco.fechar()
+        stats = stream.obter_estatisticas()
+    finally:
+        stream.parar()
+        servidor.parar()
+
+    assert ticker['fonte'] == 'Bybit_WS' and ticker['bid'] < ticker['ask'], f"Ticker: {ticker}"
+    assert ticker['preco_maximo'] and ticker['volume'] is not None, "Campos do snapshot perdidos nos deltas"
+    assert (janela['ts_ms'][1:] >= janela['ts_ms'][:-1]).all(), "Ticks fora de ordem no buffer"
+    assert preco_coletor and preco_coletor > 0, "ColetorBybit deveria responder pelo stream"
+    assert mercado['preco_atual'] > 0 and mercado['volatilidade'] > 0, f"Gestor sem dados do stream: {mercado}"
+    assert stats['lacunas'] == 0 and stats['mensagens_invalidas'] == 0, f"Estatísticas: {stats}"
+    assert 'fora_de_ordem' in stats
+    logger.info(f"✅ {stats['ticks']} ticks, {stats['tickers']} tickers, {stats['klines']} klines; "
+                f"BTC {preco_coletor:.2f}")
+
+def testar_reconexao_e_reassinatura():
+    """Queda da conexão: reconecta, reassina todos os tópicos e registra a lacuna"""
+    logger.info("🧪 Testando reconexão e reassinatura...")
+
+    servidor = ServidorBybitLocal(intervalo_ms=20, semente=2).iniciar()
+    stream = StreamBybit(['BTCUSDT', 'ETHUSDT'], url=servidor.url, backoff_max_segundos=0.5)
+    lacunas = []
+    stream.ao_receber('lacuna', lacunas.append)
+    try:
+        stream.iniciar()
+        assert stream.aguardar_dados(timeout=5)
+        inscricoes_antes = len(servidor.inscricoes)
+        ticks_antes = stream.obter_estatisticas()['ticks']
+
+        servidor.derrubar_conexoes()
+        assert _esperar(lambda: stream.obter_estatisticas()['reconexoes'] >= 1), "Stream não reconectou"
+        assert _esperar(lambda: stream.obter_estatisticas()['ticks'] > ticks_antes + 10), "Ticks não voltaram"
+        assert stream.aguardar_dados(timeout=5)
+
+        stream.inscrever(['SOLUSDT'])  # não existe no servidor: assinatura recusada
+        assert _esperar(lambda: stream.obter_estatisticas()['inscricoes_recusadas'] == 1)
+        reassinados = servidor.inscricoes[inscricoes_antes:]
+        stats = stream.obter_estatisticas()
+    finally:
+        stream.parar()
+        servidor.parar()
+
+    assert sorted(reassinados) == sorted(servidor.inscricoes[:inscricoes_antes]), f"Reassinatura: {reassinados}"
+    assert servidor.conexoes_aceitas == 2, f"Conexões: {servidor.conexoes_aceitas}"
+    assert {l['symbol'] for l in lacunas if l['tipo'] == 'reconexao'} == {'BTCUSDT', 'ETHUSDT'}, lacunas
+    logger.info(f"✅ {stats['reconexoes']} reconexão, {len(reassinados)} tópicos reassinados, {len(lacunas)} lacunas")
+
+def testar_lacunas_kline_e_mensagens_invalidas():
+    """Candles pulados viram lacuna; payload malformado é descartado sem derrubar o stream"""
+    logger.info("🧪 Testando lacunas de kline e mensagens inválidas...")
+
+    servidor = ServidorBybitLocal({'BTCUSDT': 50000.0}, intervalo_ms=20, ticks_por_kline=2).iniciar()
+    stream = StreamBybit(['BTCUSDT'], url=servidor.url, intervalo_kline='5')
+    try:
+        stream.iniciar()
+        assert _esperar(lambda: stream.ultimo_kline('BTCUSDT') is not None)
+        servidor.pular_klines('BTCUSDT', 3)
+        assert _esperar(lambda: any(l['tipo'] == 'kline' for l in stream.lacunas)), "Lacuna de kline não detectada"
+        servidor.enviar_bruto('{"topic": "tickers.BTCUSDT", "data": ')
+        servidor.enviar_bruto('[1, 2, 3]')
+        assert _esperar(lambda: stream.obter_estatisticas()['mensagens_invalidas'] == 2)
+        ticks = stream.obter_estatisticas()['ticks']
+        assert _esperar(lambda: stream.obter_estatisticas()['ticks'] > ticks), "Stream parou após payload inválido"
+        lacuna = next(l for l in stream.lacunas if l['tipo'] == 'kline')
+        stats = stream.obter_estatisticas()
+    finally:
+        stream.parar()
+        servidor.parar()
+
+    assert lacuna['fim_ms'] - lacuna['inicio_ms'] == 3 * 5 * 60_000, f"Lacuna: {lacuna}"
+    assert stats['conexoes'] == 1, "Payload inválido não deveria derrubar a conexão"
+    logger.info(f"✅ Lacuna de kline: {lacuna['detalhe']}; {stats['mensagens_invalidas']} mensagens inválidas ignoradas")
+
+if __name__ == "__main__":
+    try:
+        testar_ticks_e_buffers()
+        testar_reconexao_e_reassinatura()
+        testar_lacunas_kline_e_mensagens_invalidas()
+        logger.info("🎉 Testes do stream Bybit concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
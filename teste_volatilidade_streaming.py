@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Teste da Volatilidade EWMA/GARCH
+Verifica o ajuste por máxima verossimilhança, a atualização O(1) contra pandas e a recursão direta,
+o ajuste sobre o histórico arquivado em processo separado e o stop/take do gestor de ordens
+"""
+
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from banco_dados import GerenciadorBanco, fechar_bancos
+from migracoes import aplicar_migracoes
+from gestor_ordens_dinamico import GestorOrdensDinamico, TipoOrdem
+from volatilidade_streaming import GerenciadorVolatilidade, ModeloVolatilidade, ParametrosGarch, ajustar_garch
+
+MINUTO = 60_000
+
+def _garch(n, omega=1e-7, alfa=0.08, beta=0.9, semente=1):
+    """Retornos simulados de um GARCH(1,1) conhecido"""
+    rng = np.random.default_rng(semente)
+    variancia, retornos = omega / (1 - alfa - beta), np.empty(n)
+    for i, z in enumerate(rng.normal(size=n)):
+        retornos[i] = z * math.sqrt(variancia)
+        variancia = omega + alfa * retornos[i] ** 2 + beta * variancia
+    return retornos
+
+def testar_ajuste_recupera_parametros():
+    """Máxima verossimilhança recupera α e β de uma série simulada; poucos retornos é erro"""
+    logger.info("🧪 Testando ajuste GARCH(1,1)...")
+
+    inicio = time.perf_counter()
+    parametros = ajustar_garch(_garch(8000))
+    custo_ms = (time.perf_counter() - inicio) * 1000
+    assert abs(parametros.alfa - 0.08) < 0.03 and abs(parametros.beta - 0.9) < 0.04, f"{parametros}"
+    assert abs(parametros.variancia_longa / 5e-6 - 1) < 0.2, f"Variância longa {parametros.variancia_longa}"
+    try:
+        ajustar_garch(_garch(100))
+        raise AssertionError("Ajustou com 100 retornos")
+    except ValueError:
+        pass
+    logger.info(f"✅ α={parametros.alfa:.3f} β={parametros.beta:.3f} em {custo_ms:.0f}ms")
+
+def testar_modelo_online():
+    """EWMA igual ao pandas, GARCH igual à recursão direta, previsão longa volta ao longo prazo"""
+    logger.info("🧪 Testando atualização O(1) por retorno...")
+
+    retornos = _garch(5000, semente=2)
+    parametros = ParametrosGarch(1e-7, 0.08, 0.9)
+    modelo = ModeloVolatilidade(parametros, lambda_ewma=0.94, aquecimento=1)
+    precos = 100 * np.exp(np.concatenate([[0.0], np.cumsum(retornos)]))
+    variancias = []
+    inicio = time.perf_counter()
+    for preco in precos.tolist():
+        modelo.adicionar_preco(preco)
+        variancias.append(modelo.var_garch)
+    custo_us = (time.perf_counter() - inicio) / len(precos) * 1e6
+
+    r = np.diff(np.log(precos))
+    ewma = pd.Series(r ** 2).ewm(alpha=0.06, adjust=False).mean().iloc[-1]
+    assert abs(modelo.var_ewma / ewma - 1) < 1e-9, f"EWMA {modelo.var_ewma} != {ewma}"
+    direta = r[0] ** 2
+    for x in r[1:]:
+        direta = 1e-7 + 0.08 * x * x + 0.9 * direta
+    assert abs(modelo.var_garch / direta - 1) < 1e-9, "GARCH difere da recursão direta"
+    assert abs(modelo.prevista(100000) - math.sqrt(parametros.variancia_longa)) < 1e-4 * math.sqrt(5e-6)
+    assert modelo.prevista(1) == math.sqrt(modelo.var_garch) and custo_us < 20, f"{custo_us:.1f}µs"
+    logger.info(f"✅ {len(r)} retornos a {custo_us:.2f}µs; realizada {modelo.realizada():.5f}, "
+                f"prevista {modelo.prevista():.5f}, longo prazo {math.sqrt(parametros.variancia_longa):.5f}")
+
+def testar_ajuste_em_processo_separado():
+    """Ajuste sobre crypto_dados roda em outro processo; as barras continuam entrando enquanto isso"""
+    logger.info("🧪 Testando ajuste em processo separado com histórico arquivado...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, 'teste.db')
+        banco = GerenciadorBanco(caminho)
+        aplicar_migracoes(banco)
+        retornos = _garch(6000, semente=3)
+        precos = 30000 * np.exp(np.cumsum(retornos))
+        inicio = (int(time.time() * 1000) - 6100 * MINUTO) // MINUTO * MINUTO
+        banco.executar_muitos(
+            "INSERT INTO crypto_dados (timestamp, symbol, preco_atual, ts_ms) VALUES (?, 'BTCUSDT', ?, ?)",
+            [(datetime.fromtimestamp((inicio + i * MINUTO) / 1000).isoformat(), float(p), inicio + i * MINUTO + 5000)
+             for i, p in enumerate(precos)])
+        banco.fechar()
+
+        gerenciador = GerenciadorVolatilidade(timeframe='1m', aquecimento=20, db_path=caminho)
+        try:
+            comeco = time.perf_counter()
+            futuro = gerenciador.ajustar_em_segundo_plano(['BTCUSDT', 'ETHUSDT'])
+            agendamento_ms = (time.perf_counter() - comeco) * 1000
+            for i, p in enumerate(precos[-200:].tolist()):
+                gerenciador.adicionar_barra('BTCUSDT', inicio + (6000 + i) * MINUTO, p)
+            barras_durante = gerenciador.obter_estatisticas()['retornos']
+            parametros = futuro.result(timeout=120)
+            time.sleep(0.1)  # callback do futuro aplica os parâmetros
+        finally:
+            gerenciador.parar()
+
+    assert agendamento_ms < 500 and barras_durante == 199, f"{agendamento_ms:.0f}ms, {barras_durante} retornos"
+    assert set(parametros) == {'BTCUSDT'}, f"{parametros}"
+    btc = parametros['BTCUSDT']
+    assert abs(btc.alfa - 0.08) < 0.04 and abs(btc.beta - 0.9) < 0.05 and btc.amostras == 5999, f"{btc}"
+    previsao = gerenciador.previsao('BTCUSDT', horizonte_segundos=300)
+    stats = gerenciador.obter_estatisticas()
+    assert previsao['ajustado'] and previsao['horizonte_barras'] == 5 and stats['ajustes'] == 1, f"{stats}"
+    logger.info(f"✅ Agendado em {agendamento_ms:.1f}ms; α={btc.alfa:.3f} β={btc.beta:.3f} de {btc.amostras} "
+                f"retornos; previsão 5m {previsao['prevista_horizonte'] * 100:.3f}%")
+
+def testar_stop_take_do_gestor():
+    """Stop/take do gestor usam a volatilidade prevista na fórmula de sempre; regime alto encurta o tempo máximo"""
+    logger.info("🧪 Testando stop/take e tempo máximo com a volatilidade prevista...")
+
+    gerenciador = GerenciadorVolatilidade(timeframe='1m', aquecimento=20)
+    gerenciador.aplicar_parametros({'ETHUSDT': ParametrosGarch(1e-7, 0.08, 0.9)})
+    for i, p in enumerate((2000 * np.exp(np.cumsum(_garch(300, semente=4)))).tolist()):
+        gerenciador.adicionar_barra('ETHUSDT', i * MINUTO, p)
+    with tempfile.TemporaryDirectory() as tmp:
+        gestor = GestorOrdensDinamico(os.path.join(tmp, 'teste.db'), volatilidade=gerenciador)
+        dados = {'symbol': 'ETHUSDT', 'volatilidade': 0.02}
+        tempo = gestor._calcular_tempo_maximo(0.6, dados)
+        stop, take = gestor._calcular_stop_take_dinamico(TipoOrdem.COMPRA, 2000.0, dados, 0.6, tempo)
+        previsao = gerenciador.previsao('ETHUSDT', tempo)
+        distancia = previsao['prevista_horizonte'] * 2000.0  # prevista no lugar da volatilidade dos indicadores
+        assert abs((2000.0 - stop) - 0.003 * distancia) < 1e-9
+        assert abs((take - 2000.0) - 0.005 * distancia) < 1e-9
+
+        for i in range(5):  # choque: retornos de 1%
+            gerenciador.adicionar_barra('ETHUSDT', (300 + i) * MINUTO, 2000.0 * (1.01 if i % 2 else 0.99))
+        agitado = gestor._calcular_tempo_maximo(0.6, dados)
+        sem_modelo = gestor._calcular_stop_take_dinamico(TipoOrdem.VENDA, 2000.0, dict(dados, symbol='SOLUSDT'), 0.6)
+        fechar_bancos()
+
+    assert gerenciador.previsao('ETHUSDT', agitado)['regime'] > 1.3 and agitado < tempo, f"{tempo} -> {agitado}"
+    assert sem_modelo == (2000.0 + 0.003 * 0.02 * 2000.0, 2000.0 - 0.005 * 0.02 * 2000.0)
+    logger.info(f"✅ Stop {stop:.2f} / take {take:.2f} em {tempo}s; após choque {agitado}s")
+
+if __name__ == "__main__":
+    try:
+        testar_ajuste_recupera_parametros()
+        testar_modelo_online()
+        testar_ajuste_em_processo_separado()
+        testar_stop_take_do_gestor()
+        logger.info("🎉 Testes da volatilidade EWMA/GARCH concluídos com sucesso!")
+    except Exception as e:
+        logger.error(f"❌ Erro nos testes: {e}")
+        raise
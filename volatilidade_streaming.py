@@ -0,0 +1,460 @@
+"""
+Volatilidade por símbolo: EWMA (realizada) e GARCH(1,1) (prevista), O(1) por retorno
+
+Cada barra fechada do timeframe (1m) gera um retorno logarítmico r e o
+modelo do símbolo atualiza duas variâncias:
+
+    EWMA:   σ²ₜ = λ·σ²ₜ₋₁ + (1 - λ)·r²              (realizada, RiskMetrics)
+    GARCH:  σ²ₜ₊₁ = ω + α·r² + β·σ²ₜ                 (prevista para o próximo retorno)
+
+A previsão para h barras volta à variância de longo prazo ω / (1 - α - β)
+com fator (α + β) por barra, então o stop/take de uma ordem usa a
+volatilidade esperada até o seu tempo máximo e o tempo máximo usa o regime
+(prevista / longo prazo).
+
+Os parâmetros (ω, α, β) são ajustados por máxima verossimilhança sobre o
+histórico arquivado (crypto_dados, banco + Parquet) num processo separado,
+de tempos em tempos; até o primeiro ajuste valem alfa_padrao/beta_padrao com
+ω acompanhando a variância observada.
+"""
+
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from loguru import logger
+
+from barras_tempo import duracao_timeframe_ms
+
+
+@dataclass(frozen=True)
+class ParametrosGarch:
+    """Parâmetros GARCH(1,1) ajustados de um símbolo"""
+    omega: float
+    alfa: float
+    beta: float
+    amostras: int = 0
+    log_verossimilhanca: float = 0.0
+    ajustado_em: float = 0.0
+
+    @property
+    def persistencia(self) -> float:
+        return self.alfa + self.beta
+
+    @property
+    def variancia_longa(self) -> float:
+        return self.omega / (1.0 - self.persistencia)
+
+
+def _log_verossimilhanca(retornos: np.ndarray, alfas: np.ndarray, betas: np.ndarray, var_alvo: float) -> np.ndarray:
+    """Log-verossimilhança gaussiana de vários (α, β) de uma vez, com ω pela variância alvo"""
+    omegas = var_alvo * (1.0 - alfas - betas)
+    variancias = np.full(len(alfas), var_alvo)
+    soma = np.zeros(len(alfas))
+    for r2 in (retornos * retornos).tolist():
+        soma += np.log(variancias) + r2 / variancias
+        variancias = omegas + alfas * r2 + betas * variancias
+    return -0.5 * (soma + len(retornos) * math.log(2 * math.pi))
+
+
+def ajustar_garch(retornos: Iterable[float], min_amostras: int = 500) -> ParametrosGarch:
+    """
+    Ajusta GARCH(1,1) por máxima verossimilhança (sem SciPy)
+
+    ω sai da variância amostral (variance targeting); (α, β) são buscados numa
+    grade de persistência × fração de α, refinada três vezes em volta do melhor
+    ponto. Cada avaliação da grade é uma passada vetorizada sobre os retornos.
+
+    Args:
+        retornos: Retornos logarítmicos em ordem
+        min_amostras: Retornos mínimos para ajustar
+
+    Returns:
+        ParametrosGarch
+
+    Raises:
+        ValueError: Poucos retornos ou série sem variância
+    """
+    r = np.asarray(retornos if isinstance(retornos, np.ndarray) else list(retornos), dtype=np.float64)
+    r = r[np.isfinite(r)]
+    if len(r) < min_amostras:
+        raise ValueError(f"Retornos insuficientes para ajustar GARCH: {len(r)} < {min_amostras}")
+    r = r - r.mean()
+    var_alvo = float(r.var())
+    if var_alvo <= 0:
+        raise ValueError("Retornos sem variância")
+
+    persistencias = 1.0 - np.geomspace(0.001, 0.3, 24)
+    fracoes = np.linspace(0.02, 0.5, 16)
+    melhor = None
+    for _ in range(4):
+        p, f = (grade.ravel() for grade in np.meshgrid(persistencias, fracoes))
+        log_v = _log_verossimilhanca(r, p * f, p * (1 - f), var_alvo)
+        k = int(np.nanargmax(log_v))
+        if melhor is None or log_v[k] > melhor[2]:
+            melhor = (p[k], f[k], float(log_v[k]))
+        passo_p, passo_f = np.ptp(persistencias) / 8, np.ptp(fracoes) / 8
+        persistencias = np.clip(np.linspace(melhor[0] - passo_p, melhor[0] + passo_p, 9), 0.5, 0.9995)
+        fracoes = np.clip(np.linspace(melhor[1] - passo_f, melhor[1] + passo_f, 9), 0.005, 0.95)
+    persistencia, fracao, log_v = float(melhor[0]), float(melhor[1]), melhor[2]
+    alfa, beta = persistencia * fracao, persistencia * (1 - fracao)
+    return ParametrosGarch(var_alvo * (1 - persistencia), alfa, beta, len(r), log_v, time.time())
+
+
+class ModeloVolatilidade:
+    """EWMA e GARCH(1,1) de um símbolo, atualizados em O(1) por retorno"""
+
+    def __init__(self, parametros: Optional[ParametrosGarch] = None, lambda_ewma: float = 0.94,
+                 aquecimento: int = 20, alfa_padrao: float = 0.06, beta_padrao: float = 0.92):
+        """
+        Args:
+            parametros: GARCH ajustado (None = alfa/beta padrão com ω pela variância observada)
+            lambda_ewma: Decaimento da EWMA por retorno
+            aquecimento: Retornos em que as duas variâncias são a amostral
+            alfa_padrao, beta_padrao: GARCH até haver parâmetros ajustados
+        """
+        self.parametros = parametros
+        self.lambda_ewma = lambda_ewma
+        self.aquecimento = max(1, aquecimento)
+        self.alfa_padrao, self.beta_padrao = alfa_padrao, beta_padrao
+        self.n = 0
+        self._soma_r2 = 0.0
+        self.var_ewma = 0.0
+        self.var_garch = 0.0  # σ² previsto para o próximo retorno
+        self.ultimo_preco: Optional[float] = None
+
+    def _coeficientes(self):
+        if self.parametros is not None:
+            return self.parametros.omega, self.parametros.alfa, self.parametros.beta
+        alfa, beta = self.alfa_padrao, self.beta_padrao
+        return (self._soma_r2 / self.n if self.n else 0.0) * (1 - alfa - beta), alfa, beta
+
+    def adicionar_preco(self, preco: float) -> Optional[float]:
+        """Atualiza com o retorno desde o último preço; devolve o retorno (None no primeiro preço)"""
+        anterior, self.ultimo_preco = self.ultimo_preco, preco
+        if not anterior or anterior <= 0 or preco <= 0:
+            return None
+        retorno = math.log(preco / anterior)
+        self.atualizar(retorno)
+        return retorno
+
+    def atualizar(self, retorno: float):
+        """Um retorno novo nas duas variâncias"""
+        r2 = retorno * retorno
+        self.n += 1
+        self._soma_r2 += r2
+        if self.n <= self.aquecimento:
+            self.var_ewma = self.var_garch = self._soma_r2 / self.n
+            return
+        self.var_ewma = self.lambda_ewma * self.var_ewma + (1 - self.lambda_ewma) * r2
+        omega, alfa, beta = self._coeficientes()
+        self.var_garch = omega + alfa * r2 + beta * self.var_garch
+
+    @property
+    def pronto(self) -> bool:
+        return self.n >= self.aquecimento
+
+    @property
+    def variancia_longa(self) -> float:
+        if self.parametros is not None:
+            return self.parametros.variancia_longa
+        return self._soma_r2 / self.n if self.n else 0.0
+
+    def realizada(self) -> float:
+        """Volatilidade EWMA por barra"""
+        return math.sqrt(self.var_ewma)
+
+    def prevista(self, horizonte: int = 1) -> float:
+        """Volatilidade GARCH por barra, média das próximas `horizonte` barras"""
+        _, alfa, beta = self._coeficientes()
+        persistencia = alfa + beta
+        if horizonte <= 1 or persistencia >= 1:
+            return math.sqrt(self.var_garch)
+        longa = self.variancia_longa
+        media = longa + (self.var_garch - longa) * (1 - persistencia ** horizonte) / (horizonte * (1 - persistencia))
+        return math.sqrt(max(media, 0.0))
+
+
+def ajustar_do_historico(db_path: Optional[str], simbolos: List[str], timeframe: str, dias: float,
+                         min_amostras: int) -> Dict[str, ParametrosGarch]:
+    """
+    Ajusta o GARCH de cada símbolo com os preços arquivados (roda no processo de ajuste)
+
+    Os preços de crypto_dados (banco + Parquet) viram fechamentos por barra do
+    timeframe; retornos que atravessam barras sem coleta ficam de fora.
+
+    Returns:
+        {símbolo: ParametrosGarch} dos símbolos com retornos suficientes
+    """
+    import pandas as pd
+    from arquivador import ArquivadorHistorico
+    from banco_dados import DB_PADRAO
+    from leitura_monitor import conectar_somente_leitura
+
+    resultado: Dict[str, ParametrosGarch] = {}
+    # Só leitura: conexão mode=ro própria, sem thread de escrita nem migrações neste processo
+    conn = conectar_somente_leitura(db_path or DB_PADRAO)
+    if conn is None:
+        return resultado
+    try:
+        arquivador = ArquivadorHistorico(conexao_leitura=conn)
+        inicio = datetime.now() - timedelta(days=dias)
+        for simbolo in simbolos:
+            try:
+                df = arquivador.ler_historico('crypto_dados', simbolo, inicio=inicio, colunas=['ts_ms', 'preco_atual'])
+                if df.empty:
+                    continue
+                precos = pd.Series(df['preco_atual'].astype(float).to_numpy(),
+                                   index=pd.to_datetime(df['ts_ms'], unit='ms'))
+                fechamentos = precos[precos > 0].resample(f"{duracao_timeframe_ms(timeframe)}ms").last()
+                retornos = np.diff(np.log(fechamentos.to_numpy()))
+                resultado[simbolo] = ajustar_garch(retornos[np.isfinite(retornos)], min_amostras)
+            except ValueError as e:
+                logger.debug(f"📉 GARCH de {simbolo} não ajustado: {e}")
+    finally:
+        conn.close()
+    return resultado
+
+
+class GerenciadorVolatilidade:
+    """Um ModeloVolatilidade por símbolo, alimentado pelas barras e reajustado em processo separado"""
+
+    def __init__(self, timeframe: Optional[str] = None, lambda_ewma: Optional[float] = None,
+                 aquecimento: Optional[int] = None, db_path: Optional[str] = None):
+        """
+        Args:
+            timeframe: Timeframe das barras aceitas (padrão: volatilidade.timeframe)
+            lambda_ewma: Decaimento da EWMA
+            aquecimento: Retornos antes de haver previsão
+            db_path: Banco com o histórico usado nos ajustes (padrão: dados/trading.db)
+        """
+        try:
+            import config
+            cfg = config.load_config() or {}
+        except Exception:
+            cfg = {}
+        cfg_vol = cfg.get('volatilidade', {}) or {}
+        self.timeframe = timeframe or cfg_vol.get('timeframe', '1m')
+        self.duracao_ms = duracao_timeframe_ms(self.timeframe)
+        self.lambda_ewma = lambda_ewma or cfg_vol.get('lambda_ewma', 0.94)
+        self.aquecimento = aquecimento or cfg_vol.get('aquecimento', 20)
+        self.alfa_padrao = cfg_vol.get('alfa_padrao', 0.06)
+        self.beta_padrao = cfg_vol.get('beta_padrao', 0.92)
+        self.cfg_ajuste = cfg_vol.get('ajuste', {}) or {}
+        self.db_path = db_path
+
+        self._modelos: Dict[str, ModeloVolatilidade] = {}
+        self._ultimo_inicio: Dict[str, int] = {}
+        self._parametros: Dict[str, ParametrosGarch] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._ajuste: Optional[Future] = None
+        self._inicio_ajuste = 0.0
+        self._simbolos_ajuste: List[str] = []
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.estatisticas = {
+            'retornos': 0,
+            'barras_atrasadas': 0,
+            'ajustes': 0,
+            'ajustes_falhos': 0,
+            'simbolos_ajustados': 0,
+            'tempo_ajuste_ms': 0.0,
+            'ultimo_ajuste': None,
+        }
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+    def modelo(self, simbolo: str) -> ModeloVolatilidade:
+        """Modelo do símbolo (criado na primeira chamada, com os parâmetros já ajustados se houver)"""
+        modelo = self._modelos.get(simbolo)
+        if modelo is None:
+            with self._lock:
+                modelo = self._modelos.get(simbolo)
+                if modelo is None:
+                    modelo = self._modelos[simbolo] = ModeloVolatilidade(
+                        self._parametros.get(simbolo), self.lambda_ewma, self.aquecimento,
+                        self.alfa_padrao, self.beta_padrao)
+        return modelo
+
+    def anexar_barras(self, agregador):
+        """Alimenta os modelos com as barras do timeframe fechadas pelo AgregadorBarras"""
+        if self.timeframe not in agregador.timeframes:
+            raise ValueError(f"Timeframe {self.timeframe} não montado pelo agregador ({', '.join(agregador.timeframes)})")
+        agregador.ao_fechar(self._barra_fechada)
+
+    def _barra_fechada(self, evento: Dict[str, Any]):
+        if evento['timeframe'] == self.timeframe:
+            self.adicionar_barra(evento['symbol'], evento['inicio_ms'], evento['close'])
+
+    def adicionar_barra(self, simbolo: str, inicio_ms: int, fechamento: float) -> bool:
+        """Atualiza o modelo do símbolo com uma barra fechada; False se a barra já foi vista"""
+        modelo = self.modelo(simbolo)
+        with self._lock:
+            if inicio_ms <= self._ultimo_inicio.get(simbolo, -1):
+                self.estatisticas['barras_atrasadas'] += 1
+                return False
+            self._ultimo_inicio[simbolo] = inicio_ms
+            if modelo.adicionar_preco(fechamento) is not None:
+                self.estatisticas['retornos'] += 1
+            return True
+
+    def alimentar_klines(self, caches: Iterable) -> int:
+        """
+        Alimenta os modelos com os candles fechados dos caches de klines (partida ou coleta sem stream)
+
+        Returns:
+            Barras novas aplicadas (o último candle de cada cache, em formação, fica de fora)
+        """
+        aplicadas = 0
+        for cache in caches:
+            if cache is None or len(cache) < 2 or cache.duracao_ms != self.duracao_ms:
+                continue
+            janela = cache.janela()
+            inicios, fechamentos = janela['ts_ms'][:-1], janela['close'][:-1]
+            novos = inicios > self._ultimo_inicio.get(cache.simbolo, -1)
+            for inicio, fechamento in zip(inicios[novos].tolist(), fechamentos[novos].tolist()):
+                aplicadas += self.adicionar_barra(cache.simbolo, inicio, fechamento)
+        return aplicadas
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def previsao(self, simbolo: str, horizonte_segundos: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Volatilidade realizada e prevista do símbolo (por barra, em fração do preço)
+
+        Args:
+            simbolo: Símbolo
+            horizonte_segundos: Horizonte da previsão (padrão: uma barra)
+
+        Returns:
+            Dicionário com realizada, prevista, prevista_horizonte, longo_prazo e regime;
+            None enquanto o modelo aquece
+        """
+        modelo = self._modelos.get(simbolo)
+        if modelo is None:
+            return None
+        horizonte = max(1, math.ceil(horizonte_segundos * 1000 / self.duracao_ms)) if horizonte_segundos else 1
+        with self._lock:
+            if not modelo.pronto:
+                return None
+            prevista = modelo.prevista(horizonte)
+            longo_prazo = math.sqrt(max(modelo.variancia_longa, 0.0))
+            return {
+                'timeframe': self.timeframe,
+                'realizada': modelo.realizada(),
+                'prevista': prevista,                                  # média por barra até o horizonte
+                'prevista_horizonte': prevista * math.sqrt(horizonte),  # acumulada no horizonte
+                'horizonte_barras': horizonte,
+                'longo_prazo': longo_prazo,
+                'regime': prevista / longo_prazo if longo_prazo > 0 else 1.0,
+                'ajustado': modelo.parametros is not None,
+                'amostras': modelo.n,
+            }
+
+    # ------------------------------------------------------------------
+    # Ajuste em processo separado
+    # ------------------------------------------------------------------
+    def aplicar_parametros(self, parametros: Dict[str, ParametrosGarch]):
+        """Troca os parâmetros GARCH dos símbolos ajustados (o estado das variâncias continua)"""
+        with self._lock:
+            self._parametros.update(parametros)
+            for simbolo, p in parametros.items():
+                if simbolo in self._modelos:
+                    self._modelos[simbolo].parametros = p
+
+    def ajustar_em_segundo_plano(self, simbolos: Optional[Iterable[str]] = None) -> Future:
+        """
+        Agenda o ajuste por máxima verossimilhança num processo separado
+
+        Os parâmetros são aplicados quando o processo termina; a negociação
+        nunca espera o ajuste. Um ajuste em andamento é reaproveitado.
+
+        Returns:
+            Future com {símbolo: ParametrosGarch}
+        """
+        with self._lock:
+            if self._ajuste is not None and not self._ajuste.done():
+                return self._ajuste
+            simbolos = sorted(set(simbolos if simbolos is not None else list(self._modelos) + self._simbolos_ajuste))
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            self._ajuste = self._executor.submit(
+                ajustar_do_historico, self.db_path, simbolos, self.timeframe,
+                self.cfg_ajuste.get('dias_historico', 7), self.cfg_ajuste.get('min_amostras', 500))
+            self._inicio_ajuste = time.perf_counter()
+            self._ajuste.add_done_callback(self._ajuste_concluido)
+            return self._ajuste
+
+    def _ajuste_concluido(self, futuro: Future):
+        try:
+            parametros = futuro.result()
+        except Exception as e:
+            self.estatisticas['ajustes_falhos'] += 1
+            logger.error(f"❌ Erro no ajuste GARCH: {e}")
+            return
+        self.aplicar_parametros(parametros)
+        self.estatisticas['ajustes'] += 1
+        self.estatisticas['simbolos_ajustados'] = len(self._parametros)
+        self.estatisticas['tempo_ajuste_ms'] += (time.perf_counter() - self._inicio_ajuste) * 1000
+        self.estatisticas['ultimo_ajuste'] = datetime.now().isoformat()
+        for simbolo, p in parametros.items():
+            logger.info(f"📉 GARCH {simbolo}: α={p.alfa:.3f} β={p.beta:.3f} "
+                        f"vol longa {math.sqrt(p.variancia_longa) * 100:.3f}% ({p.amostras} retornos)")
+
+    def iniciar_ajuste(self, simbolos: Iterable[str]) -> 'GerenciadorVolatilidade':
+        """Reajusta os parâmetros a cada volatilidade.ajuste.intervalo_horas (primeiro ajuste na partida)"""
+        self._simbolos_ajuste = [simbolo.replace('/', '') for simbolo in simbolos]
+        if not self.cfg_ajuste.get('ativo', True) or (self._thread and self._thread.is_alive()):
+            return self
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop_ajuste, daemon=True, name="AjusteGarch")
+        self._thread.start()
+        return self
+
+    def _loop_ajuste(self):
+        intervalo = self.cfg_ajuste.get('intervalo_horas', 6) * 3600
+        while not self._parar.is_set():
+            try:
+                self.ajustar_em_segundo_plano()
+            except Exception as e:
+                logger.error(f"❌ Erro ao agendar ajuste GARCH: {e}")
+            self._parar.wait(intervalo)
+
+    def parar(self):
+        """Para o reajuste periódico e encerra o processo de ajuste"""
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Retornos processados, ajustes e parâmetros por símbolo"""
+        with self._lock:
+            stats = dict(self.estatisticas)
+            stats['simbolos'] = len(self._modelos)
+            stats['parametros'] = {simbolo: asdict(p) for simbolo, p in self._parametros.items()}
+        return stats
+
+
+_gerenciador: Optional[GerenciadorVolatilidade] = None
+_lock_gerenciador = threading.Lock()
+
+
+def obter_gerenciador_volatilidade() -> GerenciadorVolatilidade:
+    """Gerenciador compartilhado do processo"""
+    global _gerenciador
+    with _lock_gerenciador:
+        if _gerenciador is None:
+            _gerenciador = GerenciadorVolatilidade()
+        return _gerenciador
@@ -0,0 +1,280 @@
+"""
+WebSocket mínimo (RFC 6455) sobre socket/ssl da biblioteca padrão
+
+Usado pelo stream público da Bybit (stream_bybit.py) e pelo servidor local que
+o substitui nos testes (servidor_bybit_local.py). Cobre só o que esses dois
+precisam: handshake cliente/servidor, frames de texto, fragmentação, ping/pong
+e close. Sem extensões (permessage-deflate) nem subprotocolos.
+"""
+
+import os
+import ssl
+import base64
+import socket
+import struct
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUACAO = 0x0
+OP_TEXTO = 0x1
+OP_BINARIO = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+MAX_PAYLOAD = 16 * 1024 * 1024
+
+
+class ConexaoFechada(Exception):
+    """O outro lado fechou a conexão (close frame ou EOF)"""
+
+
+def _aceite(chave: str) -> str:
+    return base64.b64encode(hashlib.sha1((chave + GUID).encode()).digest()).decode()
+
+
+class ConexaoWebSocket:
+    """Conexão WebSocket já negociada (cliente mascara os frames, servidor não)"""
+
+    def __init__(self, sock: socket.socket, mascarar: bool, pendente: bytes = b''):
+        self.sock = sock
+        self.mascarar = mascarar
+        self._entrada = bytearray(pendente)
+        self._fragmentos = bytearray()
+        self._op_fragmentado: Optional[int] = None
+        self._lock_envio = threading.Lock()
+        self.fechada = False
+
+    # ------------------------------------------------------------------
+    # Handshake
+    # ------------------------------------------------------------------
+    @classmethod
+    def conectar(cls, url: str, timeout: float = 10.0) -> 'ConexaoWebSocket':
+        """Abre a conexão TCP/TLS e faz o handshake do cliente"""
+        partes = urlparse(url)
+        seguro = partes.scheme == 'wss'
+        host = partes.hostname or 'localhost'
+        porta = partes.port or (443 if seguro else 80)
+        caminho = partes.path or '/'
+        if partes.query:
+            caminho += '?' + partes.query
+
+        sock = socket.create_connection((host, porta), timeout=timeout)
+        try:
+            if seguro:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            chave = base64.b64encode(os.urandom(16)).decode()
+            requisicao = (f"GET {caminho} HTTP/1.1\r\n"
+                          f"Host: {host}:{porta}\r\n"
+                          "Upgrade: websocket\r\n"
+                          "Connection: Upgrade\r\n"
+                          f"Sec-WebSocket-Key: {chave}\r\n"
+                          "Sec-WebSocket-Version: 13\r\n\r\n")
+            sock.sendall(requisicao.encode())
+            linha_status, cabecalhos, resto = _ler_cabecalho_http(sock)
+            if ' 101 ' not in linha_status + ' ':
+                raise ConnectionError(f"Handshake recusado: {linha_status}")
+            if cabecalhos.get('sec-websocket-accept') != _aceite(chave):
+                raise ConnectionError("Sec-WebSocket-Accept inválido")
+            return cls(sock, mascarar=True, pendente=resto)
+        except Exception:
+            sock.close()
+            raise
+
+    @classmethod
+    def aceitar(cls, sock: socket.socket) -> Tuple['ConexaoWebSocket', str]:
+        """Responde o handshake do lado servidor; retorna (conexão, caminho pedido)"""
+        linha, cabecalhos, resto = _ler_cabecalho_http(sock)
+        chave = cabecalhos.get('sec-websocket-key')
+        if not linha.startswith('GET ') or not chave or cabecalhos.get('upgrade', '').lower() != 'websocket':
+            sock.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            raise ConnectionError(f"Requisição não é WebSocket: {linha}")
+        resposta = ("HTTP/1.1 101 Switching Protocols\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {_aceite(chave)}\r\n\r\n")
+        sock.sendall(resposta.encode())
+        return cls(sock, mascarar=False, pendente=resto), linha.split(' ')[1]
+
+    # ------------------------------------------------------------------
+    # Envio
+    # ------------------------------------------------------------------
+    def enviar_frame(self, opcode: int, payload: bytes = b''):
+        """Envia um frame final (FIN=1)"""
+        tamanho = len(payload)
+        cabecalho = bytearray([0x80 | opcode])
+        bit_mascara = 0x80 if self.mascarar else 0
+        if tamanho < 126:
+            cabecalho.append(bit_mascara | tamanho)
+        elif tamanho < 1 << 16:
+            cabecalho.append(bit_mascara | 126)
+            cabecalho += struct.pack('!H', tamanho)
+        else:
+            cabecalho.append(bit_mascara | 127)
+            cabecalho += struct.pack('!Q', tamanho)
+        if self.mascarar:
+            mascara = os.urandom(4)
+            cabecalho += mascara
+            payload = _aplicar_mascara(payload, mascara)
+        with self._lock_envio:
+            if self.fechada:
+                raise ConexaoFechada("Conexão já fechada")
+            self.sock.sendall(bytes(cabecalho) + payload)
+
+    def enviar_texto(self, texto: str):
+        self.enviar_frame(OP_TEXTO, texto.encode('utf-8'))
+
+    # ------------------------------------------------------------------
+    # Recebimento
+    # ------------------------------------------------------------------
+    def receber(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Próxima mensagem de texto
+
+        Pings são respondidos aqui; pongs são descartados.
+
+        Args:
+            timeout: Espera máxima por uma mensagem completa
+
+        Returns:
+            Texto da mensagem ou None se o tempo acabou (bytes parciais ficam guardados)
+
+        Raises:
+            ConexaoFechada: close recebido ou socket encerrado
+        """
+        self.sock.settimeout(timeout)
+        while True:
+            frame = self._extrair_frame()
+            if frame is None:
+                try:
+                    dados = self.sock.recv(65536)
+                except (socket.timeout, ssl.SSLWantReadError):
+                    return None
+                except OSError as e:
+                    self.fechada = True
+                    raise ConexaoFechada(str(e))
+                if not dados:
+                    self.fechada = True
+                    raise ConexaoFechada("EOF")
+                self._entrada += dados
+                continue
+
+            fin, opcode, payload = frame
+            if opcode == OP_PING:
+                self.enviar_frame(OP_PONG, payload)
+            elif opcode == OP_PONG:
+                continue
+            elif opcode == OP_CLOSE:
+                try:
+                    self.enviar_frame(OP_CLOSE, payload[:2])
+                except Exception:
+                    pass
+                self.fechada = True
+                codigo = struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else 1005
+                raise ConexaoFechada(f"close {codigo}")
+            elif opcode == OP_CONTINUACAO:
+                if self._op_fragmentado is None:
+                    raise ConexaoFechada("Continuação sem frame inicial")
+                self._fragmentos += payload
+                if fin:
+                    mensagem = bytes(self._fragmentos)
+                    self._fragmentos.clear()
+                    self._op_fragmentado = None
+                    return mensagem.decode('utf-8', errors='replace')
+            elif fin:
+                return payload.decode('utf-8', errors='replace')
+            else:
+                self._op_fragmentado = opcode
+                self._fragmentos = bytearray(payload)
+
+    def _extrair_frame(self) -> Optional[Tuple[bool, int, bytes]]:
+        dados = self._entrada
+        if len(dados) < 2:
+            return None
+        fin = bool(dados[0] & 0x80)
+        opcode = dados[0] & 0x0F
+        mascarado = bool(dados[1] & 0x80)
+        tamanho = dados[1] & 0x7F
+        pos = 2
+        if tamanho == 126:
+            if len(dados) < 4:
+                return None
+            tamanho = struct.unpack('!H', dados[2:4])[0]
+            pos = 4
+        elif tamanho == 127:
+            if len(dados) < 10:
+                return None
+            tamanho = struct.unpack('!Q', dados[2:10])[0]
+            pos = 10
+        if tamanho > MAX_PAYLOAD:
+            raise ConexaoFechada(f"Frame de {tamanho} bytes excede o limite")
+        mascara = b''
+        if mascarado:
+            if len(dados) < pos + 4:
+                return None
+            mascara = bytes(dados[pos:pos + 4])
+            pos += 4
+        if len(dados) < pos + tamanho:
+            return None
+        payload = bytes(dados[pos:pos + tamanho])
+        del dados[:pos + tamanho]
+        if mascarado:
+            payload = _aplicar_mascara(payload, mascara)
+        return fin, opcode, payload
+
+    # ------------------------------------------------------------------
+    # Encerramento
+    # ------------------------------------------------------------------
+    def fechar(self, codigo: int = 1000):
+        """Envia close (se possível) e fecha o socket"""
+        if not self.fechada:
+            try:
+                self.enviar_frame(OP_CLOSE, struct.pack('!H', codigo))
+            except Exception:
+                pass
+        self.fechada = True
+        self.abortar()
+
+    def abortar(self):
+        """Fecha o socket sem close frame (queda de conexão)"""
+        self.fechada = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def _aplicar_mascara(payload: bytes, mascara: bytes) -> bytes:
+    if not payload:
+        return payload
+    # XOR em bloco: repete a máscara até o tamanho do payload e opera como inteiro
+    repetida = (mascara * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repetida, 'big')).to_bytes(len(payload), 'big')
+
+
+def _ler_cabecalho_http(sock: socket.socket, limite: int = 65536) -> Tuple[str, Dict[str, str], bytes]:
+    dados = b''
+    while b'\r\n\r\n' not in dados:
+        bloco = sock.recv(4096)
+        if not bloco:
+            raise ConnectionError("Conexão fechada durante o handshake")
+        dados += bloco
+        if len(dados) > limite:
+            raise ConnectionError("Cabeçalho HTTP muito grande")
+    cabecalho, resto = dados.split(b'\r\n\r\n', 1)
+    linhas = cabecalho.decode('latin-1').split('\r\n')
+    campos = {}
+    for linha in linhas[1:]:
+        if ':' in linha:
+            nome, valor = linha.split(':', 1)
+            campos[nome.strip().lower()] = valor.strip()
+    return linhas[0], campos, resto